@@ -1,5 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import Optional
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
+from typing import Literal, Optional
 
 from app.users.auth import get_current_user, UserInDB
 from app.utils.utils import JobConfig
@@ -20,27 +20,117 @@ def get_sequence(
     job_id: str,
     channel_index: int,
     random_id: str,
+    background_tasks: BackgroundTasks,
+    seed: Optional[int] = None,
+    quality: Literal["master", "preview"] = "master",
     current_user: UserInDB = Depends(get_current_user),
 ):
+    """
+    Renders the sequence of one channel. Requests with the same seed, assets and
+    parameters render the same sequence, served from the render cache after the first.
+    quality=preview renders the whole pipeline at a reduced sample rate; the FX and
+    the mixdown follow the quality of the sequence.
+
+    Returns the sequence's path and its symbolic form: the asset frame, pitch offset,
+    gain and mute flag of each step.
+    """
     try:
         logger.info("Starting to build sequence...")
-        job = JobRunner(job_id, channel_index, random_id)
+        job = JobRunner(job_id, channel_index, random_id, seed=seed, quality=quality)
         res = job.execute()
         processed_job_id = job.result(res)
         logger.info("Finished building sequence...")
         print(processed_job_id)
 
+        if res:
+            background_tasks.add_task(job.build_transposition_bank)
+
         if "sequences" not in processed_job_id:
             raise HTTPException(
                 status_code=404, detail="problem with sequence generation"
             )
-        return processed_job_id
+        return {"sequence": processed_job_id, "symbolic": job.symbolic_result()}
 
     except IndexError as e:
         logger.error(e)
         raise HTTPException(status_code=404, detail="problem with sequence generation")
 
 
+@audio_processing.post("/get_sequence_variants")
+def get_sequence_variants(
+    job_id: str,
+    channel_index: int,
+    random_id: str,
+    background_tasks: BackgroundTasks,
+    n_variants: int = Query(4, ge=1, le=16),
+    seed: Optional[int] = None,
+    quality: Literal["master", "preview"] = "master",
+    current_user: UserInDB = Depends(get_current_user),
+):
+    """
+    Renders n_variants sequences of one channel in a single call, reusing one download
+    and slicing plan. Pick one with /select_sequence_variant before applying fx.
+    """
+    logger.info("Starting to build sequence variants...")
+    job = JobRunner(job_id, channel_index, random_id, seed=seed, quality=quality)
+    res = job.execute_variants(n_variants)
+    processed_job_ids = job.variants_result(res, n_variants)
+    logger.info("Finished building sequence variants...")
+
+    if not processed_job_ids:
+        raise HTTPException(status_code=404, detail="problem with sequence generation")
+
+    background_tasks.add_task(job.build_transposition_bank)
+    return processed_job_ids
+
+
+@audio_processing.post("/select_sequence_variant")
+def select_sequence_variant(
+    job_id: str,
+    channel_index: int,
+    random_id: str,
+    variant: int = Query(..., ge=0),
+    current_user: UserInDB = Depends(get_current_user),
+):
+    job = JobRunner(job_id, channel_index, random_id)
+    if not job.select_variant(variant):
+        raise HTTPException(status_code=404, detail="sequence variant not found")
+    return job.result(True)
+
+
+@audio_processing.post("/get_all_sequences")
+def get_all_sequences(
+    job_id: str,
+    random_id: str,
+    background_tasks: BackgroundTasks,
+    seed: Optional[int] = None,
+    quality: Literal["master", "preview"] = "master",
+    current_user: UserInDB = Depends(get_current_user),
+):
+    """
+    Renders the sequences of every channel of a job concurrently. Channels that failed
+    are reported under "errors" with their error message.
+    """
+    logger.info("Starting to build all sequences...")
+    try:
+        sequences, errors = JobRunner.execute_all_channels(
+            job_id, random_id, seed=seed, quality=quality
+        )
+    except Exception as e:
+        logger.error(e)
+        raise HTTPException(status_code=404, detail="problem with sequence generation")
+    logger.info("Finished building all sequences...")
+
+    if not sequences:
+        raise HTTPException(status_code=404, detail={"errors": errors})
+
+    for channel_index in sequences:
+        background_tasks.add_task(
+            JobRunner(job_id, channel_index, random_id).build_transposition_bank
+        )
+    return {"sequences": sequences, "errors": errors}
+
+
 @audio_processing.post("/apply_fx")
 def apply_fx(
     job_id: str,
@@ -52,6 +142,7 @@ def apply_fx(
     channel_mute_params: str,
     selective_mutism_value: str,
     preset: Optional[str] = None,
+    seed: Optional[int] = None,
     current_user: UserInDB = Depends(get_current_user),
 ):
     mix_params = FxParamsModel(
@@ -68,12 +159,12 @@ def apply_fx(
         logger.info("Starting to apply fx...")
         job_params = JobConfig(job_id, channel_index, random_id=random_id)
 
-        fx = FxRunner(mix_params, job_id, channel_index, random_id)
+        fx = FxRunner(mix_params, job_id, channel_index, random_id, seed=seed)
         res = fx.execute()
 
         print(res)
 
-        mixdown_file = Path(job_params.path_resolver()["local_path_mixdown_pkl"])
+        mixdown_file = Path(job_params.path_resolver()["local_path_mixdown_ragged"])
         mixdown_file.resolve(strict=True)
 
     except FileNotFoundError:
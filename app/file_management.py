@@ -1,8 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Body,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+)
+from fastapi.responses import JSONResponse, Response
+from typing import Optional
 
 from app.users.auth import get_current_user, UserInDB
 from app.utils.utils import JobUtils, purge_all
+from app.utils.render_cache import render_cache
+from app.sequence_generator.audio_cache import decoded_audio_cache
+from app.sequence_generator.plan import sequence_plan_cache
+from app.storage.asset_cache import asset_cache
+from app.storage.catalog import CatalogSettings, sample_catalog
+from app.storage.ingest import ingest_object, object_created_keys, object_removed_keys
 from app.storage.storage import (
+    StorageBase,
     StoreEngineMultiFile,
     StorageEngineDownloader,
     SnapshotManager,
@@ -10,6 +27,9 @@ from app.storage.storage import (
 
 import logging
 import re
+import time
+
+import numpy as np
 
 logger = logging.getLogger(__name__)
 file_management = APIRouter()
@@ -19,14 +39,10 @@ file_management = APIRouter()
 def clean_up_assets(job_id: str, current_user: UserInDB = Depends(get_current_user)):
     try:
         logger.info("Starting to clean up assets...")
-        clean_up_job = JobUtils(job_id)
-
-        matching_assets = clean_up_job.list_files_matching_pattern(
-            ["*.mp3"], "assets/sounds", "mp3"
-        )
-        res = clean_up_job.remove_files(matching_assets)
-        logger.info("Finished cleaning up assets...")
-        return res
+        # trim the asset cache to its cap, keeping the most recently used samples
+        evicted = asset_cache.evict()
+        logger.info(f"Finished cleaning up assets, evicted {len(evicted)}...")
+        return True
     except Exception as e:
         logger.error(e)
         return e
@@ -69,7 +85,7 @@ def clean_up_temp(
             else:
                 raise HTTPException(status_code=404, detail="pattern not supported")
         matching_files = clean_up_job.list_files_matching_pattern(
-            ["*.wav", "*.pkl"], "temp", patterns_to_match
+            ["*.wav", "*.pkl", "*.ragged"], "temp", patterns_to_match
         )
 
         regex = re.compile(f".*{random_id}.*")
@@ -114,15 +130,53 @@ def add_to_favourites(job_id: str, current_user: UserInDB = Depends(get_current_
 def purge(current_user: UserInDB = Depends(get_current_user)):
     try:
         logger.info("Starting to purge temp...")
-        purge_all(["temp"], ["*.pkl", "*.mp3", "*.wav", "*.json"])
+        purge_all(["temp"], ["*.pkl", "*.ragged", "*.mp3", "*.wav", "*.json"])
         logger.info("Starting to purge assets...")
-        purge_all(["assets", "sounds"], ["*.pkl", "*.mp3", "*.wav"])
+        purge_all(["assets", "sounds"], ["*.pkl", "*.mp3", "*.wav", "*.npy", "*.json"])
+        decoded_audio_cache.clear()
+        sequence_plan_cache.clear()
+        logger.info("Starting to purge renders...")
+        purge_all([render_cache.directory], ["*"])
         return True
     except Exception as e:
         logger.error(e)
         return e
 
 
+@file_management.post("/asset_events")
+def asset_events(
+    background_tasks: BackgroundTasks,
+    event: dict = Body(...),
+    current_user: UserInDB = Depends(get_current_user),
+):
+    """
+    Receives bucket notifications: uploaded samples are added to the sample catalog and
+    their analysis sidecars are computed in the background; deleted samples are removed
+    from the catalog.
+    """
+    created = object_created_keys(event)
+    for bucket_name, key in created:
+        sample_catalog.add(bucket_name, key)
+    removed = object_removed_keys(event)
+    for bucket_name, key in removed:
+        sample_catalog.remove(key, bucket_name)
+    if created:
+        resource = StorageBase().resource
+        for bucket_name, key in created:
+            background_tasks.add_task(_ingest_safely, resource.Bucket(bucket_name), key)
+    return {
+        "accepted": [key for __, key in created],
+        "removed": [key for __, key in removed],
+    }
+
+
+def _ingest_safely(bucket, key: str):
+    try:
+        ingest_object(bucket, key)
+    except Exception as e:
+        logger.error(f"Error ingesting {key}: {e}")
+
+
 @file_management.post("/download_from_favourites")
 def download_from_favourites(
     bucket: str, prefix_: str, current_user: UserInDB = Depends(get_current_user)
@@ -156,8 +210,111 @@ def download_universal(
 def build_snapshots(bucket: str, current_user: UserInDB = Depends(get_current_user)):
     snapshot_manager = SnapshotManager(bucket)
 
+    built_at = time.monotonic()
     if snapshot_manager.build_snapshot() and snapshot_manager.get_snapshot_data():
+        sample_catalog.load_dataframe(snapshot_manager.snapshot_files_df, built_at)
         url_1, url_2 = snapshot_manager.generate_presigned_urls()
         return {"snapshot_url": url_1, "snapshot_files_url": url_2}
     else:
         return {"error": "Failed to build snapshots and generate presigned URLs"}
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in [
+        tag[2:] if tag.startswith("W/") else tag for tag in tags
+    ]
+
+
+def _load_catalog():
+    try:
+        sample_catalog.ensure_fresh()
+    except Exception:
+        raise HTTPException(status_code=503, detail="Sample catalog unavailable")
+
+
+@file_management.get("/samples")
+def query_samples(
+    label: Optional[str] = None,
+    key: Optional[str] = None,
+    bpm_min: Optional[float] = None,
+    bpm_max: Optional[float] = None,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(100, ge=1),
+    if_none_match: Optional[str] = Header(None),
+    current_user: UserInDB = Depends(get_current_user),
+):
+    """
+    Pages through the sample catalog, ordered by path. Responses carry the catalog's
+    ETag, and a request whose If-None-Match holds it gets a 304 until the catalog changes.
+    """
+    _load_catalog()
+    etag = f'"{sample_catalog.etag}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    page_size = min(page_size, CatalogSettings().catalog_max_page_size)
+    samples, total = sample_catalog.query(
+        page, page_size, label=label, key=key, bpm_min=bpm_min, bpm_max=bpm_max
+    )
+    return JSONResponse(
+        {
+            "samples": samples,
+            "total": total,
+            "page": page,
+            "page_size": page_size,
+            "next_page": page + 1 if page * page_size < total else None,
+            "labels": sample_catalog.labels(),
+        },
+        headers=headers,
+    )
+
+
+@file_management.get("/samples/random")
+def random_samples(
+    n: int = Query(6, ge=1, le=64),
+    label: Optional[str] = None,
+    key: Optional[str] = None,
+    bpm_min: Optional[float] = None,
+    bpm_max: Optional[float] = None,
+    weights: Optional[str] = Query(
+        None, description="label:weight pairs, e.g. sp_loop__drums_full:2,sp_loop__bass:1"
+    ),
+    seed: Optional[int] = None,
+    current_user: UserInDB = Depends(get_current_user),
+):
+    """
+    Draws n random samples with replacement, uniformly among the matching samples, or
+    picking each sample's label by weight first.
+    """
+    try:
+        label_weights = (
+            {
+                name: float(weight)
+                for name, weight in (pair.rsplit(":", 1) for pair in weights.split(","))
+            }
+            if weights
+            else None
+        )
+    except ValueError:
+        raise HTTPException(status_code=422, detail="weights must be label:weight pairs")
+
+    _load_catalog()
+    try:
+        samples = sample_catalog.draw(
+            n,
+            weights=label_weights,
+            rng=np.random.default_rng(seed),
+            label=label,
+            key=key,
+            bpm_min=bpm_min,
+            bpm_max=bpm_max,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if not samples:
+        raise HTTPException(status_code=404, detail="No matching samples")
+    return {"samples": samples}
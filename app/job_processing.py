@@ -3,12 +3,15 @@ from typing import Optional
 
 from app.users.auth import get_current_user, UserInDB
 from app.utils.utils import JobConfig
+from app.storage.catalog import sample_catalog
 from app.storage.storage import StorageEngine
 
 import logging
 import json
 from pathlib import Path
 
+import numpy as np
+
 logger = logging.getLogger(__name__)
 job_processing = APIRouter()
 
@@ -17,14 +20,35 @@ job_processing = APIRouter()
 def create_job(
     job_id: str,
     payload: dict = Body(...),
+    seed: Optional[int] = None,
     current_user: UserInDB = Depends(get_current_user),
 ):
+    """
+    Uploads a job manifest. A manifest may give a "labels" list, one sample label per
+    channel, instead of its "local_paths" and "cloud_paths": a random sample of each
+    label is then picked from the sample catalog.
+    """
+    if "labels" in payload and "cloud_paths" not in payload:
+        try:
+            sample_catalog.ensure_fresh()
+            payload = {
+                **payload,
+                **sample_catalog.assign(
+                    payload["labels"], rng=np.random.default_rng(seed)
+                ),
+            }
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        except Exception:
+            raise HTTPException(status_code=503, detail="Sample catalog unavailable")
+
     try:
         job_params = JobConfig(job_id, 0, random_id="")
         local_path = job_params.path_resolver()["local_path"]
 
         with open(local_path, "w") as fp:
             json.dump(payload, fp)
+        job_params.invalidate_job_params()
 
         my_storage = StorageEngine(job_params, "job_id_path")
         # my_storage.client_init()
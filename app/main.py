@@ -9,6 +9,7 @@ from starlette.requests import Request
 
 # Local application/library specific imports
 from app.users.auth import FirebaseSettings
+from app.utils.timing import TimingSettings, server_timing_middleware
 from .audio_processing import audio_processing
 from .job_processing import job_processing
 from .file_management import file_management
@@ -38,3 +39,6 @@ async def catch_exceptions_middleware(request: Request, call_next):
 
 
 app.middleware("http")(catch_exceptions_middleware)
+
+if TimingSettings().server_timing:
+    app.middleware("http")(server_timing_middleware)
@@ -1,11 +1,15 @@
 import os
 import glob
+import logging
+import librosa
 import numpy as np
-import pickle
 import pydub
 from app.storage.storage import StorageEngine
 from app.utils.utils import JobConfig
+from app.utils.ragged import RAGGED_EXTENSION, read_ragged
+from app.utils.timing import stage
 from app.sequence_generator.generator import SequenceEngine
+from app.sequence_generator.tiles import bar_length
 
 
 class MixEngine:
@@ -24,7 +28,7 @@ class MixEngine:
     def mix_sequences_pkl(self):
         """
         mix_sequences_pkl(): Mixes the audio sequences.
-           - Loads the .pkl pickle files in the temp folder that start with mixdown_ and the random ID.
+           - Maps the ragged containers in the temp folder that start with mixdown_ and the random ID.
            - Validates and combines the sequences.
            - Exports the mixed audio as a .wav file.
            - Returns True if successful, False otherwise.
@@ -36,21 +40,41 @@ class MixEngine:
         # output_file = self.job_params.path_resolver()["local_path_mixdown_mp3_master"]
         random_id = self.job_params.random_id
 
-        res = []
-        for file in os.listdir(dir_path):
-            if file.startswith("mixdown_" + random_id) and file.endswith(".pkl"):
-                my_arrays = pickle.load(open(os.path.join(dir_path, file), "rb"))
-
-                new_seq = SequenceEngine.validate_sequence(bpm, my_arrays)
+        with stage("mix"):
+            channels_ragged = [
+                read_ragged(os.path.join(dir_path, file))
+                for file in os.listdir(dir_path)
+                if file.startswith("mixdown_" + random_id)
+                and file.endswith(RAGGED_EXTENSION)
+            ]
+            # channels are mixed at their own rate; a preview channel in a master mix is
+            # upsampled rather than mixed at the preview rate
+            sr = max(ragged.sr for ragged in channels_ragged)
+
+            res = []
+            for ragged in channels_ragged:
+                # the frames are contiguous, so the sample block is the whole sequence
+                my_arrays = ragged.samples
+                if ragged.sr != sr:
+                    logging.warning(f"Resampling a {ragged.sr} Hz channel to {sr} Hz")
+                    my_arrays = librosa.resample(
+                        np.asarray(my_arrays), orig_sr=ragged.sr, target_sr=sr
+                    )
+
+                bars = max(1, round(len(my_arrays) / bar_length(bpm, sr)))
+                new_seq = SequenceEngine.validate_sequence(
+                    bpm, my_arrays, bars=bars, sr=sr
+                )
 
                 res.append(new_seq)
 
-        my_input = [
-            (a + b + c + d + e + f) / 6
-            for a, b, c, d, e, f in zip(res[0], res[1], res[2], res[3], res[4], res[5])
-        ]
+            # channels with fewer bars loop over the longest one
+            longest = max(len(seq) for seq in res[:6])
+            res = [seq if len(seq) == longest else np.resize(seq, longest) for seq in res]
 
-        audio_seq_array = np.array(my_input)
+            # every validated sequence is a whole number of float32 bars, so the mix is a
+            # single vectorized mean
+            audio_seq_array = np.mean(np.stack(res[:6]), axis=0)
 
         channels = (
             2 if (audio_seq_array.ndim == 2 and audio_seq_array.shape[1] == 2) else 1
@@ -61,10 +85,11 @@ class MixEngine:
             y = np.int16(audio_seq_array)
 
         try:
-            sequence = pydub.AudioSegment(
-                y.tobytes(), frame_rate=44100, sample_width=2, channels=channels
-            )
-            sequence.export(output_file, format="wav", bitrate="128k")
+            with stage("encode"):
+                sequence = pydub.AudioSegment(
+                    y.tobytes(), frame_rate=sr, sample_width=2, channels=channels
+                )
+                sequence.export(output_file, format="wav", bitrate="128k")
 
             if os.path.exists(output_file):
                 print("sequences mixed")
@@ -150,7 +175,8 @@ class MixRunner:
             job_params = JobConfig(self.job_id, 0, self.random_id)
             mix_ready = MixEngine(job_params, normalize=True).mix_sequences_pkl()
             if mix_ready:
-                StorageEngine(job_params, "mixdown_job_path_master").upload_object()
+                with stage("upload"):
+                    StorageEngine(job_params, "mixdown_job_path_master").upload_object()
                 return True
             else:
                 print("something went wrong")
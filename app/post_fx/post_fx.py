@@ -1,17 +1,23 @@
 import os
-import pickle
 import numpy as np
 import math
-import random
 from typing import Optional
 
 from pydantic import BaseModel, validator
 import pedalboard
 import logging
 
-from app.sequence_generator.generator import SequenceEngine, AudioEngine
+from app.sequence_generator.audio_cache import decoded_audio_cache
+from app.sequence_generator.generator import SequenceEngine, AudioEngine, render_symbolic
+from app.sequence_generator.tiles import BarLayout, TileRenderer
+from app.storage.asset_cache import asset_cache
 from app.storage.storage import StorageEngine
 from app.utils.utils import JobConfig
+from app.utils.quality import RenderQuality
+from app.utils.ragged import RAGGED_EXTENSION
+from app.utils.render_cache import render_cache
+from app.utils.symbolic import SymbolicSequence
+from app.utils.timing import stage, timed
 
 
 class FxParamsModel(BaseModel):
@@ -80,6 +86,25 @@ class FxParamsModel(BaseModel):
         return v
 
 
+def render_sequence(job_params, sequence):
+    """
+    Renders a symbolic sequence, keeping its asset in use in the asset cache meanwhile.
+    An asset evicted since the sequence was generated is fetched again.
+
+    Parameters:
+        job_params: The job parameters.
+        sequence (SymbolicSequence): The sequence to render.
+
+    Returns:
+        List[np.ndarray]: The frame of each step.
+    """
+    with asset_cache.in_use(sequence.asset["path"]):
+        if not os.path.exists(sequence.asset["path"]):
+            with stage("download"):
+                StorageEngine(job_params, "asset_path").get_cached_object()
+        return render_symbolic(sequence)
+
+
 class MuteEngine:
     """
     Class for applying selective mutism to an audio sequence.
@@ -87,58 +112,63 @@ class MuteEngine:
     Attributes:
         mix_params: The mix parameters.
         job_params: The job parameters.
+        rng: The numpy.random.Generator picking the muted frames.
+        header: The header of the sequence, once read.
     """
 
-    def __init__(self, mix_params, job_params):
+    def __init__(self, mix_params, job_params, rng=None):
         self.mix_params = mix_params
         self.job_params = job_params
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.header = {}
 
-    def __perc_to_pulse_mapper(self, seq_len, sequence):
+    def __muted_steps(self, seq_len):
         selective_mutism_value = self.mix_params.selective_mutism_value
 
         if selective_mutism_value == 0:
-            return sequence
-        else:
-            slices = math.ceil(selective_mutism_value * seq_len)
-            # TODO: add better wight system
-            random_slices = random.sample(range(seq_len), slices)
-            for i in random_slices:
-                sequence[i] = np.zeros(len(sequence[i]))
-            return sequence
+            return []
+        slices = math.ceil(selective_mutism_value * seq_len)
+        # TODO: add better wight system
+        return self.rng.choice(seq_len, size=slices, replace=False)
 
+    @timed("mute")
     def apply_selective_mutism(self):
         """
-        Applies selective mutism to the audio sequence.
+        Applies selective mutism to the symbolic sequence, step by step. It is rendered
+        by VolEngine with its gains, so muted frames are never shifted.
 
         Returns:
-            ndarray: The audio sequence with mutism applied.
+            SymbolicSequence: The muted sequence.
         """
-
-        pickle_path = self.job_params.path_resolver()["local_path_processed_pkl"]
-
-        with open(pickle_path, "rb") as f:
-            my_sequence = pickle.load(f)
-
-        my_sequence = self.__perc_to_pulse_mapper(len(my_sequence), my_sequence)
-
-        return my_sequence
+        sequence = SymbolicSequence.load(
+            self.job_params.path_resolver()["local_path_processed_sequence"]
+        )
+        self.header = sequence.header
+        return sequence.with_mutes(self.__muted_steps(len(sequence)))
 
 
 class VolEngine:
     """
-    Class for adjusting the volume of an audio sequence.
+    Class for adjusting the volume of an audio sequence. A symbolic sequence takes the
+    volume as the gain of its steps and is rendered here.
 
     Attributes:
         mix_params: The mix parameters.
         job_params: The job parameters.
-        my_sequence: The audio sequence to adjust.
+        my_sequence: The audio sequence to adjust: a SymbolicSequence or its frames.
+        header: The header of the sequence; multi-bar sequences carry their bar layout
+            in it, rotated rhythms where their first frame starts.
     """
 
-    def __init__(self, mix_params, job_params, my_sequence):
+    def __init__(self, mix_params, job_params, my_sequence, header=None):
         self.mix_params = mix_params
         self.job_params = job_params
         self.pre_processed_sequence = my_sequence
+        self.layout = BarLayout.from_header(header or {})
+        self.sample_rate = RenderQuality.from_header(header or {}).sample_rate
+        self.lead = int((header or {}).get("lead", 0))
 
+    @timed("volume")
     def apply_volume(self):
         """
         Adjusts the volume of the audio sequence.
@@ -149,30 +179,39 @@ class VolEngine:
 
         channel_index = int(self.job_params.channel_index)
         bpm = self.job_params.get_job_params()["bpm"]
+        vol = self.mix_params.vol[channel_index] / 100
 
-        my_sequence_unpacked = SequenceEngine.validate_sequence(
-            bpm, self.pre_processed_sequence
-        )
+        frames = self.pre_processed_sequence
+        scaled = vol == 1
+        if isinstance(frames, SymbolicSequence):
+            frames = render_sequence(self.job_params, frames.with_gain(vol))
+            scaled = True
 
-        vol = self.mix_params.vol[channel_index] / 100
-        if vol == 0:
-            my_sequence_vol_applied = np.zeros(len(my_sequence_unpacked))
-        elif vol == 1:
-            my_sequence_vol_applied = my_sequence_unpacked
-        else:
-            my_sequence_vol_applied = np.array(my_sequence_unpacked) * vol
+        # multi-bar sequences are processed one distinct bar at a time, then assembled
+        tiles = [
+            SequenceEngine.validate_sequence(
+                bpm, tile_frames, sr=self.sample_rate, lead=self.lead
+            )
+            for tile_frames in self.layout.split(frames)
+        ]
 
         if vol == 0:
-            my_sequence_vol_applied_normalized = my_sequence_vol_applied
-        else:
-            my_sequence_vol_applied_normalized = (
-                2.0
-                * (my_sequence_vol_applied - np.min(my_sequence_vol_applied))
-                / np.ptp(my_sequence_vol_applied)
-                - 1
-            )
+            tiles = [np.zeros(len(tile)) for tile in tiles]
+        elif not scaled:
+            tiles = [np.array(tile) * vol for tile in tiles]
+
+        if vol != 0:
+            # the range is scanned, not read from the analysis sidecar: the sidecar's
+            # peak bounds the whole asset, while the sequence plays some of its frames,
+            # shifted and muted. One min and one max pass over the rendered tiles.
+            lo = min(np.min(tile) for tile in tiles)
+            hi = max(np.max(tile) for tile in tiles)
+            if hi > lo:
+                tiles = [2.0 * (tile - lo) / (hi - lo) - 1 for tile in tiles]
 
-        return my_sequence_vol_applied_normalized
+        if self.layout.is_single:
+            return tiles[0]
+        return TileRenderer(bpm, self.sample_rate).render(tiles, self.layout)
 
 
 class FxPedalBoardConfig(BaseModel):
@@ -200,13 +239,28 @@ class FxPedalBoardEngine:
         mix_params: The mix parameters.
         job_params: The job parameters.
         my_sequence: The audio sequence to apply FX to.
+        quality: The RenderQuality of the sequence; the FX run at its sample rate and
+            block size, and the mixdown is tagged with it.
     """
 
-    def __init__(self, mix_params, job_params, my_sequence):
+    # the FX of each fx_input index; VST FX are configured by the preset
+    FX_MAPPING = [
+        "Bitcrush",
+        "Chorus",
+        "Delay",
+        "Phaser",
+        "Reverb",
+        "Distortion",
+        "VST_Portal",
+    ]
+
+    def __init__(self, mix_params, job_params, my_sequence, quality=None):
         self.mix_params = mix_params
         self.job_params = job_params
         self.my_sequence = my_sequence
+        self.quality = RenderQuality.resolve(quality)
 
+    @timed("fx")
     def apply_pedalboard_fx(self):
         """
         Applies the audio FX to the audio sequence.
@@ -243,16 +297,7 @@ class FxPedalBoardEngine:
         Returns:
             tuple: The built pedalboard and the audio FX.
         """
-        fx_mapping = [
-            "Bitcrush",
-            "Chorus",
-            "Delay",
-            "Phaser",
-            "Reverb",
-            "Distortion",
-            "VST_Portal",
-        ]
-        fx = fx_mapping[int(fx_input)]
+        fx = self.FX_MAPPING[int(fx_input)]
         print("printing FX debug", fx)
 
         if "VST" in fx:
@@ -329,10 +374,18 @@ class FxPedalBoardEngine:
                 mono_input = self.my_sequence
 
                 stereo_audio = np.column_stack((mono_input, mono_input))
-                stereo_output = fx_board(stereo_audio, 44100.0)
+                stereo_output = fx_board(
+                    stereo_audio,
+                    float(self.quality.sample_rate),
+                    buffer_size=self.quality.fx_buffer_size,
+                )
                 effected = np.mean(stereo_output, axis=1)
             else:
-                effected = fx_board(self.my_sequence, 44100.0)
+                effected = fx_board(
+                    self.my_sequence,
+                    float(self.quality.sample_rate),
+                    buffer_size=self.quality.fx_buffer_size,
+                )
         except Exception as e:
             print(e)
             return None
@@ -350,19 +403,24 @@ class FxPedalBoardEngine:
         Args:
             audio_data (ndarray): The audio data to save.
         """
-        my_pickle = AudioEngine(
+        my_frames = AudioEngine(
             audio_data,
-            self.job_params.path_resolver()["local_path_mixdown_pkl"],
+            self.job_params.path_resolver()["local_path_mixdown_ragged"],
             normalized=True,
         )
-        my_pickle.save_to_pkl()
+        my_frames.save_to_ragged(
+            sr=self.quality.sample_rate,
+            bpm=self.job_params.get_job_params()["bpm"],
+            channel=int(self.job_params.channel_index),
+            metadata=self.quality.tag(),
+        )
 
         my_wav = AudioEngine(
             audio_data,
             self.job_params.path_resolver()["local_path_mixdown_wav"],
             normalized=True,
         )
-        my_wav.save_to_wav()
+        my_wav.save_to_wav(sr=self.quality.sample_rate)
 
 
 class FxRunner:
@@ -374,14 +432,20 @@ class FxRunner:
         job_id: The ID of the job.
         channel_index: The channel index.
         random_id: The random ID.
+        seed: The seed of the selective mutism. Seeded runs are reproducible and served
+            from the render cache when an identical render exists.
+
+    The FX run at the quality the sequence was rendered at, read from its header.
     """
 
-    def __init__(self, mix_params, job_id, channel_index, random_id):
+    def __init__(self, mix_params, job_id, channel_index, random_id, seed=None):
         self.mix_params = mix_params
         self.job_id = job_id
         self.channel_index = channel_index
         self.random_id = random_id
+        self.seed = seed
         self.job_params = JobConfig(self.job_id, self.channel_index, self.random_id)
+        self.sequence_header = {}
 
     def clean_up(self):
         """
@@ -389,21 +453,30 @@ class FxRunner:
         """
         try:
             # StorageEngine(self.job_params,'job_id_path').delete_local_object()
-            StorageEngine(self.job_params, "mixdown_job_path_pkl").delete_local_object()
+            StorageEngine(
+                self.job_params, "mixdown_job_path_ragged"
+            ).delete_local_object()
             StorageEngine(self.job_params, "mixdown_job_path").delete_local_object()
         except Exception as e:
             logging.error(f"Error during cleanup: {e}")
 
     def _apply_mute_engine(self):
         try:
-            return MuteEngine(self.mix_params, self.job_params).apply_selective_mutism()
+            engine = MuteEngine(
+                self.mix_params, self.job_params, rng=np.random.default_rng(self.seed)
+            )
+            sequence = engine.apply_selective_mutism()
+            self.sequence_header = engine.header
+            return sequence
         except Exception as e:
             logging.error(f"Error in MuteEngine: {e}")
             raise
 
     def _apply_vol_engine(self, sequence):
         try:
-            return VolEngine(self.mix_params, self.job_params, sequence).apply_volume()
+            return VolEngine(
+                self.mix_params, self.job_params, sequence, header=self.sequence_header
+            ).apply_volume()
         except Exception as e:
             logging.error(f"Error in VolEngine: {e}")
             raise
@@ -411,12 +484,45 @@ class FxRunner:
     def _apply_fx_pedal_board_engine(self, sequence):
         try:
             return FxPedalBoardEngine(
-                self.mix_params, self.job_params, sequence
+                self.mix_params,
+                self.job_params,
+                sequence,
+                quality=RenderQuality.from_header(self.sequence_header),
             ).apply_pedalboard_fx()
         except Exception as e:
             logging.error(f"Error in FxPedalBoardEngine: {e}")
             raise
 
+    def render_key(self):
+        """
+        Returns the content address of the channel's mixdown: a hash of the rendered
+        sequence, the mix parameters this channel renders with (its mutism value, volume,
+        FX and, for VST FX, preset) and the seed. Unseeded runs have none.
+        """
+        if self.seed is None:
+            return None
+        sequence_path = self.job_params.path_resolver()["local_path_processed_sequence"]
+        channel_index = int(self.channel_index)
+        fx_input = self.mix_params.fx_input[channel_index]
+        vst = fx_input != "F" and "VST" in FxPedalBoardEngine.FX_MAPPING[int(fx_input)]
+        return render_cache.key(
+            stage="fx",
+            sequence=decoded_audio_cache.asset_digest(sequence_path),
+            selective_mutism_value=self.mix_params.selective_mutism_value,
+            vol=self.mix_params.vol[channel_index],
+            fx=fx_input,
+            preset=self.mix_params.preset if vst else None,
+            channel=self.channel_index,
+            seed=self.seed,
+        )
+
+    def _render_outputs(self):
+        paths = self.job_params.path_resolver()
+        return {
+            RAGGED_EXTENSION: paths["local_path_mixdown_ragged"],
+            ".wav": paths["local_path_mixdown_wav"],
+        }
+
     def execute(self):
         """
         Executes the job of applying selective mutism, volume adjustment, and audio FX.
@@ -425,12 +531,19 @@ class FxRunner:
             bool: True if the job was successfully executed, False otherwise.
         """
         try:
+            render_key = self.render_key()
+            if render_key and render_cache.get(render_key, self._render_outputs()):
+                logging.info("Sequence served from the render cache")
+                return True
+
             sequence_mute_applied = self._apply_mute_engine()
             sequence_vol_applied = self._apply_vol_engine(sequence_mute_applied)
             sequence_ready = self._apply_fx_pedal_board_engine(sequence_vol_applied)
 
             if sequence_ready:
                 logging.info("Sequence ready")
+                if render_key:
+                    render_cache.put(render_key, self._render_outputs())
                 return True
             else:
                 logging.error("Sequence not ready")
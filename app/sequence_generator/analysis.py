@@ -0,0 +1,192 @@
+import json
+import logging
+import os
+from typing import Optional
+
+import librosa
+import numpy as np
+from pydantic import BaseSettings, Field
+
+from app.utils.cache import LRUCache, file_stat_key
+
+ANALYSIS_VERSION = 1
+ANALYSIS_SUFFIX = ".analysis.json"
+# a grid offset only moves to an onset closer than this fraction of the frame length
+ONSET_SNAP_FRACTION = 0.25
+
+logger = logging.getLogger(__name__)
+
+# parsed sidecars, keyed by sidecar file identity
+_analyses = LRUCache.counting(1024)
+
+
+class AnalysisSettings(BaseSettings):
+    """
+    A Pydantic model for the asset analysis settings.
+
+    Attributes:
+    -----------
+    slice_align_transients : bool
+        Moves the frame offsets of the slicer to the nearest onset of the asset's
+        analysis sidecar, when it has one.
+    """
+
+    slice_align_transients: bool = Field(True, env="SLICE_ALIGN_TRANSIENTS")
+
+
+def analysis_path(asset_path: str) -> str:
+    return f"{asset_path}{ANALYSIS_SUFFIX}"
+
+
+def analyze_audio(
+    audio: np.ndarray,
+    sr: int = 44100,
+    size: Optional[int] = None,
+    bpm: Optional[float] = None,
+    key: Optional[str] = None,
+) -> dict:
+    """
+    Computes the facts a render needs about an asset.
+
+    Parameters:
+        audio (np.ndarray): The decoded mono audio.
+        sr (int, optional): The sample rate of the audio. Default is 44100.
+        size (int, optional): The size of the asset file, which validates the sidecar.
+        bpm (float, optional): The tempo of the asset, usually parsed from its name.
+        key (str, optional): The key of the asset, usually parsed from its name.
+
+    Returns:
+        dict: The analysis: duration, sample rate, length, peak, RMS and onset positions
+            in samples, plus the given size, tempo and key.
+    """
+    audio = np.asarray(audio, dtype=np.float32)
+    onsets = (
+        librosa.onset.onset_detect(y=audio, sr=sr, units="samples", backtrack=True)
+        if len(audio)
+        else np.array([], dtype=np.int64)
+    )
+    return {
+        "version": ANALYSIS_VERSION,
+        "size": size,
+        "sr": int(sr),
+        "n_samples": len(audio),
+        "duration": len(audio) / sr,
+        "peak": float(np.max(np.abs(audio))) if len(audio) else 0.0,
+        "rms": float(np.sqrt(np.mean(np.square(audio)))) if len(audio) else 0.0,
+        "onsets": [int(onset) for onset in onsets],
+        "bpm": bpm,
+        "key": key,
+    }
+
+
+def write_analysis(asset_path: str, analysis: dict) -> str:
+    """
+    Writes the analysis sidecar of an asset atomically.
+
+    Parameters:
+        asset_path (str): The path to the asset.
+        analysis (dict): The analysis, see analyze_audio().
+
+    Returns:
+        str: The path to the sidecar.
+    """
+    path = analysis_path(asset_path)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "w") as f:
+            json.dump(analysis, f)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return path
+
+
+def read_analysis(asset_path: str) -> Optional[dict]:
+    """
+    Returns the analysis sidecar of an asset, if it has a valid one.
+
+    A sidecar is valid when it has the current format version and was computed from a
+    file of the asset's size; it is parsed once per sidecar version.
+
+    Parameters:
+        asset_path (str): The path to the asset.
+
+    Returns:
+        Optional[dict]: The analysis, or None.
+    """
+    path = analysis_path(asset_path)
+    try:
+        key = file_stat_key(path)
+        asset_size = os.path.getsize(asset_path)
+    except OSError:
+        return None
+
+    def parse():
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Unreadable analysis sidecar {path}: {e}")
+            return {}
+
+    analysis = _analyses.get_or_compute(key, parse)
+    if analysis.get("version") != ANALYSIS_VERSION or analysis.get("size") != asset_size:
+        return None
+    return analysis
+
+
+def snap_to_onsets(offsets: np.ndarray, onsets, frame_length: int) -> np.ndarray:
+    """
+    Moves each frame offset to the nearest onset within ONSET_SNAP_FRACTION of a frame,
+    so frames start on transients instead of on the bare grid.
+
+    Parameters:
+        offsets (np.ndarray): The sorted grid offsets in samples.
+        onsets (Sequence[int]): The sorted onset positions in samples.
+        frame_length (int): The frame length in samples.
+
+    Returns:
+        np.ndarray: The sorted, distinct offsets.
+    """
+    offsets = np.asarray(offsets, dtype=np.int64)
+    onsets = np.asarray(onsets, dtype=np.int64)
+    if offsets.size == 0 or onsets.size == 0:
+        return offsets
+
+    right = np.clip(np.searchsorted(onsets, offsets), 1, len(onsets) - 1)
+    left = right - 1
+    if len(onsets) == 1:
+        nearest = np.full_like(offsets, onsets[0])
+    else:
+        nearest = np.where(
+            offsets - onsets[left] <= onsets[right] - offsets,
+            onsets[left],
+            onsets[right],
+        )
+    max_shift = int(frame_length * ONSET_SNAP_FRACTION)
+    snapped = np.where(np.abs(nearest - offsets) <= max_shift, nearest, offsets)
+    return np.unique(snapped)
+
+
+def transient_onsets(asset_path: str, sr: int = 44100) -> Optional[list]:
+    """
+    Returns the onsets the slicer aligns the frames of an asset to.
+
+    Parameters:
+        asset_path (str): The path to the asset.
+        sr (int, optional): The sample rate the asset is sliced at. Default is 44100.
+
+    Returns:
+        Optional[list]: The onset positions in samples at that sample rate, or None when
+            transient alignment is disabled or the asset has no valid sidecar.
+    """
+    if not AnalysisSettings().slice_align_transients:
+        return None
+    analysis = read_analysis(asset_path)
+    if analysis is None or not analysis.get("sr"):
+        return None
+    if analysis["sr"] == sr:
+        return analysis["onsets"]
+    # previews slice at a lower rate; the onsets are the same instants
+    return [round(onset * sr / analysis["sr"]) for onset in analysis["onsets"]]
@@ -0,0 +1,97 @@
+import hashlib
+import os
+
+from app.sequence_generator.decode import load_audio
+from app.utils.cache import CacheSettings, LRUCache, file_stat_key
+
+
+class DecodedAudioCache:
+    """
+    Process-wide cache of decoded audio, shared by every stage of the sequence generator.
+
+    Entries are keyed by file path, mtime and size, so a re-downloaded asset is decoded again.
+    Cached arrays are read-only because they are handed out to every caller.
+
+    Attributes:
+        cache: The underlying LRU cache.
+    """
+
+    def __init__(self, max_bytes: int):
+        """
+        The constructor for DecodedAudioCache class.
+
+        Parameters:
+            max_bytes (int): The memory cap of the cache in bytes.
+        """
+        self.cache = LRUCache(max_bytes)
+        # content digests, keyed like the decodes
+        self.digests = LRUCache.counting(4096)
+
+    def load(self, path: str, sr: int = 44100):
+        """
+        Returns the decoded audio for path, decoding it on the first request only.
+
+        Parameters:
+            path (str): The path to the audio file.
+            sr (int, optional): The target sample rate. Default is 44100.
+
+        Returns:
+            np.ndarray: The decoded, read-only audio time series.
+        """
+        try:
+            key = file_stat_key(path) + (sr,)
+        except OSError:
+            # let the decoder report missing files
+            return self._decode(path, sr)
+        return self.cache.get_or_compute(key, lambda: self._decode(path, sr))
+
+    def asset_digest(self, path: str) -> str:
+        """
+        Returns a content hash identifying the asset, computed once per file version.
+
+        Parameters:
+            path (str): The path to the audio file.
+
+        Returns:
+            str: The SHA-1 hex digest of the file, or the path itself if the file is missing.
+        """
+        try:
+            key = file_stat_key(path)
+        except OSError:
+            return path
+        return self.digests.get_or_compute(key, lambda: self._digest(path))
+
+    def invalidate(self, path: str) -> int:
+        """
+        Drops every cached decode of path.
+
+        Parameters:
+            path (str): The path to the audio file.
+
+        Returns:
+            int: The number of removed entries.
+        """
+        real_path = os.path.realpath(path)
+        self.digests.invalidate(lambda key: key[0] == real_path)
+        return self.cache.invalidate(lambda key: key[0] == real_path)
+
+    def clear(self) -> None:
+        self.cache.clear()
+        self.digests.clear()
+
+    @staticmethod
+    def _digest(path: str) -> str:
+        sha1 = hashlib.sha1()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                sha1.update(chunk)
+        return sha1.hexdigest()
+
+    @staticmethod
+    def _decode(path: str, sr: int):
+        audio = load_audio(path, sr=sr)
+        audio.flags.writeable = False
+        return audio
+
+
+decoded_audio_cache = DecodedAudioCache(CacheSettings().decoded_audio_max_bytes)
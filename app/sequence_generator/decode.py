@@ -0,0 +1,160 @@
+import logging
+import os
+import shutil
+import subprocess
+
+import librosa
+import numpy as np
+import soundfile as sf
+from pydantic import BaseSettings, Field
+
+logger = logging.getLogger(__name__)
+
+DECODE_BACKENDS = ("soundfile", "ffmpeg", "librosa")
+
+
+class DecodeSettings(BaseSettings):
+    """
+    A Pydantic model for the audio decode settings.
+
+    Attributes:
+    -----------
+    audio_decode_backend : str
+        "auto" tries libsndfile, then an ffmpeg pipe, then librosa/audioread.
+        Any of "soundfile", "ffmpeg" or "librosa" pins that backend.
+    pretranscode_assets : bool
+        Keeps a float32 .npy copy of each decoded asset next to it, so later loads are
+        a memory map instead of a decode.
+    """
+
+    audio_decode_backend: str = Field("auto", env="AUDIO_DECODE_BACKEND")
+    pretranscode_assets: bool = Field(False, env="PRETRANSCODE_ASSETS")
+
+
+def _decode_soundfile(path: str, sr: int) -> np.ndarray:
+    audio, native_sr = sf.read(path, dtype="float32", always_2d=True)
+    audio = audio.mean(axis=1) if audio.shape[1] > 1 else audio[:, 0]
+    if native_sr != sr:
+        audio = librosa.resample(audio, orig_sr=native_sr, target_sr=sr)
+    return audio
+
+
+def _decode_ffmpeg(path: str, sr: int) -> np.ndarray:
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        raise RuntimeError("ffmpeg is not installed")
+    # ffmpeg leaves 44.1 kHz sources untouched when asked for 44.1 kHz
+    command = [
+        ffmpeg,
+        "-v",
+        "error",
+        "-i",
+        path,
+        "-f",
+        "f32le",
+        "-ac",
+        "1",
+        "-ar",
+        str(sr),
+        "-",
+    ]
+    result = subprocess.run(command, capture_output=True, check=True)
+    return np.frombuffer(result.stdout, dtype=np.float32).copy()
+
+
+def _decode_librosa(path: str, sr: int) -> np.ndarray:
+    audio, _ = librosa.load(path, sr=sr)
+    return audio
+
+
+_DECODERS = {
+    "soundfile": _decode_soundfile,
+    "ffmpeg": _decode_ffmpeg,
+    "librosa": _decode_librosa,
+}
+
+
+def decode_audio(path: str, sr: int = 44100, backend: str = None) -> np.ndarray:
+    """
+    Decodes an audio file to a mono float32 time series at the given sample rate.
+
+    The backends are tried from fastest to slowest, falling through to the next one when
+    a backend is missing or cannot read the file; librosa is always the last resort.
+    Derived assets stored as float32 .npy arrays, such as tempo-conformed variants, are
+    already decoded at their sample rate and are memory-mapped as is.
+
+    Parameters:
+        path (str): The path to the audio file.
+        sr (int, optional): The target sample rate. Default is 44100.
+        backend (str, optional): Pins a backend. Default is the AUDIO_DECODE_BACKEND setting.
+
+    Returns:
+        np.ndarray: The decoded audio.
+    """
+    if not os.path.exists(path):
+        # let librosa report missing files, as it always did
+        return _decode_librosa(path, sr)
+    if path.endswith(".npy"):
+        return np.load(path, mmap_mode="r")
+
+    backend = backend or DecodeSettings().audio_decode_backend
+    backends = DECODE_BACKENDS if backend == "auto" else (backend, "librosa")
+    for name in backends:
+        try:
+            return _DECODERS[name](path, sr).astype(np.float32, copy=False)
+        except Exception as e:
+            if name == "librosa":
+                raise
+            logger.debug(f"{name} could not decode {path}: {e}")
+
+
+def transcoded_path(path: str, sr: int = 44100) -> str:
+    """
+    Returns the path of the pre-transcoded copy of an asset.
+
+    Parameters:
+        path (str): The path to the audio file.
+        sr (int, optional): The sample rate of the copy. Default is 44100.
+
+    Returns:
+        str: The .npy path next to the asset.
+    """
+    return f"{os.path.splitext(path)[0]}.{sr}.npy"
+
+
+def load_audio(path: str, sr: int = 44100, pretranscode: bool = None) -> np.ndarray:
+    """
+    Loads an asset, from its pre-transcoded copy when one is enabled and up to date.
+
+    Parameters:
+        path (str): The path to the audio file.
+        sr (int, optional): The target sample rate. Default is 44100.
+        pretranscode (bool, optional): Overrides the PRETRANSCODE_ASSETS setting.
+
+    Returns:
+        np.ndarray: The decoded audio, a read-only memory map when loaded from the copy.
+    """
+    if pretranscode is None:
+        pretranscode = DecodeSettings().pretranscode_assets
+    if not pretranscode or not os.path.exists(path) or path.endswith(".npy"):
+        return decode_audio(path, sr)
+
+    npy_path = transcoded_path(path, sr)
+    try:
+        if os.stat(npy_path).st_mtime_ns >= os.stat(path).st_mtime_ns:
+            return np.load(npy_path, mmap_mode="r")
+    except (OSError, ValueError):
+        pass
+
+    audio = decode_audio(path, sr)
+    tmp_path = f"{npy_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            np.save(f, audio)
+        os.replace(tmp_path, npy_path)
+    except OSError as e:
+        logger.error(f"Could not write pre-transcoded copy {npy_path}: {e}")
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return audio
@@ -1,42 +1,222 @@
-import pandas as pd
+import contextlib
+import os
 import pickle
 import librosa
 import soundfile as sf
 import numpy as np
-import math
 import pydub
 from typing import List, Optional
 from collections import Counter
-import random
+from numpy.lib.stride_tricks import sliding_window_view
+import shutil
+import threading
 import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from pydantic import BaseSettings, Field
 
-from app.storage.storage import StorageEngine
+from app.storage.asset_cache import asset_cache
+from app.storage.storage import StorageBase, StorageEngine
 from app.utils.utils import JobConfig
+from app.utils.ragged import write_ragged
+from app.utils.symbolic import SYMBOLIC_EXTENSION, SymbolicSequence
+from app.utils.quality import RenderQuality
+from app.utils.render_cache import render_cache
+from app.utils.timing import stage, timed
+from app.sequence_generator.analysis import read_analysis, transient_onsets
+from app.sequence_generator.audio_cache import decoded_audio_cache
+from app.sequence_generator.decode import decode_audio
+from app.sequence_generator.notes import note_sequence_index
+from app.sequence_generator.pitch import pitch_backend, pitch_shift_cache
+from app.sequence_generator.plan import (
+    SequencePlan,
+    frame_lengths,
+    frame_offsets,
+    frame_reps,
+    grid_length,
+    sequence_plan_cache,
+)
+from app.sequence_generator.rhythm import euclidean_pattern
+from app.sequence_generator.tempo import TempoSettings, conform_asset
+from app.sequence_generator.tiles import BarLayout, bar_length, fit_frames
+from app.sequence_generator.transposition import TranspositionBank
+
+
+class RenderSettings(BaseSettings):
+    """
+    A Pydantic model for the sequence rendering settings.
+
+    Attributes:
+    -----------
+    render_channel_workers : int
+        Number of channels rendered concurrently by the all-channels render, per worker process.
+    """
+
+    render_channel_workers: int = Field(6, env="RENDER_CHANNEL_WORKERS")
 
 
 # SEQUENCE ENGINE ####
 
 
+def bank_usable(bank, sr, backend):
+    """
+    Checks if the frames of a backend can be sliced from a transposition bank: the bank
+    holds phase-vocoder shifts at the master rate.
+
+    :param bank: The TranspositionBank of the asset.
+    :param sr: The sample rate of the frames.
+    :param backend: The PitchBackend.
+    :return: True if the bank is fresh and holds the backend's shifts at this rate.
+    """
+    return backend.name == "librosa" and bank.sr == sr and bank.is_fresh()
+
+
+def transpose_frames(
+    asset_path, audio_frames, pitch_shift, frame_keys, sr, backend, use_bank=True
+):
+    """
+    Shifts the frames of an asset, slicing them from the transposition bank when it holds
+    them and shifting the others through the pitch-shift cache. Frames shifted by 0
+    half-steps are returned as they are.
+
+    :param asset_path: The audio the frames are cut from.
+    :param audio_frames: The frames to shift.
+    :param pitch_shift: The half-steps to shift each frame by.
+    :param frame_keys: The (asset digest, frame offset, frame length) of each frame.
+    :param sr: The sample rate of the frames.
+    :param backend: The PitchBackend.
+    :param use_bank: Whether the transposition bank may be used. Default is True.
+    :return: The shifted frames and whether the bank was used.
+    """
+    bank = TranspositionBank(asset_path)
+    bank_ready = use_bank and bank_usable(bank, sr, backend)
+    shifted_frames = [
+        (
+            audio_frame
+            if shift == 0
+            else (
+                bank.frame(shift, frame_key[1], frame_key[2])
+                if bank_ready and bank.covers(shift)
+                else None
+            )
+        )
+        for audio_frame, shift, frame_key in zip(audio_frames, pitch_shift, frame_keys)
+    ]
+
+    # frames missing from the bank are memoized and, when enabled, shifted on the process pool
+    pending = [i for i, frame in enumerate(shifted_frames) if frame is None]
+    pending_shifted = pitch_shift_cache.shift_many(
+        [audio_frames[i] for i in pending],
+        [pitch_shift[i] for i in pending],
+        [frame_keys[i] for i in pending],
+        sr=sr,
+        backend=backend,
+    )
+    for i, shifted_frame in zip(pending, pending_shifted):
+        shifted_frames[i] = shifted_frame
+    return shifted_frames, bank_ready
+
+
+@timed("render")
+def render_symbolic(sequence: SymbolicSequence) -> list:
+    """
+    Renders the audio of a symbolic sequence: its frames are gathered from the decoded
+    asset, the pitched steps shifted the way the engine shifted them, and the mutes and
+    gains applied. Muted steps are not shifted.
+
+    :param sequence: The SymbolicSequence.
+    :return: The audio frame of each step.
+    :raises ValueError: If the asset changed since the sequence was generated.
+    """
+    header = sequence.header
+    source_path = sequence.asset["path"]
+    if decoded_audio_cache.asset_digest(source_path) != sequence.asset["digest"]:
+        raise ValueError(f"{source_path} changed since the sequence was generated")
+
+    asset_path = conform_asset(source_path, header["bpm"], sr=sequence.sr)
+    frames = sequence.gather(decoded_audio_cache.load(asset_path, sr=sequence.sr))
+
+    pitched = np.flatnonzero((sequence.pitch != 0) & (sequence.mute == 0))
+    if pitched.size:
+        asset_digest = decoded_audio_cache.asset_digest(asset_path)
+        shifted_frames, __ = transpose_frames(
+            asset_path,
+            [frames[step] for step in pitched],
+            sequence.pitch[pitched].tolist(),
+            [
+                (asset_digest, int(sequence.offsets[step]), int(sequence.lengths[step]))
+                for step in pitched
+            ],
+            sequence.sr,
+            pitch_backend(header["pitch"]["backend"], header["pitch"]["res_type"]),
+            use_bank=header["pitch"]["bank"],
+        )
+        for step, shifted_frame in zip(pitched, shifted_frames):
+            frames[step] = shifted_frame
+    return sequence.apply_levels(frames)
+
+
 class SequenceConfigRefactor:
     """This class is used to handle the configuration of audio sequences."""
 
-    def __init__(self, job_params):
+    def __init__(self, job_params, quality=None):
         """
         Initialize the SequenceConfigRefactor with job parameters.
 
         :param job_params: parameters for the job
+        :param quality: The RenderQuality, or its name, the sequence is rendered at.
+            Default is master.
         """
         self.job_params = job_params
-        self.sample_rate = 44100
+        self.quality = RenderQuality.resolve(quality)
+        self.sample_rate = self.quality.sample_rate
+        self._asset_path = None
+        self._plan = None
+
+    def asset_path(self) -> str:
+        """
+        Returns the path of the audio to slice: the job's sample, or its variant
+        time-stretched to the job's bpm when the sample is tagged with another tempo.
+
+        :return: The path to the sample or to its tempo-conformed variant.
+        """
+        if self._asset_path is None:
+            job_params = self.job_params.get_job_params()
+            self._asset_path = conform_asset(
+                job_params["local_paths"], job_params["bpm"], sr=self.sample_rate
+            )
+        return self._asset_path
+
+    def plan(self) -> SequencePlan:
+        """
+        Returns the compiled SequencePlan of the channel: its rhythm, grid, frame lengths,
+        repetitions and offsets. Plans are shared through the process-wide plan cache,
+        so regenerating a channel skips the planning work.
+
+        :return: The SequencePlan.
+        """
+        if self._plan is None:
+            job_params = self.job_params.get_job_params()
+            with stage("plan"):
+                self._plan = sequence_plan_cache.get(
+                    self.asset_path(),
+                    job_params["rythm_config_list"],
+                    job_params["bpm"],
+                    self.sample_rate,
+                    self.audio_length,
+                )
+        return self._plan
 
     def euclead_rhythm_generator(self) -> list:
         """
         Generate a Euclidean rhythm based on the rhythm configuration.
+        An optional third entry of the rhythm configuration rotates the pattern left.
 
         :return: A list representing the generated rhythm.
         """
         rhythm_config = self.job_params.get_job_params()["rythm_config_list"]
-        return self._generate_euclidean_rhythm(rhythm_config[0], rhythm_config[1])
+        rotation = rhythm_config[2] if len(rhythm_config) > 2 else 0
+        return euclidean_pattern(rhythm_config[0], rhythm_config[1], rotation).tolist()
 
     def get_note_sequence(self) -> list:
         """
@@ -50,14 +230,24 @@ class SequenceConfigRefactor:
 
     def grid_validate(self):
         """
-        Validate the grid based on bpm and rhythm configuration.
+        Validate the grid based on bpm and rhythm configuration. The length of the
+        audio is read from its analysis sidecar when it has one, without decoding it.
 
         :return: Grid value and pulse length samples.
         """
-        bpm = self.job_params.get_job_params()["bpm"]
-        rhythm_config = self.job_params.get_job_params()["rythm_config_list"]
-        audio = self._load_audio(self.job_params.get_job_params()["local_paths"])
-        return self._validate_grid(audio, bpm, rhythm_config[1])
+        plan = self.plan()
+        return plan.grid_value, plan.pulse_length
+
+    def audio_length(self) -> int:
+        """
+        Returns the length of the audio to slice, in samples.
+
+        :return: The length from the asset's analysis sidecar, or of the decoded audio.
+        """
+        analysis = read_analysis(self.asset_path())
+        if analysis is not None and analysis["sr"] == self.sample_rate:
+            return analysis["n_samples"]
+        return len(self._load_audio(self.asset_path()))
 
     def get_audio_frames_length(self) -> list:
         """
@@ -65,9 +255,7 @@ class SequenceConfigRefactor:
 
         :return: A list representing the length of audio frames.
         """
-        pulse_sequence = self.euclead_rhythm_generator()
-        __, pulse_length_samples = self.grid_validate()
-        return self._calculate_audio_frames_length(pulse_sequence, pulse_length_samples)
+        return self.plan().frame_lengths.tolist()
 
     def get_audio_frames_reps(self) -> list:
         """
@@ -75,60 +263,41 @@ class SequenceConfigRefactor:
 
         :return: A list representing the number of repetitions for each audio frame.
         """
-        grid_value, __ = self.grid_validate()
-        audio_frames_lens = self.get_audio_frames_length()
-        return self._calculate_audio_frames_reps(grid_value, audio_frames_lens)
+        return self.plan().reps.tolist()
 
     # Private methods
 
     def _generate_euclidean_rhythm(self, n: int, k: int) -> list:
         """
-        Generate a Euclidean rhythm based on given n and k values.
+        Generate a Euclidean rhythm based on given n and k values, read from the
+        precomputed pattern table.
 
         :param n: The number of pulses in the rhythm.
         :param k: The number of steps the rhythm should be fitted into.
         :return: A list representing the generated rhythm.
         """
-        data = [[1 if i < n else 0] for i in range(k)]
-        while True:
-            k = k - n
-            if k <= 1:
-                break
-            elif k < n:
-                n, k = k, n
-            for i in range(n):
-                data[i] += data[-1]
-                del data[-1]
-        return [x for y in data for x in y]
+        return euclidean_pattern(n, k).tolist()
 
     def _extract_note_sequence(self, scale_value, keynote) -> list:
         """
-        Extract a note sequence based on scale value and keynote.
+        Extract a note sequence based on scale value and keynote from the
+        precompiled scale/key index.
 
         :param scale_value: The scale value.
         :param keynote: The keynote.
         :return: A list representing the note sequence.
         """
-        notes_match_table = pd.read_pickle("app/sequence_generator/notes_match_table.pkl")
-        notes_sequence_raw = notes_match_table.query(
-            "scale_name==@scale_value & key==@keynote"
-        ).filter(["notes"])
-        notes_sequence_extracted_str = notes_sequence_raw["notes"].values[0].split(", ")
-        notes_sequence_extracted_int = [int(i) for i in notes_sequence_extracted_str]
-        notes_sequence_extracted_int_octave_down = [
-            (i - 12) for i in notes_sequence_extracted_int
-        ]
-        return notes_sequence_extracted_int_octave_down + notes_sequence_extracted_int
+        return note_sequence_index.lookup(scale_value, keynote).tolist()
 
     def _load_audio(self, path):
         """
-        Load audio from given path.
+        Load audio from given path through the shared decoded-audio cache.
 
         :param path: The path to the audio file.
         :return: The loaded audio.
         """
-        audio, _ = librosa.load(path, sr=self.sample_rate)
-        return audio
+        with stage("decode"):
+            return decoded_audio_cache.load(path, sr=self.sample_rate)
 
     def _validate_grid(self, audio, bpm, k):
         """
@@ -139,18 +308,18 @@ class SequenceConfigRefactor:
         :param k: The number of steps.
         :return: Grid value and pulse length samples.
         """
-        one_bar = 60 / bpm * 4
-        pulse_length_samples = self.sample_rate * one_bar / k
-        equal_to_total = (
-            True if (math.floor(len(audio) / pulse_length_samples)) <= 1 else False
-        )
-        grid_value = (
-            len(audio)
-            if equal_to_total
-            else math.floor(len(audio) / pulse_length_samples) * pulse_length_samples
-            - pulse_length_samples
-        )
-        return grid_value, pulse_length_samples
+        return self._validate_grid_length(len(audio), bpm, k)
+
+    def _validate_grid_length(self, n_samples, bpm, k):
+        """
+        Validate the grid based on the audio length, bpm and k values.
+
+        :param n_samples: The length of the audio in samples.
+        :param bpm: The beats per minute.
+        :param k: The number of steps.
+        :return: Grid value and pulse length samples.
+        """
+        return grid_length(n_samples, bpm, k, self.sample_rate)
 
     def _calculate_audio_frames_length(self, pulse_sequence, pulse_length_samples):
         """
@@ -160,15 +329,7 @@ class SequenceConfigRefactor:
         :param pulse_length_samples: The length of a pulse in samples.
         :return: A list representing the length of audio frames.
         """
-        onsets_loc = [i for i, e in enumerate(pulse_sequence) if e == 1]
-        onsets_loc_arr = np.array(onsets_loc)
-        silence_loc_arr_temp = np.subtract(onsets_loc_arr[1:], 1)
-        silence_loc_arr = np.append(silence_loc_arr_temp, len(pulse_sequence) - 1)
-
-        audio_frames_lengths = []
-        for onsets, silence in zip(onsets_loc_arr, silence_loc_arr):
-            audio_frames_lengths.append((silence - onsets + 1) * pulse_length_samples)
-        return audio_frames_lengths
+        return frame_lengths(pulse_sequence, pulse_length_samples).tolist()
 
     def _calculate_audio_frames_reps(self, grid_value, audio_frames_lens):
         """
@@ -178,87 +339,95 @@ class SequenceConfigRefactor:
         :param audio_frames_lens: The lengths of audio frames.
         :return: A list representing the number of repetitions for each audio frame.
         """
-        unique_audio_frame_lengths = np.unique(audio_frames_lens)
-
-        audio_frame_rep_nr = []
-        for i in range(len(unique_audio_frame_lengths)):
-            reps_value = grid_value / unique_audio_frame_lengths[i]
-            if reps_value < 1:
-                my_reps = math.ceil(reps_value)
-            else:
-                my_reps = math.floor(reps_value)
-
-            audio_frame_rep_nr.append(my_reps)
-        return audio_frame_rep_nr
+        return frame_reps(grid_value, np.unique(audio_frames_lens)).tolist()
 
 
 class SequenceAudioFrameSlicer:
-    def __init__(self, sequence_config):
+    def __init__(self, sequence_config, plan=None):
         """
         Initialize the SequenceAudioFrameSlicer with sequence configuration.
 
         :param sequence_config: An instance of SequenceConfigRefactor class.
+        :param plan: The compiled SequencePlan of the channel. Its offsets are used as
+            is; without one they are computed from the sequence configuration.
         """
         self.sequence_config = sequence_config
-        self.audio, _ = librosa.load(
-            self.sequence_config.job_params.get_job_params()["local_paths"], sr=44100
+        self.plan = plan
+        sample_rate = self.sequence_config.sample_rate
+        self.audio = decoded_audio_cache.load(
+            self.sequence_config.asset_path(), sr=sample_rate
+        )
+        # the offsets of a plan are already aligned to the transients
+        self.onsets = (
+            transient_onsets(self.sequence_config.asset_path(), sr=sample_rate)
+            if plan is None
+            else None
         )
 
     def get_audio_frame_sequence_list(self):
         """
         Generate a list of sequences based on audio frame lengths and repetitions.
+        When the asset's analysis sidecar lists its onsets, the grid offsets are moved
+        to the nearby transients.
 
         :return: A list of numpy arrays containing the sequences.
         """
-        audio_frames_lengths = self.sequence_config.get_audio_frames_length()
-        audio_frames_reps = self.sequence_config.get_audio_frames_reps()
-        unique_audio_frames_lengths = np.unique(audio_frames_lengths)
-
-        sequence_l = []
-        for audio_lengths, audio_reps in zip(
-            unique_audio_frames_lengths, audio_frames_reps
-        ):
-            stop_range = int(
-                audio_lengths
-                * (
-                    1
-                    if audio_lengths * audio_reps - audio_lengths == 0
-                    else audio_reps - 1
-                )
-            )
-            sequence_l.append(np.arange(0, stop_range, int(audio_lengths)))
-        return sequence_l
+        if self.plan is not None:
+            return list(self.plan.offsets)
+        return frame_offsets(
+            np.unique(self.sequence_config.get_audio_frames_length()),
+            self.sequence_config.get_audio_frames_reps(),
+            self.onsets,
+        )
 
     def frames_list(self, individual_frames: list, unique_frame_length: float):
         """
         Slice the audio into frames based on the individual frames and unique frame length.
 
+        Evenly spaced frames are returned as a read-only strided view over the audio, so
+        no samples are copied; the audio is zero-padded once when a frame runs past its end.
+
         :param individual_frames: A list of individual frames.
         :param unique_frame_length: The unique length of the frame.
-        :return: A list of numpy arrays containing the sliced audio frames.
+        :return: A 2-D array holding one audio frame per row.
         """
-        sliced_frames = []
-
-        if unique_frame_length > len(self.audio):
-            self.audio = np.append(
-                self.audio, np.zeros(int(unique_frame_length) - len(self.audio))
-            )
+        offsets = np.asarray(individual_frames, dtype=np.int64)
+        frame_length = int(unique_frame_length)
+        end = int(offsets.max()) + frame_length if offsets.size else frame_length
+        windows = sliding_window_view(self.__padded_audio(end), frame_length)
+
+        if offsets.size == 0:
+            return windows[:0]
+        step = int(offsets[1] - offsets[0]) if offsets.size > 1 else 1
+        if step > 0 and np.all(np.diff(offsets) == step):
+            return windows[offsets[0] : offsets[-1] + 1 : step]
+        return windows[offsets]
+
+    def __padded_audio(self, min_length: int):
+        """
+        Returns the audio, zero-padded to at least min_length samples.
 
-        for frame in individual_frames:
-            sliced_frames.append(
-                self.audio[int(frame) : int(frame) + int(unique_frame_length)]
-            )
-        return sliced_frames
+        :param min_length: The minimal length in samples.
+        :return: The read-only audio buffer.
+        """
+        if len(self.audio) < min_length:
+            padded = np.zeros(min_length, dtype=self.audio.dtype)
+            padded[: len(self.audio)] = self.audio
+            padded.flags.writeable = False
+            self.audio = padded
+        return self.audio
 
     def get_audio_frames(self):
         """
-        Generate a list of audio frames.
+        Generate the audio frames, one strided view per unique frame length.
 
-        :return: A list of lists containing numpy arrays of sliced audio frames.
+        :return: A list of 2-D arrays holding one audio frame per row.
         """
         sequence_l = self.get_audio_frame_sequence_list()
-        unique_audio_frames_lengths = np.unique(
-            self.sequence_config.get_audio_frames_length()
+        unique_audio_frames_lengths = (
+            self.plan.unique_lengths
+            if self.plan is not None
+            else np.unique(self.sequence_config.get_audio_frames_length())
         )
         return [
             self.frames_list(x, y)
@@ -271,47 +440,161 @@ class SequenceEngine:
     This class is used to generate, validate and manipulate audio sequences.
     """
 
-    def __init__(self, sequence_config, audio_frames):
+    def __init__(self, sequence_config, audio_frames, rng=None, plan=None):
         """
         Initialize the SequenceEngine with sequence configuration and audio frames.
 
         :param sequence_config: An instance of SequenceConfigRefactor that contains the job parameters.
         :param audio_frames: An instance of AudioFrameSlicer that contains the audio frames.
+        :param rng: The numpy.random.Generator drawing frames, notes and pitch shifts.
+            A seeded generator makes the sequence reproducible. Default is an unseeded one.
+        :param plan: The compiled SequencePlan of the channel. Default reads the frame
+            lengths from the sequence configuration.
         """
         self.audio_frames = audio_frames
         self.sequence_config = sequence_config
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.plan = plan
+        self._step_plan = None
+        self._frame_plan = None
+        self._frame_draws = None
+        self._frame_offsets = None
+        self._steps = None
 
     def get_job_params(self):
         return self.sequence_config.job_params.get_job_params()
 
+    def get_frame_plan(self):
+        """
+        Returns the frame lengths, the sliced audio frames and the note sequence.
+
+        They are computed on first use and shared by every sequence this engine generates,
+        so rendering several variants only draws new frames and notes.
+
+        :return: A tuple of (frame lengths, audio frames, note sequence).
+        """
+        if self._frame_plan is None:
+            frame_lengths, note_sequence = self.__step_plan()
+            with stage("slice"):
+                audio_frames = self.audio_frames.get_audio_frames()
+            self._frame_plan = (frame_lengths, audio_frames, note_sequence)
+        return self._frame_plan
+
+    def __step_plan(self):
+        """
+        Returns the frame lengths and the note sequence, computed on first use. The
+        number of frames drawn from each length group is kept in self._frame_draws.
+
+        :return: A tuple of (frame lengths, note sequence).
+        """
+        if self._step_plan is None:
+            with stage("plan"):
+                if self.plan is not None:
+                    frame_lengths = self.plan.frame_lengths.tolist()
+                    self._frame_draws = self.plan.draws
+                else:
+                    frame_lengths = self.sequence_config.get_audio_frames_length()
+                    self._frame_draws = tuple(Counter(map(int, frame_lengths)).values())
+                note_sequence = self.sequence_config.get_note_sequence()
+            self._step_plan = (frame_lengths, note_sequence)
+        return self._step_plan
+
     @staticmethod
-    def validate_sequence(bpm, new_sequence):
+    def validate_sequence(bpm, new_sequence, bars=1, sr=44100, lead=0):
         """
         Validates the sequence based on bpm and the new sequence.
 
+        The frames are written straight into a preallocated float32 buffer of the given
+        number of bars. Shorter sequences are zero-padded and longer ones are truncated.
+
         :param bpm: Beats per minute.
-        :param new_sequence: The newly generated sequence.
+        :param new_sequence: The newly generated sequence, either a list of audio frames or a flat array.
+        :param bars: The number of bars of the buffer. Default is one.
+        :param sr: The sample rate of the sequence. Default is 44100.
+        :param lead: Where the first frame starts, in samples; the frames wrap around
+            the end of the buffer. Default is 0.
         :return: The validated sequence.
         """
-        one_bar = 60 / bpm * 4
-        original_sample_len = round(44100 * one_bar / 1)
+        return fit_frames(new_sequence, bars * bar_length(bpm, sr), lead)
 
-        try:
-            new_sequence_unpacked = [item for sublist in new_sequence for item in sublist]
-        except TypeError:
-            new_sequence_unpacked = new_sequence
+    @property
+    def lead(self):
+        """
+        Where the first frame starts in the bar, in samples: the first onset of a rotated
+        rhythm. Without a plan the frames start on the first step.
+        """
+        return self.plan.lead if self.plan is not None else 0
+
+    def generate_tiles(self, layout):
+        """
+        Generates one bar per distinct tile of a multi-bar layout. The tiles share the
+        frame plan, so each one only draws new frames and notes.
+
+        The steps of every tile are recorded in order, see recorded_steps().
 
-        new_sequence_len = len(new_sequence_unpacked)
+        :param layout: The BarLayout of the sequence.
+        :return: The validated audio of each tile and the frames of every tile, in order.
+        """
+        tiles = self.__record_tiles(layout.n_tiles, self.generate_audio_sequence)
+        layout.tile_frames = [len(tile) for __, tile in tiles]
+        validated_tiles = [validated_tile for validated_tile, __ in tiles]
+        return validated_tiles, [frame for __, tile in tiles for frame in tile]
 
-        if new_sequence_len == original_sample_len:
-            validated_sequence = new_sequence_unpacked[:original_sample_len]
-        elif new_sequence_len < original_sample_len:
-            empty_array = np.zeros(original_sample_len - new_sequence_len)
+    def generate_tile_steps(self, layout):
+        """
+        Draws the steps of one bar per distinct tile of a multi-bar layout, without
+        rendering any audio, see generate_steps().
 
-            validated_sequence = np.append(new_sequence_unpacked, empty_array)
-        else:
-            validated_sequence = new_sequence_unpacked
-        return validated_sequence
+        :param layout: The BarLayout of the sequence.
+        :return: The steps of every tile, in order, see recorded_steps().
+        """
+        tiles = self.__record_tiles(layout.n_tiles, self.generate_steps)
+        layout.tile_frames = [len(steps["lengths"]) for steps in tiles]
+        return self.recorded_steps()
+
+    def __record_tiles(self, n_tiles, generate):
+        """
+        Generates the distinct tiles of a layout and records the steps of every tile,
+        in order.
+
+        :param n_tiles: The number of distinct tiles.
+        :param generate: Generates one bar and records its steps.
+        :return: What generate returned for each tile.
+        """
+        tiles, tile_steps = [], []
+        for __ in range(n_tiles):
+            tiles.append(generate())
+            tile_steps.append(self._steps)
+        self._steps = None
+        if all(tile_steps):
+            self._steps = {
+                field: [value for steps in tile_steps for value in steps[field]]
+                for field in ("selection", "lengths", "pitch")
+            }
+            self._steps["bank"] = any(steps["bank"] for steps in tile_steps)
+        return tiles
+
+    def recorded_steps(self):
+        """
+        Returns the steps of the last generated sequence: the offset and length of each
+        frame in the asset, the half-steps it was shifted by and whether the
+        transposition bank was used.
+
+        :return: A dict of "offsets", "lengths", "pitch" and "bank", or None before the
+            first sequence.
+        """
+        if self._steps is None:
+            return None
+        frame_offsets = self.__frame_offsets()
+        return {
+            "offsets": [
+                int(frame_offsets[group][index])
+                for group, index in self._steps["selection"]
+            ],
+            "lengths": self._steps["lengths"],
+            "pitch": self._steps["pitch"],
+            "bank": self._steps["bank"],
+        }
 
     @staticmethod
     def __unpack_multi_level_list(my_list):
@@ -323,67 +606,189 @@ class SequenceEngine:
         """
         return [element for sublist in my_list for element in sublist]
 
-    def __pitch_shift(self, audio, pitch_shift):
+    def __frame_keys(self, frame_selection, audio_frames):
+        """
+        Resolves the identity of each selected frame.
+
+        :param frame_selection: The (frame length group, frame index) of each selected frame.
+        :param audio_frames: The selected audio frames.
+        :return: A list of (asset digest, frame offset, frame length) tuples.
         """
-        Apply a pitch shift to the given audio.
+        asset_digest = decoded_audio_cache.asset_digest(self.sequence_config.asset_path())
+        frame_offsets = self.__frame_offsets()
+        return [
+            (asset_digest, int(frame_offsets[group][index]), len(audio_frame))
+            for (group, index), audio_frame in zip(frame_selection, audio_frames)
+        ]
+
+    def __frame_offsets(self):
+        if self._frame_offsets is None:
+            # the steps alone are drawn from the plan, without a frame slicer
+            self._frame_offsets = (
+                self.audio_frames.get_audio_frame_sequence_list()
+                if self.audio_frames is not None
+                else list(self.plan.offsets)
+            )
+        return self._frame_offsets
 
-        :param audio: The audio data to shift.
-        :param pitch_shift: The number of half-steps to shift the pitch.
-        :return: The pitch-shifted audio data.
+    def __draw_frames(self, group_sizes, note_sequence):
         """
-        return librosa.effects.pitch_shift(audio, sr=44100, n_steps=pitch_shift)
+        Draws the frames of a sequence from each length group, then a note per frame.
+
+        :param group_sizes: The number of frames of each length group.
+        :param note_sequence: The notes to draw from.
+        :return: The drawn frame indices of each group and the drawn notes.
+        """
+        selected_indices = [
+            self.rng.integers(group_size, size=nr_elements_to_select)
+            for group_size, nr_elements_to_select in zip(group_sizes, self._frame_draws)
+        ]
+        notes = self.rng.choice(
+            note_sequence, size=sum(len(indices) for indices in selected_indices)
+        ).tolist()
+        return selected_indices, notes
 
-    def __apply_pitch_shift(self, audio_frames: List[float], pitch_shift: Optional[list]):
+    def __draw_pitch(self):
+        """
+        Draws whether the frames of a sequence are pitch-shifted, as the job's pitch
+        temperature allows.
+
+        :return: True if the frames are shifted by their notes.
+        """
+        pitch_temperature = self.get_job_params()["pitch_temperature_knob_list"][0]
+        return bool(pitch_temperature) and self.rng.random() > pitch_temperature / 100
+
+    def pitch_backend(self):
+        """
+        Returns the pitch-shift backend: the job's "pitch_backend" when it picks one,
+        else the backend of the render quality.
+
+        :return: The PitchBackend.
+        """
+        quality = self.sequence_config.quality
+        return pitch_backend(
+            self.get_job_params().get("pitch_backend") or quality.pitch_backend,
+            quality.pitch_res_type,
+        )
+
+    @timed("pitch_shift")
+    def __apply_pitch_shift(
+        self,
+        audio_frames: List[float],
+        pitch_shift: Optional[list],
+        frame_selection: Optional[list] = None,
+    ):
         """
         Applies a pitch shift to each audio frame based on the given pitch shift list.
 
         :param audio_frames: The audio frames to shift.
         :param pitch_shift: The list of half-steps to shift each frame.
-        :return: The list of pitch-shifted audio frames.
+        :param frame_selection: The (frame length group, frame index) of each frame, used to
+            slice the transposition bank when it is built, or as memoization key otherwise.
+        :return: The list of pitch-shifted audio frames, the half-steps each frame was
+            shifted by and whether the transposition bank was used.
         """
-        pitch_temperature = self.get_job_params()["pitch_temperature_knob_list"][0]
-
-        if pitch_temperature and random.random() > pitch_temperature / 100:
-            return [
-                self.__pitch_shift(audio_frame, shift)
-                for audio_frame, shift in zip(audio_frames, pitch_shift)
-            ]
-        return audio_frames
+        if self.__draw_pitch():
+            sample_rate = self.sequence_config.sample_rate
+            backend = self.pitch_backend()
+            if frame_selection is None:
+                shifted_frames = pitch_shift_cache.shift_many(
+                    audio_frames, pitch_shift, sr=sample_rate, backend=backend
+                )
+                return shifted_frames, pitch_shift, False
+
+            shifted_frames, bank_used = transpose_frames(
+                self.sequence_config.asset_path(),
+                audio_frames,
+                pitch_shift,
+                self.__frame_keys(frame_selection, audio_frames),
+                sample_rate,
+                backend,
+            )
+            return shifted_frames, pitch_shift, bank_used
+        return audio_frames, [0] * len(audio_frames), False
 
     def generate_audio_sequence(self):
         """
         Generates an audio sequence based on the sequence configuration and audio frames.
+        The steps it plays are recorded, see recorded_steps().
 
         :return: The generated audio sequence.
         """
-        my_audio_frames_lengths = self.sequence_config.get_audio_frames_length()
-        my_audio_frames = self.audio_frames.get_audio_frames()
-
-        occurences_of_distinct_frames = Counter(map(int, my_audio_frames_lengths))
-
-        new_audio_sequence = [
-            random.choices(my_audio_frames[i], k=nr_elements_to_select)
-            for i, nr_elements_to_select in enumerate(
-                occurences_of_distinct_frames.values()
-            )
-        ]
+        __, my_audio_frames, note_sequence = self.get_frame_plan()
 
-        new_sequence_unlisted = self.__unpack_multi_level_list(new_audio_sequence)
-
-        note_sequence = self.sequence_config.get_note_sequence()
-        note_sequence_updated = random.choices(
-            note_sequence, k=len(new_sequence_unlisted)
+        selected_indices, note_sequence_updated = self.__draw_frames(
+            [len(audio_frames) for audio_frames in my_audio_frames], note_sequence
         )
+        frame_selection = [
+            (i, int(index))
+            for i, indices in enumerate(selected_indices)
+            for index in indices
+        ]
+        # one gather per frame length; the rows are views into the gathered block
+        new_sequence_unlisted = [
+            frame
+            for i, indices in enumerate(selected_indices)
+            for frame in np.take(my_audio_frames[i], indices, axis=0)
+        ]
 
         bpm = self.get_job_params()["bpm"]
 
-        updated_new_audio_sequence = self.__apply_pitch_shift(
-            new_sequence_unlisted, note_sequence_updated
+        updated_new_audio_sequence, pitch, bank_used = self.__apply_pitch_shift(
+            new_sequence_unlisted, note_sequence_updated, frame_selection
+        )
+        self._steps = {
+            "selection": frame_selection,
+            "lengths": [len(frame) for frame in new_sequence_unlisted],
+            "pitch": list(pitch),
+            "bank": bank_used,
+        }
+        validated_audio_sequence = self.validate_sequence(
+            bpm,
+            updated_new_audio_sequence,
+            sr=self.sequence_config.sample_rate,
+            lead=self.lead,
         )
-        validated_audio_sequence = self.validate_sequence(bpm, updated_new_audio_sequence)
 
         return validated_audio_sequence, updated_new_audio_sequence
 
+    def generate_steps(self):
+        """
+        Draws the steps of a sequence from the same random stream as
+        generate_audio_sequence(), without slicing, shifting or assembling any audio:
+        the frames are rendered from the steps when the FX need them.
+
+        :return: The drawn steps, see recorded_steps().
+        """
+        __, note_sequence = self.__step_plan()
+        frame_offsets = self.__frame_offsets()
+        selected_indices, notes = self.__draw_frames(
+            [len(offsets) for offsets in frame_offsets], note_sequence
+        )
+        frame_selection = [
+            (i, int(index))
+            for i, indices in enumerate(selected_indices)
+            for index in indices
+        ]
+        unique_lengths = (
+            self.plan.unique_lengths
+            if self.plan is not None
+            else np.unique(self.sequence_config.get_audio_frames_length())
+        )
+        shifted = self.__draw_pitch()
+        self._steps = {
+            "selection": frame_selection,
+            "lengths": [int(unique_lengths[group]) for group, __ in frame_selection],
+            "pitch": notes if shifted else [0] * len(notes),
+            "bank": shifted
+            and bank_usable(
+                TranspositionBank(self.sequence_config.asset_path()),
+                self.sequence_config.sample_rate,
+                self.pitch_backend(),
+            ),
+        }
+        return self.recorded_steps()
+
     def generate_audio_sequence_auto(self):
         """
         Generates an audio sequence automatically based on the audio frames and their lengths.
@@ -395,7 +800,7 @@ class SequenceEngine:
         unique_audio_frames_lengths = np.unique(audio_frames_lengths)
 
         audio_frames_sequence = [
-            np.random.choice(audio_frame, int(unique_length), replace=False)
+            self.rng.choice(audio_frame, int(unique_length), replace=False)
             for audio_frame, unique_length in zip(
                 audio_frames, unique_audio_frames_lengths
             )
@@ -433,13 +838,13 @@ class AudioEngine:
 
     def read_audio(self):
         """
-        Reads audio from the provided file location using librosa.
+        Reads audio from the provided file location through the fastest available decoder.
 
         Returns:
             tuple: A tuple containing the audio time series and the sampling rate.
         """
 
-        return librosa.load(self.file_loc, sr=44100)
+        return decode_audio(self.file_loc, sr=44100), 44100
 
     def save_to_pkl(self):
         """
@@ -454,23 +859,55 @@ class AudioEngine:
         except IOError as e:
             print(f"Could not save to {pkl_file}. IOError: {e}")
 
-    def save_to_wav(self):
+    @timed("serialize")
+    def save_to_ragged(self, sr=44100, bpm=None, channel=None, metadata=None):
+        """
+        Saves the audio sequence, a list of frames or a flat array, to a ragged container:
+        one float32 sample block plus the frame boundaries, readable with np.memmap.
+
+        Parameters:
+            sr (int, optional): The sample rate. Default is 44100.
+            bpm (float, optional): The tempo the frames were cut for.
+            channel (int, optional): The channel the sequence belongs to.
+            metadata (dict, optional): Further header fields, such as the bar layout.
+        """
+        try:
+            write_ragged(
+                self.file_loc,
+                self.audio_sequence,
+                sr=sr,
+                bpm=bpm,
+                channel=channel,
+                metadata=metadata,
+            )
+        except IOError as e:
+            print(f"Could not save to {self.file_loc}. IOError: {e}")
+
+    @timed("encode")
+    def save_to_wav(self, sr=44100):
         """
         Saves the audio sequence to a .wav file using the soundfile library.
 
         The file is saved at the same location as the original audio file.
+
+        Parameters:
+            sr (int, optional): The sample rate. Default is 44100.
         """
         try:
-            sf.write(self.file_loc, self.audio_sequence, 44100)
+            sf.write(self.file_loc, self.audio_sequence, sr)
         except Exception as e:
             print(f"Error converting to wav: {e}")
             raise
 
-    def save_to_mp3(self):
+    @timed("encode")
+    def save_to_mp3(self, sr=44100):
         """
         Converts and saves the audio sequence to an .mp3 file using pydub.
 
         The file is saved at the same location as the original audio file.
+
+        Parameters:
+            sr (int, optional): The sample rate. Default is 44100.
         """
 
         try:
@@ -485,7 +922,7 @@ class AudioEngine:
             )
 
             sequence = pydub.AudioSegment(
-                y.tobytes(), frame_rate=44100, sample_width=2, channels=channels
+                y.tobytes(), frame_rate=sr, sample_width=2, channels=channels
             )
             sequence.export(self.file_loc, format="mp3", bitrate="128k")
         except Exception as e:
@@ -509,6 +946,11 @@ class JobRunner:
         Index of the channel being processed.
     random_id : str
         Unique random identifier.
+    seed : int, optional
+        Seed of the random generator. Seeded jobs are reproducible and served from the
+        render cache when an identical render exists.
+    quality : RenderQuality
+        The quality the sequence is rendered at, master by default or a faster preview.
     job_params : object
         Instance of JobConfig class containing the job parameters.
     logger : object
@@ -518,44 +960,147 @@ class JobRunner:
     ------------
     get_assets():
         Retrieves the necessary assets for the job.
+    asset_in_use():
+        Keeps the channel's asset out of eviction while it renders.
     validate():
-        Validates the assets and returns validated audio sequence.
+        Validates the assets and draws the steps of the sequence.
+    engine():
+        Returns the SequenceEngine drawing the channel's steps.
+    bar_layout(rng):
+        Returns the bars, pattern chain and variation masks of the channel.
+    generate(engine):
+        Draws the steps of a one-bar sequence, or of the distinct bars of a multi-bar one.
     result(result: bool):
         Handles the job result. Returns cloud path if job is successful.
+    symbolic_result():
+        Returns the rendered sequence in its symbolic form.
+    build_transposition_bank():
+        Precomputes the pitch transpositions of the asset in the background.
     clean_up():
         Deletes local assets after job completion.
+    asset_reference():
+        Returns the path, cloud path and digest of the channel's asset.
+    symbolic_sequence():
+        Returns the last generated sequence as a SymbolicSequence.
+    save_sequence(file_loc: str):
+        Saves the last generated sequence symbolically.
+    render_key():
+        Returns the render cache key of a seeded job.
+    render():
+        Renders the sequence, or copies it from the render cache.
     execute():
         Executes the job workflow.
+    execute_variants(n_variants: int):
+        Executes the job workflow once and renders several variants of the sequence.
+    variants_result(result: bool, n_variants: int):
+        Handles the variants result. Returns the cloud path of each variant if successful.
+    select_variant(variant: int):
+        Makes a rendered variant the channel's sequence.
+    execute_all_channels(job_id: str, random_id: str):
+        Renders the sequences of every channel of a job concurrently.
     """
 
-    def __init__(self, job_id, channel_index, random_id):
+    def __init__(self, job_id, channel_index, random_id, seed=None, quality=None):
         self.job_id = job_id
         self.channel_index = channel_index
         self.random_id = random_id
+        self.seed = seed
+        self.quality = RenderQuality.resolve(quality)
         self.job_params = JobConfig(self.job_id, self.channel_index, self.random_id)
+        self.sequence_header = {}
+        self.steps = None
         self.logger = logging.getLogger(__name__)
 
-    def get_assets(self):
+    def get_assets(self, fetch_job_manifest=True, storage=None):
+        """
+        Downloads the job manifest and, through the local asset cache, the channel's
+        asset. The manifest download can be skipped when it was already fetched for the
+        job, and the storage client and resource of an existing StorageBase can be reused.
+        """
+        storage_clients = (
+            {"client": storage.client, "resource": storage.resource} if storage else {}
+        )
         try:
-            StorageEngine(self.job_params, "job_id_path").get_object()
-            StorageEngine(self.job_params, "asset_path").get_object()
+            with stage("download"):
+                if fetch_job_manifest:
+                    StorageEngine(
+                        self.job_params, "job_id_path", **storage_clients
+                    ).get_object()
+                StorageEngine(
+                    self.job_params, "asset_path", **storage_clients
+                ).get_cached_object()
         except Exception as e:
             self.logger.error(f"Error getting assets: {e}")
             raise e
 
+    @contextlib.contextmanager
+    def asset_in_use(self, storage=None):
+        """
+        Marks the channel's asset as in use for the duration of the block, so that no
+        worker evicts it from the asset cache while the channel renders. An asset
+        evicted since get_assets() is fetched again.
+        """
+        local_path = self.job_params.get_job_params()["local_paths"]
+        with asset_cache.in_use(local_path):
+            if not os.path.exists(local_path):
+                self.get_assets(fetch_job_manifest=False, storage=storage)
+            yield
+
     def validate(self):
         try:
-            new_config_test = SequenceConfigRefactor(self.job_params)
-            new_audio_frames = SequenceAudioFrameSlicer(new_config_test)
-            validated_audio_sequence, audio_sequence = SequenceEngine(
-                new_config_test, new_audio_frames
-            ).generate_audio_sequence()
-
-            return validated_audio_sequence, audio_sequence
+            return self.generate(self.engine())
         except Exception as e:
             self.logger.error(f"Error validating: {e}")
             raise e
 
+    def engine(self):
+        """
+        Returns the SequenceEngine of the channel. It draws the steps from the compiled
+        plan alone, so the asset is neither sliced nor shifted until the FX render it.
+        """
+        sequence_config = SequenceConfigRefactor(self.job_params, self.quality)
+        return SequenceEngine(
+            sequence_config,
+            None,
+            rng=np.random.default_rng(self.seed),
+            plan=sequence_config.plan(),
+        )
+
+    def bar_layout(self, rng):
+        """
+        Returns the BarLayout of the channel: its bars, pattern chain and variation.
+        """
+        job_params = self.job_params.get_job_params()
+        variation = job_params.get("bar_variation") or 0.0
+        return BarLayout.from_spec(
+            bars=job_params.get("bars") or 1,
+            chain=job_params.get("bar_chain"),
+            variation=variation,
+            steps=job_params["rythm_config_list"][1] if variation else None,
+            rng=rng,
+        )
+
+    def generate(self, engine):
+        """
+        Draws the steps of the channel's sequence into self.steps. A multi-bar sequence
+        draws each distinct bar once and stores its layout in self.sequence_header, to
+        be saved with the steps. A rotated rhythm stores where its first frame starts in
+        the bar as "lead". No audio is rendered, see render_symbolic().
+
+        :param engine: The SequenceEngine to draw from.
+        :return: The steps of the sequence.
+        """
+        layout = self.bar_layout(engine.rng)
+        lead = {"lead": engine.lead} if engine.lead else {}
+        if layout.is_single:
+            self.sequence_header = lead
+            self.steps = engine.generate_steps()
+            return self.steps
+
+        self.steps = engine.generate_tile_steps(layout)
+        self.sequence_header = {**layout.to_header(), **lead}
+        return self.steps
+
     def result(self, result):
         try:
             if result:
@@ -567,6 +1112,33 @@ class JobRunner:
             self.logger.error(f"Error processing result: {e}")
             raise e
 
+    def symbolic_result(self):
+        """
+        Returns the channel's rendered sequence in its symbolic form, as a JSON-ready dict.
+        The asset is referenced by its cloud path and digest; its local path stays on
+        the server.
+        """
+        result = SymbolicSequence.load(
+            self.job_params.path_resolver()["local_path_processed_sequence"]
+        ).to_dict()
+        result["asset"] = {key: result["asset"][key] for key in ("cloud_path", "digest")}
+        return result
+
+    def build_transposition_bank(self):
+        """
+        Precomputes the transpositions of the job's asset, unless a fresh bank exists.
+        Meant to run in the background, after the sequence has been returned.
+        """
+        try:
+            job_params = self.job_params.get_job_params()
+            bank = TranspositionBank(
+                conform_asset(job_params["local_paths"], job_params["bpm"])
+            )
+            if not bank.is_fresh():
+                bank.build()
+        except Exception as e:
+            self.logger.error(f"Error building transposition bank: {e}")
+
     def clean_up(self):
         try:
             StorageEngine(self.job_params, "asset_path").delete_local_object()
@@ -574,18 +1146,238 @@ class JobRunner:
             self.logger.error(f"Error cleaning up: {e}")
             raise e
 
+    def asset_reference(self):
+        """
+        Returns how a symbolic sequence references the channel's asset: its local path,
+        its cloud path and the digest of its content.
+        """
+        job_params = self.job_params.get_job_params()
+        return {
+            "path": job_params["local_paths"],
+            "cloud_path": job_params["cloud_paths"],
+            "digest": decoded_audio_cache.asset_digest(job_params["local_paths"]),
+        }
+
+    def symbolic_sequence(self):
+        """
+        Returns the last generated sequence as the steps it plays, referencing the job's
+        asset. Its header carries the job's bpm, the channel index, the render quality,
+        the pitch backend, the rhythm the plan is compiled from and the bar layout of
+        multi-bar sequences.
+
+        :return: The SymbolicSequence.
+        """
+        job_params = self.job_params.get_job_params()
+        backend = pitch_backend(
+            job_params.get("pitch_backend") or self.quality.pitch_backend,
+            self.quality.pitch_res_type,
+        )
+        return SymbolicSequence(
+            asset=self.asset_reference(),
+            offsets=self.steps["offsets"],
+            lengths=self.steps["lengths"],
+            pitch=self.steps["pitch"],
+            header={
+                "sr": self.quality.sample_rate,
+                "bpm": job_params["bpm"],
+                "channel": self.channel_index,
+                **self.quality.tag(),
+                "pitch": {
+                    "backend": backend.name,
+                    "res_type": self.quality.pitch_res_type,
+                    "bank": bool(self.steps["bank"]),
+                },
+                "rhythm": list(job_params["rythm_config_list"]),
+                **self.sequence_header,
+            },
+        )
+
+    def save_sequence(self, file_loc):
+        """
+        Saves the last generated sequence symbolically; its audio is rendered when the
+        FX need it.
+        """
+        with stage("serialize"):
+            self.symbolic_sequence().save(file_loc)
+
+    def render_key(self):
+        """
+        Returns the content address of the channel's sequence: a hash of the asset's
+        content, whether its frames are aligned to transients, the tempo conform
+        settings, the job parameters, the channel, the seed and the render quality.
+        The asset's paths are left out, so jobs whose assets have the same content
+        share their renders. Unseeded renders are random, so they have none.
+        """
+        if self.seed is None:
+            return None
+        job_params = self.job_params.get_job_params()
+        asset_path = SequenceConfigRefactor(self.job_params, self.quality).asset_path()
+        return render_cache.key(
+            stage="sequence",
+            asset=decoded_audio_cache.asset_digest(job_params["local_paths"]),
+            aligned=transient_onsets(asset_path, sr=self.quality.sample_rate) is not None,
+            tempo=TempoSettings().dict(),
+            quality=vars(self.quality),
+            job_params={
+                key: value
+                for key, value in job_params.items()
+                if key not in ("local_paths", "cloud_paths")
+            },
+            channel=self.channel_index,
+            seed=self.seed,
+        )
+
+    def render(self):
+        """
+        Renders the channel's sequence to its local symbolic sequence file, copying it
+        from the render cache instead when the job is seeded and an identical render
+        exists. The cached render may come from another job whose asset has the same
+        content, so the copy is made to reference this job's asset.
+        """
+        sequence_path = self.job_params.path_resolver()["local_path_processed_sequence"]
+
+        render_key = self.render_key()
+        if render_key and render_cache.get(
+            render_key, {SYMBOLIC_EXTENSION: sequence_path}
+        ):
+            self.logger.info("Sequence served from the render cache")
+            SymbolicSequence.load(sequence_path).with_asset(self.asset_reference()).save(
+                sequence_path
+            )
+            return
+
+        self.validate()
+        self.save_sequence(sequence_path)
+        if render_key:
+            render_cache.put(render_key, {SYMBOLIC_EXTENSION: sequence_path})
+
     def execute(self):
         try:
             self.get_assets()
-            validated_audio, audio_sequence = self.validate()
-
-            AudioEngine(
-                audio_sequence,
-                self.job_params.path_resolver()["local_path_processed_pkl"],
-                normalized=None,
-            ).save_to_pkl()
+            with self.asset_in_use():
+                self.render()
 
             return True
         except Exception as e:
             self.logger.error(f"Error executing job: {e}")
             return False
+
+    @classmethod
+    def execute_all_channels(
+        cls,
+        job_id,
+        random_id,
+        channel_indexes=range(6),
+        max_workers=None,
+        seed=None,
+        quality=None,
+    ):
+        """
+        Renders the sequences of several channels of a job on a bounded thread pool.
+
+        The job manifest is downloaded and parsed once. Each pool thread keeps its own
+        storage client, and an asset shared by several channels is downloaded once.
+
+        Returns:
+            tuple: The cloud path of each rendered channel and the error of each failed
+                channel, both keyed by channel index.
+        """
+        logger = logging.getLogger(__name__)
+        with stage("download"):
+            StorageEngine(JobConfig(job_id, 0, random_id), "job_id_path").get_object()
+
+        thread_storage = threading.local()
+        asset_locks = {}
+        asset_locks_guard = threading.Lock()
+        fetched_assets = set()
+
+        def render_channel(runner):
+            if not hasattr(thread_storage, "storage"):
+                thread_storage.storage = StorageBase()
+            local_path = runner.job_params.get_job_params()["local_paths"]
+            with asset_locks_guard:
+                asset_lock = asset_locks.setdefault(local_path, threading.Lock())
+            with asset_lock:
+                if local_path not in fetched_assets:
+                    runner.get_assets(
+                        fetch_job_manifest=False, storage=thread_storage.storage
+                    )
+                    fetched_assets.add(local_path)
+
+            with runner.asset_in_use(storage=thread_storage.storage):
+                runner.render()
+            return runner.result(True)
+
+        sequences, errors = {}, {}
+        with ThreadPoolExecutor(
+            max_workers=max_workers or RenderSettings().render_channel_workers
+        ) as executor:
+            futures = {}
+            for channel_index in channel_indexes:
+                runner = cls(job_id, channel_index, random_id, seed=seed, quality=quality)
+                try:
+                    # parsed here, in one thread, so the manifest is parsed only once
+                    runner.job_params.get_job_params()
+                except Exception as e:
+                    errors[channel_index] = str(e)
+                    continue
+                # each channel runs in a copy of the request context, to keep its timings
+                futures[channel_index] = executor.submit(
+                    contextvars.copy_context().run, render_channel, runner
+                )
+
+            for channel_index, future in futures.items():
+                try:
+                    sequences[channel_index] = future.result()
+                except Exception as e:
+                    logger.error(f"Error rendering channel {channel_index}: {e}")
+                    errors[channel_index] = str(e)
+        return sequences, errors
+
+    def execute_variants(self, n_variants):
+        """
+        Renders n_variants sequences of the channel, each saved as its own artifact.
+        The assets are fetched and planned once; every variant only draws new frames
+        and notes.
+        """
+        try:
+            self.get_assets()
+            with self.asset_in_use():
+                engine = self.engine()
+                for variant in range(n_variants):
+                    self.generate(engine)
+                    self.save_sequence(
+                        self.job_params.variant_path_resolver(variant)[
+                            "local_path_processed_sequence"
+                        ]
+                    )
+
+            return True
+        except Exception as e:
+            self.logger.error(f"Error executing variants job: {e}")
+            return False
+
+    def variants_result(self, result, n_variants):
+        if result:
+            return [
+                self.job_params.variant_path_resolver(variant)["cloud_path_processed"]
+                for variant in range(n_variants)
+            ]
+        self.logger.error("Variants job failed")
+
+    def select_variant(self, variant):
+        """
+        Copies a rendered variant over the channel's sequence, so that the following
+        steps (fx, mixdown) pick it up.
+        """
+        try:
+            shutil.copyfile(
+                self.job_params.variant_path_resolver(variant)[
+                    "local_path_processed_sequence"
+                ],
+                self.job_params.path_resolver()["local_path_processed_sequence"],
+            )
+            return True
+        except OSError as e:
+            self.logger.error(f"Error selecting variant {variant}: {e}")
+            return False
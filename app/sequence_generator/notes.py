@@ -0,0 +1,78 @@
+import os
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+NOTES_MATCH_TABLE_PATH = os.path.join(os.path.dirname(__file__), "notes_match_table.pkl")
+
+
+class NoteSequenceIndex:
+    """
+    In-memory index of the scale/key table, compiled once per process.
+
+    Every (scale_name, key) row is parsed into a read-only integer array holding the
+    scale one octave down followed by the scale itself.
+
+    Attributes:
+        index: Mapping of (scale_name, key) to the two-octave note array.
+    """
+
+    def __init__(self, notes_match_table: pd.DataFrame):
+        """
+        The constructor for NoteSequenceIndex class.
+
+        Parameters:
+            notes_match_table (pd.DataFrame): Table with scale_name, key and notes columns.
+        """
+        self.index: Dict[Tuple[str, str], np.ndarray] = {}
+        for scale_name, key, notes in notes_match_table[
+            ["scale_name", "key", "notes"]
+        ].itertuples(index=False):
+            # the first row wins, as with the former per-request query
+            self.index.setdefault((scale_name, key), self._compile(notes))
+
+    @classmethod
+    def from_pickle(cls, path: str = NOTES_MATCH_TABLE_PATH):
+        """
+        Builds the index from the pickled notes match table.
+
+        Parameters:
+            path (str, optional): The path to the pickle. Default is the bundled table.
+
+        Returns:
+            NoteSequenceIndex: The compiled index.
+        """
+        return cls(pd.read_pickle(path))
+
+    @staticmethod
+    def _compile(notes: str) -> np.ndarray:
+        notes_int = np.array([int(i) for i in notes.split(", ")], dtype=np.int64)
+        two_octaves = np.concatenate((notes_int - 12, notes_int))
+        two_octaves.flags.writeable = False
+        return two_octaves
+
+    def lookup(self, scale_name: str, key: str) -> np.ndarray:
+        """
+        Returns the two-octave note array of a scale and key.
+
+        Parameters:
+            scale_name (str): The scale name, for example "major".
+            key (str): The key, for example "C Major".
+
+        Returns:
+            np.ndarray: The read-only note array, octave down first.
+
+        Raises:
+            IndexError: If the table has no such scale and key.
+        """
+        try:
+            return self.index[(scale_name, key)]
+        except KeyError:
+            raise IndexError(f"no note sequence for scale {scale_name!r} and key {key!r}")
+
+    def __len__(self):
+        return len(self.index)
+
+
+note_sequence_index = NoteSequenceIndex.from_pickle()
@@ -0,0 +1,438 @@
+import abc
+import atexit
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Hashable, List, Optional
+
+import librosa
+import numpy as np
+import pedalboard
+from pydantic import BaseSettings, Field
+
+from app.utils.cache import CacheSettings, LRUCache
+
+
+class PitchShiftSettings(BaseSettings):
+    """
+    A Pydantic model for the pitch shifting settings.
+
+    Attributes:
+    -----------
+    pitch_shift_workers : int
+        Size of the process pool shifting frames in parallel, per worker process.
+        0 or 1 shifts the frames one after another in the calling thread.
+    """
+
+    pitch_shift_workers: int = Field(0, env="PITCH_SHIFT_WORKERS")
+
+
+class PitchBackend(abc.ABC):
+    """
+    A pitch-shift algorithm. Backends keep the length of the audio and are picklable,
+    so they can be shipped to the process pool.
+
+    Attributes:
+        name: The backend name, a key of PITCH_BACKENDS.
+        res_type: The resampler, a librosa res_type, for the backends resampling.
+    """
+
+    name = None
+
+    def __init__(self, res_type: str = "soxr_hq"):
+        self.res_type = res_type
+
+    @property
+    def key(self) -> tuple:
+        """Identifies the output of the backend, as part of the pitch cache key."""
+        return (self.name, self.res_type)
+
+    @abc.abstractmethod
+    def shift(self, audio: np.ndarray, sr: int, n_steps) -> np.ndarray:
+        """
+        Shifts the audio by n_steps half-steps.
+
+        Parameters:
+            audio (np.ndarray): The float32 mono audio.
+            sr (int): The sample rate.
+            n_steps (float): The number of half-steps.
+
+        Returns:
+            np.ndarray: The float32 shifted audio, as long as the input.
+        """
+
+    def __eq__(self, other):
+        return isinstance(other, PitchBackend) and self.key == other.key
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.res_type!r})"
+
+
+class LibrosaPitchBackend(PitchBackend):
+    """
+    Phase-vocoder time stretch followed by a resample: librosa.effects.pitch_shift.
+    The slowest backend and the reference for quality.
+    """
+
+    name = "librosa"
+
+    def shift(self, audio, sr, n_steps):
+        return librosa.effects.pitch_shift(
+            audio, sr=sr, n_steps=n_steps, res_type=self.res_type
+        )
+
+
+class ResamplePitchBackend(PitchBackend):
+    """
+    Varispeed: the audio is resampled as if played faster or slower, then cut or
+    zero-padded back to its length. A single resample, so by far the fastest; the
+    timing of the frame follows the pitch, as on a sampler.
+    """
+
+    name = "resample"
+
+    def shift(self, audio, sr, n_steps):
+        if n_steps == 0:
+            return np.asarray(audio, dtype=np.float32)
+        ratio = 2 ** (n_steps / 12)
+        shifted = librosa.resample(
+            np.asarray(audio, dtype=np.float32),
+            orig_sr=sr,
+            target_sr=sr / ratio,
+            res_type=self.res_type,
+        )
+        out = np.zeros(len(audio), dtype=np.float32)
+        out[: min(len(shifted), len(out))] = shifted[: len(out)]
+        return out
+
+
+class PedalboardPitchBackend(PitchBackend):
+    """
+    Pedalboard's PitchShift plugin, a native pitch shifter keeping the timing of the
+    audio. Its cost is mostly per call, so it pays off on long frames; see
+    benchmarks/bench_pitch_shift.py.
+    """
+
+    name = "pedalboard"
+
+    @property
+    def key(self) -> tuple:
+        return (self.name,)
+
+    def shift(self, audio, sr, n_steps):
+        if n_steps == 0:
+            return np.asarray(audio, dtype=np.float32)
+        board = pedalboard.Pedalboard([pedalboard.PitchShift(semitones=float(n_steps))])
+        return board(np.asarray(audio, dtype=np.float32), float(sr))
+
+    def __repr__(self):
+        return f"{type(self).__name__}()"
+
+
+PITCH_BACKENDS = {
+    backend.name: backend
+    for backend in (LibrosaPitchBackend, ResamplePitchBackend, PedalboardPitchBackend)
+}
+
+
+def pitch_backend(name: Optional[str] = None, res_type: str = "soxr_hq") -> PitchBackend:
+    """
+    Returns a pitch-shift backend.
+
+    Parameters:
+        name (str, optional): A key of PITCH_BACKENDS. Default is "librosa".
+        res_type (str, optional): The resampler of the resampling backends. Default is
+            "soxr_hq".
+
+    Returns:
+        PitchBackend: The backend.
+
+    Raises:
+        ValueError: If the backend is unknown.
+    """
+    try:
+        backend = PITCH_BACKENDS[name or LibrosaPitchBackend.name]
+    except KeyError:
+        raise ValueError(
+            f"pitch backend must be one of {', '.join(PITCH_BACKENDS)}"
+        ) from None
+    return backend(res_type)
+
+
+def _shift_shared_frame(
+    input_name, output_name, offset, length, n_steps, sr, backend=None
+):
+    """
+    Pool task: shifts one frame of the shared input block into the shared output block.
+
+    Parameters:
+        input_name (str): Name of the shared memory block holding the input frames.
+        output_name (str): Name of the shared memory block receiving the shifted frames.
+        offset (int): Offset of the frame in samples.
+        length (int): Length of the frame in samples.
+        n_steps (int): The number of half-steps to shift the pitch.
+        sr (int): The sample rate.
+        backend (PitchBackend, optional): The pitch-shift algorithm. Default is librosa.
+    """
+    backend = backend or LibrosaPitchBackend()
+    input_block = shared_memory.SharedMemory(name=input_name)
+    output_block = shared_memory.SharedMemory(name=output_name)
+    try:
+        itemsize = np.dtype(np.float32).itemsize
+        audio = np.ndarray(
+            (length,), dtype=np.float32, buffer=input_block.buf, offset=offset * itemsize
+        )
+        shifted = np.ndarray(
+            (length,), dtype=np.float32, buffer=output_block.buf, offset=offset * itemsize
+        )
+        shifted[:] = backend.shift(audio, sr, n_steps)
+        del audio, shifted
+    finally:
+        input_block.close()
+        output_block.close()
+
+
+class ParallelPitchShifter:
+    """
+    Spreads the pitch shifts of one render over a bounded process pool.
+
+    Frames are handed to the pool through two shared memory blocks, one holding every
+    input frame back to back and one receiving the shifted frames at the same offsets,
+    so no audio is pickled.
+
+    Attributes:
+        max_workers: The size of the process pool.
+    """
+
+    def __init__(self, max_workers: int):
+        """
+        The constructor for ParallelPitchShifter class.
+
+        Parameters:
+            max_workers (int): The size of the process pool. Values below 2 disable the pool.
+        """
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_workers > 1
+
+    def executor(self) -> ProcessPoolExecutor:
+        """
+        Returns the process pool, starting it on first use.
+
+        Returns:
+            ProcessPoolExecutor: The pool.
+        """
+        with self._lock:
+            if self._executor is None:
+                # spawn, as forking a threaded server process is unsafe
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+    def shift_frames(
+        self,
+        audio_frames: List,
+        n_steps: List,
+        sr: int = 44100,
+        backend: Optional[PitchBackend] = None,
+    ) -> List:
+        """
+        Shifts every frame by its number of half-steps on the process pool.
+
+        Parameters:
+            audio_frames (List[np.ndarray]): The frames to shift.
+            n_steps (List[int]): The number of half-steps for each frame.
+            sr (int, optional): The sample rate. Default is 44100.
+            backend (PitchBackend, optional): The pitch-shift algorithm. Default is librosa.
+
+        Returns:
+            List[np.ndarray]: The shifted frames, in input order.
+        """
+        lengths = [len(audio_frame) for audio_frame in audio_frames]
+        offsets = np.concatenate(([0], np.cumsum(lengths)[:-1])).astype(int)
+        block_size = max(sum(lengths), 1) * np.dtype(np.float32).itemsize
+
+        input_block = shared_memory.SharedMemory(create=True, size=block_size)
+        output_block = shared_memory.SharedMemory(create=True, size=block_size)
+        try:
+            frames_in = np.ndarray(
+                (sum(lengths),), dtype=np.float32, buffer=input_block.buf
+            )
+            for audio_frame, offset, length in zip(audio_frames, offsets, lengths):
+                frames_in[offset : offset + length] = audio_frame
+            del frames_in
+
+            futures = [
+                self.executor().submit(
+                    _shift_shared_frame,
+                    input_block.name,
+                    output_block.name,
+                    int(offset),
+                    length,
+                    steps,
+                    sr,
+                    backend,
+                )
+                for offset, length, steps in zip(offsets, lengths, n_steps)
+            ]
+            for future in futures:
+                future.result()
+
+            frames_out = np.ndarray(
+                (sum(lengths),), dtype=np.float32, buffer=output_block.buf
+            ).copy()
+        finally:
+            input_block.close()
+            input_block.unlink()
+            output_block.close()
+            output_block.unlink()
+
+        return [
+            frames_out[offset : offset + length]
+            for offset, length in zip(offsets, lengths)
+        ]
+
+
+class PitchShiftCache:
+    """
+    Memoizes pitch-shifted frames.
+
+    Frames are identified by (asset digest, frame offset, frame length), so the same frame
+    shifted by the same number of semitones with the same backend is only shifted once,
+    within a request and across regenerations.
+
+    Attributes:
+        cache: The underlying LRU cache, which also counts hits and misses.
+        shifter: Optional process pool used for the frames missing from the cache.
+    """
+
+    def __init__(self, max_bytes: int, shifter: Optional[ParallelPitchShifter] = None):
+        """
+        The constructor for PitchShiftCache class.
+
+        Parameters:
+            max_bytes (int): The memory cap of the cache in bytes.
+            shifter (ParallelPitchShifter, optional): Process pool for cache misses.
+        """
+        self.cache = LRUCache(max_bytes)
+        self.shifter = shifter
+
+    def shift(
+        self,
+        audio,
+        n_steps,
+        frame_key: Optional[Hashable] = None,
+        sr: int = 44100,
+        backend: Optional[PitchBackend] = None,
+    ):
+        """
+        Returns the audio shifted by n_steps half-steps.
+
+        Parameters:
+            audio (np.ndarray): The audio frame to shift.
+            n_steps (int): The number of half-steps to shift the pitch.
+            frame_key (Hashable, optional): The frame identity. Frames without one are not cached.
+            sr (int, optional): The sample rate. Default is 44100.
+            backend (PitchBackend, optional): The pitch-shift algorithm. Default is librosa.
+
+        Returns:
+            np.ndarray: The pitch-shifted audio frame.
+        """
+        if frame_key is None:
+            return self._shift(audio, n_steps, sr, backend)
+        backend = backend or LibrosaPitchBackend()
+        key = (frame_key, n_steps, sr, backend.key)
+        return self.cache.get_or_compute(
+            key, lambda: self._shift(audio, n_steps, sr, backend)
+        )
+
+    def shift_many(
+        self,
+        audio_frames: List,
+        n_steps: List,
+        frame_keys: Optional[List[Optional[Hashable]]] = None,
+        sr: int = 44100,
+        backend: Optional[PitchBackend] = None,
+    ) -> List:
+        """
+        Shifts a batch of frames. Cache hits are returned as is, each distinct miss is
+        shifted once, on the process pool when it is enabled.
+
+        Parameters:
+            audio_frames (List[np.ndarray]): The frames to shift.
+            n_steps (List[int]): The number of half-steps for each frame.
+            frame_keys (List[Hashable], optional): The identity of each frame, None disables caching.
+            sr (int, optional): The sample rate. Default is 44100.
+            backend (PitchBackend, optional): The pitch-shift algorithm. Default is librosa.
+
+        Returns:
+            List[np.ndarray]: The shifted frames, in input order.
+        """
+        backend = backend or LibrosaPitchBackend()
+        if frame_keys is None:
+            frame_keys = [None] * len(audio_frames)
+
+        shifted = [None] * len(audio_frames)
+        misses = {}
+        for i, (frame_key, steps) in enumerate(zip(frame_keys, n_steps)):
+            key = i if frame_key is None else (frame_key, steps, sr, backend.key)
+            cached = None if frame_key is None else self.cache.get(key)
+            if cached is None:
+                misses.setdefault(key, []).append(i)
+            else:
+                shifted[i] = cached
+
+        if not misses:
+            return shifted
+
+        first_indices = [indices[0] for indices in misses.values()]
+        miss_frames = [audio_frames[i] for i in first_indices]
+        miss_steps = [n_steps[i] for i in first_indices]
+        if self.shifter is not None and self.shifter.enabled and len(miss_frames) > 1:
+            results = self.shifter.shift_frames(miss_frames, miss_steps, sr, backend)
+        else:
+            results = [
+                self._shift(audio_frame, steps, sr, backend)
+                for audio_frame, steps in zip(miss_frames, miss_steps)
+            ]
+
+        for (key, indices), result in zip(misses.items(), results):
+            result.flags.writeable = False
+            if not isinstance(key, int):
+                self.cache.put(key, result)
+            for i in indices:
+                shifted[i] = result
+        return shifted
+
+    def stats(self) -> dict:
+        return self.cache.stats()
+
+    @staticmethod
+    def _shift(audio, n_steps, sr, backend=None):
+        shifted = (backend or LibrosaPitchBackend()).shift(audio, sr, n_steps)
+        shifted.flags.writeable = False
+        return shifted
+
+
+parallel_pitch_shifter = ParallelPitchShifter(PitchShiftSettings().pitch_shift_workers)
+atexit.register(parallel_pitch_shifter.shutdown)
+
+pitch_shift_cache = PitchShiftCache(
+    CacheSettings().pitch_shift_max_bytes, shifter=parallel_pitch_shifter
+)
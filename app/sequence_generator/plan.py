@@ -0,0 +1,290 @@
+import math
+import os
+from collections import Counter
+from typing import Callable, List, Optional, Sequence
+
+import numpy as np
+
+from app.sequence_generator.analysis import (
+    AnalysisSettings,
+    analysis_path,
+    snap_to_onsets,
+    transient_onsets,
+)
+from app.sequence_generator.rhythm import euclidean_pattern, onset_frame_steps
+from app.utils.cache import CacheSettings, LRUCache, file_stat_key
+
+
+def grid_length(n_samples: int, bpm: float, steps: int, sr: int = 44100) -> tuple:
+    """
+    Returns the part of the audio the frames are cut from and the length of one step.
+
+    Parameters:
+        n_samples (int): The length of the audio in samples.
+        bpm (float): The tempo.
+        steps (int): The number of steps of one bar.
+        sr (int, optional): The sample rate. Default is 44100.
+
+    Returns:
+        tuple: The grid value and the pulse length, both in samples.
+    """
+    one_bar = 60 / bpm * 4
+    pulse_length_samples = sr * one_bar / steps
+    pulses = math.floor(n_samples / pulse_length_samples)
+    grid_value = (
+        n_samples if pulses <= 1 else pulses * pulse_length_samples - pulse_length_samples
+    )
+    return grid_value, pulse_length_samples
+
+
+def frame_lengths(pattern: Sequence[int], pulse_length_samples: float) -> np.ndarray:
+    """
+    Returns the length of the frame played at each onset of a pattern: the distance to
+    the next onset. The last onset lasts until the first onset of the next bar, so the
+    frames of a rotated pattern start at its first onset (SequencePlan.lead) and wrap
+    around the end of the bar.
+
+    Parameters:
+        pattern (Sequence[int]): The 0/1 steps of the rhythm.
+        pulse_length_samples (float): The length of one step in samples.
+
+    Returns:
+        np.ndarray: The frame lengths in samples.
+    """
+    onsets = np.flatnonzero(np.asarray(pattern) == 1)
+    return onset_frame_steps(onsets, len(pattern)) * pulse_length_samples
+
+
+def frame_reps(grid_value: float, unique_lengths: Sequence[float]) -> np.ndarray:
+    """
+    Returns how many frames of each length fit in the grid, at least one.
+
+    Parameters:
+        grid_value (float): The grid value in samples.
+        unique_lengths (Sequence[float]): The distinct frame lengths.
+
+    Returns:
+        np.ndarray: The int number of frames of each length.
+    """
+    reps_value = grid_value / np.asarray(unique_lengths, dtype=np.float64)
+    return np.where(reps_value < 1, np.ceil(reps_value), np.floor(reps_value)).astype(int)
+
+
+def frame_offsets(
+    unique_lengths: Sequence[float], reps: Sequence[int], onsets=None
+) -> List[np.ndarray]:
+    """
+    Returns the offsets of the frames of each length, moved to the nearby onsets when
+    the asset's onsets are known.
+
+    Parameters:
+        unique_lengths (Sequence[float]): The distinct frame lengths.
+        reps (Sequence[int]): The number of frames of each length.
+        onsets (list, optional): The onsets of the asset, in samples.
+
+    Returns:
+        List[np.ndarray]: The offsets of each frame length.
+    """
+    offsets = []
+    for length, rep in zip(unique_lengths, reps):
+        stop = int(length * (1 if length * rep - length == 0 else rep - 1))
+        group = np.arange(0, stop, int(length))
+        if onsets is not None:
+            group = snap_to_onsets(group, onsets, int(length))
+        offsets.append(group)
+    return offsets
+
+
+class SequencePlan:
+    """
+    The compiled slicing plan of a channel: everything derived from the rhythm, the
+    tempo and the asset, before any frame is drawn. A plan is immutable, so a single
+    instance is shared by every render of the channel.
+
+    Attributes:
+        pattern: The 0/1 steps of the Euclidean rhythm.
+        onsets: The step index of each onset.
+        grid_value: The part of the audio the frames are cut from, in samples.
+        pulse_length: The length of one step in samples.
+        frame_lengths: The length of the frame played at each onset.
+        unique_lengths: The distinct frame lengths, sorted.
+        reps: The number of frames cut for each distinct length.
+        offsets: The offsets of the frames of each distinct length.
+        draws: The number of frames drawn from each length group per sequence.
+        lead: Where the first frame starts in the bar, in samples: the first onset of a
+            rotated pattern. The frames wrap around the end of the bar.
+    """
+
+    __slots__ = (
+        "pattern",
+        "onsets",
+        "grid_value",
+        "pulse_length",
+        "frame_lengths",
+        "unique_lengths",
+        "reps",
+        "offsets",
+        "draws",
+        "lead",
+    )
+
+    def __init__(
+        self,
+        pattern: Sequence[int],
+        grid_value: float,
+        pulse_length: float,
+        onsets: Optional[list] = None,
+    ):
+        """
+        Parameters:
+            pattern (Sequence[int]): The 0/1 steps of the rhythm.
+            grid_value (float): The part of the audio the frames are cut from.
+            pulse_length (float): The length of one step in samples.
+            onsets (list, optional): The onsets of the asset the frames are aligned to.
+        """
+        pattern = np.asarray(pattern, dtype=np.uint8)
+        lengths = frame_lengths(pattern, pulse_length)
+        unique_lengths = np.unique(lengths)
+        reps = frame_reps(grid_value, unique_lengths)
+        onset_steps = np.flatnonzero(pattern)
+        fields = {
+            "pattern": pattern,
+            "onsets": onset_steps,
+            "grid_value": grid_value,
+            "pulse_length": pulse_length,
+            "frame_lengths": lengths,
+            "unique_lengths": unique_lengths,
+            "reps": reps,
+            "offsets": tuple(frame_offsets(unique_lengths, reps, onsets)),
+            # in order of first onset, which is how the engine pairs them with the groups
+            "draws": tuple(Counter(map(int, lengths)).values()),
+            "lead": int(round(onset_steps[0] * pulse_length)) if onset_steps.size else 0,
+        }
+        for name, value in fields.items():
+            for array in value if name == "offsets" else (value,):
+                if isinstance(array, np.ndarray):
+                    array.flags.writeable = False
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("SequencePlan is immutable")
+
+    @classmethod
+    def compile(
+        cls,
+        rhythm_config: Sequence[int],
+        bpm: float,
+        n_samples: int,
+        sr: int = 44100,
+        onsets: Optional[list] = None,
+    ) -> "SequencePlan":
+        """
+        Compiles the plan of a channel.
+
+        Parameters:
+            rhythm_config (Sequence[int]): The pulses, steps and optional rotation.
+            bpm (float): The tempo.
+            n_samples (int): The length of the asset in samples.
+            sr (int, optional): The sample rate. Default is 44100.
+            onsets (list, optional): The onsets of the asset the frames are aligned to.
+
+        Returns:
+            SequencePlan: The plan.
+        """
+        rotation = rhythm_config[2] if len(rhythm_config) > 2 else 0
+        pattern = euclidean_pattern(rhythm_config[0], rhythm_config[1], rotation)
+        grid_value, pulse_length = grid_length(n_samples, bpm, rhythm_config[1], sr)
+        return cls(pattern, grid_value, pulse_length, onsets)
+
+    def __repr__(self):
+        return (
+            f"SequencePlan(onsets={self.onsets.tolist()}, "
+            f"lengths={self.unique_lengths.tolist()}, reps={self.reps.tolist()})"
+        )
+
+
+class SequencePlanCache:
+    """
+    Process-wide cache of the compiled plans.
+
+    Plans are keyed by the asset's path, mtime and size, its analysis sidecar, the
+    rhythm, the tempo and the sample rate, so every render of a job channel shares one
+    plan until the manifest or the asset changes.
+
+    Attributes:
+        cache: The underlying LRU cache, counting entries.
+    """
+
+    def __init__(self, max_entries: int):
+        self.cache = LRUCache.counting(max_entries)
+
+    def get(
+        self,
+        asset_path: str,
+        rhythm_config: Sequence[int],
+        bpm: float,
+        sr: int,
+        audio_length: Callable[[], int],
+    ) -> SequencePlan:
+        """
+        Returns the plan of a channel, compiling it on the first request only.
+
+        Parameters:
+            asset_path (str): The audio the frames are cut from.
+            rhythm_config (Sequence[int]): The pulses, steps and optional rotation.
+            bpm (float): The tempo.
+            sr (int): The sample rate.
+            audio_length (Callable): Returns the length of the asset in samples.
+
+        Returns:
+            SequencePlan: The plan.
+        """
+
+        def compile_plan():
+            return SequencePlan.compile(
+                rhythm_config,
+                bpm,
+                audio_length(),
+                sr,
+                transient_onsets(asset_path, sr=sr),
+            )
+
+        try:
+            key = (
+                file_stat_key(asset_path),
+                self._sidecar_key(asset_path),
+                tuple(rhythm_config),
+                float(bpm),
+                sr,
+            )
+        except OSError:
+            return compile_plan()
+        return self.cache.get_or_compute(key, compile_plan)
+
+    @staticmethod
+    def _sidecar_key(asset_path: str):
+        if not AnalysisSettings().slice_align_transients:
+            return None
+        try:
+            return file_stat_key(analysis_path(asset_path))
+        except OSError:
+            return None
+
+    def invalidate(self, path: str) -> int:
+        """
+        Drops every cached plan of an asset.
+
+        Parameters:
+            path (str): The path to the asset.
+
+        Returns:
+            int: The number of removed entries.
+        """
+        real_path = os.path.realpath(path)
+        return self.cache.invalidate(lambda key: key[0][0] == real_path)
+
+    def clear(self) -> None:
+        self.cache.clear()
+
+
+sequence_plan_cache = SequencePlanCache(CacheSettings().sequence_plan_max_entries)
@@ -0,0 +1,176 @@
+from typing import Optional, Sequence
+
+import numpy as np
+
+MAX_STEPS = 64
+
+
+def bjorklund(pulses: int, steps: int) -> list:
+    """
+    Generates a Euclidean rhythm by repeatedly folding the trailing groups onto the leading ones.
+
+    Parameters:
+        pulses (int): The number of pulses in the rhythm.
+        steps (int): The number of steps the rhythm should be fitted into.
+
+    Returns:
+        list: The rhythm as a list of 0/1 steps.
+    """
+    if pulses <= 0:
+        return [0] * steps
+    n, k = pulses, steps
+    data = [[1 if i < n else 0] for i in range(k)]
+    while True:
+        k = k - n
+        if k <= 1:
+            break
+        elif k < n:
+            n, k = k, n
+        for i in range(n):
+            data[i] += data[-1]
+            del data[-1]
+    return [x for y in data for x in y]
+
+
+def _build_pattern_table() -> np.ndarray:
+    """
+    Bit-packs every (pulses, steps) pattern up to MAX_STEPS steps; bit i holds step i.
+
+    Returns:
+        np.ndarray: A uint64 table indexed by [pulses, steps].
+    """
+    table = np.zeros((MAX_STEPS + 1, MAX_STEPS + 1), dtype=np.uint64)
+    for steps in range(1, MAX_STEPS + 1):
+        for pulses in range(steps + 1):
+            bits = 0
+            for i, step in enumerate(bjorklund(pulses, steps)):
+                bits |= step << i
+            table[pulses, steps] = bits
+    table.flags.writeable = False
+    return table
+
+
+PATTERN_TABLE = _build_pattern_table()
+_STEP_BITS = np.arange(MAX_STEPS, dtype=np.uint64)
+
+
+def euclidean_pattern(pulses: int, steps: int, rotation: int = 0) -> np.ndarray:
+    """
+    Returns a Euclidean rhythm as an array of 0/1 steps.
+
+    Parameters:
+        pulses (int): The number of pulses, from 0 to steps.
+        steps (int): The number of steps.
+        rotation (int, optional): Rotates the pattern left by this many steps. Default is 0.
+
+    Returns:
+        np.ndarray: The uint8 pattern.
+
+    Raises:
+        ValueError: If pulses is negative or larger than steps.
+    """
+    if not 0 <= pulses <= steps:
+        raise ValueError("pulses must be between 0 and the number of steps")
+    if steps > MAX_STEPS:
+        pattern = np.array(bjorklund(pulses, steps), dtype=np.uint8)
+    else:
+        bits = PATTERN_TABLE[pulses, steps]
+        pattern = ((bits >> _STEP_BITS[:steps]) & np.uint64(1)).astype(np.uint8)
+    if rotation:
+        pattern = np.roll(pattern, -rotation)
+    return pattern
+
+
+def euclidean_onsets(pulses: int, steps: int, rotation: int = 0) -> np.ndarray:
+    """
+    Returns the onset step indices of a Euclidean rhythm.
+
+    Parameters:
+        pulses (int): The number of pulses, from 0 to steps.
+        steps (int): The number of steps.
+        rotation (int, optional): Rotates the pattern left by this many steps. Default is 0.
+
+    Returns:
+        np.ndarray: The sorted onset indices.
+    """
+    return np.flatnonzero(euclidean_pattern(pulses, steps, rotation))
+
+
+def onset_frame_steps(onsets: np.ndarray, steps: int) -> np.ndarray:
+    """
+    Returns how many steps each onset lasts, up to the next onset. The last onset lasts
+    until the first one of the next bar, so a rotated pattern whose first onset is not
+    on step 0 still fills the bar; its frames start at the first onset and wrap around.
+
+    Parameters:
+        onsets (np.ndarray): The sorted onset indices.
+        steps (int): The number of steps in the bar.
+
+    Returns:
+        np.ndarray: The length in steps of each onset's frame.
+    """
+    onsets = np.asarray(onsets)
+    if onsets.size == 0:
+        return np.diff(onsets)
+    return np.diff(np.append(onsets, onsets[0] + steps))
+
+
+def batch_patterns(
+    pulses: Sequence[int], steps: Sequence[int], rotations: Optional[Sequence[int]] = None
+) -> np.ndarray:
+    """
+    Returns many Euclidean rhythms, for example one per channel, in one vectorized call.
+
+    Parameters:
+        pulses (Sequence[int]): The number of pulses of each rhythm, from 0 to its steps.
+        steps (Sequence[int]): The number of steps of each rhythm, at most MAX_STEPS.
+        rotations (Sequence[int], optional): The left rotation of each rhythm. Default is none.
+
+    Returns:
+        np.ndarray: A (len(pulses), MAX_STEPS) bool matrix, False past each rhythm's steps.
+    """
+    steps = np.asarray(steps, dtype=np.int64)
+    pulses = np.asarray(pulses, dtype=np.int64)
+    if np.any(steps < 1) or np.any(steps > MAX_STEPS):
+        raise ValueError(f"steps must be between 1 and {MAX_STEPS}")
+    if np.any(pulses < 0) or np.any(pulses > steps):
+        raise ValueError("pulses must be between 0 and the number of steps")
+    rotations = (
+        np.zeros_like(steps)
+        if rotations is None
+        else np.asarray(rotations, dtype=np.int64)
+    )
+
+    positions = np.arange(MAX_STEPS, dtype=np.int64)
+    in_bar = positions[None, :] < steps[:, None]
+    # the rotated pattern reads step (j + rotation) mod steps of the stored pattern
+    source = ((positions[None, :] + rotations[:, None]) % steps[:, None]).astype(
+        np.uint64
+    )
+    bits = PATTERN_TABLE[pulses, steps][:, None]
+    return ((bits >> source) & np.uint64(1)).astype(bool) & in_bar
+
+
+def batch_frame_steps(patterns: np.ndarray, steps: Sequence[int]) -> np.ndarray:
+    """
+    Returns, for every onset of every rhythm, how many steps it lasts; the last onset
+    lasts until the first one of the next bar, as in onset_frame_steps().
+
+    Parameters:
+        patterns (np.ndarray): A bool matrix as returned by batch_patterns.
+        steps (Sequence[int]): The number of steps of each rhythm.
+
+    Returns:
+        np.ndarray: An int matrix shaped like patterns, holding the frame length in steps
+            at each onset and 0 elsewhere.
+    """
+    steps = np.asarray(steps, dtype=np.int64)
+    n_rhythms, width = patterns.shape
+    positions = np.broadcast_to(np.arange(width, dtype=np.int64), (n_rhythms, width))
+    # the first onset of the next bar, past every onset of this one
+    wrapped = (np.argmax(patterns, axis=1) + steps)[:, None]
+    onset_positions = np.where(patterns, positions, wrapped)
+    # next onset strictly after each step, or the first one of the next bar
+    following = np.concatenate((onset_positions[:, 1:], wrapped), axis=1)
+    next_onset = np.minimum.accumulate(following[:, ::-1], axis=1)[:, ::-1]
+    return np.where(patterns, next_onset - positions, 0)
@@ -0,0 +1,127 @@
+import logging
+import os
+
+import librosa
+import numpy as np
+from pydantic import BaseSettings, Field
+
+from app.sequence_generator.analysis import analyze_audio, write_analysis
+from app.sequence_generator.audio_cache import decoded_audio_cache
+from app.utils.cache import file_lock
+from app.utils.timing import stage
+from app.utils.utils import parse_sample_bpm, parse_sample_key
+
+logger = logging.getLogger(__name__)
+
+
+class TempoSettings(BaseSettings):
+    """
+    A Pydantic model for the tempo conform settings.
+
+    Attributes:
+    -----------
+    tempo_conform : bool
+        Time-stretches samples tagged with a BPM in their name to the job's bpm before
+        slicing them, instead of only trimming them to the bar grid.
+    tempo_conform_tolerance : float
+        Relative tempo difference below which a sample is used as is.
+    """
+
+    tempo_conform: bool = Field(True, env="TEMPO_CONFORM")
+    tempo_conform_tolerance: float = Field(0.005, env="TEMPO_CONFORM_TOLERANCE")
+
+
+def conformed_path(asset_path: str, bpm: float, sr: int = 44100) -> str:
+    """
+    Returns the path of an asset's variant stretched to bpm.
+
+    Parameters:
+        asset_path (str): The path to the sample asset.
+        bpm (float): The target tempo.
+        sr (int, optional): The sample rate of the variant. Default is 44100.
+
+    Returns:
+        str: The .npy path next to the asset, e.g. "loop.bpm140.44100.npy".
+    """
+    return f"{os.path.splitext(asset_path)[0]}.bpm{float(bpm):g}.{sr}.npy"
+
+
+def _is_fresh(variant_path: str, asset_path: str) -> bool:
+    try:
+        return os.stat(variant_path).st_mtime_ns >= os.stat(asset_path).st_mtime_ns
+    except OSError:
+        return False
+
+
+def conform_asset(asset_path: str, bpm: float, sr: int = 44100) -> str:
+    """
+    Returns the asset to render a job at bpm from: a variant of the sample time-stretched
+    from the tempo in its name to bpm, or the sample itself when it has no tempo tag,
+    already plays at bpm or conforming is disabled.
+
+    A variant is stretched once per (asset, bpm) and stored as a float32 .npy sidecar,
+    so later jobs at that tempo memory-map it. Sidecars are rebuilt when the asset is
+    downloaded again and are evicted with it by the asset cache.
+
+    Parameters:
+        asset_path (str): The path to the sample asset.
+        bpm (float): The job tempo.
+        sr (int, optional): The sample rate. Default is 44100.
+
+    Returns:
+        str: The path to load the audio from.
+    """
+    settings = TempoSettings()
+    source_bpm = parse_sample_bpm(asset_path)
+    if (
+        not settings.tempo_conform
+        or source_bpm is None
+        or not bpm
+        or abs(bpm / source_bpm - 1) <= settings.tempo_conform_tolerance
+        or not os.path.exists(asset_path)
+    ):
+        return asset_path
+
+    variant_path = conformed_path(asset_path, bpm, sr)
+    if _is_fresh(variant_path, asset_path):
+        return variant_path
+
+    lock_path = os.path.join(
+        os.path.dirname(asset_path), ".locks", f"{os.path.basename(variant_path)}.lock"
+    )
+    try:
+        with file_lock(lock_path):
+            # another worker may have stretched it while we waited
+            if not _is_fresh(variant_path, asset_path):
+                with stage("tempo_conform"):
+                    _stretch(asset_path, variant_path, bpm, source_bpm, sr)
+    except Exception as e:
+        logger.error(f"Could not conform {asset_path} to {bpm} bpm: {e}")
+        return asset_path
+    return variant_path
+
+
+def _stretch(
+    asset_path: str, variant_path: str, bpm: float, source_bpm: float, sr: int
+) -> None:
+    audio = decoded_audio_cache.load(asset_path, sr=sr)
+    stretched = librosa.effects.time_stretch(np.asarray(audio), rate=bpm / source_bpm)
+    stretched = stretched.astype(np.float32, copy=False)
+    tmp_path = f"{variant_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            np.save(f, stretched)
+        # the variant's sidecar goes first, so the variant is never seen without it
+        analysis = analyze_audio(
+            stretched,
+            sr=sr,
+            size=os.path.getsize(tmp_path),
+            bpm=bpm,
+            key=parse_sample_key(asset_path),
+        )
+        write_analysis(variant_path, analysis)
+        os.replace(tmp_path, variant_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    logger.info(f"Tempo-conformed variant written to {variant_path}")
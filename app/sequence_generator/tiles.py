@@ -0,0 +1,236 @@
+import string
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+MAX_BARS = 64
+
+
+def bar_length(bpm: float, sr: int = 44100) -> int:
+    """
+    Returns the length of one 4/4 bar in samples.
+
+    Parameters:
+        bpm (float): The tempo.
+        sr (int, optional): The sample rate. Default is 44100.
+
+    Returns:
+        int: The bar length.
+    """
+    return round(sr * 60 / bpm * 4)
+
+
+def fit_frames(frames, length: int, start: int = 0) -> np.ndarray:
+    """
+    Writes frames back to back into a preallocated float32 buffer of the given length.
+    Shorter sequences are zero-padded and longer ones are truncated.
+
+    Parameters:
+        frames (Sequence[np.ndarray] | np.ndarray): The frames, or a flat array.
+        length (int): The buffer length in samples.
+        start (int, optional): Where the first frame starts; what runs past the end of
+            the buffer wraps around to its start. Default is 0.
+
+    Returns:
+        np.ndarray: The buffer.
+    """
+    buffer = np.zeros(length, dtype=np.float32)
+    position = start % length if length else 0
+    written = 0
+    for frame in _as_frames(frames):
+        frame_len = min(len(frame), length - written)
+        head = min(frame_len, length - position)
+        buffer[position : position + head] = frame[:head]
+        buffer[: frame_len - head] = frame[head:frame_len]
+        position = (position + frame_len) % length
+        written += frame_len
+        if written == length:
+            break
+    return buffer
+
+
+def _as_frames(frames):
+    if len(frames) == 0:
+        return ()
+    if np.ndim(frames[0]) == 0:
+        return (np.asarray(frames),)
+    return frames
+
+
+class BarLayout:
+    """
+    How a multi-bar sequence is assembled from distinct one-bar tiles.
+
+    Attributes:
+        chain: The tile played in each bar, e.g. [0, 0, 1, 0] for an AABA chain.
+        masks: For each bar, the steps it plays (1) or drops (0), or None to play the
+            tile as is.
+        tile_frames: The number of frames of each tile, in tile order, once rendered.
+    """
+
+    def __init__(
+        self,
+        chain: Sequence[int] = (0,),
+        masks: Optional[Sequence[Optional[Sequence[int]]]] = None,
+        tile_frames: Optional[Sequence[int]] = None,
+    ):
+        self.chain = [int(tile) for tile in chain]
+        if not self.chain or sorted(set(self.chain)) != list(range(max(self.chain) + 1)):
+            raise ValueError("bar chain must use tiles 0..n-1")
+        self.masks = (
+            [None if mask is None else [int(step) for step in mask] for mask in masks]
+            if masks is not None
+            else [None] * len(self.chain)
+        )
+        if len(self.masks) != len(self.chain):
+            raise ValueError("one mask per bar is required")
+        self.tile_frames = None if tile_frames is None else [int(n) for n in tile_frames]
+
+    @property
+    def bars(self) -> int:
+        return len(self.chain)
+
+    @property
+    def n_tiles(self) -> int:
+        return max(self.chain) + 1
+
+    @property
+    def is_single(self) -> bool:
+        """True for a plain one-bar sequence, with nothing to assemble."""
+        return self.bars == 1 and self.masks[0] is None
+
+    @classmethod
+    def from_spec(
+        cls,
+        bars: int = 1,
+        chain: Optional[str] = None,
+        variation: float = 0.0,
+        steps: Optional[int] = None,
+        rng: Optional[np.random.Generator] = None,
+    ) -> "BarLayout":
+        """
+        Builds the layout of a job channel.
+
+        Parameters:
+            bars (int, optional): The number of bars. Default is 1.
+            chain (str, optional): The pattern chain, one letter per tile, e.g. "AABA";
+                it is repeated over the bars. Default repeats a single tile.
+            variation (float, optional): The probability to drop each step of a bar
+                repeating an earlier tile. Default is 0.
+            steps (int, optional): The number of steps of a bar; required for variation.
+            rng (np.random.Generator, optional): Draws the dropped steps.
+
+        Returns:
+            BarLayout: The layout.
+        """
+        if not 1 <= bars <= MAX_BARS:
+            raise ValueError(f"bars must be between 1 and {MAX_BARS}")
+        chain = (chain or "A").upper()
+        if any(letter not in string.ascii_uppercase for letter in chain):
+            raise ValueError("bar chain must be letters, e.g. AABA")
+        # tiles are numbered by first use, so "BBA" plays tile 0 twice, then tile 1
+        tiles = {}
+        tile_chain = [tiles.setdefault(letter, len(tiles)) for letter in chain]
+        tile_chain = [tile_chain[bar % len(tile_chain)] for bar in range(bars)]
+
+        masks = [None] * bars
+        if variation > 0:
+            if not steps:
+                raise ValueError("variation needs the number of steps")
+            rng = rng if rng is not None else np.random.default_rng()
+            seen = set()
+            for bar, tile in enumerate(tile_chain):
+                if tile in seen:
+                    masks[bar] = (rng.random(steps) >= variation).astype(int).tolist()
+                seen.add(tile)
+        return cls(tile_chain, masks)
+
+    def to_header(self) -> dict:
+        """Returns the layout as ragged container header fields."""
+        return {"chain": self.chain, "masks": self.masks, "tiles": self.tile_frames}
+
+    @classmethod
+    def from_header(cls, header: dict) -> "BarLayout":
+        """
+        Reads the layout of a ragged container; containers without one hold one bar.
+        """
+        if not header.get("chain"):
+            return cls()
+        return cls(header["chain"], header.get("masks"), header.get("tiles"))
+
+    def split(self, frames: Sequence[np.ndarray]) -> List[Sequence[np.ndarray]]:
+        """
+        Splits the frames of a rendered sequence into the frames of each tile.
+
+        Parameters:
+            frames (Sequence[np.ndarray]): The frames of every tile, back to back.
+
+        Returns:
+            List[Sequence[np.ndarray]]: The frames of each tile.
+        """
+        if self.tile_frames is None:
+            return [frames]
+        bounds = np.concatenate(([0], np.cumsum(self.tile_frames)))
+        return [frames[start:stop] for start, stop in zip(bounds[:-1], bounds[1:])]
+
+
+class TileRenderer:
+    """
+    Assembles multi-bar sequences from one-bar tiles.
+
+    The output is preallocated once and every distinct tile is block-copied into all
+    the bars that play it, so the cost grows with the number of distinct tiles; only
+    the bars with a variation mask are touched again.
+
+    Attributes:
+        bar_length: The length of one bar in samples.
+    """
+
+    def __init__(self, bpm: float, sr: int = 44100):
+        self.bar_length = bar_length(bpm, sr)
+
+    def render(
+        self,
+        tiles: Sequence[np.ndarray],
+        layout: BarLayout,
+        out: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """
+        Assembles the bars of a layout.
+
+        Parameters:
+            tiles (Sequence[np.ndarray]): The one-bar audio of each tile.
+            layout (BarLayout): The chain and masks of the bars.
+            out (np.ndarray, optional): A float32 buffer of layout.bars bars to fill.
+
+        Returns:
+            np.ndarray: The assembled float32 sequence.
+        """
+        if len(tiles) != layout.n_tiles:
+            raise ValueError(f"expected {layout.n_tiles} tiles, got {len(tiles)}")
+        if out is None:
+            out = np.empty(layout.bars * self.bar_length, dtype=np.float32)
+        bars = out.reshape(layout.bars, self.bar_length)
+
+        chain = np.asarray(layout.chain)
+        for tile_index, tile in enumerate(tiles):
+            if not (isinstance(tile, np.ndarray) and tile.shape == (self.bar_length,)):
+                tile = fit_frames(tile, self.bar_length)
+            bars[chain == tile_index] = tile
+        for bar, mask in enumerate(layout.masks):
+            if mask is not None and not all(mask):
+                bars[bar] *= self.step_gains(mask)
+        return out
+
+    def step_gains(self, mask: Sequence[int]) -> np.ndarray:
+        """
+        Expands a per-step mask to per-sample gains over one bar.
+
+        Parameters:
+            mask (Sequence[int]): 1 for each played step, 0 for each dropped one.
+
+        Returns:
+            np.ndarray: The float32 gains.
+        """
+        bounds = np.round(np.linspace(0, self.bar_length, len(mask) + 1)).astype(int)
+        return np.repeat(np.asarray(mask, dtype=np.float32), np.diff(bounds))
@@ -0,0 +1,133 @@
+import os
+import logging
+
+import librosa
+import numpy as np
+
+from app.utils.cache import LRUCache, file_stat_key
+from app.sequence_generator.audio_cache import decoded_audio_cache
+
+# every offset the note tables can produce: one octave down up to a major seventh up
+BANK_SEMITONES = range(-12, 12)
+
+logger = logging.getLogger(__name__)
+
+# open memory maps, keyed by bank file identity
+_open_banks = LRUCache.counting(64)
+
+
+class TranspositionBank:
+    """
+    Precomputed semitone transpositions of a sample asset.
+
+    The bank is a float32 array of shape (len(BANK_SEMITONES), asset length) stored as a
+    .npy sidecar next to the asset and read back as a memory map, so pitched frames are
+    slices instead of phase-vocoder runs.
+
+    Attributes:
+        asset_path: The path to the sample asset.
+        bank_path: The path to the sidecar holding the bank.
+        sr: The sample rate of the bank.
+    """
+
+    def __init__(self, asset_path: str, sr: int = 44100):
+        """
+        The constructor for TranspositionBank class.
+
+        Parameters:
+            asset_path (str): The path to the sample asset.
+            sr (int, optional): The sample rate. Default is 44100.
+        """
+        self.asset_path = asset_path
+        self.sr = sr
+        self.bank_path = f"{os.path.splitext(asset_path)[0]}.bank.npy"
+
+    @staticmethod
+    def covers(n_steps) -> bool:
+        """
+        Checks if a half-step count is stored in the bank.
+
+        Parameters:
+            n_steps (int): The number of half-steps.
+
+        Returns:
+            bool: True if the bank holds this transposition.
+        """
+        return float(n_steps).is_integer() and int(n_steps) in BANK_SEMITONES
+
+    def is_fresh(self) -> bool:
+        """
+        Checks if the bank exists and is newer than its asset.
+
+        Returns:
+            bool: True if the bank can be used.
+        """
+        try:
+            return (
+                os.stat(self.bank_path).st_mtime_ns
+                >= os.stat(self.asset_path).st_mtime_ns
+            )
+        except OSError:
+            return False
+
+    def build(self) -> bool:
+        """
+        Computes every transposition of the asset and writes the bank atomically.
+
+        Returns:
+            bool: True once the bank is written.
+        """
+        audio = decoded_audio_cache.load(self.asset_path, sr=self.sr)
+        tmp_path = f"{self.bank_path}.{os.getpid()}.tmp"
+        try:
+            bank = np.lib.format.open_memmap(
+                tmp_path,
+                mode="w+",
+                dtype=np.float32,
+                shape=(len(BANK_SEMITONES), len(audio)),
+            )
+            for row, n_steps in enumerate(BANK_SEMITONES):
+                bank[row] = librosa.effects.pitch_shift(
+                    audio, sr=self.sr, n_steps=n_steps
+                )
+            bank.flush()
+            del bank
+            os.replace(tmp_path, self.bank_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        logger.info(f"Transposition bank written to {self.bank_path}")
+        return True
+
+    def load(self):
+        """
+        Returns the bank as a read-only memory map.
+
+        Returns:
+            np.memmap: The bank, one row per entry of BANK_SEMITONES.
+        """
+        key = file_stat_key(self.bank_path)
+        return _open_banks.get_or_compute(
+            key, lambda: np.load(self.bank_path, mmap_mode="r")
+        )
+
+    def frame(self, n_steps, offset: int, length: int):
+        """
+        Slices a transposed frame out of the bank.
+
+        Parameters:
+            n_steps (int): The number of half-steps, within BANK_SEMITONES.
+            offset (int): The frame offset in samples.
+            length (int): The frame length in samples.
+
+        Returns:
+            np.ndarray: The transposed frame, zero-padded past the end of the asset.
+        """
+        row = np.asarray(self.load()[BANK_SEMITONES.index(int(n_steps))])
+        transposed = row[offset : offset + length]
+        if len(transposed) < length:
+            transposed = np.concatenate(
+                (transposed, np.zeros(length - len(transposed), dtype=np.float32))
+            )
+        return transposed
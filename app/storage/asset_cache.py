@@ -0,0 +1,275 @@
+import contextlib
+import json
+import logging
+import os
+import re
+from typing import List, Optional
+
+from botocore.exceptions import ClientError
+
+from app.sequence_generator.analysis import ANALYSIS_SUFFIX, analysis_path, read_analysis
+from app.sequence_generator.audio_cache import decoded_audio_cache
+from app.sequence_generator.plan import sequence_plan_cache
+from app.utils.cache import (
+    CacheSettings,
+    LRUCache,
+    evict_directory,
+    file_lock,
+    file_stat_key,
+    touch_atime,
+)
+
+ASSET_DIRECTORY = os.path.join("assets", "sounds")
+ASSET_PATTERNS = ["*.mp3", "*.wav"]
+# the .npy sidecars named after an asset's stem: pre-transcoded copies
+# (decode.transcoded_path), tempo-conformed variants (tempo.conformed_path) and the
+# transposition banks of both (TranspositionBank.bank_path)
+DERIVED_SIDECAR = r"\.(?:\d+|bank|bpm[0-9.e+]+\.\d+(?:\.bank)?)\.npy"
+
+logger = logging.getLogger(__name__)
+
+
+class AssetCache:
+    """
+    Node-wide cache of the sample assets downloaded from the bucket.
+
+    Every asset has a metadata sidecar holding the ETag and size it was downloaded with,
+    so a cached copy is only reused while it matches the bucket. Downloads go to a
+    temporary file that is renamed into place, under a per-asset flock, so concurrent
+    workers download a sample once and never read a partial file. The directory is kept
+    under a byte cap by evicting the least recently used assets with their sidecars.
+
+    Workers hold a shared flock on an asset while they fetch or use it (see in_use()),
+    and an asset is only deleted under the exclusive lock, so no worker evicts a sample
+    another one is reading.
+
+    Attributes:
+        directory: The asset directory.
+        max_bytes: The disk cap in bytes.
+        validate: Check the cached copies against the bucket before reusing them.
+    """
+
+    def __init__(
+        self,
+        directory: str = ASSET_DIRECTORY,
+        max_bytes: Optional[int] = None,
+        validate: Optional[bool] = None,
+    ):
+        """
+        The constructor for AssetCache class.
+
+        Parameters:
+            directory (str, optional): The asset directory. Default is assets/sounds.
+            max_bytes (int, optional): The disk cap. Default is the ASSET_CACHE_BYTES setting.
+            validate (bool, optional): Default is the ASSET_CACHE_VALIDATE setting.
+        """
+        settings = CacheSettings()
+        self.directory = directory
+        self.max_bytes = (
+            settings.asset_cache_max_bytes if max_bytes is None else max_bytes
+        )
+        self.validate = settings.asset_cache_validate if validate is None else validate
+        # asset versions without an analysis sidecar in the bucket, so they are asked once
+        self._missing_analyses = LRUCache.counting(4096)
+
+    def lock_path(self, local_path: str) -> str:
+        return os.path.join(
+            self.directory, ".locks", f"{os.path.basename(local_path)}.lock"
+        )
+
+    def use_lock_path(self, local_path: str) -> str:
+        return os.path.join(
+            self.directory, ".locks", f"{os.path.basename(local_path)}.use.lock"
+        )
+
+    @contextlib.contextmanager
+    def in_use(self, local_path: str):
+        """
+        Marks an asset as in use for the duration of the block: it is not evicted, by
+        this worker or another one, until the block exits.
+
+        Parameters:
+            local_path (str): The cached asset.
+        """
+        with file_lock(self.use_lock_path(local_path), shared=True):
+            yield
+
+    @staticmethod
+    def meta_path(local_path: str) -> str:
+        return f"{local_path}.meta.json"
+
+    @staticmethod
+    def companions(local_path: str) -> List[str]:
+        """
+        Returns the sidecars derived from an asset: its metadata and analysis, and the
+        pre-transcoded copies, tempo-conformed variants and transposition banks named
+        after it, with their analyses. Sidecar names are matched exactly, so the
+        sidecars of "kick.v2.mp3" are not taken for those of "kick.mp3".
+        """
+        directory, name = os.path.split(local_path)
+        derived_name = re.compile(re.escape(os.path.splitext(name)[0]) + DERIVED_SIDECAR)
+        try:
+            names = os.listdir(directory or ".")
+        except OSError:
+            names = []
+        derived = [
+            os.path.join(directory, n) for n in sorted(names) if derived_name.fullmatch(n)
+        ]
+        return (
+            [AssetCache.meta_path(local_path), analysis_path(local_path)]
+            + derived
+            + [analysis_path(path) for path in derived]
+        )
+
+    def fetch(self, bucket, cloud_path: str, local_path: str) -> bool:
+        """
+        Makes sure local_path holds the current version of cloud_path. The asset may be
+        evicted once this returns; callers reading it should fetch it within in_use().
+
+        Parameters:
+            bucket: The boto3 Bucket resource to download from.
+            cloud_path (str): The object key.
+            local_path (str): The cached file.
+
+        Returns:
+            bool: True if the asset was downloaded, False if the cached copy was reused.
+        """
+        with self.in_use(local_path), file_lock(self.lock_path(local_path)):
+            remote = self._remote_meta(bucket, cloud_path) if self.validate else None
+            if self._is_fresh(local_path, remote):
+                touch_atime(local_path)
+                return False
+
+            os.makedirs(os.path.dirname(local_path) or ".", exist_ok=True)
+            tmp_path = f"{local_path}.{os.getpid()}.tmp"
+            try:
+                bucket.download_file(cloud_path, tmp_path)
+                os.replace(tmp_path, local_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+            meta = remote or {"etag": None}
+            meta["size"] = os.path.getsize(local_path)
+            with open(self.meta_path(local_path), "w") as f:
+                json.dump(meta, f)
+            self._forget([local_path])
+
+        self.evict(keep=[local_path])
+        return True
+
+    def fetch_analysis(self, bucket, cloud_path: str, local_path: str) -> bool:
+        """
+        Makes sure a cached asset has the analysis sidecar computed at ingest, downloading
+        it from next to the asset in the bucket when the local copy is missing or stale.
+
+        Parameters:
+            bucket: The boto3 Bucket resource to download from.
+            cloud_path (str): The object key of the asset.
+            local_path (str): The cached asset.
+
+        Returns:
+            bool: True if the asset has a valid sidecar.
+        """
+        if read_analysis(local_path) is not None:
+            return True
+        try:
+            asset_key = file_stat_key(local_path)
+        except OSError:
+            return False
+        if asset_key in self._missing_analyses:
+            return False
+
+        sidecar_path = analysis_path(local_path)
+        tmp_path = f"{sidecar_path}.{os.getpid()}.tmp"
+        try:
+            bucket.download_file(f"{cloud_path}{ANALYSIS_SUFFIX}", tmp_path)
+            os.replace(tmp_path, sidecar_path)
+        except ClientError:
+            self._missing_analyses.put(asset_key, True)
+            return False
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        if read_analysis(local_path) is None:
+            # computed from another version of the asset
+            self._missing_analyses.put(asset_key, True)
+            return False
+        return True
+
+    def evict(self, max_bytes: Optional[int] = None, keep: List[str] = ()) -> List[str]:
+        """
+        Evicts the least recently used assets until the directory fits in max_bytes.
+        Assets in keep, and assets a worker is fetching or using, are left alone; an
+        asset is deleted under its exclusive lock, so no worker can start using it
+        meanwhile.
+
+        Parameters:
+            max_bytes (int, optional): The cap to trim to. Default is the cache's cap.
+            keep (List[str], optional): Assets that must not be evicted.
+
+        Returns:
+            List[str]: The evicted assets.
+        """
+        keep = {os.path.realpath(path) for path in keep}
+        related = {}
+
+        def companions(path):
+            related[path] = self.companions(path)
+            return related[path]
+
+        def can_evict(path):
+            return os.path.realpath(path) not in keep
+
+        def lock(path):
+            return file_lock(self.use_lock_path(path), blocking=False)
+
+        with file_lock(
+            os.path.join(self.directory, ".locks", "evict.lock"), blocking=False
+        ) as locked:
+            if not locked:
+                return []
+            evicted = evict_directory(
+                self.directory,
+                self.max_bytes if max_bytes is None else max_bytes,
+                ASSET_PATTERNS,
+                companions=companions,
+                can_evict=can_evict,
+                lock=lock,
+            )
+        for path in evicted:
+            self._forget([path] + related[path])
+        if evicted:
+            logger.info(f"Evicted {len(evicted)} assets from {self.directory}")
+        return evicted
+
+    @staticmethod
+    def _forget(paths: List[str]) -> None:
+        # drops this worker's decodes and plans of replaced or evicted files; the other
+        # workers' entries are keyed by file version, so they only age out of their LRUs
+        for path in paths:
+            decoded_audio_cache.invalidate(path)
+            sequence_plan_cache.invalidate(path)
+
+    def _is_fresh(self, local_path: str, remote: Optional[dict]) -> bool:
+        try:
+            with open(self.meta_path(local_path)) as f:
+                meta = json.load(f)
+            size = os.path.getsize(local_path)
+        except (OSError, ValueError):
+            return False
+        if meta.get("size") != size:
+            return False
+        return remote is None or (
+            remote["etag"] == meta.get("etag") and remote["size"] == size
+        )
+
+    @staticmethod
+    def _remote_meta(bucket, cloud_path: str) -> dict:
+        obj = bucket.Object(cloud_path)
+        obj.load()
+        return {"etag": obj.e_tag, "size": obj.content_length}
+
+
+asset_cache = AssetCache()
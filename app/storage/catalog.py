@@ -0,0 +1,490 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from pydantic import BaseSettings, Field
+
+from app.storage.asset_cache import ASSET_DIRECTORY
+from app.storage.storage import SAMPLES_BUCKET, SnapshotManager
+from app.utils.cache import LRUCache
+from app.utils.utils import parse_sample_bpm, parse_sample_key
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogSettings(BaseSettings):
+    """
+    A Pydantic model for the sample catalog settings.
+
+    Attributes:
+    -----------
+    catalog_refresh_seconds : int
+        Age after which the catalog is reloaded from the bucket snapshot.
+    catalog_max_page_size : int
+        Largest page served by the catalog query API.
+    """
+
+    catalog_refresh_seconds: int = Field(900, env="CATALOG_REFRESH_SECONDS")
+    catalog_max_page_size: int = Field(500, env="CATALOG_MAX_PAGE_SIZE")
+
+
+class AliasTable:
+    """
+    Walker's alias method: draws from a discrete distribution in O(1) per draw, after
+    an O(n) build.
+
+    Attributes:
+        probability: The probability of keeping each column's own outcome.
+        alias: The outcome each column falls back to.
+    """
+
+    def __init__(self, weights):
+        weights = np.asarray(weights, dtype=np.float64)
+        if weights.ndim != 1 or len(weights) == 0:
+            raise ValueError("weights must be a non-empty 1-D sequence")
+        if np.any(weights < 0) or not np.isfinite(weights).all():
+            raise ValueError("weights must be finite and non-negative")
+        total = weights.sum()
+        if total <= 0:
+            raise ValueError("weights must not all be zero")
+
+        n = len(weights)
+        scaled = weights * n / total
+        self.probability = np.ones(n)
+        self.alias = np.arange(n)
+        small = [i for i in range(n) if scaled[i] < 1]
+        large = [i for i in range(n) if scaled[i] >= 1]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.probability[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] -= 1 - scaled[less]
+            (small if scaled[more] < 1 else large).append(more)
+        # what is left is 1 up to rounding errors
+
+    def __len__(self):
+        return len(self.probability)
+
+    def draw(self, rng: np.random.Generator, size: int) -> np.ndarray:
+        """
+        Draws outcomes with replacement.
+
+        Parameters:
+            rng (np.random.Generator): The random generator.
+            size (int): The number of draws.
+
+        Returns:
+            np.ndarray: The drawn outcome indexes.
+        """
+        columns = rng.integers(len(self), size=size)
+        keep = rng.random(size) < self.probability[columns]
+        return np.where(keep, columns, self.alias[columns])
+
+
+class _CatalogIndex:
+    """
+    Immutable columnar view of the catalog, sorted by path.
+
+    Rows matching a filter are looked up once and kept, so repeated queries and draws
+    index arrays instead of scanning the catalog.
+    """
+
+    def __init__(self, rows: Dict[str, str]):
+        self.paths = np.array(sorted(rows), dtype=object)
+        self.buckets = np.array([rows[path] for path in self.paths], dtype=object)
+        split = [path.split("/", 1) for path in self.paths]
+        self.labels = np.array([label for label, __ in split], dtype=object)
+        self.files = np.array([file for __, file in split], dtype=object)
+        self.bpms = np.array(
+            [parse_sample_bpm(path) or np.nan for path in self.paths], dtype=np.float64
+        )
+        self.keys = np.array(
+            [parse_sample_key(path) for path in self.paths], dtype=object
+        )
+
+        label_names, label_codes = np.unique(self.labels.astype(str), return_inverse=True)
+        self.groups = {
+            label: np.flatnonzero(label_codes == code)
+            for code, label in enumerate(label_names)
+        }
+        self.etag = hashlib.sha1(
+            "\n".join(
+                f"{bucket}/{path}" for bucket, path in zip(self.buckets, self.paths)
+            ).encode()
+        ).hexdigest()
+        self._selections = LRUCache.counting(256)
+
+    def __len__(self):
+        return len(self.paths)
+
+    def select(
+        self,
+        label: Optional[str] = None,
+        key: Optional[str] = None,
+        bpm_min: Optional[float] = None,
+        bpm_max: Optional[float] = None,
+    ) -> np.ndarray:
+        """
+        Returns the sorted indexes of the rows matching every given filter.
+        """
+
+        def compute():
+            if label is None:
+                rows = np.arange(len(self))
+            else:
+                rows = self.groups.get(label, np.array([], dtype=np.int64))
+            mask = np.ones(len(rows), dtype=bool)
+            if key is not None:
+                mask &= self.keys[rows] == key
+            if bpm_min is not None:
+                mask &= self.bpms[rows] >= bpm_min
+            if bpm_max is not None:
+                mask &= self.bpms[rows] <= bpm_max
+            return rows if mask.all() else rows[mask]
+
+        return self._selections.get_or_compute(
+            ("select", label, key, bpm_min, bpm_max), compute
+        )
+
+    def label_alias(self, weights: Tuple[Tuple[str, float], ...], **filters):
+        """
+        Returns the labels that have matching rows and an alias table over their weights.
+        """
+
+        def compute():
+            labels = [
+                (label, weight)
+                for label, weight in weights
+                if weight > 0 and len(self.select(label, **filters))
+            ]
+            if not labels:
+                return [], None
+            return [label for label, __ in labels], AliasTable([w for __, w in labels])
+
+        return self._selections.get_or_compute(
+            ("alias", weights, tuple(sorted(filters.items()))), compute
+        )
+
+    def row(self, index: int) -> dict:
+        bpm = self.bpms[index]
+        return {
+            "bucket": self.buckets[index],
+            "path": self.paths[index],
+            "label": self.labels[index],
+            "file": self.files[index],
+            "bpm": None if np.isnan(bpm) else float(bpm),
+            "key": self.keys[index],
+        }
+
+
+class SampleCatalog:
+    """
+    In-memory index of the samples of the bucket, by label, bpm and key.
+
+    The catalog is loaded from the bucket snapshot built by SnapshotManager and kept
+    updated with upload and delete notifications. The notified changes are applied over
+    every reload, since the stored snapshot may predate them, until a snapshot built
+    after them is loaded or for one refresh window. Only the samples of the bucket the
+    job assets are fetched from are catalogued. Reads go through an immutable columnar index that is rebuilt
+    after changes, so queries and random draws never list the bucket.
+
+    Attributes:
+        loaded_at: The time.monotonic() of the last load from the snapshot, or None.
+    """
+
+    def __init__(self, rows: Iterable[Tuple[str, str]] = ()):
+        """
+        The constructor for SampleCatalog class.
+
+        Parameters:
+            rows (Iterable[Tuple[str, str]], optional): The (bucket, path) of each sample.
+        """
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._reloader = None
+        self._rows = {}
+        # path -> (bucket, or None once deleted; time.monotonic() of the notification)
+        self._changes = {}
+        self._index = None
+        self.loaded_at = None
+        self.replace(rows)
+
+    @classmethod
+    def is_sample(cls, bucket: str, path: str) -> bool:
+        """
+        Tells whether an object is a catalogued sample: a sample path of the bucket the
+        job assets are fetched from, as the manifests the catalog assigns carry no bucket.
+        """
+        return bucket == SAMPLES_BUCKET and cls.is_sample_path(path)
+
+    @staticmethod
+    def is_sample_path(path: str) -> bool:
+        """
+        Tells whether an object key is a catalogued sample: an mp3 directly under a
+        label that is not user content, as in the snapshot.
+        """
+        parts = path.split("/")
+        return (
+            len(parts) == 2
+            and path.endswith(".mp3")
+            and parts[0] not in SnapshotManager.FILTER_OUT_LABELS
+        )
+
+    def replace(
+        self, rows: Iterable[Tuple[str, str]], built_at: Optional[float] = None
+    ) -> None:
+        """
+        Replaces the catalogued samples, then applies the notified uploads and deletes
+        over them.
+
+        Parameters:
+            rows (Iterable[Tuple[str, str]]): The (bucket, path) of each sample.
+            built_at (float, optional): The time.monotonic() at which the rows were
+                listed from the bucket; the changes notified before it are part of them
+                and are dropped. Default keeps every change.
+        """
+        rows = {path: bucket for bucket, path in rows if self.is_sample(bucket, path)}
+        with self._lock:
+            if built_at is not None:
+                self._changes = {
+                    path: change
+                    for path, change in self._changes.items()
+                    if change[1] >= built_at
+                }
+            for path, (bucket, __) in self._changes.items():
+                if bucket is None:
+                    rows.pop(path, None)
+                else:
+                    rows[path] = bucket
+            self._rows = rows
+            self._index = None
+
+    def add(self, bucket: str, path: str) -> bool:
+        """
+        Adds an uploaded sample.
+
+        Returns:
+            bool: True if the path is a sample that was not catalogued yet.
+        """
+        if not self.is_sample(bucket, path):
+            return False
+        with self._lock:
+            self._changes[path] = (bucket, time.monotonic())
+            if self._rows.get(path) == bucket:
+                return False
+            self._rows[path] = bucket
+            self._index = None
+        return True
+
+    def remove(self, path: str, bucket: str = SAMPLES_BUCKET) -> bool:
+        """
+        Removes a deleted sample.
+
+        Parameters:
+            path (str): The key of the deleted object.
+            bucket (str, optional): Its bucket. Default is the samples bucket.
+
+        Returns:
+            bool: True if the path was catalogued.
+        """
+        if not self.is_sample(bucket, path):
+            return False
+        with self._lock:
+            self._changes[path] = (None, time.monotonic())
+            if self._rows.pop(path, None) is None:
+                return False
+            self._index = None
+        return True
+
+    def index(self) -> _CatalogIndex:
+        with self._lock:
+            if self._index is None:
+                self._index = _CatalogIndex(self._rows)
+            return self._index
+
+    def __len__(self):
+        return len(self._rows)
+
+    @property
+    def etag(self) -> str:
+        """Content hash of the catalog, the ETag of the query API's responses."""
+        return self.index().etag
+
+    def labels(self) -> Dict[str, int]:
+        """Returns the number of samples of each label."""
+        return {label: len(rows) for label, rows in self.index().groups.items()}
+
+    def query(
+        self, page: int = 1, page_size: int = 100, **filters
+    ) -> Tuple[List[dict], int]:
+        """
+        Returns a page of the samples matching the filters, ordered by path.
+
+        Parameters:
+            page (int, optional): The 1-based page number. Default is 1.
+            page_size (int, optional): The number of samples per page. Default is 100.
+            **filters: label, key, bpm_min and bpm_max, see _CatalogIndex.select().
+
+        Returns:
+            Tuple[List[dict], int]: The samples of the page and the number of matches.
+        """
+        index = self.index()
+        rows = index.select(**filters)
+        start = (page - 1) * page_size
+        return [index.row(i) for i in rows[start : start + page_size]], len(rows)
+
+    def draw(
+        self,
+        n: int = 1,
+        weights: Optional[Dict[str, float]] = None,
+        rng: Optional[np.random.Generator] = None,
+        **filters,
+    ) -> List[dict]:
+        """
+        Draws random samples with replacement, in O(1) per draw.
+
+        Parameters:
+            n (int, optional): The number of samples. Default is 1.
+            weights (Dict[str, float], optional): Relative weights of the labels to draw
+                from; a label is picked by weight, then a sample uniformly within it.
+                Default draws uniformly over all matching samples.
+            rng (np.random.Generator, optional): Default is a fresh generator.
+            **filters: label, key, bpm_min and bpm_max, see _CatalogIndex.select().
+
+        Returns:
+            List[dict]: The drawn samples; empty when nothing matches.
+        """
+        rng = rng or np.random.default_rng()
+        index = self.index()
+        if not weights:
+            rows = index.select(**filters)
+            if not len(rows):
+                return []
+            return [index.row(i) for i in rows[rng.integers(len(rows), size=n)]]
+
+        filters.pop("label", None)
+        labels, alias = index.label_alias(tuple(sorted(weights.items())), **filters)
+        if alias is None:
+            return []
+        drawn = []
+        for label_index in alias.draw(rng, n):
+            rows = index.select(labels[label_index], **filters)
+            drawn.append(index.row(rows[rng.integers(len(rows))]))
+        return drawn
+
+    def load_snapshot(self, snapshot_manager: Optional[SnapshotManager] = None) -> int:
+        """
+        Replaces the catalog with the processed bucket snapshot. The notified changes
+        older than one refresh window are dropped: the stored snapshot is rebuilt more
+        often than that, so it holds them.
+
+        Parameters:
+            snapshot_manager (SnapshotManager, optional): Reads the snapshot. Default
+                reads it from the snapshots bucket.
+
+        Returns:
+            int: The number of catalogued samples.
+        """
+        snapshot_manager = snapshot_manager or SnapshotManager(
+            SnapshotManager.SNAPSHOTS_DUMP_BUCKET
+        )
+        files_df = snapshot_manager.load_snapshot_files_from_s3()
+        return self.load_dataframe(
+            files_df, time.monotonic() - CatalogSettings().catalog_refresh_seconds
+        )
+
+    def load_dataframe(self, files_df, built_at: Optional[float] = None) -> int:
+        """
+        Replaces the catalog with a processed snapshot, see
+        SnapshotManager.process_snapshot_data().
+
+        Parameters:
+            files_df (pd.DataFrame): The snapshot, with "bucket" and "paths" columns.
+            built_at (float, optional): The time.monotonic() at which the snapshot was
+                listed from the bucket, see replace().
+
+        Returns:
+            int: The number of catalogued samples.
+        """
+        self.replace(zip(files_df["bucket"], files_df["paths"]), built_at)
+        self.loaded_at = time.monotonic()
+        logger.info(f"Sample catalog loaded: {len(self)} samples")
+        return len(self)
+
+    def ensure_fresh(self) -> None:
+        """
+        Loads the snapshot when the catalog was never loaded, and reloads it in the
+        background when it is older than the CATALOG_REFRESH_SECONDS setting; requests
+        keep reading the current catalog meanwhile. Only one load runs at a time. A
+        failed reload keeps the current catalog.
+        """
+        if self.loaded_at is None:
+            with self._reload_lock:
+                if self.loaded_at is None:
+                    try:
+                        self.load_snapshot()
+                    except Exception as e:
+                        logger.error(f"Error loading the sample catalog: {e}")
+                        raise
+            return
+
+        refresh_seconds = CatalogSettings().catalog_refresh_seconds
+        if time.monotonic() - self.loaded_at < refresh_seconds:
+            return
+        if not self._reload_lock.acquire(blocking=False):
+            # another request is reloading it
+            return
+        try:
+            self._reloader = threading.Thread(target=self._reload, daemon=True)
+            self._reloader.start()
+        except Exception:
+            self._reload_lock.release()
+            raise
+
+    def _reload(self) -> None:
+        try:
+            self.load_snapshot()
+        except Exception as e:
+            logger.error(f"Error reloading the sample catalog: {e}")
+            # retry at the next refresh rather than on every request
+            self.loaded_at = time.monotonic()
+        finally:
+            self._reload_lock.release()
+
+    def assign(
+        self, labels: List[str], rng: Optional[np.random.Generator] = None
+    ) -> Dict[str, List[str]]:
+        """
+        Picks one random sample of each label, for the channels of a job.
+
+        Parameters:
+            labels (List[str]): The label of each channel.
+            rng (np.random.Generator, optional): Default is a fresh generator.
+
+        Returns:
+            Dict[str, List[str]]: The "local_paths" and "cloud_paths" of the job manifest,
+                fetched from the samples bucket like every job asset.
+
+        Raises:
+            ValueError: If a label has no samples.
+        """
+        rng = rng or np.random.default_rng()
+        samples = []
+        for label in labels:
+            drawn = self.draw(1, rng=rng, label=label)
+            if not drawn:
+                raise ValueError(f"No samples labelled {label}")
+            samples.append(drawn[0]["path"])
+        return {
+            "local_paths": [
+                os.path.join(ASSET_DIRECTORY, os.path.basename(path)) for path in samples
+            ],
+            "cloud_paths": samples,
+        }
+
+
+sample_catalog = SampleCatalog()
@@ -0,0 +1,159 @@
+"""
+Ingest-time analysis of the sample assets.
+
+Every asset uploaded to the bucket gets an analysis sidecar, stored next to it under
+"<key>.analysis.json", that renders download with the asset instead of scanning its
+audio. Sidecars are computed from bucket upload events (see /asset_events) or in batch:
+
+    python -m app.storage.ingest --bucket sample-dump --prefix loop__drums_full/
+"""
+
+import argparse
+import logging
+import os
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import unquote_plus
+
+from app.sequence_generator.analysis import (
+    ANALYSIS_SUFFIX,
+    analysis_path,
+    analyze_audio,
+    write_analysis,
+)
+from app.sequence_generator.audio_cache import decoded_audio_cache
+from app.storage.asset_cache import ASSET_DIRECTORY, asset_cache
+from app.storage.storage import StorageBase
+from app.utils.utils import parse_sample_bpm, parse_sample_key
+
+AUDIO_EXTENSIONS = (".mp3", ".wav")
+
+logger = logging.getLogger(__name__)
+
+
+def is_audio_key(key: str) -> bool:
+    return key.lower().endswith(AUDIO_EXTENSIONS)
+
+
+def object_created_keys(event: dict) -> List[Tuple[str, str]]:
+    """
+    Extracts the uploaded audio objects from an S3 event notification.
+
+    Parameters:
+        event (dict): The notification, with one entry per object under "Records".
+
+    Returns:
+        List[Tuple[str, str]]: The (bucket name, object key) of each created audio object.
+    """
+    return _event_keys(event, "ObjectCreated")
+
+
+def object_removed_keys(event: dict) -> List[Tuple[str, str]]:
+    """
+    Extracts the deleted audio objects from an S3 event notification.
+
+    Parameters:
+        event (dict): The notification, with one entry per object under "Records".
+
+    Returns:
+        List[Tuple[str, str]]: The (bucket name, object key) of each deleted audio object.
+    """
+    return _event_keys(event, "ObjectRemoved")
+
+
+def _event_keys(event: dict, event_type: str) -> List[Tuple[str, str]]:
+    keys = []
+    for record in event.get("Records", []):
+        if not record.get("eventName", "").startswith(event_type):
+            continue
+        s3 = record.get("s3", {})
+        # keys are URL-encoded in notifications
+        key = unquote_plus(s3.get("object", {}).get("key", ""))
+        bucket_name = s3.get("bucket", {}).get("name")
+        if bucket_name and is_audio_key(key):
+            keys.append((bucket_name, key))
+    return keys
+
+
+def ingest_object(bucket, cloud_path: str, directory: str = ASSET_DIRECTORY) -> dict:
+    """
+    Analyzes an asset and uploads its sidecar next to it in the bucket.
+
+    The asset is fetched through the local asset cache, so the node that ingests it can
+    render it straight away.
+
+    Parameters:
+        bucket: The boto3 Bucket resource holding the asset.
+        cloud_path (str): The object key of the asset.
+        directory (str, optional): The local asset directory. Default is assets/sounds.
+
+    Returns:
+        dict: The analysis.
+    """
+    local_path = os.path.join(directory, os.path.basename(cloud_path))
+    with asset_cache.in_use(local_path):
+        asset_cache.fetch(bucket, cloud_path, local_path)
+        analysis = analyze_audio(
+            decoded_audio_cache.load(local_path, sr=44100),
+            sr=44100,
+            size=os.path.getsize(local_path),
+            bpm=parse_sample_bpm(cloud_path),
+            key=parse_sample_key(cloud_path),
+        )
+        write_analysis(local_path, analysis)
+    bucket.upload_file(analysis_path(local_path), f"{cloud_path}{ANALYSIS_SUFFIX}")
+    logger.info(f"Ingested {cloud_path}: {len(analysis['onsets'])} onsets")
+    return analysis
+
+
+def ingest_bucket(
+    bucket, prefix: str = "", force: bool = False, directory: str = ASSET_DIRECTORY
+) -> Dict[str, Optional[str]]:
+    """
+    Ingests every audio object of a bucket prefix.
+
+    Parameters:
+        bucket: The boto3 Bucket resource.
+        prefix (str, optional): Only ingest keys starting with it. Default is every key.
+        force (bool, optional): Also re-analyze assets that have a sidecar. Default is False.
+        directory (str, optional): The local asset directory. Default is assets/sounds.
+
+    Returns:
+        Dict[str, Optional[str]]: The error of each ingested key, None on success.
+    """
+    keys = {obj.key for obj in bucket.objects.filter(Prefix=prefix)}
+    results = {}
+    for key in sorted(keys):
+        if not is_audio_key(key):
+            continue
+        if not force and f"{key}{ANALYSIS_SUFFIX}" in keys:
+            continue
+        try:
+            ingest_object(bucket, key, directory)
+            results[key] = None
+        except Exception as e:
+            logger.error(f"Error ingesting {key}: {e}")
+            results[key] = str(e)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Computes asset analysis sidecars.")
+    parser.add_argument("--bucket", default="sample-dump")
+    parser.add_argument("--prefix", default="")
+    parser.add_argument(
+        "--force", action="store_true", help="re-analyze assets that have a sidecar"
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    bucket = StorageBase().resource.Bucket(args.bucket)
+    results = ingest_bucket(bucket, args.prefix, force=args.force)
+    failed = {key: error for key, error in results.items() if error}
+    print(f"ingested {len(results) - len(failed)} assets, {len(failed)} failed")
+    for key, error in failed.items():
+        print(f"  {key}: {error}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -15,6 +15,10 @@ from botocore.exceptions import BotoCoreError, ClientError
 from pydantic import Field, BaseSettings, validator
 
 from app.utils.utils import JobTypeValidator
+from app.storage.asset_cache import asset_cache
+
+# the bucket the job assets are fetched from
+SAMPLES_BUCKET = "sample-dump"
 
 
 class StorageBase:
@@ -150,6 +154,12 @@ class StorageEngine(StorageBase):
                 "local_path": job_paths["local_path_mixdown_pkl"],
             }
             return d_paths
+        elif _check.job_type == "mixdown_job_path_ragged":
+            d_paths = {
+                "cloud_path": job_paths["cloud_path_mixdown_ragged"],
+                "local_path": job_paths["local_path_mixdown_ragged"],
+            }
+            return d_paths
         else:
             asset_paths = self.job_config.get_job_params()
             d_paths = {
@@ -169,6 +179,21 @@ class StorageEngine(StorageBase):
             self.logger.error(f"Error getting object from S3: {e}")
             raise e
 
+    def get_cached_object(self, bucket_name=SAMPLES_BUCKET):
+        """
+        Download file from S3 to local, unless the local asset cache holds it already,
+        along with its analysis sidecar when one was computed at ingest.
+        """
+        try:
+            bucket = self.client.Bucket(bucket_name)
+            _type = self.__resolve_type()
+            asset_cache.fetch(bucket, _type["cloud_path"], _type["local_path"])
+            asset_cache.fetch_analysis(bucket, _type["cloud_path"], _type["local_path"])
+            return True
+        except (BotoCoreError, ClientError) as e:
+            self.logger.error(f"Error getting cached object from S3: {e}")
+            raise e
+
     def delete_local_object(self):
         """Delete local file."""
         try:
@@ -512,6 +537,16 @@ class SnapshotManager(StorageBase):
             Body=csv_buffer.getvalue()
         )
 
+    def load_snapshot_files_from_s3(self):
+        """
+        Loads the processed snapshot CSV, one row per sample with its bucket, path, label and file.
+        """
+        csv_obj = self.resource.Object(
+            self.SNAPSHOTS_DUMP_BUCKET, self.SNAPSHOT_FILES_CSV
+        ).get()["Body"]
+        self.snapshot_files_df = pd.read_csv(io.StringIO(csv_obj.read().decode("utf-8")))
+        return self.snapshot_files_df
+
     def generate_presigned_urls(self):
         """
         Generate pre-signed URLs for database snapshot and snapshot files.
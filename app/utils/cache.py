@@ -0,0 +1,320 @@
+import contextlib
+import fcntl
+import glob
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, ContextManager, Hashable, Iterable, List, Optional
+
+import numpy as np
+from pydantic import BaseSettings, Field
+
+
+class CacheSettings(BaseSettings):
+    """
+    A Pydantic model for the in-process cache settings.
+
+    Attributes:
+    -----------
+    decoded_audio_max_bytes : int
+        Memory cap of the decoded audio cache, per worker process.
+    job_params_max_entries : int
+        Number of parsed job manifests kept per worker process.
+    pitch_shift_max_bytes : int
+        Memory cap of the pitch-shifted frame cache, per worker process.
+    sequence_plan_max_entries : int
+        Number of compiled sequence plans kept per worker process.
+    asset_cache_max_bytes : int
+        Disk cap of the downloaded sample assets, shared by every worker of the node.
+    asset_cache_validate : bool
+        Checks the ETag and size of a cached asset against the bucket before reusing it.
+    """
+
+    decoded_audio_max_bytes: int = Field(
+        256 * 1024 * 1024, env="DECODED_AUDIO_CACHE_BYTES"
+    )
+    job_params_max_entries: int = Field(1024, env="JOB_PARAMS_CACHE_ENTRIES")
+    pitch_shift_max_bytes: int = Field(128 * 1024 * 1024, env="PITCH_SHIFT_CACHE_BYTES")
+    sequence_plan_max_entries: int = Field(1024, env="SEQUENCE_PLAN_CACHE_ENTRIES")
+    asset_cache_max_bytes: int = Field(2 * 1024 * 1024 * 1024, env="ASSET_CACHE_BYTES")
+    asset_cache_validate: bool = Field(True, env="ASSET_CACHE_VALIDATE")
+
+
+def file_stat_key(path: str) -> tuple:
+    """
+    Builds the identity of a file on disk.
+
+    Parameters:
+        path (str): The path to the file.
+
+    Returns:
+        tuple: The resolved path, modification time in nanoseconds and size in bytes.
+    """
+    stat = os.stat(path)
+    return os.path.realpath(path), stat.st_mtime_ns, stat.st_size
+
+
+def nbytes_of(value: Any) -> int:
+    """
+    Estimates the memory footprint of a cached value.
+
+    Parameters:
+        value (Any): The cached value. NumPy arrays report their buffer size,
+            tuples and lists are summed, anything else falls back to sys.getsizeof.
+
+    Returns:
+        int: The approximate size in bytes.
+    """
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sum(nbytes_of(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class LRUCache:
+    """
+    A thread-safe, size-capped LRU cache.
+
+    Attributes:
+        max_bytes: The memory cap. Least recently used entries are evicted once it is exceeded.
+        sizeof: Callable returning the size of a value in bytes.
+        hits: The number of lookups served from the cache.
+        misses: The number of lookups that had to compute the value.
+    """
+
+    def __init__(self, max_bytes: int, sizeof: Callable[[Any], int] = nbytes_of):
+        """
+        The constructor for LRUCache class.
+
+        Parameters:
+            max_bytes (int): The memory cap in bytes.
+            sizeof (Callable, optional): Function measuring a value. Default is nbytes_of.
+        """
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._current_bytes = 0
+        self._lock = threading.RLock()
+
+    @classmethod
+    def counting(cls, max_entries: int) -> "LRUCache":
+        """
+        Returns an LRU cache capped by its number of entries rather than their size.
+
+        Parameters:
+            max_entries (int): The maximum number of entries.
+
+        Returns:
+            LRUCache: A cache whose entries each count as one.
+        """
+        return cls(max_entries, sizeof=lambda value: 1)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable):
+        return key in self._entries
+
+    @property
+    def current_bytes(self) -> int:
+        return self._current_bytes
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        """
+        Returns the cached value for key and marks it as most recently used.
+
+        Parameters:
+            key (Hashable): The cache key.
+            default (Any, optional): Returned when the key is not cached.
+
+        Returns:
+            Any: The cached value or default.
+        """
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key][0]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """
+        Stores a value and evicts least recently used entries above the cap.
+        Values larger than the whole cap are not stored.
+
+        Parameters:
+            key (Hashable): The cache key.
+            value (Any): The value to cache.
+        """
+        size = self.sizeof(value)
+        with self._lock:
+            self._discard(key)
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size)
+            self._current_bytes += size
+            while self._current_bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._discard(oldest)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """
+        Returns the cached value for key, computing and storing it on a miss.
+
+        Parameters:
+            key (Hashable): The cache key.
+            compute (Callable): Zero-argument function producing the value.
+
+        Returns:
+            Any: The cached or freshly computed value.
+        """
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def invalidate(self, predicate: Callable[[Hashable], bool]) -> int:
+        """
+        Removes every entry whose key matches the predicate.
+
+        Parameters:
+            predicate (Callable): Function returning True for keys to drop.
+
+        Returns:
+            int: The number of removed entries.
+        """
+        with self._lock:
+            stale = [key for key in self._entries if predicate(key)]
+            for key in stale:
+                self._discard(key)
+            return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._current_bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        """
+        Returns the cache counters.
+
+        Returns:
+            dict: Entries, bytes, hits and misses.
+        """
+        return {
+            "entries": len(self._entries),
+            "bytes": self._current_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def _discard(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._current_bytes -= entry[1]
+
+
+@contextlib.contextmanager
+def file_lock(path: str, shared: bool = False, blocking: bool = True):
+    """
+    Holds an advisory flock on path, which is created if needed. The lock is shared by
+    every process of the node, so it also serializes uvicorn workers.
+
+    Parameters:
+        path (str): The lock file.
+        shared (bool, optional): Take a shared instead of an exclusive lock. Default is False.
+        blocking (bool, optional): Wait for the lock. Default is True.
+
+    Yields:
+        bool: True if the lock is held, False if it was busy and blocking is False.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a") as lock_file:
+        flags = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+        try:
+            fcntl.flock(lock_file, flags if blocking else flags | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def touch_atime(path: str) -> None:
+    """
+    Marks a file as used for LRU eviction, leaving its mtime alone so that freshness
+    checks against it keep working.
+
+    Parameters:
+        path (str): The file.
+    """
+    os.utime(path, ns=(time.time_ns(), os.stat(path).st_mtime_ns))
+
+
+def evict_directory(
+    directory: str,
+    max_bytes: int,
+    patterns: Iterable[str],
+    companions: Callable[[str], List[str]] = lambda path: [],
+    can_evict: Callable[[str], bool] = lambda path: True,
+    lock: Optional[Callable[[str], ContextManager[bool]]] = None,
+) -> List[str]:
+    """
+    Deletes the least recently used files of a directory until it fits in max_bytes.
+
+    Files are ordered by access time. Companion files, such as derived sidecars, count
+    towards their file's size and are deleted with it.
+
+    Parameters:
+        directory (str): The directory to trim.
+        max_bytes (int): The disk cap in bytes.
+        patterns (Iterable[str]): Glob patterns of the evictable files, e.g. ["*.mp3"].
+        companions (Callable, optional): Returns the companion files of a file.
+        can_evict (Callable, optional): Returns False for files that must be kept.
+        lock (Callable, optional): Returns a context manager held while a file and its
+            companions are deleted, yielding False to keep the file, for example
+            because another worker is using it. Default deletes without a lock.
+
+    Returns:
+        List[str]: The evicted files, without their companions.
+    """
+    entries = []
+    for path in {
+        p for pattern in patterns for p in glob.glob(os.path.join(directory, pattern))
+    }:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        related = [p for p in companions(path) if os.path.exists(p)]
+        size = stat.st_size + sum(os.path.getsize(p) for p in related)
+        entries.append((stat.st_atime_ns, path, size, related))
+
+    total = sum(entry[2] for entry in entries)
+    evicted = []
+    for __, path, size, related in sorted(entries):
+        if total <= max_bytes:
+            break
+        if not can_evict(path):
+            continue
+        with lock(path) if lock else contextlib.nullcontext(True) as locked:
+            if not locked:
+                continue
+            for p in [path] + related:
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(p)
+        total -= size
+        evicted.append(path)
+    return evicted
@@ -0,0 +1,118 @@
+from typing import Optional
+
+from pydantic import BaseSettings, Field
+
+MASTER = "master"
+PREVIEW = "preview"
+QUALITIES = (MASTER, PREVIEW)
+
+MASTER_SAMPLE_RATE = 44100
+
+
+class QualitySettings(BaseSettings):
+    """
+    A Pydantic model for the preview render settings.
+
+    Attributes:
+    -----------
+    preview_sample_rate : int
+        Sample rate of the whole preview pipeline: decode, slicing, pitch shift, FX and mix.
+    preview_pitch_backend : str
+        Pitch-shift backend of the previews: librosa, resample or pedalboard.
+    preview_pitch_res_type : str
+        Resampler of the preview pitch shift, a librosa res_type.
+    preview_fx_buffer_size : int
+        Block size the preview FX are processed in.
+    """
+
+    preview_sample_rate: int = Field(22050, env="PREVIEW_SAMPLE_RATE")
+    preview_pitch_backend: str = Field("resample", env="PREVIEW_PITCH_BACKEND")
+    preview_pitch_res_type: str = Field("soxr_qq", env="PREVIEW_PITCH_RES_TYPE")
+    preview_fx_buffer_size: int = Field(65536, env="PREVIEW_FX_BUFFER_SIZE")
+
+
+class RenderQuality:
+    """
+    The settings a sequence is rendered with, from decode to mixdown.
+
+    Master renders run at 44100 Hz with the phase-vocoder pitch shift and the
+    high-quality resampler. Preview renders run the same pipeline at a reduced sample
+    rate with a faster pitch-shift backend, a cheaper resampler and larger FX blocks.
+    Every artifact is tagged with the quality it was rendered at, so that the next
+    stage follows it and a master render does not reuse preview work.
+
+    Attributes:
+        name: The quality tier, "master" or "preview".
+        sample_rate: The sample rate of the pipeline.
+        pitch_backend: The pitch-shift backend, unless the job picks one.
+        pitch_res_type: The resampler of the pitch shift, a librosa res_type.
+        fx_buffer_size: The block size the FX are processed in.
+    """
+
+    def __init__(
+        self,
+        name: str = MASTER,
+        sample_rate: int = MASTER_SAMPLE_RATE,
+        pitch_backend: str = "librosa",
+        pitch_res_type: str = "soxr_hq",
+        fx_buffer_size: int = 8192,
+    ):
+        self.name = name
+        self.sample_rate = int(sample_rate)
+        self.pitch_backend = pitch_backend
+        self.pitch_res_type = pitch_res_type
+        self.fx_buffer_size = int(fx_buffer_size)
+
+    @property
+    def is_master(self) -> bool:
+        return self.name == MASTER
+
+    @classmethod
+    def resolve(cls, name: Optional[str] = None) -> "RenderQuality":
+        """
+        Returns the settings of a quality tier.
+
+        Parameters:
+            name (str, optional): "master" or "preview". Default is "master".
+
+        Returns:
+            RenderQuality: The settings.
+
+        Raises:
+            ValueError: If the quality tier is unknown.
+        """
+        if isinstance(name, cls):
+            return name
+        name = name or MASTER
+        if name == MASTER:
+            return cls()
+        if name == PREVIEW:
+            settings = QualitySettings()
+            return cls(
+                PREVIEW,
+                settings.preview_sample_rate,
+                settings.preview_pitch_backend,
+                settings.preview_pitch_res_type,
+                settings.preview_fx_buffer_size,
+            )
+        raise ValueError(f"quality must be one of {', '.join(QUALITIES)}")
+
+    @classmethod
+    def from_header(cls, header: dict) -> "RenderQuality":
+        """
+        Returns the quality a ragged container was rendered at. Untagged containers are
+        master renders; the sample rate is the container's own.
+        """
+        quality = cls.resolve(header.get("quality"))
+        quality.sample_rate = int(header.get("sr", quality.sample_rate))
+        return quality
+
+    def tag(self) -> dict:
+        """Returns the header fields tagging an artifact with this quality."""
+        return {"quality": self.name}
+
+    def __eq__(self, other):
+        return isinstance(other, RenderQuality) and vars(self) == vars(other)
+
+    def __repr__(self):
+        return f"RenderQuality({self.name!r}, {self.sample_rate})"
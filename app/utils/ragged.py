@@ -0,0 +1,178 @@
+import json
+import os
+import struct
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+# file layout: magic, header length (uint32), JSON header padded to 64 bytes,
+# int64 frame offsets (n_frames + 1), float32 samples of every frame back to back
+RAGGED_MAGIC = b"RAGGED01"
+RAGGED_EXTENSION = ".ragged"
+_ALIGNMENT = 64
+
+
+class RaggedFrames:
+    """
+    Read-only view of a ragged audio container: a list of frames of different lengths
+    stored as one contiguous float32 sample block plus the frame boundaries.
+
+    Attributes:
+        header: The container header (sr, bpm, channel, n_frames, n_samples, ...).
+        offsets: The frame boundaries, frame i spans samples[offsets[i]:offsets[i + 1]].
+        samples: Every frame's samples back to back.
+    """
+
+    def __init__(self, header: dict, offsets: np.ndarray, samples: np.ndarray):
+        """
+        The constructor for RaggedFrames class.
+
+        Parameters:
+            header (dict): The container header.
+            offsets (np.ndarray): The int64 frame boundaries.
+            samples (np.ndarray): The float32 sample block.
+        """
+        self.header = header
+        self.offsets = offsets
+        self.samples = samples
+
+    @property
+    def sr(self) -> int:
+        return self.header["sr"]
+
+    @property
+    def bpm(self) -> Optional[float]:
+        return self.header.get("bpm")
+
+    @property
+    def channel(self) -> Optional[int]:
+        return self.header.get("channel")
+
+    def frames(self) -> List[np.ndarray]:
+        """
+        Returns every frame as a view into the sample block.
+
+        Returns:
+            List[np.ndarray]: The frames, in order.
+        """
+        return [self[i] for i in range(len(self))]
+
+    def __getitem__(self, index: int) -> np.ndarray:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(f"frame index {index} out of range")
+        return self.samples[self.offsets[index] : self.offsets[index + 1]]
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+
+def write_ragged(
+    path: str,
+    frames,
+    sr: int = 44100,
+    bpm: Optional[float] = None,
+    channel: Optional[int] = None,
+    metadata: Optional[dict] = None,
+):
+    """
+    Writes a list of frames, or a flat array as a single frame, to a ragged container.
+    The file is written next to its destination and moved into place, so readers never
+    see a partial file.
+
+    Parameters:
+        path (str): The destination file.
+        frames (Sequence[np.ndarray] | np.ndarray): The frames to store.
+        sr (int, optional): The sample rate. Default is 44100.
+        bpm (float, optional): The tempo the frames were cut for.
+        channel (int, optional): The channel the frames belong to.
+        metadata (dict, optional): Further JSON-serializable header fields.
+    """
+    frames = _as_frames(frames)
+    lengths = np.fromiter(
+        (len(frame) for frame in frames), dtype=np.int64, count=len(frames)
+    )
+    offsets = np.concatenate(([0], np.cumsum(lengths))).astype(np.int64)
+
+    header = {
+        "sr": int(sr),
+        "bpm": None if bpm is None else float(bpm),
+        "channel": None if channel is None else int(channel),
+        "n_frames": len(frames),
+        "n_samples": int(offsets[-1]),
+        "dtype": "float32",
+        **(metadata or {}),
+    }
+    header_bytes = json.dumps(header).encode()
+    prefix_len = len(RAGGED_MAGIC) + 4 + len(header_bytes)
+    header_bytes += b" " * (-prefix_len % _ALIGNMENT)
+
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(RAGGED_MAGIC)
+            f.write(struct.pack("<I", len(header_bytes)))
+            f.write(header_bytes)
+            f.write(offsets.astype("<i8").tobytes())
+            for frame in frames:
+                f.write(np.asarray(frame, dtype="<f4").tobytes())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def read_ragged(path: str, mmap: bool = True) -> RaggedFrames:
+    """
+    Opens a ragged container.
+
+    Parameters:
+        path (str): The container file.
+        mmap (bool, optional): Memory-map the offsets and samples instead of reading them.
+            Default is True.
+
+    Returns:
+        RaggedFrames: The read-only container.
+
+    Raises:
+        ValueError: If the file is not a ragged container.
+    """
+    with open(path, "rb") as f:
+        magic = f.read(len(RAGGED_MAGIC))
+        if magic != RAGGED_MAGIC:
+            raise ValueError(f"{path} is not a ragged audio container")
+        (header_len,) = struct.unpack("<I", f.read(4))
+        header = json.loads(f.read(header_len))
+
+    offsets_start = len(RAGGED_MAGIC) + 4 + header_len
+    n_offsets = header["n_frames"] + 1
+    samples_start = offsets_start + n_offsets * 8
+
+    if mmap and header["n_samples"]:
+        offsets = np.memmap(
+            path, dtype="<i8", mode="r", offset=offsets_start, shape=(n_offsets,)
+        )
+        samples = np.memmap(
+            path,
+            dtype="<f4",
+            mode="r",
+            offset=samples_start,
+            shape=(header["n_samples"],),
+        )
+    else:
+        with open(path, "rb") as f:
+            f.seek(offsets_start)
+            offsets = np.fromfile(f, dtype="<i8", count=n_offsets)
+            samples = np.fromfile(f, dtype="<f4", count=header["n_samples"])
+        offsets.flags.writeable = False
+        samples.flags.writeable = False
+    return RaggedFrames(header, offsets, samples)
+
+
+def _as_frames(frames) -> Sequence[np.ndarray]:
+    if len(frames) == 0:
+        return []
+    if np.ndim(frames[0]) == 0:
+        return [np.asarray(frames)]
+    return frames
@@ -0,0 +1,138 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+from typing import Dict
+
+from pydantic import BaseSettings, Field
+
+from app.utils.cache import evict_directory, file_lock, touch_atime
+
+logger = logging.getLogger(__name__)
+
+
+class RenderCacheSettings(BaseSettings):
+    """
+    A Pydantic model for the render cache settings.
+
+    Attributes:
+    -----------
+    render_cache_dir : str
+        Directory holding the cached renders, shared by every worker of the node.
+    render_cache_max_bytes : int
+        Disk cap of the cached renders.
+    """
+
+    render_cache_dir: str = Field(
+        os.path.join("cache", "renders"), env="RENDER_CACHE_DIR"
+    )
+    render_cache_max_bytes: int = Field(512 * 1024 * 1024, env="RENDER_CACHE_BYTES")
+
+
+class RenderCache:
+    """
+    Content-addressed cache of seeded renders.
+
+    A render is identified by a hash of everything it depends on, e.g. the asset digest,
+    the job parameters, the channel and the seed, so identical requests from any job or
+    user are served by copying the cached files instead of running the DSP again.
+    An entry is a set of files sharing the key, one per suffix.
+
+    Attributes:
+        directory: The cache directory.
+        max_bytes: The disk cap in bytes, enforced by evicting the least recently used files.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        """
+        The constructor for RenderCache class.
+
+        Parameters:
+            directory (str): The cache directory.
+            max_bytes (int): The disk cap in bytes.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def key(**parts) -> str:
+        """
+        Hashes the inputs of a render.
+
+        Parameters:
+            **parts: JSON-serializable render inputs.
+
+        Returns:
+            str: The SHA-256 hex digest of the inputs.
+        """
+        payload = json.dumps(parts, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def path(self, key: str, suffix: str) -> str:
+        return os.path.join(self.directory, f"{key}{suffix}")
+
+    def get(self, key: str, destinations: Dict[str, str]) -> bool:
+        """
+        Copies a cached render to its destinations.
+
+        Parameters:
+            key (str): The render key.
+            destinations (Dict[str, str]): The destination path of each cached suffix.
+
+        Returns:
+            bool: True on a cache hit, False if any of the files is missing.
+        """
+        sources = {suffix: self.path(key, suffix) for suffix in destinations}
+        if not all(os.path.exists(source) for source in sources.values()):
+            return False
+        try:
+            with file_lock(self.__lock_path(key), shared=True):
+                for suffix, destination in destinations.items():
+                    _copy_atomic(sources[suffix], destination)
+                    touch_atime(sources[suffix])
+        except OSError as e:
+            logger.error(f"Error reading render {key} from the cache: {e}")
+            return False
+        return True
+
+    def put(self, key: str, sources: Dict[str, str]) -> None:
+        """
+        Stores the files of a render, then trims the cache to its cap.
+
+        Parameters:
+            key (str): The render key.
+            sources (Dict[str, str]): The rendered file of each suffix.
+        """
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with file_lock(self.__lock_path(key)):
+                for suffix, source in sources.items():
+                    _copy_atomic(source, self.path(key, suffix))
+        except OSError as e:
+            logger.error(f"Error storing render {key} in the cache: {e}")
+            return
+        evict_directory(
+            self.directory,
+            self.max_bytes,
+            ["*"],
+            can_evict=lambda path: not os.path.basename(path).startswith(key),
+        )
+
+    def __lock_path(self, key: str) -> str:
+        return os.path.join(self.directory, ".locks", f"{key}.lock")
+
+
+def _copy_atomic(source: str, destination: str) -> None:
+    tmp_path = f"{destination}.{os.getpid()}.tmp"
+    try:
+        shutil.copyfile(source, tmp_path)
+        os.replace(tmp_path, destination)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+render_cache = RenderCache(
+    RenderCacheSettings().render_cache_dir, RenderCacheSettings().render_cache_max_bytes
+)
@@ -0,0 +1,240 @@
+import json
+import os
+from typing import List, Optional, Sequence
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+SYMBOLIC_EXTENSION = ".sequence.json"
+SYMBOLIC_VERSION = 1
+
+
+class SymbolicSequence:
+    """
+    A generated sequence stored as the steps that play it rather than their audio: for
+    each step, the frame of the asset it plays, its pitch offset, gain and mute flag.
+    A channel takes a few hundred bytes; the audio is gathered from the decoded asset
+    when the FX need it, so mute and gain edits are array operations.
+
+    Attributes:
+        asset: The sample the frames are cut from: its local path, cloud path and
+            content digest.
+        offsets: The start of each step's frame in the asset, in samples.
+        lengths: The length of each step's frame in samples.
+        pitch: The half-steps each frame is shifted by.
+        gain: The gain of each step.
+        mute: 1 for each muted step.
+        header: The sample rate, tempo, channel, quality, pitch backend, rhythm and bar
+            layout of the sequence, in the fields of a ragged container header.
+    """
+
+    def __init__(
+        self,
+        asset: dict,
+        offsets: Sequence[int],
+        lengths: Sequence[int],
+        pitch: Optional[Sequence[float]] = None,
+        gain: Optional[Sequence[float]] = None,
+        mute: Optional[Sequence[int]] = None,
+        header: Optional[dict] = None,
+    ):
+        self.asset = dict(asset)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.lengths = np.asarray(lengths, dtype=np.int64)
+        n_steps = len(self.offsets)
+        if len(self.lengths) != n_steps:
+            raise ValueError("one frame length per step is required")
+        self.pitch = np.zeros(n_steps) if pitch is None else np.asarray(pitch)
+        self.gain = (
+            np.ones(n_steps, dtype=np.float32)
+            if gain is None
+            else np.asarray(gain, dtype=np.float32)
+        )
+        self.mute = (
+            np.zeros(n_steps, dtype=np.uint8)
+            if mute is None
+            else np.asarray(mute, dtype=np.uint8)
+        )
+        if not len(self.pitch) == len(self.gain) == len(self.mute) == n_steps:
+            raise ValueError("one pitch, gain and mute flag per step is required")
+        self.header = dict(header or {})
+
+    def __len__(self):
+        return len(self.offsets)
+
+    @property
+    def sr(self) -> int:
+        return self.header["sr"]
+
+    def with_mutes(self, steps: Sequence[int]) -> "SymbolicSequence":
+        """
+        Returns a copy of the sequence with the given steps muted.
+
+        Parameters:
+            steps (Sequence[int]): The indices of the steps to mute.
+
+        Returns:
+            SymbolicSequence: The copy.
+        """
+        mute = self.mute.copy()
+        mute[np.asarray(steps, dtype=np.int64)] = 1
+        return self._replace(mute=mute)
+
+    def with_gain(self, gain) -> "SymbolicSequence":
+        """
+        Returns a copy of the sequence with its gains scaled.
+
+        Parameters:
+            gain (float | Sequence[float]): One gain, or one gain per step.
+
+        Returns:
+            SymbolicSequence: The copy.
+        """
+        return self._replace(gain=self.gain * np.asarray(gain, dtype=np.float32))
+
+    def with_asset(self, asset: dict) -> "SymbolicSequence":
+        """
+        Returns a copy of the sequence playing another copy of its asset.
+
+        Parameters:
+            asset (dict): The "path", "cloud_path" and "digest" of the copy.
+
+        Returns:
+            SymbolicSequence: The copy.
+
+        Raises:
+            ValueError: If the copy has other content.
+        """
+        if asset["digest"] != self.asset["digest"]:
+            raise ValueError(f"{asset['path']} is not a copy of {self.asset['path']}")
+        return self._replace(asset=dict(asset))
+
+    def _replace(self, **fields) -> "SymbolicSequence":
+        values = {
+            "asset": self.asset,
+            "offsets": self.offsets,
+            "lengths": self.lengths,
+            "pitch": self.pitch,
+            "gain": self.gain,
+            "mute": self.mute,
+            "header": self.header,
+        }
+        values.update(fields)
+        return SymbolicSequence(**values)
+
+    def gather(self, audio: np.ndarray) -> List[np.ndarray]:
+        """
+        Cuts the frame of every step from the decoded asset, one gather per frame
+        length; frames running past the end of the audio are zero-padded. The frames
+        are neither shifted nor leveled.
+
+        Parameters:
+            audio (np.ndarray): The decoded asset at the sequence's sample rate.
+
+        Returns:
+            List[np.ndarray]: The float32 frame of each step, in order.
+        """
+        frames = [None] * len(self)
+        if not len(self):
+            return frames
+        end = int((self.offsets + self.lengths).max())
+        if len(audio) < end:
+            audio = np.concatenate((audio, np.zeros(end - len(audio), dtype=audio.dtype)))
+        for length in np.unique(self.lengths):
+            steps = np.flatnonzero(self.lengths == length)
+            windows = sliding_window_view(audio, int(length))
+            block = np.asarray(windows[self.offsets[steps]], dtype=np.float32)
+            for step, frame in zip(steps, block):
+                frames[step] = frame
+        return frames
+
+    def apply_levels(self, frames: List[np.ndarray]) -> List[np.ndarray]:
+        """
+        Silences the muted steps and applies the gains.
+
+        Parameters:
+            frames (List[np.ndarray]): The frame of each step.
+
+        Returns:
+            List[np.ndarray]: The leveled frames; unchanged frames are passed through.
+        """
+        frames = list(frames)
+        for step in np.flatnonzero(self.mute):
+            frames[step] = np.zeros(len(frames[step]), dtype=np.float32)
+        for step in np.flatnonzero((self.gain != 1) & (self.mute == 0)):
+            frames[step] = frames[step] * self.gain[step]
+        return frames
+
+    def to_dict(self) -> dict:
+        """Returns the JSON-serializable sequence."""
+        return {
+            "version": SYMBOLIC_VERSION,
+            "asset": self.asset,
+            "header": self.header,
+            "steps": {
+                "offset": self.offsets.tolist(),
+                "length": self.lengths.tolist(),
+                "pitch": self.pitch.tolist(),
+                "gain": self.gain.tolist(),
+                "mute": self.mute.tolist(),
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "SymbolicSequence":
+        """
+        Reads a sequence written by to_dict().
+
+        Raises:
+            ValueError: If the data is not a symbolic sequence of this version.
+        """
+        if not isinstance(data, dict) or data.get("version") != SYMBOLIC_VERSION:
+            raise ValueError("not a symbolic sequence of a supported version")
+        steps = data["steps"]
+        return cls(
+            data["asset"],
+            steps["offset"],
+            steps["length"],
+            steps["pitch"],
+            steps["gain"],
+            steps["mute"],
+            data["header"],
+        )
+
+    def save(self, path: str) -> None:
+        """
+        Writes the sequence as JSON. The file is written next to its destination and
+        moved into place, so readers never see a partial file.
+
+        Parameters:
+            path (str): The destination file.
+        """
+        tmp_path = f"{path}.tmp{os.getpid()}"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(self.to_dict(), f, separators=(",", ":"))
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    @classmethod
+    def load(cls, path: str) -> "SymbolicSequence":
+        """
+        Reads a sequence saved with save().
+
+        Parameters:
+            path (str): The sequence file.
+
+        Returns:
+            SymbolicSequence: The sequence.
+
+        Raises:
+            ValueError: If the file is not a symbolic sequence.
+        """
+        with open(path) as f:
+            try:
+                data = json.load(f)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path} is not a symbolic sequence") from e
+        return cls.from_dict(data)
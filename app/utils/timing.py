@@ -0,0 +1,205 @@
+import contextlib
+import contextvars
+import functools
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from pydantic import BaseSettings, Field
+from starlette.requests import Request
+from starlette.responses import Response
+
+DEBUG_TIMINGS_PARAM = "debug_timings"
+
+
+class TimingSettings(BaseSettings):
+    """
+    A Pydantic model for the pipeline timing settings.
+
+    Attributes:
+    -----------
+    server_timing : bool
+        Times the pipeline stages of every request and returns them in a Server-Timing
+        header. When disabled, stage timers are no-ops.
+    """
+
+    server_timing: bool = Field(True, env="SERVER_TIMING")
+
+
+class StageTimer:
+    """
+    Accumulates the wall time spent in each named stage of a request.
+
+    Stages may nest, e.g. a decode inside the frame plan; each stage is only charged
+    its own time, so the durations add up to the instrumented time. Stages timed on
+    several threads, such as channels rendered concurrently, are summed.
+
+    Attributes:
+        durations: The seconds spent in each stage, in order of first use.
+        counts: The number of times each stage was entered.
+    """
+
+    def __init__(self):
+        self.durations = OrderedDict()
+        self.counts = {}
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.durations[name] = self.durations.get(name, 0.0) + seconds
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def total(self) -> float:
+        return time.perf_counter() - self.started
+
+    def as_dict(self) -> dict:
+        """
+        Returns the stage durations and the total request time in milliseconds.
+
+        Returns:
+            dict: The rounded duration of each stage, plus "total".
+        """
+        with self._lock:
+            timings = {name: round(s * 1000, 3) for name, s in self.durations.items()}
+        timings["total"] = round(self.total() * 1000, 3)
+        return timings
+
+    def header(self) -> str:
+        """
+        Formats the timings as a Server-Timing header value.
+
+        Returns:
+            str: e.g. "download;dur=12.5, decode;dur=3.1, total;dur=20.0".
+        """
+        return ", ".join(f"{name};dur={ms}" for name, ms in self.as_dict().items())
+
+
+class _Stage:
+    __slots__ = ("timer", "name", "started", "children", "token")
+
+    def __init__(self, timer: StageTimer, name: str):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.children = 0.0
+        self.token = _active_stage.set(self)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.started
+        _active_stage.reset(self.token)
+        self.timer.add(self.name, elapsed - self.children)
+        parent = _active_stage.get()
+        if parent is not None:
+            parent.children += elapsed
+        return False
+
+
+_current_timer: contextvars.ContextVar[Optional[StageTimer]] = contextvars.ContextVar(
+    "stage_timer", default=None
+)
+_active_stage: contextvars.ContextVar[Optional[_Stage]] = contextvars.ContextVar(
+    "active_stage", default=None
+)
+_NO_STAGE = contextlib.nullcontext()
+
+
+def current_timer() -> Optional[StageTimer]:
+    return _current_timer.get()
+
+
+def stage(name: str):
+    """
+    Times a block as one stage of the current request.
+
+    Outside of a timed request this returns a shared no-op context manager, so
+    instrumented code costs a context variable lookup.
+
+    Parameters:
+        name (str): The stage name, a Server-Timing metric name such as "decode".
+
+    Returns:
+        A context manager timing the block.
+    """
+    timer = _current_timer.get()
+    if timer is None:
+        return _NO_STAGE
+    return _Stage(timer, name)
+
+
+def timed(name: str):
+    """
+    Decorator timing every call of a function as a stage, see stage().
+
+    Parameters:
+        name (str): The stage name.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+@contextlib.contextmanager
+def timing_scope(timer: Optional[StageTimer] = None):
+    """
+    Makes a timer current for the enclosed block and the threads started with its
+    context, see contextvars.copy_context().
+
+    Parameters:
+        timer (StageTimer, optional): The timer to use. Default is a new one.
+
+    Yields:
+        StageTimer: The current timer.
+    """
+    timer = timer or StageTimer()
+    token = _current_timer.set(timer)
+    try:
+        yield timer
+    finally:
+        _current_timer.reset(token)
+
+
+async def server_timing_middleware(request: Request, call_next):
+    """
+    Times the pipeline stages of a request and returns them in a Server-Timing header.
+    With ?debug_timings=true, the timings are also added under "debug" to a JSON object
+    body, or the body is wrapped as {"result": ..., "debug": ...} otherwise.
+    """
+    with timing_scope() as timer:
+        response = await call_next(request)
+
+    if request.query_params.get(DEBUG_TIMINGS_PARAM, "").lower() in ("1", "true"):
+        if response.headers.get("content-type", "").startswith("application/json"):
+            body = b"".join([chunk async for chunk in response.body_iterator])
+            content = json.loads(body)
+            debug = {"timings": timer.as_dict()}
+            if isinstance(content, dict):
+                content["debug"] = debug
+            else:
+                content = {"result": content, "debug": debug}
+            headers = {
+                key: value
+                for key, value in response.headers.items()
+                if key.lower() != "content-length"
+            }
+            response = Response(
+                json.dumps(content),
+                status_code=response.status_code,
+                headers=headers,
+                media_type="application/json",
+            )
+
+    response.headers["Server-Timing"] = timer.header()
+    return response
@@ -1,13 +1,23 @@
 import json
 import re
-from typing import Literal, List
+from typing import Literal, List, Optional
 
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field, conint, validator
 import glob
 import os
 import pathlib
 import itertools
 
+from app.utils.cache import CacheSettings, LRUCache, file_stat_key
+from app.utils.ragged import RAGGED_EXTENSION
+from app.utils.symbolic import SYMBOLIC_EXTENSION
+
+_SAMPLE_BPM_PATTERN = re.compile(r"(?:^|_)BPM_(\d+(?:\.\d+)?)(?=_|\.|$)")
+_SAMPLE_KEY_PATTERN = re.compile(r"(?:^|_)PITCH_([A-G][#b]?m?)(?=_|\.|$)")
+
+# parsed job manifests, keyed by (local path, mtime, size)
+_job_params_cache = LRUCache.counting(CacheSettings().job_params_max_entries)
+
 
 class JobTypeValidator(BaseModel):
     """
@@ -16,7 +26,8 @@ class JobTypeValidator(BaseModel):
     Attributes:
         job_type: A string representing the job type. It must be one of the
             following: "job_id_path", "processed_job_path", "asset_path",
-            "mixdown_job_path", "mixdown_job_path_master", or "mixdown_job_path_pkl".
+            "mixdown_job_path", "mixdown_job_path_master", "mixdown_job_path_pkl" or
+            "mixdown_job_path_ragged".
     """
 
     job_type: str
@@ -30,15 +41,17 @@ class JobTypeValidator(BaseModel):
             "mixdown_job_path",
             "mixdown_job_path_master",
             "mixdown_job_path_pkl",
+            "mixdown_job_path_ragged",
         ]:
             raise ValueError(
-                'job_type must be either "job_id_path", "processed_job_path", "asset_path", "mixdown_job_path" or "mixdown_job_path_pkl" or "mixdown_job_path_master"'
+                'job_type must be either "job_id_path", "processed_job_path", "asset_path", "mixdown_job_path" or "mixdown_job_path_pkl" or "mixdown_job_path_ragged" or "mixdown_job_path_master"'
             )
         return v
 
 
 class JobConfigValidator(BaseModel):
     index_value: int = Field(..., ge=0, le=5)
+    bars: conint(strict=True, ge=1) = 1
 
     @validator("index_value")
     def item_validator(cls, v):
@@ -47,6 +60,20 @@ class JobConfigValidator(BaseModel):
         return v
 
 
+def _channel_value(job_id_dict, key, index, default=None):
+    """
+    Returns a channel's entry of an optional per-channel list of the job file. A single
+    value rather than a list applies to every channel.
+    """
+    values = job_id_dict.get(key)
+    if values is not None and not isinstance(values, list):
+        return values
+    values = values or []
+    if index < len(values) and values[index] is not None:
+        return values[index]
+    return default
+
+
 class JobConfig:
     """
     A class used to manage and resolve job configurations.
@@ -112,6 +139,9 @@ class JobConfig:
         cloud_path_processed_pkl = (
             f"sequences/{sanitized_job_id}_{self.channel_index}.pkl"
         )
+        local_path_processed_sequence = (
+            f"temp/sequences_{sanitized_job_id}_{self.channel_index}{SYMBOLIC_EXTENSION}"
+        )
 
         local_path_mixdown = f"temp/mixdown_{self.random_id}_{sanitized_job_id}"
         cloud_path_mixdown = f"mixdown/mixdown_{self.random_id}_{sanitized_job_id}"
@@ -128,6 +158,13 @@ class JobConfig:
         local_path_mixdown_pkl = f"{local_path_mixdown}_{self.channel_index}.pkl"
         cloud_path_mixdown_pkl = f"{cloud_path_mixdown}_{self.channel_index}.pkl"
 
+        local_path_mixdown_ragged = (
+            f"{local_path_mixdown}_{self.channel_index}{RAGGED_EXTENSION}"
+        )
+        cloud_path_mixdown_ragged = (
+            f"{cloud_path_mixdown}_{self.channel_index}{RAGGED_EXTENSION}"
+        )
+
         local_path_mixdown_mp3_master = f"{local_path_mixdown}_master.mp3"
         cloud_path_mixdown_mp3_master = f"{cloud_path_mixdown}_master.mp3"
 
@@ -141,10 +178,13 @@ class JobConfig:
             "cloud_path_processed": cloud_path_processed,
             "local_path_processed_pkl": local_path_processed_pkl,
             "cloud_path_processed_pkl": cloud_path_processed_pkl,
+            "local_path_processed_sequence": local_path_processed_sequence,
             "local_path_pre_mixdown_mp3": local_path_pre_mixdown_mp3,
             "local_path_pre_mixdown_pkl": local_path_pre_mixdown_pkl,
             "local_path_mixdown_pkl": local_path_mixdown_pkl,
             "cloud_path_mixdown_pkl": cloud_path_mixdown_pkl,
+            "local_path_mixdown_ragged": local_path_mixdown_ragged,
+            "cloud_path_mixdown_ragged": cloud_path_mixdown_ragged,
             "local_path_mixdown_wav": local_path_mixdown_wav,
             "cloud_path_mixdown_wav": cloud_path_mixdown_wav,
             "local_path_mixdown_mp3": local_path_mixdown_mp3,
@@ -157,6 +197,24 @@ class JobConfig:
         }
         return paths_dict
 
+    def variant_path_resolver(self, variant: int):
+        """
+        Resolves the paths of one variant of the channel's sequence.
+
+        Parameters:
+            variant (int): The variant number.
+
+        Returns:
+            dict: A dictionary containing the variant's processed paths.
+        """
+        sanitized_job_id = self.path_resolver()["sanitized_job_id"]
+        variant_name = f"{sanitized_job_id}_{self.channel_index}__v{variant}"
+
+        return {
+            "local_path_processed_sequence": f"temp/sequences_{variant_name}{SYMBOLIC_EXTENSION}",
+            "cloud_path_processed": f"sequences/{variant_name}.mp3",
+        }
+
     def __psuedo_json_to_dict(self):
         """
         Converts the job's pseudo JSON to a Python dictionary.
@@ -165,30 +223,27 @@ class JobConfig:
             dict: The job's data as a Python dictionary.
         """
         paths = self.path_resolver()
-        inital_index = self.has_initial_index(paths["local_path"])
-        if inital_index:
-            with open(paths["local_path"], "r") as lst:
-                json_psudo = json.load(lst)
-                json_sanitized = re.sub(
-                    r'("\s*:\s*)undefined(\s*[,}])', "\\1null\\2", json_psudo[0]
-                )
-                json_dict = json.loads(json_sanitized)
+        with open(paths["local_path"], "r") as lst:
+            json_obj = json.load(lst)
+
+        if isinstance(json_obj, list) and len(json_obj) > 0:
+            json_sanitized = re.sub(
+                r'("\s*:\s*)undefined(\s*[,}])', "\\1null\\2", json_obj[0]
+            )
+            json_dict = json.loads(json_sanitized)
         else:
-            with open(paths["local_path"], "r") as lst:
-                json_dict = json.load(lst)
+            json_dict = json_obj
 
         return json_dict
 
-    def get_job_params(self):
-        """
-        Retrieves the job's parameters.
-
-        Returns:
-            dict: The job's parameters as a Python dictionary.
-        """
-        job_id_dict = self.__psuedo_json_to_dict()
-
-        _check_index = JobConfigValidator.parse_obj({"index_value": self.channel_index})
+    def __build_job_params(self, job_id_dict):
+        index = JobConfigValidator.parse_obj({"index_value": self.channel_index})
+        _check_index = JobConfigValidator.parse_obj(
+            {
+                "index_value": index.index_value,
+                "bars": _channel_value(job_id_dict, "bars", index.index_value, 1),
+            }
+        )
 
         params_dict = {
             "local_paths": job_id_dict["local_paths"][_check_index.index_value],
@@ -202,10 +257,53 @@ class JobConfig:
             "pitch_temperature_knob_list": job_id_dict["pitch_temperature_knob_list"][
                 _check_index.index_value
             ],
+            "pitch_backend": _channel_value(
+                job_id_dict, "pitch_backend", _check_index.index_value
+            ),
+            "bars": _check_index.bars,
+            "bar_chain": _channel_value(
+                job_id_dict, "bar_chain_list", _check_index.index_value
+            ),
+            "bar_variation": _channel_value(
+                job_id_dict, "bar_variation_list", _check_index.index_value, 0.0
+            ),
         }
 
         return params_dict
 
+    def get_job_params(self):
+        """
+        Retrieves the job's parameters.
+
+        The parsed job file and the parameters of each channel are cached, keyed by the
+        file's mtime and size, so repeated calls do not re-read the job JSON.
+
+        Returns:
+            dict: The job's parameters as a Python dictionary.
+        """
+        try:
+            key = file_stat_key(self.path_resolver()["local_path"])
+        except OSError:
+            return self.__build_job_params(self.__psuedo_json_to_dict())
+
+        params_dict = _job_params_cache.get_or_compute(
+            key + (self.channel_index,),
+            lambda: self.__build_job_params(
+                _job_params_cache.get_or_compute(key, self.__psuedo_json_to_dict)
+            ),
+        )
+        return dict(params_dict)
+
+    def invalidate_job_params(self):
+        """
+        Drops the cached parameters of this job, for every channel.
+
+        Returns:
+            int: The number of removed cache entries.
+        """
+        local_path = os.path.realpath(self.path_resolver()["local_path"])
+        return _job_params_cache.invalidate(lambda key: key[0] == local_path)
+
 
 class JobUtils:
     """
@@ -371,7 +469,7 @@ class JobCleanUp:
 
     def temp(self):
         """
-        Cleans up temporary files by removing .pkl, .mp3, and .json files.
+        Cleans up temporary files by removing .pkl, .ragged, .mp3, and .json files.
 
         Returns:
             List[bool]: A list of status indicating whether each file was successfully removed or not.
@@ -383,7 +481,7 @@ class JobCleanUp:
             os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "temp/"
         )
 
-        ext_types = ["*.pkl", "*.mp3", "*.json"]  # the tuple of file types
+        ext_types = ["*.pkl", "*.ragged", "*.mp3", "*.json"]  # the tuple of file types
 
         files_grabbed = []
         for ext_type in ext_types:
@@ -409,14 +507,14 @@ class JobCleanUp:
 
     def tempre_factor(self):
         """
-        Cleans up temporary files by removing .pkl, .mp3, and .json files. Refactored version.
+        Cleans up temporary files by removing .pkl, .ragged, .mp3, and .json files. Refactored version.
 
         Returns:
             bool: True if all files were successfully removed, False otherwise.
         """
         temp_path = os.path.abspath(os.path.join("temp"))
 
-        ext_types = ["*.pkl", "*.mp3", "*.json"]
+        ext_types = ["*.pkl", "*.ragged", "*.mp3", "*.json"]
         files = itertools.chain(
             *(glob.glob(os.path.join(temp_path, ext)) for ext in ext_types)
         )
@@ -447,3 +545,36 @@ def purge_all(my_paths: List[str], my_patterns: List[str]) -> bool:
         os.remove(f)
 
     return True
+
+
+def parse_sample_bpm(path: str) -> Optional[float]:
+    """
+    Reads the tempo a sample was recorded at from its file name,
+    e.g. "PITCH_C__BPM_120__nn2_120_drum_loop_inland_full.mp3".
+
+    Args:
+        path (str): The sample path or object key.
+
+    Returns:
+        Optional[float]: The tempo, or None if the name carries no positive BPM tag.
+    """
+    match = _SAMPLE_BPM_PATTERN.search(os.path.basename(path))
+    if match is None:
+        return None
+    bpm = float(match.group(1))
+    return bpm if bpm > 0 else None
+
+
+def parse_sample_key(path: str) -> Optional[str]:
+    """
+    Reads the key a sample was recorded in from its file name,
+    e.g. "C" for "PITCH_C__BPM_120__nn2_120_drum_loop_inland_full.mp3".
+
+    Args:
+        path (str): The sample path or object key.
+
+    Returns:
+        Optional[str]: The key, or None if the name carries no PITCH tag.
+    """
+    match = _SAMPLE_KEY_PATTERN.search(os.path.basename(path))
+    return match.group(1) if match else None
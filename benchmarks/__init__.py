@@ -0,0 +1,6 @@
+"""
+Offline performance benchmarks of the audio pipeline.
+
+Run them from the repository root, e.g. ``python -m benchmarks.bench_generator``.
+They only use synthetic samples, so no bucket or Firebase access is needed.
+"""
@@ -0,0 +1,377 @@
+"""
+Benchmarks the sequence generator on synthetic samples.
+
+Every stage of a /get_sequence render is timed for each sample, bpm and (pulses, steps)
+of the grid, and the results are written as JSON so runs can be compared:
+
+    python -m benchmarks.bench_generator --output bench.json
+    python -m benchmarks.bench_generator --bpm 90 140 --rhythm 5,16 7,12 --repeats 3
+    python -m benchmarks.bench_generator --quality master preview
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Tuple
+
+import librosa
+import numpy as np
+
+from app.sequence_generator.audio_cache import decoded_audio_cache
+from app.sequence_generator.generator import (
+    AudioEngine,
+    SequenceAudioFrameSlicer,
+    SequenceConfigRefactor,
+    SequenceEngine,
+    render_symbolic,
+)
+from app.sequence_generator.pitch import pitch_shift_cache
+from app.sequence_generator.plan import sequence_plan_cache
+from app.utils.symbolic import SYMBOLIC_EXTENSION, SymbolicSequence
+from app.utils.quality import QUALITIES, RenderQuality
+from benchmarks.synthetic import SAMPLE_KINDS, write_samples
+
+DEFAULT_BPMS = (90, 120, 160)
+DEFAULT_RHYTHMS = ((3, 8), (5, 16), (7, 12))
+DEFAULT_LENGTHS = (2.0, 8.0)
+
+
+class BenchmarkJob:
+    """
+    Offline stand-in for JobConfig, serving fixed job parameters.
+
+    Attributes:
+        params: The job parameters returned by get_job_params().
+    """
+
+    def __init__(self, params: dict):
+        self.params = params
+
+    def get_job_params(self) -> dict:
+        return self.params
+
+
+def job_params(path: str, bpm: float, pulses: int, steps: int) -> dict:
+    """
+    Builds the job parameters of one benchmark case, without pitch shifting.
+
+    Parameters:
+        path (str): The sample.
+        bpm (float): The tempo.
+        pulses (int): The number of onsets of the Euclidean rhythm.
+        steps (int): The number of steps of the Euclidean rhythm.
+
+    Returns:
+        dict: The parameters, shaped like a parsed job manifest.
+    """
+    return {
+        "local_paths": path,
+        "cloud_paths": os.path.basename(path),
+        "bpm": bpm,
+        "scale_value": "major",
+        "key_value": "C Major",
+        "rythm_config_list": [pulses, steps],
+        # 0 disables pitch shifting; at 1, a sequence is shifted when a draw exceeds 0.01
+        "pitch_temperature_knob_list": [0],
+    }
+
+
+def time_call(func: Callable, repeats: int, setup: Callable = None) -> dict:
+    """
+    Times func over several repeats, after one untimed warm-up call that absorbs
+    one-off costs such as librosa's JIT compilation.
+
+    Parameters:
+        func (Callable): The zero-argument function to time.
+        repeats (int): The number of timed calls.
+        setup (Callable, optional): Called, untimed, before each call.
+
+    Returns:
+        dict: The min, median and mean duration in milliseconds and the repeats.
+    """
+    durations = []
+    for i in range(repeats + 1):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        func()
+        if i:
+            durations.append((time.perf_counter() - started) * 1000)
+    return {
+        "min_ms": round(min(durations), 3),
+        "median_ms": round(statistics.median(durations), 3),
+        "mean_ms": round(statistics.fmean(durations), 3),
+        "repeats": repeats,
+    }
+
+
+def bench_case(
+    params: dict,
+    output_dir: str,
+    repeats: int,
+    seed: int,
+    pitch: bool = True,
+    quality: str = "master",
+) -> Dict[str, dict]:
+    """
+    Times each stage of one render.
+
+    Decoding is timed with a cold decoded-audio cache, the later stages with a warm one,
+    as on a worker that already served the asset. Pitch shifting starts from an empty
+    pitch-shift cache on every repeat.
+
+    Parameters:
+        params (dict): The job parameters without pitch shifting, see job_params().
+        output_dir (str): Directory for the serialized sequences.
+        repeats (int): The number of timed calls per stage.
+        seed (int): Seeds the frame, note and pitch draws.
+        pitch (bool, optional): Also time generation with pitch shifting. Default is True.
+        quality (str, optional): The render quality, "master" or "preview". Default is
+            "master".
+
+    Returns:
+        Dict[str, dict]: The timings of each stage, see time_call().
+    """
+    job = BenchmarkJob(params)
+    path = params["local_paths"]
+    quality = RenderQuality.resolve(quality)
+    sr = quality.sample_rate
+    results = {}
+
+    results["decode"] = time_call(
+        lambda: decoded_audio_cache.load(path, sr=sr),
+        repeats,
+        setup=lambda: decoded_audio_cache.invalidate(path),
+    )
+    decoded_audio_cache.load(path, sr=sr)
+
+    def config():
+        sequence_config = SequenceConfigRefactor(job, quality)
+        sequence_config.plan()
+        sequence_config.get_note_sequence()
+
+    results["config"] = time_call(config, repeats, setup=sequence_plan_cache.cache.clear)
+    # a regeneration of the channel, served from the plan cache
+    results["config_cached"] = time_call(config, repeats)
+
+    sequence_config = SequenceConfigRefactor(job, quality)
+    plan = sequence_config.plan()
+    results["slice"] = time_call(
+        lambda: SequenceAudioFrameSlicer(sequence_config, plan).get_audio_frames(),
+        repeats,
+    )
+
+    def engine(sequence_config):
+        plan = sequence_config.plan()
+        return SequenceEngine(
+            sequence_config,
+            SequenceAudioFrameSlicer(sequence_config, plan),
+            rng=np.random.default_rng(seed),
+            plan=plan,
+        )
+
+    def generate(sequence_config):
+        return engine(sequence_config).generate_audio_sequence()
+
+    results["generate"] = time_call(lambda: generate(sequence_config), repeats)
+    if pitch:
+        pitched_config = SequenceConfigRefactor(
+            BenchmarkJob({**params, "pitch_temperature_knob_list": [1]}), quality
+        )
+        results["generate_pitch_shift"] = time_call(
+            lambda: generate(pitched_config), repeats, setup=pitch_shift_cache.cache.clear
+        )
+
+    sequence_engine = engine(sequence_config)
+    __, audio_sequence = sequence_engine.generate_audio_sequence()
+    file_loc = os.path.join(output_dir, "sequence")
+    steps = sequence_engine.recorded_steps()
+    sequence = SymbolicSequence(
+        {
+            "path": path,
+            "cloud_path": path,
+            "digest": decoded_audio_cache.asset_digest(path),
+        },
+        steps["offsets"],
+        steps["lengths"],
+        steps["pitch"],
+        header={
+            "sr": sr,
+            "bpm": params["bpm"],
+            **quality.tag(),
+            "pitch": {
+                "backend": quality.pitch_backend,
+                "res_type": quality.pitch_res_type,
+                "bank": steps["bank"],
+            },
+        },
+    )
+    results["serialize_symbolic"] = time_call(
+        lambda: sequence.save(f"{file_loc}{SYMBOLIC_EXTENSION}"), repeats
+    )
+    # the lazy render of the FX stage, from the symbolic sequence to its frames
+    results["render_symbolic"] = time_call(lambda: render_symbolic(sequence), repeats)
+    results["serialize_ragged"] = time_call(
+        lambda: AudioEngine(audio_sequence, f"{file_loc}.ragged").save_to_ragged(
+            sr=sr, bpm=params["bpm"]
+        ),
+        repeats,
+    )
+    mixdown = SequenceEngine.validate_sequence(params["bpm"], audio_sequence, sr=sr)
+    results["serialize_wav"] = time_call(
+        lambda: AudioEngine(mixdown, f"{file_loc}.wav").save_to_wav(sr=sr), repeats
+    )
+    if shutil.which("ffmpeg"):
+        results["serialize_mp3"] = time_call(
+            lambda: AudioEngine(mixdown, f"{file_loc}.mp3", normalized=True).save_to_mp3(
+                sr=sr
+            ),
+            repeats,
+        )
+    return results
+
+
+def run(
+    kinds: List[str],
+    lengths: List[float],
+    bpms: List[float],
+    rhythms: List[Tuple[int, int]],
+    repeats: int = 5,
+    pitch: bool = True,
+    seed: int = 0,
+    qualities: List[str] = ("master",),
+) -> dict:
+    """
+    Runs the benchmark grid.
+
+    Parameters:
+        kinds (List[str]): The synthetic sample kinds, keys of SAMPLE_KINDS.
+        lengths (List[float]): The sample lengths in seconds.
+        bpms (List[float]): The tempos.
+        rhythms (List[Tuple[int, int]]): The (pulses, steps) of the Euclidean rhythms.
+        repeats (int, optional): The number of timed calls per stage. Default is 5.
+        pitch (bool, optional): Also time generation with pitch shifting. Default is True.
+        seed (int, optional): Seeds the samples and the draws. Default is 0.
+        qualities (List[str], optional): The render qualities. Default is master only.
+
+    Returns:
+        dict: The run metadata and one result row per case and stage.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        samples = write_samples(os.path.join(tmp_dir, "samples"), kinds, lengths, seed)
+        for name, sample in samples.items():
+            for bpm in bpms:
+                for (pulses, steps), quality in itertools.product(rhythms, qualities):
+                    params = job_params(sample["path"], bpm, pulses, steps)
+                    timings = bench_case(params, tmp_dir, repeats, seed, pitch, quality)
+                    for stage, timing in timings.items():
+                        results.append(
+                            {
+                                "sample": name,
+                                "kind": sample["kind"],
+                                "seconds": sample["seconds"],
+                                "bpm": bpm,
+                                "pulses": pulses,
+                                "steps": steps,
+                                "quality": quality,
+                                "stage": stage,
+                                **timing,
+                            }
+                        )
+                decoded_audio_cache.invalidate(sample["path"])
+    return {"metadata": metadata(repeats, seed), "results": results}
+
+
+def metadata(repeats: int, seed: int, benchmark: str = "sequence_generator") -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True
+        ).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "benchmark": benchmark,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit or None,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "librosa": librosa.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "repeats": repeats,
+        "seed": seed,
+        "env": {
+            key: os.environ[key]
+            for key in (
+                "PITCH_SHIFT_WORKERS",
+                "AUDIO_DECODE_BACKEND",
+                "PRETRANSCODE_ASSETS",
+                "PREVIEW_SAMPLE_RATE",
+                "PREVIEW_PITCH_BACKEND",
+                "PREVIEW_PITCH_RES_TYPE",
+            )
+            if key in os.environ
+        },
+    }
+
+
+def _rhythm(value: str) -> Tuple[int, int]:
+    pulses, steps = value.split(",")
+    return int(pulses), int(steps)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--output", help="JSON file to write, stdout by default")
+    parser.add_argument(
+        "--kinds", nargs="+", default=list(SAMPLE_KINDS), choices=list(SAMPLE_KINDS)
+    )
+    parser.add_argument("--seconds", nargs="+", type=float, default=list(DEFAULT_LENGTHS))
+    parser.add_argument("--bpm", nargs="+", type=float, default=list(DEFAULT_BPMS))
+    parser.add_argument(
+        "--rhythm",
+        nargs="+",
+        type=_rhythm,
+        default=list(DEFAULT_RHYTHMS),
+        help="(pulses, steps) pairs, e.g. 5,16",
+    )
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--no-pitch", action="store_true", help="skip the pitch-shifted generation"
+    )
+    parser.add_argument(
+        "--quality", nargs="+", default=["master"], choices=list(QUALITIES)
+    )
+    args = parser.parse_args(argv)
+
+    report = run(
+        args.kinds,
+        args.seconds,
+        args.bpm,
+        args.rhythm,
+        repeats=args.repeats,
+        pitch=not args.no_pitch,
+        seed=args.seed,
+        qualities=args.quality,
+    )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Benchmarks the pitch-shift backends for speed and fidelity.
+
+Each backend shifts a harmonic tone whose shifted spectrum is known analytically. The
+throughput and the log-spectral distance to the ideally shifted tone are written as
+JSON for each backend, frame length and number of half-steps:
+
+    python -m benchmarks.bench_pitch_shift --output pitch.json
+    python -m benchmarks.bench_pitch_shift --backends librosa resample --steps -7 7
+"""
+
+import argparse
+import itertools
+import json
+import sys
+from typing import List
+
+import numpy as np
+
+from app.sequence_generator.pitch import PITCH_BACKENDS, pitch_backend
+from app.utils.quality import MASTER_SAMPLE_RATE
+from benchmarks.bench_generator import metadata, time_call
+
+DEFAULT_STEPS = (-12, -5, -1, 1, 5, 12)
+DEFAULT_FRAMES = (2048, 8192, 44100)
+FUNDAMENTAL = 220.0
+HARMONICS = 6
+
+
+def harmonic_tone(
+    length: int, n_steps: float = 0, sr: int = MASTER_SAMPLE_RATE
+) -> np.ndarray:
+    """
+    Synthesizes a tone of decaying harmonics, transposed by n_steps half-steps.
+
+    Parameters:
+        length (int): The length in samples.
+        n_steps (float, optional): The transposition. Default is 0.
+        sr (int, optional): The sample rate. Default is 44100.
+
+    Returns:
+        np.ndarray: The float32 tone.
+    """
+    t = np.arange(length) / sr
+    f0 = FUNDAMENTAL * 2 ** (n_steps / 12)
+    tone = sum(
+        np.sin(2 * np.pi * f0 * harmonic * t) / harmonic
+        for harmonic in range(1, HARMONICS + 1)
+    )
+    return (0.5 * tone / np.abs(tone).max()).astype(np.float32)
+
+
+def spectral_distance(audio: np.ndarray, reference: np.ndarray, floor_db=-80.0):
+    """
+    Returns the log-spectral distance in dB between the average magnitude spectra of
+    two signals, each normalized to its peak and floored at floor_db.
+
+    Parameters:
+        audio (np.ndarray): The signal to rate.
+        reference (np.ndarray): The ideal signal.
+        floor_db (float, optional): The floor of the spectra. Default is -80.
+
+    Returns:
+        float: The distance; 0 for identical spectra.
+    """
+
+    def spectrum_db(signal):
+        n_fft = min(2048, len(signal))
+        frames = np.lib.stride_tricks.sliding_window_view(signal, n_fft)[:: n_fft // 4]
+        magnitude = np.abs(np.fft.rfft(frames * np.hanning(n_fft), axis=1)).mean(axis=0)
+        magnitude /= max(magnitude.max(), 1e-12)
+        return np.maximum(20 * np.log10(np.maximum(magnitude, 1e-12)), floor_db)
+
+    difference = spectrum_db(audio) - spectrum_db(reference)
+    return float(np.sqrt(np.mean(difference**2)))
+
+
+def bench_backend(
+    name: str, frame_length: int, n_steps: float, repeats: int, sr: int
+) -> dict:
+    """
+    Times one backend on one frame and rates its output.
+
+    Parameters:
+        name (str): The backend, a key of PITCH_BACKENDS.
+        frame_length (int): The frame length in samples.
+        n_steps (float): The number of half-steps.
+        repeats (int): The number of timed calls.
+        sr (int): The sample rate.
+
+    Returns:
+        dict: The timing, see time_call(), the throughput as samples per second and
+            times realtime, and the spectral distance to the ideal shift.
+    """
+    backend = pitch_backend(name)
+    frame = harmonic_tone(frame_length, sr=sr)
+    timing = time_call(lambda: backend.shift(frame, sr, n_steps), repeats)
+    shifted = backend.shift(frame, sr, n_steps)
+    seconds = max(timing["median_ms"], 1e-3) / 1000
+    return {
+        **timing,
+        "samples_per_second": round(frame_length / seconds),
+        "x_realtime": round(frame_length / sr / seconds, 2),
+        "spectral_distance_db": round(
+            spectral_distance(shifted, harmonic_tone(frame_length, n_steps, sr)), 3
+        ),
+    }
+
+
+def run(
+    backends: List[str],
+    frames: List[int],
+    steps: List[float],
+    repeats: int = 5,
+    sr: int = MASTER_SAMPLE_RATE,
+) -> dict:
+    """
+    Runs the benchmark grid.
+
+    Parameters:
+        backends (List[str]): The backends, keys of PITCH_BACKENDS.
+        frames (List[int]): The frame lengths in samples.
+        steps (List[float]): The numbers of half-steps.
+        repeats (int, optional): The number of timed calls per case. Default is 5.
+        sr (int, optional): The sample rate. Default is 44100.
+
+    Returns:
+        dict: The run metadata and one result row per case.
+    """
+    results = []
+    for name, frame_length, n_steps in itertools.product(backends, frames, steps):
+        results.append(
+            {
+                "backend": name,
+                "frame_length": frame_length,
+                "n_steps": n_steps,
+                "sr": sr,
+                **bench_backend(name, frame_length, n_steps, repeats, sr),
+            }
+        )
+    return {"metadata": metadata(repeats, 0, "pitch_shift"), "results": results}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--output", help="JSON file to write, stdout by default")
+    parser.add_argument(
+        "--backends",
+        nargs="+",
+        default=list(PITCH_BACKENDS),
+        choices=list(PITCH_BACKENDS),
+    )
+    parser.add_argument("--frames", nargs="+", type=int, default=list(DEFAULT_FRAMES))
+    parser.add_argument("--steps", nargs="+", type=float, default=list(DEFAULT_STEPS))
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--sr", type=int, default=MASTER_SAMPLE_RATE)
+    args = parser.parse_args(argv)
+
+    report = run(args.backends, args.frames, args.steps, args.repeats, args.sr)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
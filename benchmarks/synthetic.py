@@ -0,0 +1,126 @@
+import os
+from typing import Dict, Iterable
+
+import numpy as np
+import soundfile as sf
+
+SAMPLE_RATE = 44100
+
+
+def _envelope(length: int, decay: float, sr: int) -> np.ndarray:
+    return np.exp(-np.arange(length) / (decay * sr))
+
+
+def _place(audio: np.ndarray, hit: np.ndarray, onset: int) -> None:
+    end = min(len(audio), onset + len(hit))
+    audio[onset:end] += hit[: end - onset]
+
+
+def drum_loop(seconds: float, bpm: float = 120, seed: int = 0, sr: int = SAMPLE_RATE):
+    """
+    Synthesizes a kick, snare and hi-hat loop on a 16th-note grid.
+
+    Parameters:
+        seconds (float): The length of the loop.
+        bpm (float, optional): The tempo of the loop. Default is 120.
+        seed (int, optional): Seeds the noise of the snare and hi-hat. Default is 0.
+        sr (int, optional): The sample rate. Default is 44100.
+
+    Returns:
+        np.ndarray: The float32 mono loop.
+    """
+    rng = np.random.default_rng(seed)
+    audio = np.zeros(int(seconds * sr), dtype=np.float64)
+    step = 60 / bpm / 4 * sr
+
+    kick_t = np.arange(int(0.25 * sr)) / sr
+    kick = np.sin(2 * np.pi * (50 + 100 * np.exp(-kick_t * 30)) * kick_t)
+    kick *= _envelope(len(kick_t), 0.08, sr)
+    snare = rng.uniform(-1, 1, int(0.15 * sr)) * _envelope(int(0.15 * sr), 0.04, sr)
+    hat = rng.uniform(-1, 1, int(0.05 * sr)) * _envelope(int(0.05 * sr), 0.01, sr)
+
+    for i in range(int(len(audio) / step) + 1):
+        onset = int(i * step)
+        if i % 4 == 0:
+            _place(audio, 0.9 * kick, onset)
+        if i % 8 == 4:
+            _place(audio, 0.6 * snare, onset)
+        _place(audio, 0.2 * hat, onset)
+    return np.clip(audio, -1, 1).astype(np.float32)
+
+
+def one_shot(seconds: float, seed: int = 0, sr: int = SAMPLE_RATE):
+    """
+    Synthesizes a single decaying hit: a noise transient over a detuned tone.
+
+    Parameters:
+        seconds (float): The length of the sample.
+        seed (int, optional): Seeds the transient and the pitch. Default is 0.
+        sr (int, optional): The sample rate. Default is 44100.
+
+    Returns:
+        np.ndarray: The float32 mono one-shot.
+    """
+    rng = np.random.default_rng(seed)
+    length = int(seconds * sr)
+    t = np.arange(length) / sr
+    frequency = 220 * 2 ** (rng.integers(0, 12) / 12)
+    tone = np.sin(2 * np.pi * frequency * t) + 0.5 * np.sin(
+        2 * np.pi * 1.01 * frequency * t
+    )
+    transient = rng.uniform(-1, 1, length) * _envelope(length, 0.005, sr)
+    audio = 0.5 * tone * _envelope(length, seconds / 4, sr) + 0.3 * transient
+    return np.clip(audio, -1, 1).astype(np.float32)
+
+
+def bass(seconds: float, bpm: float = 120, seed: int = 0, sr: int = SAMPLE_RATE):
+    """
+    Synthesizes a saw-wave bass line playing a random note on every 8th note.
+
+    Parameters:
+        seconds (float): The length of the line.
+        bpm (float, optional): The tempo of the line. Default is 120.
+        seed (int, optional): Seeds the notes. Default is 0.
+        sr (int, optional): The sample rate. Default is 44100.
+
+    Returns:
+        np.ndarray: The float32 mono bass line.
+    """
+    rng = np.random.default_rng(seed)
+    audio = np.zeros(int(seconds * sr), dtype=np.float64)
+    note_length = int(60 / bpm / 2 * sr)
+    t = np.arange(note_length) / sr
+    for onset in range(0, len(audio), note_length):
+        frequency = 55 * 2 ** (rng.integers(0, 12) / 12)
+        saw = 2 * (t * frequency % 1) - 1
+        _place(audio, 0.5 * saw * _envelope(note_length, 0.2, sr), onset)
+    return np.clip(audio, -1, 1).astype(np.float32)
+
+
+SAMPLE_KINDS = {"drum_loop": drum_loop, "one_shot": one_shot, "bass": bass}
+
+
+def write_samples(
+    directory: str, kinds: Iterable[str], lengths: Iterable[float], seed: int = 0
+) -> Dict[str, dict]:
+    """
+    Writes one 16-bit wav per sample kind and length.
+
+    Parameters:
+        directory (str): The output directory.
+        kinds (Iterable[str]): Keys of SAMPLE_KINDS.
+        lengths (Iterable[float]): The sample lengths in seconds.
+        seed (int, optional): Seeds every generator. Default is 0.
+
+    Returns:
+        Dict[str, dict]: The path, kind and length of each sample, keyed by sample name.
+    """
+    os.makedirs(directory, exist_ok=True)
+    samples = {}
+    for kind in kinds:
+        for seconds in lengths:
+            name = f"{kind}_{seconds:g}s"
+            path = os.path.join(directory, f"{name}.wav")
+            sf.write(path, SAMPLE_KINDS[kind](seconds, seed=seed), SAMPLE_RATE, "PCM_16")
+            samples[name] = {"path": path, "kind": kind, "seconds": seconds}
+    return samples
@@ -1,7 +1,7 @@
 #!/bin/bash
 
 PREFIX="tests.test_"
-TEST_FILES=("auth" "activity" "generator" "mixer" "post_fx" "storage" "utils")
+TEST_FILES=("auth" "activity" "analysis" "asset_cache" "benchmarks" "cache" "catalog" "decode" "generator" "ingest" "mixer" "notes" "pitch" "plan" "post_fx" "quality" "ragged" "render_cache" "rhythm" "storage" "symbolic" "tempo" "tiles" "timing" "transposition" "utils")
 
 for test_file in "${TEST_FILES[@]}"
 do
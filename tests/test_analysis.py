@@ -0,0 +1,110 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+import numpy as np
+from app.sequence_generator.analysis import (
+    analysis_path,
+    analyze_audio,
+    read_analysis,
+    snap_to_onsets,
+    transient_onsets,
+    write_analysis,
+)
+
+
+def clicks(positions, n_samples=44100):
+    audio = np.zeros(n_samples, dtype=np.float32)
+    for position in positions:
+        audio[position : position + 200] = np.hanning(400)[200:] * 0.8
+    return audio
+
+
+class TestAnalyzeAudio(unittest.TestCase):
+    def test_analysis(self):
+        audio = clicks([4410, 22050])
+        analysis = analyze_audio(audio, sr=44100, size=1234, bpm=120.0, key="Am")
+
+        self.assertEqual(analysis["n_samples"], 44100)
+        self.assertEqual(analysis["sr"], 44100)
+        self.assertAlmostEqual(analysis["duration"], 1.0)
+        self.assertAlmostEqual(analysis["peak"], 0.8, places=3)
+        self.assertGreater(analysis["rms"], 0)
+        self.assertEqual(
+            (analysis["size"], analysis["bpm"], analysis["key"]), (1234, 120.0, "Am")
+        )
+        self.assertEqual(len(analysis["onsets"]), 2)
+        for onset, click in zip(analysis["onsets"], [4410, 22050]):
+            self.assertLess(abs(onset - click), 1024)
+        # the sidecar is JSON
+        json.dumps(analysis)
+
+    def test_silence(self):
+        analysis = analyze_audio(np.zeros(0, dtype=np.float32))
+        self.assertEqual(
+            (analysis["n_samples"], analysis["peak"], analysis["onsets"]), (0, 0.0, [])
+        )
+
+
+class TestAnalysisSidecar(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.asset_path = os.path.join(self.tmp_dir, "loop.wav")
+        with open(self.asset_path, "wb") as f:
+            f.write(b"a" * 100)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write(self, **fields):
+        analysis = analyze_audio(clicks([4410]), size=100)
+        analysis.update(fields)
+        return write_analysis(self.asset_path, analysis)
+
+    def test_round_trip(self):
+        path = self.write()
+        self.assertEqual(path, analysis_path(self.asset_path))
+        self.assertEqual(read_analysis(self.asset_path)["n_samples"], 44100)
+
+    def test_missing_sidecar(self):
+        self.assertIsNone(read_analysis(self.asset_path))
+
+    def test_sidecar_of_another_asset_version(self):
+        self.write(size=99)
+        self.assertIsNone(read_analysis(self.asset_path))
+
+    def test_sidecar_of_another_format_version(self):
+        self.write(version=0)
+        self.assertIsNone(read_analysis(self.asset_path))
+
+    def test_unreadable_sidecar(self):
+        with open(analysis_path(self.asset_path), "w") as f:
+            f.write("{")
+        self.assertIsNone(read_analysis(self.asset_path))
+
+    def test_transient_onsets(self):
+        self.write(onsets=[10, 20])
+        self.assertEqual(transient_onsets(self.asset_path), [10, 20])
+        self.assertEqual(transient_onsets(self.asset_path, sr=22050), [5, 10])
+        with patch.dict(os.environ, {"SLICE_ALIGN_TRANSIENTS": "false"}):
+            self.assertIsNone(transient_onsets(self.asset_path))
+
+
+class TestSnapToOnsets(unittest.TestCase):
+    def test_offsets_move_to_nearby_onsets(self):
+        offsets = np.arange(0, 4000, 1000)
+        snapped = snap_to_onsets(offsets, [90, 1240, 2600, 2990], 1000)
+        np.testing.assert_array_equal(snapped, [90, 1240, 2000, 2990])
+
+    def test_offsets_collapsing_on_an_onset_are_merged(self):
+        snapped = snap_to_onsets([0, 100, 200], [150], 400)
+        np.testing.assert_array_equal(snapped, [0, 150])
+
+    def test_without_onsets(self):
+        np.testing.assert_array_equal(snap_to_onsets([0, 100], [], 100), [0, 100])
+
+
+if __name__ == "__main__":
+    unittest.main()
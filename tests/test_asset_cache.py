@@ -0,0 +1,209 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+import boto3
+from moto import mock_s3
+from unittest.mock import patch
+from app.storage.asset_cache import AssetCache
+from app.utils.cache import file_lock
+
+
+@mock_s3
+class TestAssetCache(unittest.TestCase):
+    def setUp(self):
+        self.mock_s3 = mock_s3()
+        self.mock_s3.start()
+        s3_resource = boto3.resource("s3", region_name="us-east-1")
+        s3_resource.create_bucket(Bucket="test-bucket")
+        self.bucket = s3_resource.Bucket("test-bucket")
+
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.directory = self.tmp_dir.name
+        self.cache = AssetCache(self.directory, max_bytes=1024, validate=True)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+        self.mock_s3.stop()
+
+    def put(self, key, body):
+        self.bucket.put_object(Key=key, Body=body)
+
+    def local(self, name):
+        return os.path.join(self.directory, name)
+
+    def test_downloads_once(self):
+        self.put("sounds/a.mp3", b"a" * 100)
+
+        with patch.object(
+            self.bucket, "download_file", wraps=self.bucket.download_file
+        ) as d:
+            self.assertTrue(
+                self.cache.fetch(self.bucket, "sounds/a.mp3", self.local("a.mp3"))
+            )
+            self.assertFalse(
+                self.cache.fetch(self.bucket, "sounds/a.mp3", self.local("a.mp3"))
+            )
+        d.assert_called_once()
+        with open(self.local("a.mp3"), "rb") as f:
+            self.assertEqual(f.read(), b"a" * 100)
+        self.assertEqual(
+            [name for name in os.listdir(self.directory) if name.endswith(".tmp")], []
+        )
+
+    def test_changed_object_is_downloaded_again(self):
+        self.put("sounds/a.mp3", b"a" * 100)
+        self.cache.fetch(self.bucket, "sounds/a.mp3", self.local("a.mp3"))
+        self.put("sounds/a.mp3", b"b" * 100)
+
+        self.assertTrue(
+            self.cache.fetch(self.bucket, "sounds/a.mp3", self.local("a.mp3"))
+        )
+        with open(self.local("a.mp3"), "rb") as f:
+            self.assertEqual(f.read(), b"b" * 100)
+
+    def test_truncated_copy_is_downloaded_again(self):
+        cache = AssetCache(self.directory, max_bytes=1024, validate=False)
+        self.put("sounds/a.mp3", b"a" * 100)
+        cache.fetch(self.bucket, "sounds/a.mp3", self.local("a.mp3"))
+        self.assertFalse(cache.fetch(self.bucket, "sounds/a.mp3", self.local("a.mp3")))
+
+        with open(self.local("a.mp3"), "wb") as f:
+            f.write(b"a" * 10)
+        self.assertTrue(cache.fetch(self.bucket, "sounds/a.mp3", self.local("a.mp3")))
+
+    def test_failed_download_leaves_nothing(self):
+        with self.assertRaises(Exception):
+            self.cache.fetch(self.bucket, "sounds/missing.mp3", self.local("missing.mp3"))
+        self.assertFalse(os.path.exists(self.local("missing.mp3")))
+
+    def test_evicts_least_recently_used(self):
+        for name in ("a", "b", "c"):
+            self.put(f"sounds/{name}.mp3", name.encode() * 400)
+        self.cache.fetch(self.bucket, "sounds/a.mp3", self.local("a.mp3"))
+        with open(self.local("a.bank.npy"), "wb") as f:
+            f.write(b"0" * 10)
+        time.sleep(0.01)
+        self.cache.fetch(self.bucket, "sounds/b.mp3", self.local("b.mp3"))
+        time.sleep(0.01)
+        # a is used again, so b is now the least recently used asset
+        self.cache.fetch(self.bucket, "sounds/a.mp3", self.local("a.mp3"))
+        time.sleep(0.01)
+        self.cache.fetch(self.bucket, "sounds/c.mp3", self.local("c.mp3"))
+
+        self.assertFalse(os.path.exists(self.local("b.mp3")))
+        self.assertFalse(os.path.exists(self.local("b.mp3.meta.json")))
+        self.assertTrue(os.path.exists(self.local("c.mp3")))
+
+        self.assertEqual(
+            self.cache.evict(max_bytes=0, keep=[self.local("c.mp3")]),
+            [self.local("a.mp3")],
+        )
+        self.assertFalse(os.path.exists(self.local("a.bank.npy")))
+        self.assertTrue(os.path.exists(self.local("c.mp3")))
+
+    def test_busy_assets_are_not_evicted(self):
+        self.put("sounds/a.mp3", b"a" * 100)
+        self.cache.fetch(self.bucket, "sounds/a.mp3", self.local("a.mp3"))
+
+        with self.cache.in_use(self.local("a.mp3")):
+            self.assertEqual(self.cache.evict(max_bytes=0), [])
+        self.assertEqual(self.cache.evict(max_bytes=0), [self.local("a.mp3")])
+
+    def test_assets_are_deleted_under_the_exclusive_lock(self):
+        self.put("sounds/a.mp3", b"a" * 100)
+        self.cache.fetch(self.bucket, "sounds/a.mp3", self.local("a.mp3"))
+        remove = os.remove
+        shared_locks = []
+
+        def checked_remove(path):
+            # no worker can start using the asset while it is deleted
+            with file_lock(
+                self.cache.use_lock_path(self.local("a.mp3")), shared=True, blocking=False
+            ) as locked:
+                shared_locks.append(locked)
+            remove(path)
+
+        with patch("app.utils.cache.os.remove", side_effect=checked_remove):
+            self.assertEqual(self.cache.evict(max_bytes=0), [self.local("a.mp3")])
+        self.assertEqual(shared_locks, [False, False])
+
+    def test_replaced_and_evicted_assets_are_forgotten(self):
+        self.put("sounds/a.mp3", b"a" * 100)
+        with patch("app.storage.asset_cache.decoded_audio_cache") as decodes, patch(
+            "app.storage.asset_cache.sequence_plan_cache"
+        ) as plans:
+            self.cache.fetch(self.bucket, "sounds/a.mp3", self.local("a.mp3"))
+            self.cache.fetch(self.bucket, "sounds/a.mp3", self.local("a.mp3"))
+            decodes.invalidate.assert_called_once_with(self.local("a.mp3"))
+            plans.invalidate.assert_called_once_with(self.local("a.mp3"))
+
+            with open(self.local("a.bpm90.0.1.npy"), "wb") as f:
+                f.write(b"0" * 10)
+            decodes.reset_mock()
+            plans.reset_mock()
+            self.assertEqual(self.cache.evict(max_bytes=0), [self.local("a.mp3")])
+        forgotten = [call.args[0] for call in plans.invalidate.call_args_list]
+        self.assertIn(self.local("a.mp3"), forgotten)
+        self.assertIn(self.local("a.bpm90.0.1.npy"), forgotten)
+        self.assertEqual(
+            decodes.invalidate.call_args_list, plans.invalidate.call_args_list
+        )
+
+    def test_companions_match_exact_names(self):
+        names = [
+            "kick.mp3.meta.json",
+            "kick.mp3.analysis.json",
+            "kick.44100.npy",
+            "kick.bank.npy",
+            "kick.bpm92.5.44100.npy",
+            "kick.bpm92.5.44100.bank.npy",
+            "kick.bpm92.5.44100.npy.analysis.json",
+            # another asset's sidecars
+            "kick.v2.mp3.meta.json",
+            "kick.v2.mp3.analysis.json",
+            "kick.v2.44100.npy",
+            "kick.v2.bank.npy",
+            "kick.v2.bpm120.44100.npy",
+        ]
+        for name in names:
+            with open(self.local(name), "wb") as f:
+                f.write(b"0")
+
+        self.assertEqual(
+            sorted(filter(os.path.exists, self.cache.companions(self.local("kick.mp3")))),
+            sorted(self.local(name) for name in names[:7]),
+        )
+
+    def test_fetch_analysis(self):
+        self.put("sounds/a.mp3", b"a" * 100)
+        self.cache.fetch(self.bucket, "sounds/a.mp3", self.local("a.mp3"))
+        self.assertFalse(
+            self.cache.fetch_analysis(self.bucket, "sounds/a.mp3", self.local("a.mp3"))
+        )
+
+        analysis = {"version": 1, "size": 100, "sr": 44100, "n_samples": 10, "onsets": []}
+        self.put("sounds/a.mp3.analysis.json", json.dumps(analysis).encode())
+        # the miss is remembered until the asset changes
+        self.assertFalse(
+            self.cache.fetch_analysis(self.bucket, "sounds/a.mp3", self.local("a.mp3"))
+        )
+        self.cache._missing_analyses.clear()
+        with patch.object(
+            self.bucket, "download_file", wraps=self.bucket.download_file
+        ) as d:
+            for __ in range(2):
+                self.assertTrue(
+                    self.cache.fetch_analysis(
+                        self.bucket, "sounds/a.mp3", self.local("a.mp3")
+                    )
+                )
+        d.assert_called_once()
+
+        self.assertEqual(self.cache.evict(max_bytes=0), [self.local("a.mp3")])
+        self.assertFalse(os.path.exists(self.local("a.mp3.analysis.json")))
+
+
+if __name__ == "__main__":
+    unittest.main()
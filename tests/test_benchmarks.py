@@ -0,0 +1,128 @@
+import json
+import os
+import tempfile
+import unittest
+import numpy as np
+from benchmarks import bench_generator, bench_pitch_shift
+from benchmarks.synthetic import SAMPLE_KINDS, write_samples
+
+
+class TestSyntheticSamples(unittest.TestCase):
+    def test_samples_are_deterministic(self):
+        for kind, generate in SAMPLE_KINDS.items():
+            with self.subTest(kind=kind):
+                audio = generate(0.5, seed=3)
+                self.assertEqual(audio.dtype, np.float32)
+                self.assertEqual(len(audio), 22050)
+                self.assertLessEqual(np.abs(audio).max(), 1)
+                np.testing.assert_array_equal(audio, generate(0.5, seed=3))
+
+    def test_write_samples(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            samples = write_samples(tmp_dir, ["drum_loop", "bass"], [0.5, 1])
+            self.assertEqual(
+                sorted(samples),
+                ["bass_0.5s", "bass_1s", "drum_loop_0.5s", "drum_loop_1s"],
+            )
+            for sample in samples.values():
+                self.assertTrue(os.path.exists(sample["path"]))
+
+
+class TestBenchGenerator(unittest.TestCase):
+    def test_main_writes_json(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output = os.path.join(tmp_dir, "bench.json")
+            bench_generator.main(
+                [
+                    "--output",
+                    output,
+                    "--kinds",
+                    "drum_loop",
+                    "--seconds",
+                    "1",
+                    "--bpm",
+                    "120",
+                    "--rhythm",
+                    "3,8",
+                    "--repeats",
+                    "1",
+                    "--no-pitch",
+                    "--quality",
+                    "master",
+                    "preview",
+                ]
+            )
+            with open(output) as f:
+                report = json.load(f)
+
+        self.assertEqual(report["metadata"]["repeats"], 1)
+        stages = {row["stage"] for row in report["results"]}
+        self.assertTrue(
+            {
+                "decode",
+                "config",
+                "config_cached",
+                "slice",
+                "generate",
+                "serialize_ragged",
+                "serialize_symbolic",
+                "render_symbolic",
+                "serialize_wav",
+            }
+            <= stages
+        )
+        self.assertNotIn("generate_pitch_shift", stages)
+        self.assertEqual(
+            {row["quality"] for row in report["results"]}, {"master", "preview"}
+        )
+        for row in report["results"]:
+            self.assertEqual((row["pulses"], row["steps"], row["bpm"]), (3, 8, 120))
+            self.assertGreaterEqual(row["median_ms"], row["min_ms"])
+
+
+class TestBenchPitchShift(unittest.TestCase):
+    def test_harmonic_tone(self):
+        tone = bench_pitch_shift.harmonic_tone(4096, n_steps=12)
+        self.assertEqual((len(tone), tone.dtype), (4096, np.float32))
+        self.assertAlmostEqual(
+            bench_pitch_shift.spectral_distance(tone, tone.copy()), 0.0
+        )
+        self.assertGreater(
+            bench_pitch_shift.spectral_distance(
+                tone, bench_pitch_shift.harmonic_tone(4096)
+            ),
+            1,
+        )
+
+    def test_main_writes_json(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output = os.path.join(tmp_dir, "pitch.json")
+            bench_pitch_shift.main(
+                [
+                    "--output",
+                    output,
+                    "--backends",
+                    "librosa",
+                    "resample",
+                    "--frames",
+                    "4096",
+                    "--steps",
+                    "-3",
+                    "--repeats",
+                    "1",
+                ]
+            )
+            with open(output) as f:
+                report = json.load(f)
+
+        self.assertEqual(report["metadata"]["benchmark"], "pitch_shift")
+        self.assertEqual(
+            [row["backend"] for row in report["results"]], ["librosa", "resample"]
+        )
+        for row in report["results"]:
+            self.assertGreater(row["x_realtime"], 0)
+            self.assertGreaterEqual(row["spectral_distance_db"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,152 @@
+import unittest
+import os
+import tempfile
+from unittest.mock import patch
+import numpy as np
+from app.utils.cache import LRUCache, evict_directory, nbytes_of, touch_atime
+from app.sequence_generator.audio_cache import DecodedAudioCache
+
+
+class TestLRUCache(unittest.TestCase):
+    def test_get_and_put(self):
+        cache = LRUCache(max_bytes=1024)
+        cache.put("a", np.zeros(10, dtype=np.float32))
+        self.assertEqual(len(cache.get("a")), 10)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(max_bytes=100)
+        cache.put("a", np.zeros(10, dtype=np.float32))
+        cache.put("b", np.zeros(10, dtype=np.float32))
+        cache.get("a")
+        cache.put("c", np.zeros(10, dtype=np.float32))
+        self.assertIn("a", cache)
+        self.assertNotIn("b", cache)
+        self.assertIn("c", cache)
+        self.assertLessEqual(cache.current_bytes, 100)
+
+    def test_skips_values_larger_than_cap(self):
+        cache = LRUCache(max_bytes=10)
+        cache.put("a", np.zeros(10, dtype=np.float32))
+        self.assertNotIn("a", cache)
+
+    def test_get_or_compute(self):
+        cache = LRUCache(max_bytes=1024)
+        calls = []
+        compute = lambda: calls.append(1) or np.ones(4)  # noqa: E731
+        cache.get_or_compute("a", compute)
+        cache.get_or_compute("a", compute)
+        self.assertEqual(len(calls), 1)
+
+    def test_invalidate(self):
+        cache = LRUCache(max_bytes=1024)
+        cache.put(("x", 1), 1)
+        cache.put(("y", 1), 2)
+        removed = cache.invalidate(lambda key: key[0] == "x")
+        self.assertEqual(removed, 1)
+        self.assertNotIn(("x", 1), cache)
+
+    def test_counting(self):
+        cache = LRUCache.counting(2)
+        cache.put("a", np.zeros(1000))
+        cache.put("b", "b")
+        cache.put("c", None)
+        self.assertNotIn("a", cache)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.current_bytes, 2)
+
+    def test_nbytes_of(self):
+        self.assertEqual(nbytes_of(np.zeros(4, dtype=np.float32)), 16)
+        self.assertEqual(nbytes_of((np.zeros(4, dtype=np.float32),) * 2), 32)
+
+
+class TestEvictDirectory(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.directory = self.tmp_dir.name
+        for i, name in enumerate(["a.mp3", "b.mp3", "c.mp3", "a.txt"]):
+            path = os.path.join(self.directory, name)
+            with open(path, "wb") as f:
+                f.write(b"0" * 100)
+            os.utime(path, ns=(i * 10**9, 0))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def test_evicts_oldest_first(self):
+        evicted = evict_directory(self.directory, 250, ["*.mp3"])
+        self.assertEqual(evicted, [self.path("a.mp3")])
+        self.assertTrue(os.path.exists(self.path("a.txt")))
+
+    def test_touch_keeps_mtime(self):
+        mtime = os.stat(self.path("a.mp3")).st_mtime_ns
+        touch_atime(self.path("a.mp3"))
+        self.assertEqual(os.stat(self.path("a.mp3")).st_mtime_ns, mtime)
+        self.assertEqual(
+            evict_directory(self.directory, 250, ["*.mp3"]), [self.path("b.mp3")]
+        )
+
+    def test_companions_and_can_evict(self):
+        evicted = evict_directory(
+            self.directory,
+            100,
+            ["*.mp3"],
+            companions=lambda path: [path.replace(".mp3", ".txt")],
+            can_evict=lambda path: not path.endswith("b.mp3"),
+        )
+        # a.mp3 and its companion count 200 bytes, b.mp3 is kept
+        self.assertEqual(evicted, [self.path("a.mp3"), self.path("c.mp3")])
+        self.assertFalse(os.path.exists(self.path("a.txt")))
+        self.assertTrue(os.path.exists(self.path("b.mp3")))
+
+
+class TestDecodedAudioCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.NamedTemporaryFile(suffix=".mp3", delete=False)
+        self.tmp.write(b"audio")
+        self.tmp.close()
+        self.cache = DecodedAudioCache(max_bytes=10 * 1024 * 1024)
+
+    def tearDown(self):
+        os.remove(self.tmp.name)
+
+    @patch("librosa.load")
+    def test_decodes_once(self, mock_load):
+        mock_load.return_value = (np.zeros(44100, dtype=np.float32), 44100)
+        first = self.cache.load(self.tmp.name)
+        second = self.cache.load(self.tmp.name)
+        mock_load.assert_called_once_with(self.tmp.name, sr=44100)
+        self.assertIs(first, second)
+        self.assertFalse(first.flags.writeable)
+
+    @patch("librosa.load")
+    def test_decodes_again_after_rewrite(self, mock_load):
+        mock_load.return_value = (np.zeros(44100, dtype=np.float32), 44100)
+        self.cache.load(self.tmp.name)
+        with open(self.tmp.name, "ab") as f:
+            f.write(b"more audio")
+        self.cache.load(self.tmp.name)
+        self.assertEqual(mock_load.call_count, 2)
+
+    @patch("librosa.load")
+    def test_missing_file_is_not_cached(self, mock_load):
+        mock_load.return_value = (np.zeros(10, dtype=np.float32), 44100)
+        self.cache.load("path/does/not/exist.mp3")
+        self.cache.load("path/does/not/exist.mp3")
+        self.assertEqual(mock_load.call_count, 2)
+        self.assertEqual(len(self.cache.cache), 0)
+
+    @patch("librosa.load")
+    def test_invalidate(self, mock_load):
+        mock_load.return_value = (np.zeros(10, dtype=np.float32), 44100)
+        self.cache.load(self.tmp.name)
+        self.assertEqual(self.cache.invalidate(self.tmp.name), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
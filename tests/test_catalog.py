@@ -0,0 +1,301 @@
+import json
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+import numpy as np
+import pandas as pd
+from fastapi import HTTPException
+from app import file_management
+from app.storage.catalog import AliasTable, CatalogSettings, SampleCatalog
+
+ROWS = [
+    ("sample-dump", "sp_loop__drums_full/PITCH_C__BPM_120__loop_a.mp3"),
+    ("sample-dump", "sp_loop__drums_full/PITCH_Am__BPM_90__loop_b.mp3"),
+    ("sample-dump", "sp_loop__drums_full/loop_c.mp3"),
+    ("sample-dump", "sp_loop__bass/PITCH_C__BPM_128__bass.mp3"),
+    ("sample-dump", "sp_loop__bass/notes.txt"),
+    ("sample-dump", "mixdown/mixdown_a.mp3"),
+    ("sample-dump", "sp_loop__bass/nested/bass.mp3"),
+]
+ROWS_PATHS = [path for __, path in ROWS]
+
+
+class TestAliasTable(unittest.TestCase):
+    def test_draws_follow_the_weights(self):
+        table = AliasTable([1, 0, 3, 4])
+        draws = table.draw(np.random.default_rng(0), 80000)
+        np.testing.assert_allclose(
+            np.bincount(draws, minlength=4) / len(draws),
+            [0.125, 0, 0.375, 0.5],
+            atol=0.01,
+        )
+
+    def test_invalid_weights(self):
+        for weights in ([], [0, 0], [1, -1], [1, np.inf]):
+            with self.subTest(weights=weights):
+                with self.assertRaises(ValueError):
+                    AliasTable(weights)
+
+
+class TestSampleCatalog(unittest.TestCase):
+    def setUp(self):
+        self.catalog = SampleCatalog(ROWS)
+
+    def test_only_samples_are_catalogued(self):
+        self.assertEqual(len(self.catalog), 4)
+        self.assertEqual(
+            self.catalog.labels(), {"sp_loop__bass": 1, "sp_loop__drums_full": 3}
+        )
+
+    def test_other_buckets_are_not_catalogued(self):
+        self.assertEqual(len(SampleCatalog([("favs-dump", ROWS_PATHS[0])])), 0)
+        self.assertFalse(self.catalog.add("favs-dump", "sp_loop__bass/new.mp3"))
+        self.assertFalse(self.catalog.remove(ROWS_PATHS[0], "favs-dump"))
+        self.assertEqual(len(self.catalog), 4)
+
+    def test_query_filters(self):
+        samples, total = self.catalog.query(label="sp_loop__drums_full", key="C")
+        self.assertEqual(total, 1)
+        self.assertEqual(
+            samples[0],
+            {
+                "bucket": "sample-dump",
+                "path": "sp_loop__drums_full/PITCH_C__BPM_120__loop_a.mp3",
+                "label": "sp_loop__drums_full",
+                "file": "PITCH_C__BPM_120__loop_a.mp3",
+                "bpm": 120.0,
+                "key": "C",
+            },
+        )
+
+        __, total = self.catalog.query(bpm_min=100, bpm_max=125)
+        self.assertEqual(total, 1)
+        __, total = self.catalog.query(label="unknown")
+        self.assertEqual(total, 0)
+
+    def test_query_pages(self):
+        first, total = self.catalog.query(page=1, page_size=3)
+        last, __ = self.catalog.query(page=2, page_size=3)
+        self.assertEqual(total, 4)
+        self.assertEqual((len(first), len(last)), (3, 1))
+        paths = [sample["path"] for sample in first + last]
+        self.assertEqual(paths, sorted(paths))
+
+    def test_etag_follows_the_content(self):
+        etag = self.catalog.etag
+        self.assertEqual(SampleCatalog(reversed(ROWS)).etag, etag)
+
+        self.assertTrue(self.catalog.add("sample-dump", "sp_loop__bass/new.mp3"))
+        self.assertFalse(self.catalog.add("sample-dump", "sp_loop__bass/new.mp3"))
+        self.assertNotEqual(self.catalog.etag, etag)
+
+        self.assertTrue(self.catalog.remove("sp_loop__bass/new.mp3"))
+        self.assertFalse(self.catalog.remove("sp_loop__bass/new.mp3"))
+        self.assertEqual(self.catalog.etag, etag)
+
+    def test_uniform_draw(self):
+        samples = self.catalog.draw(
+            500, rng=np.random.default_rng(0), label="sp_loop__drums_full"
+        )
+        self.assertEqual(len(samples), 500)
+        self.assertEqual(len({sample["path"] for sample in samples}), 3)
+        self.assertEqual({sample["label"] for sample in samples}, {"sp_loop__drums_full"})
+
+    def test_draws_are_seeded(self):
+        draw = lambda: self.catalog.draw(6, rng=np.random.default_rng(7))
+        self.assertEqual(draw(), draw())
+
+    def test_weighted_draw(self):
+        samples = self.catalog.draw(
+            4000,
+            weights={"sp_loop__drums_full": 1, "sp_loop__bass": 3, "unknown": 5},
+            rng=np.random.default_rng(0),
+        )
+        bass = sum(sample["label"] == "sp_loop__bass" for sample in samples)
+        self.assertAlmostEqual(bass / len(samples), 0.75, delta=0.03)
+
+    def test_draw_without_matches(self):
+        self.assertEqual(self.catalog.draw(3, key="F#"), [])
+        self.assertEqual(self.catalog.draw(3, weights={"unknown": 1}), [])
+
+    def test_assign(self):
+        assigned = self.catalog.assign(
+            ["sp_loop__bass", "sp_loop__drums_full"], rng=np.random.default_rng(0)
+        )
+        self.assertEqual(
+            assigned["cloud_paths"][0], "sp_loop__bass/PITCH_C__BPM_128__bass.mp3"
+        )
+        self.assertEqual(
+            assigned["local_paths"][0], "assets/sounds/PITCH_C__BPM_128__bass.mp3"
+        )
+        self.assertTrue(assigned["cloud_paths"][1].startswith("sp_loop__drums_full/"))
+        with self.assertRaises(ValueError):
+            self.catalog.assign(["unknown"])
+
+    def test_load_dataframe(self):
+        files_df = pd.DataFrame(
+            {"paths": ["sp_loop__perc/a.mp3"], "bucket": ["sample-dump"]}
+        )
+        self.assertEqual(self.catalog.load_dataframe(files_df), 1)
+        self.assertEqual(self.catalog.labels(), {"sp_loop__perc": 1})
+        self.assertIsNotNone(self.catalog.loaded_at)
+
+    def test_ensure_fresh(self):
+        manager = MagicMock()
+        manager.load_snapshot_files_from_s3.return_value = pd.DataFrame(
+            {"paths": ["sp_loop__perc/a.mp3"], "bucket": ["sample-dump"]}
+        )
+        with patch("app.storage.catalog.SnapshotManager", return_value=manager):
+            self.catalog.ensure_fresh()
+            self.catalog.ensure_fresh()
+            manager.load_snapshot_files_from_s3.assert_called_once()
+
+            # a failed reload keeps the catalog
+            self.catalog.loaded_at -= 10**6
+            manager.load_snapshot_files_from_s3.side_effect = RuntimeError("down")
+            self.catalog.ensure_fresh()
+            self.catalog._reloader.join()
+        self.assertEqual(len(self.catalog), 1)
+        self.assertEqual(manager.load_snapshot_files_from_s3.call_count, 2)
+
+    def test_reloads_are_single_flight(self):
+        started, release = threading.Event(), threading.Event()
+
+        def load_snapshot():
+            started.set()
+            release.wait(5)
+            return pd.DataFrame(
+                {"paths": ["sp_loop__perc/a.mp3"], "bucket": ["sample-dump"]}
+            )
+
+        manager = MagicMock()
+        manager.load_snapshot_files_from_s3.side_effect = load_snapshot
+        self.catalog.loaded_at = time.monotonic() - 10**6
+        with patch("app.storage.catalog.SnapshotManager", return_value=manager):
+            self.catalog.ensure_fresh()
+            started.wait(5)
+            # requests read the stale catalog while the reload runs
+            self.catalog.ensure_fresh()
+            self.assertEqual(len(self.catalog), 4)
+            release.set()
+            self.catalog._reloader.join()
+        manager.load_snapshot_files_from_s3.assert_called_once()
+        self.assertEqual(len(self.catalog), 1)
+
+    def test_notified_changes_survive_reloads(self):
+        self.catalog.add("sample-dump", "sp_loop__perc/new.mp3")
+        self.catalog.remove("sp_loop__bass/PITCH_C__BPM_128__bass.mp3")
+        self.assertFalse(self.catalog.remove("sp_loop__bass/missing.mp3"))
+
+        # a stale snapshot, listed before the notifications
+        self.catalog.load_dataframe(
+            pd.DataFrame({"paths": ROWS_PATHS, "bucket": "sample-dump"})
+        )
+        self.assertEqual(
+            self.catalog.labels(), {"sp_loop__drums_full": 3, "sp_loop__perc": 1}
+        )
+
+        # a snapshot listed after them already holds the changes
+        self.catalog.load_dataframe(
+            pd.DataFrame({"paths": ROWS_PATHS, "bucket": "sample-dump"}), time.monotonic()
+        )
+        self.assertEqual(
+            self.catalog.labels(), {"sp_loop__bass": 1, "sp_loop__drums_full": 3}
+        )
+
+    def test_reloads_drop_changes_older_than_the_refresh_window(self):
+        manager = MagicMock()
+        manager.load_snapshot_files_from_s3.return_value = pd.DataFrame(
+            {"paths": ROWS_PATHS, "bucket": "sample-dump"}
+        )
+        self.catalog.add("sample-dump", "sp_loop__perc/new.mp3")
+
+        self.catalog.load_snapshot(manager)
+        self.assertIn("sp_loop__perc", self.catalog.labels())
+
+        refresh_seconds = CatalogSettings().catalog_refresh_seconds
+        with patch(
+            "app.storage.catalog.time.monotonic",
+            return_value=time.monotonic() + refresh_seconds + 1,
+        ):
+            self.catalog.load_snapshot(manager)
+        self.assertNotIn("sp_loop__perc", self.catalog.labels())
+        self.assertEqual(self.catalog._changes, {})
+
+
+class TestCatalogEndpoints(unittest.TestCase):
+    def setUp(self):
+        self.catalog = SampleCatalog(ROWS)
+        self.catalog.loaded_at = float("inf")
+        self.patcher = patch.object(file_management, "sample_catalog", self.catalog)
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    def query(self, **params):
+        params = {
+            "label": None,
+            "key": None,
+            "bpm_min": None,
+            "bpm_max": None,
+            "page": 1,
+            "page_size": 100,
+            "if_none_match": None,
+            "current_user": None,
+            **params,
+        }
+        return file_management.query_samples(**params)
+
+    def test_query_samples(self):
+        response = self.query(page_size=3)
+        body = json.loads(response.body)
+
+        self.assertEqual(response.headers["etag"], f'"{self.catalog.etag}"')
+        self.assertEqual((body["total"], body["next_page"]), (4, 2))
+        self.assertEqual(len(body["samples"]), 3)
+        self.assertIsNone(json.loads(self.query(page=2, page_size=3).body)["next_page"])
+
+    def test_query_samples_not_modified(self):
+        etag = self.query().headers["etag"]
+        self.assertEqual(self.query(if_none_match=etag).status_code, 304)
+        self.assertEqual(self.query(if_none_match=f"W/{etag}").status_code, 304)
+
+        self.catalog.add("sample-dump", "sp_loop__bass/new.mp3")
+        self.assertEqual(self.query(if_none_match=etag).status_code, 200)
+
+    def random(self, **params):
+        params = {
+            "n": 6,
+            "label": None,
+            "key": None,
+            "bpm_min": None,
+            "bpm_max": None,
+            "weights": None,
+            "seed": 1,
+            "current_user": None,
+            **params,
+        }
+        return file_management.random_samples(**params)
+
+    def test_random_samples(self):
+        self.assertEqual(len(self.random()["samples"]), 6)
+        self.assertEqual(self.random(), self.random())
+        samples = self.random(weights="sp_loop__bass:1,sp_loop__drums_full:0")["samples"]
+        self.assertEqual({sample["label"] for sample in samples}, {"sp_loop__bass"})
+
+    def test_random_samples_errors(self):
+        for params, status in (
+            ({"weights": "sp_loop__bass"}, 422),
+            ({"weights": "sp_loop__bass:-1"}, 404),
+            ({"label": "unknown"}, 404),
+        ):
+            with self.subTest(params=params):
+                with self.assertRaises(HTTPException) as context:
+                    self.random(**params)
+                self.assertEqual(context.exception.status_code, status)
+
+
+if __name__ == "__main__":
+    unittest.main()
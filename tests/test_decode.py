@@ -0,0 +1,106 @@
+import os
+import unittest
+from unittest.mock import Mock, patch
+import numpy as np
+import soundfile as sf
+from app.sequence_generator.decode import decode_audio, load_audio, transcoded_path
+
+
+class TestDecodeAudio(unittest.TestCase):
+    def setUp(self):
+        self.path = "temp/test_decode.wav"
+        self.audio = (np.sin(np.linspace(0, 200, 44100)) * 0.5).astype(np.float32)
+        sf.write(self.path, self.audio, 44100, subtype="FLOAT")
+
+    def tearDown(self):
+        for path in (self.path, transcoded_path(self.path)):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_soundfile_skips_resampling(self):
+        with patch("app.sequence_generator.decode.librosa.resample") as mock_resample:
+            audio = decode_audio(self.path, backend="soundfile")
+        mock_resample.assert_not_called()
+        self.assertEqual(audio.dtype, np.float32)
+        np.testing.assert_array_equal(audio, self.audio)
+
+    def test_backends_agree(self):
+        np.testing.assert_allclose(
+            decode_audio(self.path, backend="soundfile"),
+            decode_audio(self.path, backend="librosa"),
+            atol=1e-6,
+        )
+
+    def test_resamples_other_rates(self):
+        sf.write(self.path, self.audio, 22050, subtype="FLOAT")
+        audio = decode_audio(self.path, backend="soundfile")
+        self.assertEqual(len(audio), 2 * len(self.audio))
+
+    def test_stereo_is_downmixed(self):
+        sf.write(self.path, np.column_stack((self.audio, -self.audio)), 44100)
+        np.testing.assert_allclose(decode_audio(self.path), 0, atol=1e-4)
+
+    @patch("app.sequence_generator.decode.shutil.which", return_value=None)
+    def test_falls_back_to_librosa(self, mock_which):
+        mock_librosa = Mock(return_value=self.audio)
+        with patch.dict(
+            "app.sequence_generator.decode._DECODERS", {"librosa": mock_librosa}
+        ):
+            audio = decode_audio(self.path, backend="ffmpeg")
+        mock_which.assert_called_once_with("ffmpeg")
+        mock_librosa.assert_called_once_with(self.path, 44100)
+        np.testing.assert_array_equal(audio, self.audio)
+
+    def test_missing_file(self):
+        with self.assertRaises(FileNotFoundError):
+            decode_audio("temp/missing_file.wav")
+
+    def test_npy_is_memory_mapped(self):
+        npy_path = transcoded_path(self.path)
+        np.save(npy_path, self.audio)
+        audio = decode_audio(npy_path)
+        self.assertIsInstance(audio, np.memmap)
+        np.testing.assert_array_equal(audio, self.audio)
+
+
+class TestLoadAudio(unittest.TestCase):
+    def setUp(self):
+        self.path = "temp/test_transcode.wav"
+        self.audio = np.random.uniform(-0.5, 0.5, 4410).astype(np.float32)
+        sf.write(self.path, self.audio, 44100, subtype="FLOAT")
+
+    def tearDown(self):
+        for path in (self.path, transcoded_path(self.path)):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_without_pretranscode(self):
+        np.testing.assert_array_equal(
+            load_audio(self.path, pretranscode=False), self.audio
+        )
+        self.assertFalse(os.path.exists(transcoded_path(self.path)))
+
+    def test_pretranscoded_copy_is_memory_mapped(self):
+        np.testing.assert_array_equal(
+            load_audio(self.path, pretranscode=True), self.audio
+        )
+        self.assertTrue(os.path.exists(transcoded_path(self.path)))
+
+        with patch("app.sequence_generator.decode.decode_audio") as mock_decode:
+            audio = load_audio(self.path, pretranscode=True)
+        mock_decode.assert_not_called()
+        self.assertIsInstance(audio, np.memmap)
+        np.testing.assert_array_equal(audio, self.audio)
+
+    def test_stale_copy_is_rebuilt(self):
+        load_audio(self.path, pretranscode=True)
+        new_audio = np.zeros(100, dtype=np.float32)
+        sf.write(self.path, new_audio, 44100, subtype="FLOAT")
+        stat = os.stat(transcoded_path(self.path))
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+        np.testing.assert_array_equal(load_audio(self.path, pretranscode=True), new_audio)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,9 +1,12 @@
 import unittest
 import os
+import tempfile
 from unittest.mock import Mock, patch, mock_open, MagicMock
 import numpy as np
+from app.storage.asset_cache import AssetCache
 from app.storage.storage import StorageEngine
 from app.utils.utils import JobConfig
+from app.utils.quality import RenderQuality
 from app.sequence_generator.generator import (
     SequenceConfigRefactor,
     SequenceAudioFrameSlicer,
@@ -11,6 +14,7 @@ from app.sequence_generator.generator import (
     AudioEngine,
     JobRunner,
 )
+from app.sequence_generator.plan import SequencePlan
 
 
 class TestSequenceConfigRefactor(unittest.TestCase):
@@ -25,6 +29,27 @@ class TestSequenceConfigRefactor(unittest.TestCase):
         }
         self.seq_refactor = SequenceConfigRefactor(self.job_params_mock)
 
+    @patch("app.sequence_generator.generator.conform_asset", return_value="variant.npy")
+    def test_asset_path_is_conformed_once(self, mock_conform_asset):
+        self.assertEqual(self.seq_refactor.asset_path(), "variant.npy")
+        self.assertEqual(self.seq_refactor.asset_path(), "variant.npy")
+        mock_conform_asset.assert_called_once_with(
+            "/path/to/audio/file.wav", 120, sr=44100
+        )
+
+    @patch("app.sequence_generator.generator.conform_asset", return_value="variant.npy")
+    def test_preview_quality(self, mock_conform_asset):
+        preview = SequenceConfigRefactor(self.job_params_mock, "preview")
+        preview.asset_path()
+        mock_conform_asset.assert_called_once_with(
+            "/path/to/audio/file.wav", 120, sr=22050
+        )
+        # the grid is the same, in half the samples
+        self.assertEqual(
+            preview._validate_grid_length(22050 * 3, 120, 12)[1] * 2,
+            self.seq_refactor._validate_grid_length(44100 * 3, 120, 12)[1],
+        )
+
     def test_euclead_rhythm_generator(self):
         result = self.seq_refactor.euclead_rhythm_generator()
         self.assertIsInstance(result, list)
@@ -56,6 +81,18 @@ class TestSequenceConfigRefactor(unittest.TestCase):
         self.assertIsInstance(result, tuple)
         self.assertEqual(len(result), 2)
 
+    @patch("app.sequence_generator.generator.read_analysis")
+    def test_grid_validate_reads_length_from_analysis(self, mock_read_analysis):
+        mock_read_analysis.return_value = {"sr": 44100, "n_samples": 44100 * 3}
+        self.seq_refactor._load_audio = MagicMock()
+
+        result = self.seq_refactor.grid_validate()
+
+        self.seq_refactor._load_audio.assert_not_called()
+        self.assertEqual(
+            result, self.seq_refactor._validate_grid(np.zeros(44100 * 3), 120, 12)
+        )
+
     @patch("librosa.load")
     def test_get_audio_frames_length(self, mock_load):
         # Mock librosa.load return value
@@ -96,10 +133,20 @@ class TestSequenceConfigRefactor(unittest.TestCase):
     def test_calculate_audio_frames_length(self):
         result = self.seq_refactor._calculate_audio_frames_length([1, 0, 0, 1, 0], 2)
         self.assertIsInstance(result, list)
+        self.assertEqual(result, [6, 4])
+
+    def test_euclead_rhythm_generator_rotation(self):
+        self.job_params_mock.get_job_params.return_value["rythm_config_list"] = [3, 8, 1]
+        result = self.seq_refactor.euclead_rhythm_generator()
+        self.assertEqual(result, [0, 0, 1, 0, 0, 1, 0, 1])
 
     def test_calculate_audio_frames_reps(self):
         result = self.seq_refactor._calculate_audio_frames_reps(10, [1, 2, 3, 4, 5])
         self.assertIsInstance(result, list)
+        self.assertEqual(result, [10, 5, 3, 2, 2])
+        self.assertEqual(
+            self.seq_refactor._calculate_audio_frames_reps(3, [4, 8]), [1, 1]
+        )
 
 
 class TestSequenceAudioFrameSlicer(unittest.TestCase):
@@ -115,6 +162,7 @@ class TestSequenceAudioFrameSlicer(unittest.TestCase):
         self.mock_sequence_config.job_params.get_job_params.return_value = {
             "local_paths": "path/to/audio.wav"
         }
+        self.mock_sequence_config.asset_path.return_value = "path/to/audio.wav"
 
         self.audio_frame_slicer = SequenceAudioFrameSlicer(self.mock_sequence_config)
 
@@ -177,12 +225,46 @@ class TestSequenceAudioFrameSlicer(unittest.TestCase):
         for r, e in zip(result, expected_result):
             np.testing.assert_array_equal(r, e)
 
+    def test_get_audio_frame_sequence_list_aligns_to_onsets(self):
+        self.mock_sequence_config.get_audio_frames_length.return_value = [11025]
+        self.mock_sequence_config.get_audio_frames_reps.return_value = [4]
+        self.audio_frame_slicer.onsets = [400, 11000, 30000]
+
+        result = self.audio_frame_slicer.get_audio_frame_sequence_list()
+
+        np.testing.assert_array_equal(result[0], [400, 11000, 22050])
+
     def test_frames_list(self):
         result = self.audio_frame_slicer.frames_list([0, 44100], 44100)
         # Check each frame has the expected length
         for frame in result:
             self.assertEqual(len(frame), 44100)
 
+    def test_frames_list_is_a_strided_view(self):
+        self.audio_frame_slicer.audio = np.arange(44100 * 3, dtype=np.float32)
+        result = self.audio_frame_slicer.frames_list(np.arange(0, 88200, 11025), 11025)
+
+        self.assertEqual(result.shape, (8, 11025))
+        self.assertTrue(np.shares_memory(result, self.audio_frame_slicer.audio))
+        self.assertFalse(result.flags.writeable)
+        for row, offset in zip(result, range(0, 88200, 11025)):
+            np.testing.assert_array_equal(
+                row, self.audio_frame_slicer.audio[offset : offset + 11025]
+            )
+
+    def test_frames_list_pads_short_audio(self):
+        self.audio_frame_slicer.audio = np.ones(1000, dtype=np.float32)
+        result = self.audio_frame_slicer.frames_list([0], 4410)
+
+        self.assertEqual(result.shape, (1, 4410))
+        np.testing.assert_array_equal(result[0, :1000], 1)
+        np.testing.assert_array_equal(result[0, 1000:], 0)
+
+    def test_frames_list_irregular_offsets(self):
+        self.audio_frame_slicer.audio = np.arange(1000, dtype=np.float32)
+        result = self.audio_frame_slicer.frames_list([0, 10, 50], 5)
+        np.testing.assert_array_equal(result[:, 0], [0, 10, 50])
+
     @patch("librosa.load")
     def test_get_audio_frames(self, mock_load):
         # Mock librosa.load return value
@@ -264,33 +346,47 @@ class TestSequenceEngine(unittest.TestCase):
     #     self.mock_frames.get_audio_frames.assert_called_once()
     #     self.mock_random_choice.assert_called()
 
-    @patch("numpy.zeros")
-    @patch("numpy.append")
-    def test_validate_sequence(self, mock_append, mock_zeros):
+    def test_validate_sequence(self):
         """
         Test the validate_sequence method of the SequenceEngine class.
         """
-        mock_zeros.return_value = [0, 0, 0]
-        mock_append.return_value = [1, 2, 3, 0, 0, 0]
-
         # Initialize the SequenceEngine with None for config and frames, as they aren't used in this method.
         engine = SequenceEngine(None, None)
 
-        # Define a test bpm and sequence
-        bpm = 120
-        new_sequence = [1, 2, 3]
+        # One bar at 120 bpm is 88200 samples
+        result = engine.validate_sequence(120, [1, 2, 3])
 
-        # Call the method under test
-        result = engine.validate_sequence(bpm, new_sequence)
+        self.assertEqual(result.dtype, np.float32)
+        self.assertEqual(len(result), 88200)
+        np.testing.assert_array_equal(result[:4], [1, 2, 3, 0])
 
-        # Perform your assertions
-        # Here, we'll just check that the method doesn't return None
-        # Update this based on your requirements
-        self.assertIsNotNone(result)
+    def test_validate_sequence_frames(self):
+        frames = [np.ones(44100), np.full(22050, 2.0), np.full(10, 3.0)]
+
+        result = SequenceEngine.validate_sequence(120, frames)
+
+        self.assertEqual(len(result), 88200)
+        np.testing.assert_array_equal(result[:44100], 1)
+        np.testing.assert_array_equal(result[44100:66150], 2)
+        np.testing.assert_array_equal(result[66150:66160], 3)
+        np.testing.assert_array_equal(result[66160:], 0)
 
-        # Check that the mock methods were called
-        mock_zeros.assert_called_once()
-        mock_append.assert_called_once()
+    def test_validate_sequence_truncates(self):
+        frames = [np.ones(60000), np.full(60000, 2.0)]
+
+        result = SequenceEngine.validate_sequence(120, frames)
+
+        self.assertEqual(len(result), 88200)
+        np.testing.assert_array_equal(result[60000:], 2)
+
+    def test_validate_sequence_flat_array(self):
+        result = SequenceEngine.validate_sequence(120, np.ones(88200))
+        np.testing.assert_array_equal(result, np.ones(88200, dtype=np.float32))
+
+    def test_validate_sequence_bars(self):
+        result = SequenceEngine.validate_sequence(120, [np.ones(100000)], bars=2)
+        self.assertEqual(len(result), 176400)
+        np.testing.assert_array_equal(result[99990:100010], [1] * 10 + [0] * 10)
 
     @patch("librosa.load")
     @patch.object(SequenceConfigRefactor, "get_audio_frames_length")
@@ -342,6 +438,88 @@ class TestSequenceEngine(unittest.TestCase):
         mock_get_note_sequence.assert_called_once()
 
 
+class TestSequenceEnginePitchShift(unittest.TestCase):
+    def setUp(self):
+        self.frames = [np.random.rand(2048).astype(np.float32) for _ in range(2)]
+        self.mock_config = MagicMock()
+        self.mock_config.get_audio_frames_length.return_value = [2048.0] * 8
+        self.mock_config.get_note_sequence.return_value = [3]
+        self.mock_config.job_params.get_job_params.return_value = {
+            "local_paths": "/path/to/audio/file.wav",
+            "bpm": 120,
+            "pitch_temperature_knob_list": [50],
+        }
+        self.mock_config.asset_path.return_value = "/path/to/audio/file.wav"
+        self.mock_config.quality = RenderQuality()
+        self.mock_config.sample_rate = 44100
+        self.mock_frames = MagicMock()
+        self.mock_frames.get_audio_frames.return_value = [self.frames]
+        self.mock_frames.get_audio_frame_sequence_list.return_value = [
+            np.array([0, 2048])
+        ]
+
+    @patch("app.sequence_generator.generator.pitch_shift_cache")
+    def test_pitch_shift_uses_frame_identity(self, mock_cache):
+        mock_cache.shift_many.side_effect = (
+            lambda frames, n_steps, frame_keys, sr, backend: frames
+        )
+        rng = MagicMock(wraps=np.random.default_rng(0))
+        rng.random.return_value = 0.9
+
+        engine = SequenceEngine(self.mock_config, self.mock_frames, rng=rng)
+        __, audio_sequence = engine.generate_audio_sequence()
+
+        mock_cache.shift_many.assert_called_once()
+        frame_keys = set(mock_cache.shift_many.call_args.args[2])
+        self.assertTrue(
+            frame_keys
+            <= {
+                ("/path/to/audio/file.wav", 0, 2048),
+                ("/path/to/audio/file.wav", 2048, 2048),
+            }
+        )
+        self.assertEqual(len(audio_sequence), 8)
+
+    @patch("app.sequence_generator.generator.pitch_shift_cache")
+    def test_seeded_sequences_are_reproducible(self, mock_cache):
+        mock_cache.shift_many.side_effect = (
+            lambda frames, n_steps, frame_keys, sr, backend: [
+                frame + n_step for frame, n_step in zip(frames, n_steps)
+            ]
+        )
+
+        sequences = [
+            SequenceEngine(
+                self.mock_config, self.mock_frames, rng=np.random.default_rng(7)
+            ).generate_audio_sequence()[1]
+            for __ in range(2)
+        ]
+
+        self.assertEqual(len(sequences[0]), len(sequences[1]))
+        for first, second in zip(*sequences):
+            np.testing.assert_array_equal(first, second)
+
+    def test_compiled_plan(self):
+        plan = SequencePlan.compile([8, 8], 120, 2048 * 12)
+        self.mock_frames.get_audio_frames.return_value = [[np.ones(11025)] * 2]
+        engine = SequenceEngine(
+            self.mock_config, self.mock_frames, rng=np.random.default_rng(0), plan=plan
+        )
+        __, audio_sequence = engine.generate_audio_sequence()
+
+        self.assertEqual(len(audio_sequence), 8)
+        self.mock_config.get_audio_frames_length.assert_not_called()
+
+    def test_frame_plan_is_shared_between_sequences(self):
+        engine = SequenceEngine(self.mock_config, self.mock_frames)
+        for __ in range(3):
+            engine.generate_audio_sequence()
+
+        self.mock_config.get_audio_frames_length.assert_called_once()
+        self.mock_config.get_note_sequence.assert_called_once()
+        self.mock_frames.get_audio_frames.assert_called_once()
+
+
 class TestAudioEngine(unittest.TestCase):
     @patch("app.sequence_generator.generator.librosa.load")
     def test_read_audio(self, mock_load):
@@ -368,6 +546,15 @@ class TestAudioEngine(unittest.TestCase):
         np.testing.assert_array_equal(args[0], np.array([1, 2, 3]))
         self.assertEqual(args[1], mock_open.return_value.__enter__.return_value)
 
+    @patch("app.sequence_generator.generator.write_ragged")
+    def test_save_to_ragged(self, mock_write_ragged):
+        frames = [np.array([1.0, 2.0]), np.array([3.0])]
+        ae = AudioEngine(frames, "dummy/path.ragged")
+        ae.save_to_ragged(bpm=120, channel=2)
+        mock_write_ragged.assert_called_once_with(
+            "dummy/path.ragged", frames, sr=44100, bpm=120, channel=2, metadata=None
+        )
+
     @patch("app.sequence_generator.generator.sf.write")
     def test_save_to_wav(self, mock_write):
         ae = AudioEngine(np.array([1, 2, 3]), "dummy/path")
@@ -420,7 +607,13 @@ class TestJobRunner(unittest.TestCase):
         self.mock_job_config.return_value.path_resolver.return_value = {
             "local_path": "some/path",
             "cloud_path": "some/cloud/path",
-            "local_path_processed_pkl": "some/other/path",
+            "local_path_processed_sequence": "some/other/path",
+        }
+        self.mock_job_config.return_value.get_job_params.return_value = {
+            "local_paths": "some/asset.wav",
+            "cloud_paths": "assets/asset.wav",
+            "bpm": 120,
+            "rythm_config_list": [3, 8],
         }
 
         self.job_runner = JobRunner("folder/job_id.json", 0, "random_id")
@@ -443,14 +636,142 @@ class TestJobRunner(unittest.TestCase):
         self, mock_sequence_engine, mock_audio_frame_slicer, mock_sequence_config
     ):
         mock_instance = mock_sequence_engine.return_value
-        mock_instance.generate_audio_sequence.return_value = (
-            "validated_audio_sequence",
-            "audio_sequence",
+        mock_instance.generate_steps.return_value = "steps"
+
+        self.assertEqual(self.job_runner.validate(), "steps")
+        self.assertEqual(self.job_runner.steps, "steps")
+
+        # the steps are drawn from the channel's compiled plan, without slicing the asset
+        plan = mock_sequence_config.return_value.plan.return_value
+        mock_audio_frame_slicer.assert_not_called()
+        mock_instance.generate_audio_sequence.assert_not_called()
+        self.assertIsNone(mock_sequence_engine.call_args.args[1])
+        self.assertIs(mock_sequence_engine.call_args.kwargs["plan"], plan)
+
+    @patch("app.sequence_generator.generator.decoded_audio_cache")
+    def test_generate_multi_bar(self, mock_audio_cache):
+        self.mock_job_config.return_value.get_job_params.return_value = {
+            "local_paths": "some/asset.wav",
+            "cloud_paths": "assets/asset.wav",
+            "bpm": 120,
+            "rythm_config_list": [3, 8],
+            "bars": 4,
+            "bar_chain": "ABA",
+        }
+        frame_slicer = MagicMock()
+        frame_slicer.get_audio_frame_sequence_list.return_value = [np.arange(0, 500, 100)]
+        engine = SequenceEngine(None, frame_slicer, rng=np.random.default_rng(0))
+        tiles = [
+            {"selection": [(0, 0), (0, 1)], "lengths": [100] * 2, "pitch": [0, 7]},
+            {"selection": [(0, 2)], "lengths": [100], "pitch": [0]},
+        ]
+
+        def generate_steps():
+            engine._steps = dict(tiles.pop(0), bank=False)
+            return engine.recorded_steps()
+
+        with patch.object(engine, "generate_steps", side_effect=generate_steps) as gen:
+            steps = self.job_runner.generate(engine)
+
+        # each distinct bar is drawn once
+        self.assertEqual(gen.call_count, 2)
+        self.assertEqual(
+            steps,
+            {
+                "offsets": [0, 100, 200],
+                "lengths": [100] * 3,
+                "pitch": [0, 7, 0],
+                "bank": False,
+            },
         )
+        header = {"chain": [0, 1, 0, 0], "masks": [None] * 4, "tiles": [2, 1]}
+        self.assertEqual(self.job_runner.sequence_header, header)
+
+        sequence = self.job_runner.symbolic_sequence()
+        self.assertEqual({key: sequence.header[key] for key in header}, header)
+        self.assertEqual(sequence.header["quality"], "master")
+
+    @staticmethod
+    def steps(n_steps):
+        return {
+            "offsets": list(range(0, 100 * n_steps, 100)),
+            "lengths": [100] * n_steps,
+            "pitch": [0] * n_steps,
+            "bank": False,
+        }
 
-        validated_audio_sequence, audio_sequence = self.job_runner.validate()
-        self.assertEqual(validated_audio_sequence, "validated_audio_sequence")
-        self.assertEqual(audio_sequence, "audio_sequence")
+    @patch("app.sequence_generator.generator.decoded_audio_cache")
+    def test_symbolic_sequence(self, mock_audio_cache):
+        mock_audio_cache.asset_digest.return_value = "digest"
+        self.job_runner.steps = dict(self.steps(2), pitch=[0, 7])
+        sequence = self.job_runner.symbolic_sequence()
+
+        self.assertEqual(
+            sequence.asset,
+            {
+                "path": "some/asset.wav",
+                "cloud_path": "assets/asset.wav",
+                "digest": "digest",
+            },
+        )
+        np.testing.assert_array_equal(sequence.offsets, [0, 100])
+        np.testing.assert_array_equal(sequence.pitch, [0, 7])
+        self.assertEqual(
+            sequence.header,
+            {
+                "sr": 44100,
+                "bpm": 120,
+                "channel": 0,
+                "quality": "master",
+                "pitch": {"backend": "librosa", "res_type": "soxr_hq", "bank": False},
+                "rhythm": [3, 8],
+            },
+        )
+
+    @patch("app.sequence_generator.generator.decoded_audio_cache")
+    def test_symbolic_result_keeps_local_paths_private(self, mock_audio_cache):
+        mock_audio_cache.asset_digest.return_value = "digest"
+        self.job_runner.steps = self.steps(2)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            sequence_path = os.path.join(tmp_dir, "sequence.sequence.json")
+            self.job_runner.save_sequence(sequence_path)
+            self.mock_job_config.return_value.path_resolver.return_value = {
+                "local_path_processed_sequence": sequence_path
+            }
+            result = self.job_runner.symbolic_result()
+
+        self.assertEqual(
+            result["asset"], {"cloud_path": "assets/asset.wav", "digest": "digest"}
+        )
+        self.assertEqual(result["steps"]["offset"], [0, 100])
+
+    @patch("app.sequence_generator.generator.decoded_audio_cache")
+    def test_preview_sequence_is_tagged(self, mock_audio_cache):
+        self.job_runner.quality = RenderQuality.resolve("preview")
+        self.job_runner.steps = self.steps(1)
+        header = self.job_runner.symbolic_sequence().header
+        self.assertEqual((header["sr"], header["quality"]), (22050, "preview"))
+        self.assertEqual(header["pitch"]["backend"], "resample")
+
+    @patch("app.sequence_generator.generator.decoded_audio_cache")
+    def test_render_key_depends_on_quality(self, mock_audio_cache):
+        mock_audio_cache.asset_digest.return_value = "digest"
+        self.job_runner.seed = 3
+        master_key = self.job_runner.render_key()
+        self.job_runner.quality = RenderQuality.resolve("preview")
+        self.assertNotEqual(self.job_runner.render_key(), master_key)
+
+    @patch("app.sequence_generator.generator.decoded_audio_cache")
+    def test_render_key_depends_on_tempo_conform(self, mock_audio_cache):
+        mock_audio_cache.asset_digest.return_value = "digest"
+        self.job_runner.seed = 3
+        key = self.job_runner.render_key()
+        for name, value in (
+            ("TEMPO_CONFORM", "false"),
+            ("TEMPO_CONFORM_TOLERANCE", "0.1"),
+        ):
+            with self.subTest(name=name), patch.dict(os.environ, {name: value}):
+                self.assertNotEqual(self.job_runner.render_key(), key)
 
     def test_result(self):
         self.mock_job_config.return_value.path_resolver.return_value = {
@@ -465,24 +786,192 @@ class TestJobRunner(unittest.TestCase):
     #     self.job_runner.clean_up()
     #     mock_delete_local_object.assert_called_once()
 
-    @patch("app.sequence_generator.generator.AudioEngine")
-    def test_execute(self, mock_audio_engine):
+    def test_execute(self):
         with patch.object(self.job_runner, "get_assets") as mock_get_assets, patch.object(
+            self.job_runner, "asset_in_use"
+        ) as mock_asset_in_use, patch.object(
             self.job_runner, "validate"
-        ) as mock_validate:
+        ) as mock_validate, patch.object(
+            self.job_runner, "save_sequence"
+        ) as mock_save_sequence:
             mock_validate.return_value = ("validated_audio_sequence", "audio_sequence")
             result = self.job_runner.execute()
             mock_get_assets.assert_called_once()
+            mock_asset_in_use.return_value.__enter__.assert_called_once()
             mock_validate.assert_called_once()
-            mock_audio_engine.assert_called_with(
-                "audio_sequence",
+            mock_save_sequence.assert_called_once_with(
                 self.mock_job_config.return_value.path_resolver.return_value[
-                    "local_path_processed_pkl"
-                ],
-                normalized=None,
+                    "local_path_processed_sequence"
+                ]
             )
             self.assertTrue(result)
 
+    def test_render_key_requires_seed(self):
+        self.assertIsNone(self.job_runner.render_key())
+
+    @patch("app.sequence_generator.generator.SymbolicSequence")
+    @patch("app.sequence_generator.generator.decoded_audio_cache")
+    @patch("app.sequence_generator.generator.render_cache")
+    def test_execute_seeded_render_cache_hit(
+        self, mock_render_cache, mock_audio_cache, mock_symbolic_sequence
+    ):
+        mock_render_cache.get.return_value = True
+        job_runner = self.job_runner
+        job_runner.seed = 3
+
+        with patch.object(job_runner, "get_assets"), patch.object(
+            job_runner, "asset_in_use"
+        ), patch.object(job_runner, "validate") as mock_validate:
+            self.assertTrue(job_runner.execute())
+
+        mock_validate.assert_not_called()
+        mock_render_cache.get.assert_called_once_with(
+            mock_render_cache.key.return_value, {".sequence.json": "some/other/path"}
+        )
+        mock_render_cache.put.assert_not_called()
+        # the cached sequence references this job's asset
+        mock_symbolic_sequence.load.assert_called_once_with("some/other/path")
+        cached = mock_symbolic_sequence.load.return_value
+        cached.with_asset.assert_called_once_with(job_runner.asset_reference())
+        cached.with_asset.return_value.save.assert_called_once_with("some/other/path")
+
+    @patch("app.sequence_generator.generator.decoded_audio_cache")
+    @patch("app.sequence_generator.generator.render_cache")
+    def test_execute_seeded_render_cache_miss(self, mock_render_cache, mock_audio_cache):
+        mock_render_cache.get.return_value = False
+        job_runner = self.job_runner
+        job_runner.seed = 3
+
+        with patch.object(job_runner, "get_assets"), patch.object(
+            job_runner, "asset_in_use"
+        ), patch.object(
+            job_runner, "validate", return_value=("validated", "audio_sequence")
+        ) as mock_validate, patch.object(
+            job_runner, "save_sequence"
+        ):
+            self.assertTrue(job_runner.execute())
+
+        mock_validate.assert_called_once()
+        mock_render_cache.put.assert_called_once_with(
+            mock_render_cache.key.return_value, {".sequence.json": "some/other/path"}
+        )
+
+    @patch("app.sequence_generator.generator.JobRunner.save_sequence")
+    @patch("app.sequence_generator.generator.SequenceConfigRefactor")
+    @patch("app.sequence_generator.generator.SequenceAudioFrameSlicer")
+    @patch("app.sequence_generator.generator.SequenceEngine")
+    def test_execute_variants(
+        self,
+        mock_sequence_engine,
+        mock_audio_frame_slicer,
+        mock_sequence_config,
+        mock_save_sequence,
+    ):
+        self.mock_job_config.return_value.variant_path_resolver.side_effect = (
+            lambda variant: {"local_path_processed_sequence": f"variant_{variant}"}
+        )
+
+        with patch.object(self.job_runner, "get_assets") as mock_get_assets, patch.object(
+            self.job_runner, "asset_in_use"
+        ):
+            result = self.job_runner.execute_variants(3)
+
+        self.assertTrue(result)
+        mock_get_assets.assert_called_once()
+        mock_audio_frame_slicer.assert_not_called()
+        mock_sequence_engine.assert_called_once()
+        self.assertEqual(mock_sequence_engine.return_value.generate_steps.call_count, 3)
+        self.assertEqual(
+            [call.args[0] for call in mock_save_sequence.call_args_list],
+            ["variant_0", "variant_1", "variant_2"],
+        )
+
+    def test_asset_in_use(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = AssetCache(tmp_dir, max_bytes=0)
+            asset_path = os.path.join(tmp_dir, "asset.wav")
+            self.mock_job_config.return_value.get_job_params.return_value = {
+                "local_paths": asset_path
+            }
+            with patch(
+                "app.sequence_generator.generator.asset_cache", cache
+            ), patch.object(self.job_runner, "get_assets") as mock_get_assets:
+                with self.job_runner.asset_in_use():
+                    # evicted since get_assets(), so fetched again
+                    mock_get_assets.assert_called_once_with(
+                        fetch_job_manifest=False, storage=None
+                    )
+                    with open(asset_path, "wb") as f:
+                        f.write(b"0" * 10)
+                    self.assertEqual(cache.evict(), [])
+                self.assertEqual(cache.evict(), [asset_path])
+
+    @patch("app.sequence_generator.generator.shutil.copyfile")
+    def test_select_variant(self, mock_copyfile):
+        self.mock_job_config.return_value.variant_path_resolver.return_value = {
+            "local_path_processed_sequence": "variant_path"
+        }
+        self.assertTrue(self.job_runner.select_variant(1))
+        mock_copyfile.assert_called_once_with("variant_path", "some/other/path")
+
+        mock_copyfile.side_effect = FileNotFoundError
+        self.assertFalse(self.job_runner.select_variant(1))
+
+
+class TestJobRunnerAllChannels(unittest.TestCase):
+    def job_config(self, job_id, channel_index, random_id):
+        job_config = MagicMock()
+        if channel_index == 4:
+            job_config.get_job_params.side_effect = IndexError("no such channel")
+        else:
+            job_config.get_job_params.return_value = {
+                "local_paths": "shared.wav",
+                "bpm": 120,
+            }
+        job_config.path_resolver.return_value = {
+            "local_path_processed_sequence": f"sequence_{channel_index}.sequence.json",
+            "cloud_path_processed": f"sequence_{channel_index}.mp3",
+        }
+        return job_config
+
+    @patch("app.sequence_generator.generator.JobRunner.asset_in_use")
+    @patch("app.sequence_generator.generator.JobRunner.save_sequence")
+    @patch("app.sequence_generator.generator.SequenceConfigRefactor")
+    @patch("app.sequence_generator.generator.SequenceAudioFrameSlicer")
+    @patch("app.sequence_generator.generator.SequenceEngine")
+    @patch("app.sequence_generator.generator.StorageBase")
+    @patch("app.sequence_generator.generator.StorageEngine")
+    @patch("app.sequence_generator.generator.JobConfig")
+    def test_execute_all_channels(
+        self,
+        mock_job_config,
+        mock_storage_engine,
+        mock_storage_base,
+        mock_sequence_engine,
+        mock_audio_frame_slicer,
+        mock_sequence_config,
+        mock_save_sequence,
+        mock_asset_in_use,
+    ):
+        mock_job_config.side_effect = self.job_config
+        mock_sequence_engine.return_value.generate_audio_sequence.return_value = (
+            "validated_audio_sequence",
+            "audio_sequence",
+        )
+
+        sequences, errors = JobRunner.execute_all_channels(
+            "folder/job_id.json", "random_id", max_workers=3
+        )
+
+        self.assertEqual(sequences, {i: f"sequence_{i}.mp3" for i in range(6) if i != 4})
+        self.assertEqual(errors, {4: "no such channel"})
+        # one manifest download and, as every channel shares it, one asset download
+        asset_types = [call.args[1] for call in mock_storage_engine.call_args_list]
+        self.assertEqual(asset_types.count("job_id_path"), 1)
+        self.assertEqual(asset_types.count("asset_path"), 1)
+        self.assertLessEqual(mock_storage_base.call_count, 3)
+        self.assertEqual(mock_asset_in_use.call_count, 5)
+
 
 if __name__ == "__main__":
     unittest.main()
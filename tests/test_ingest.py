@@ -0,0 +1,123 @@
+import json
+import os
+import tempfile
+import unittest
+import boto3
+import numpy as np
+import soundfile as sf
+from moto import mock_s3
+from unittest.mock import patch
+from app.sequence_generator.analysis import read_analysis
+from app.storage.asset_cache import AssetCache
+from app.storage.ingest import (
+    ingest_bucket,
+    ingest_object,
+    object_created_keys,
+    object_removed_keys,
+)
+
+KEY = "loop__drums_full/PITCH_Am__BPM_96__loop.wav"
+
+
+def event_record(key, bucket="sample-dump", name="ObjectCreated:Put"):
+    return {"eventName": name, "s3": {"bucket": {"name": bucket}, "object": {"key": key}}}
+
+
+class TestObjectCreatedKeys(unittest.TestCase):
+    def test_audio_uploads(self):
+        event = {
+            "Records": [
+                event_record("loop__drums_full/PITCH_C__BPM_120__my+loop.mp3"),
+                event_record("loop__drums_full/a.wav", name="ObjectRemoved:Delete"),
+                event_record("loop__drums_full/a.wav.analysis.json"),
+                event_record("loop__drums_full/b.WAV", bucket="other"),
+            ]
+        }
+        self.assertEqual(
+            object_created_keys(event),
+            [
+                ("sample-dump", "loop__drums_full/PITCH_C__BPM_120__my loop.mp3"),
+                ("other", "loop__drums_full/b.WAV"),
+            ],
+        )
+
+    def test_empty_event(self):
+        self.assertEqual(object_created_keys({}), [])
+
+    def test_audio_deletes(self):
+        event = {
+            "Records": [
+                event_record("loop__drums_full/a.wav"),
+                event_record("loop__drums_full/b+c.mp3", name="ObjectRemoved:Delete"),
+                event_record(
+                    "loop__drums_full/b.mp3.analysis.json", name="ObjectRemoved:Delete"
+                ),
+            ]
+        }
+        self.assertEqual(
+            object_removed_keys(event), [("sample-dump", "loop__drums_full/b c.mp3")]
+        )
+
+
+@mock_s3
+class TestIngest(unittest.TestCase):
+    def setUp(self):
+        self.mock_s3 = mock_s3()
+        self.mock_s3.start()
+        s3_resource = boto3.resource("s3", region_name="us-east-1")
+        s3_resource.create_bucket(Bucket="sample-dump")
+        self.bucket = s3_resource.Bucket("sample-dump")
+
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.directory = self.tmp_dir.name
+        cache = AssetCache(self.directory, max_bytes=10**8, validate=True)
+        self.patcher = patch("app.storage.ingest.asset_cache", cache)
+        self.patcher.start()
+
+        audio = np.zeros(44100, dtype=np.float32)
+        audio[11025:11225] = 0.5
+        source = os.path.join(self.directory, "source.wav")
+        sf.write(source, audio, 44100)
+        self.bucket.upload_file(source, KEY)
+        os.remove(source)
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.tmp_dir.cleanup()
+        self.mock_s3.stop()
+
+    def uploaded_analysis(self, key):
+        body = self.bucket.Object(f"{key}.analysis.json").get()["Body"].read()
+        return json.loads(body)
+
+    def test_ingest_object(self):
+        analysis = ingest_object(self.bucket, KEY, self.directory)
+
+        self.assertEqual((analysis["bpm"], analysis["key"]), (96.0, "Am"))
+        self.assertEqual(analysis["n_samples"], 44100)
+        self.assertEqual(self.uploaded_analysis(KEY), analysis)
+        local_path = os.path.join(self.directory, os.path.basename(KEY))
+        self.assertEqual(read_analysis(local_path), analysis)
+
+    def test_ingest_bucket_skips_analyzed_assets(self):
+        self.bucket.put_object(Key="loop__drums_full/notes.txt", Body=b"")
+        self.assertEqual(
+            ingest_bucket(self.bucket, directory=self.directory), {KEY: None}
+        )
+
+        with patch("app.storage.ingest.ingest_object") as mock_ingest:
+            self.assertEqual(ingest_bucket(self.bucket, directory=self.directory), {})
+            ingest_bucket(self.bucket, force=True, directory=self.directory)
+        mock_ingest.assert_called_once_with(self.bucket, KEY, self.directory)
+
+    def test_ingest_bucket_reports_errors(self):
+        self.bucket.put_object(Key="loop__drums_full/broken.wav", Body=b"not audio")
+        results = ingest_bucket(
+            self.bucket, "loop__drums_full/", directory=self.directory
+        )
+        self.assertIsNone(results[KEY])
+        self.assertIsNotNone(results["loop__drums_full/broken.wav"])
+
+
+if __name__ == "__main__":
+    unittest.main()
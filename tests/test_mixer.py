@@ -6,14 +6,14 @@ import numpy as np
 
 class TestMixEngine(unittest.TestCase):
     @patch("os.listdir")
-    @patch("pickle.load")
+    @patch("app.mixer.mixer.read_ragged")
     @patch("os.path.exists")
     @patch(
         "builtins.open", new_callable=mock_open
     )  # ensure we're mocking the correct 'open'
     @patch("pydub.AudioSegment")
     def test_mix_sequences_pkl(
-        self, mock_AudioSegment, mock_open, mock_exists, mock_pickle_load, mock_listdir
+        self, mock_AudioSegment, mock_open, mock_exists, mock_read_ragged, mock_listdir
     ):
         # setup
         mock_job_params = Mock(spec=JobConfig)
@@ -23,20 +23,23 @@ class TestMixEngine(unittest.TestCase):
         }
         mock_job_params.random_id = "12345"
         mock_listdir.return_value = [
-            "mixdown_12345.pkl",
-            "mixdown_12345.pkl",
-            "mixdown_12345.pkl",
-            "mixdown_12345.pkl",
-            "mixdown_12345.pkl",
-            "mixdown_12345.pkl",
+            "mixdown_12345.ragged",
+            "mixdown_12345.ragged",
+            "mixdown_12345.ragged",
+            "mixdown_12345.ragged",
+            "mixdown_12345.ragged",
+            "mixdown_12345.ragged",
         ]
-        mock_pickle_load.side_effect = [
-            np.array([0.06873822, 0.0775969, 0.11674154]),
-            np.array([-0.00858092, -0.01676106, -0.02365756]),
-            np.array([0.00524747, -0.01671952, -0.00353223]),
-            np.array([-0.11494309, -0.16739362, -0.19740874]),
-            np.array([-0.18956006, -0.18455303, -0.17906487]),
-            np.array([0.07217887, 0.07220143, 0.07216715]),
+        mock_read_ragged.side_effect = [
+            Mock(samples=samples, sr=44100)
+            for samples in (
+                np.array([0.06873822, 0.0775969, 0.11674154]),
+                np.array([-0.00858092, -0.01676106, -0.02365756]),
+                np.array([0.00524747, -0.01671952, -0.00353223]),
+                np.array([-0.11494309, -0.16739362, -0.19740874]),
+                np.array([-0.18956006, -0.18455303, -0.17906487]),
+                np.array([0.07217887, 0.07220143, 0.07216715]),
+            )
         ]
         mock_exists.return_value = True
         mix_engine = MixEngine(mock_job_params)
@@ -47,6 +50,64 @@ class TestMixEngine(unittest.TestCase):
         # validation
         self.assertTrue(result)
 
+    @patch("os.listdir")
+    @patch("app.mixer.mixer.read_ragged")
+    @patch("os.path.exists", return_value=True)
+    @patch("pydub.AudioSegment")
+    def test_mix_sequences_pkl_loops_shorter_channels(
+        self, mock_AudioSegment, mock_exists, mock_read_ragged, mock_listdir
+    ):
+        mock_job_params = Mock(spec=JobConfig)
+        mock_job_params.get_job_params.return_value = {"bpm": 120}
+        mock_job_params.path_resolver.return_value = {
+            "local_path_mixdown_wav_master": "/tmp/test_output.wav"
+        }
+        mock_job_params.random_id = "12345"
+        mock_listdir.return_value = ["mixdown_12345_0.ragged", "mixdown_12345_1.ragged"]
+        two_bars = np.concatenate([np.full(88200, 0.5), np.full(88200, -0.5)])
+        mock_read_ragged.side_effect = [
+            Mock(samples=two_bars, sr=44100),
+            Mock(samples=np.full(88200, 0.25), sr=44100),
+        ]
+
+        self.assertTrue(MixEngine(mock_job_params).mix_sequences_pkl())
+
+        mixed = np.frombuffer(mock_AudioSegment.call_args[0][0], dtype=np.int16)
+        self.assertEqual(len(mixed), 176400)
+        self.assertEqual((mixed[0], mixed[-1]), (12288, -4096))
+
+    @patch("os.listdir")
+    @patch("app.mixer.mixer.read_ragged")
+    @patch("os.path.exists", return_value=True)
+    @patch("pydub.AudioSegment")
+    def test_mix_sequences_pkl_preview_rate(
+        self, mock_AudioSegment, mock_exists, mock_read_ragged, mock_listdir
+    ):
+        mock_job_params = Mock(spec=JobConfig)
+        mock_job_params.get_job_params.return_value = {"bpm": 120}
+        mock_job_params.path_resolver.return_value = {
+            "local_path_mixdown_wav_master": "/tmp/test_output.wav"
+        }
+        mock_job_params.random_id = "12345"
+        mock_listdir.return_value = ["mixdown_12345_0.ragged", "mixdown_12345_1.ragged"]
+        mock_read_ragged.side_effect = [
+            Mock(samples=np.full(44100, 0.5), sr=22050),
+            Mock(samples=np.full(44100, 0.5), sr=22050),
+        ]
+
+        self.assertTrue(MixEngine(mock_job_params).mix_sequences_pkl())
+        self.assertEqual(mock_AudioSegment.call_args.kwargs["frame_rate"], 22050)
+        self.assertEqual(len(mock_AudioSegment.call_args[0][0]), 44100 * 2)
+
+        # a preview channel in a master mix is upsampled
+        mock_read_ragged.side_effect = [
+            Mock(samples=np.full(44100, 0.5), sr=22050),
+            Mock(samples=np.full(88200, 0.5), sr=44100),
+        ]
+        self.assertTrue(MixEngine(mock_job_params).mix_sequences_pkl())
+        self.assertEqual(mock_AudioSegment.call_args.kwargs["frame_rate"], 44100)
+        self.assertEqual(len(mock_AudioSegment.call_args[0][0]), 88200 * 2)
+
     @patch("os.system")
     @patch("os.path.exists")
     @patch("glob.glob")
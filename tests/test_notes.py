@@ -0,0 +1,53 @@
+import unittest
+import numpy as np
+import pandas as pd
+from app.sequence_generator.notes import (
+    NoteSequenceIndex,
+    note_sequence_index,
+    NOTES_MATCH_TABLE_PATH,
+)
+
+
+class TestNoteSequenceIndex(unittest.TestCase):
+    def test_matches_table_query(self):
+        notes_match_table = pd.read_pickle(NOTES_MATCH_TABLE_PATH)
+        for scale_value, keynote in [("major", "C Major"), ("dominant-diminished", "E")]:
+            with self.subTest(scale=scale_value, key=keynote):
+                notes = notes_match_table.query(
+                    "scale_name==@scale_value & key==@keynote"
+                )["notes"].values[0]
+                notes_int = [int(i) for i in notes.split(", ")]
+                expected = [i - 12 for i in notes_int] + notes_int
+                np.testing.assert_array_equal(
+                    note_sequence_index.lookup(scale_value, keynote), expected
+                )
+
+    def test_index_covers_table(self):
+        notes_match_table = pd.read_pickle(NOTES_MATCH_TABLE_PATH)
+        unique_pairs = notes_match_table[["scale_name", "key"]].drop_duplicates()
+        self.assertEqual(len(note_sequence_index), len(unique_pairs))
+
+    def test_lookup_is_read_only(self):
+        notes = note_sequence_index.lookup("major", "C Major")
+        self.assertFalse(notes.flags.writeable)
+        self.assertEqual(notes.dtype, np.int64)
+
+    def test_unknown_scale(self):
+        with self.assertRaises(IndexError):
+            note_sequence_index.lookup("major", "H Major")
+
+    def test_first_row_wins(self):
+        table = pd.DataFrame(
+            {
+                "scale_name": ["major", "major"],
+                "key": ["C Major", "C Major"],
+                "notes": ["0, 2", "1, 3"],
+            }
+        )
+        np.testing.assert_array_equal(
+            NoteSequenceIndex(table).lookup("major", "C Major"), [-12, -10, 0, 2]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,168 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import numpy as np
+import librosa
+from app.sequence_generator.pitch import (
+    PitchBackend,
+    PitchShiftCache,
+    ParallelPitchShifter,
+    pitch_backend,
+)
+
+
+class TestPitchShiftCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = PitchShiftCache(max_bytes=10 * 1024 * 1024)
+        self.frame = np.random.rand(2048).astype(np.float32)
+
+    @patch("librosa.effects.pitch_shift")
+    def test_shift_is_memoized(self, mock_pitch_shift):
+        mock_pitch_shift.return_value = np.zeros(2048, dtype=np.float32)
+        frame_key = ("digest", 0, 2048)
+
+        first = self.cache.shift(self.frame, 3, frame_key)
+        second = self.cache.shift(self.frame, 3, frame_key)
+
+        mock_pitch_shift.assert_called_once()
+        self.assertIs(first, second)
+        self.assertEqual(self.cache.stats()["hits"], 1)
+        self.assertEqual(self.cache.stats()["misses"], 1)
+
+    @patch("librosa.effects.pitch_shift")
+    def test_semitones_are_part_of_the_key(self, mock_pitch_shift):
+        mock_pitch_shift.return_value = np.zeros(2048, dtype=np.float32)
+        frame_key = ("digest", 0, 2048)
+
+        self.cache.shift(self.frame, 3, frame_key)
+        self.cache.shift(self.frame, -9, frame_key)
+
+        self.assertEqual(mock_pitch_shift.call_count, 2)
+
+    @patch("librosa.effects.pitch_shift")
+    def test_rate_and_backend_are_part_of_the_key(self, mock_pitch_shift):
+        mock_pitch_shift.return_value = np.zeros(2048, dtype=np.float32)
+        key = ("digest", 0, 2048)
+        backend = pitch_backend("librosa", "soxr_qq")
+        self.cache.shift(self.frame, 2, key)
+        self.cache.shift(self.frame, 2, key, sr=22050, backend=backend)
+        self.cache.shift(self.frame, 2, key, sr=22050, backend=backend)
+        self.assertEqual(mock_pitch_shift.call_count, 2)
+        self.assertEqual(mock_pitch_shift.call_args.kwargs["res_type"], "soxr_qq")
+
+        self.cache.shift(self.frame, 2, key, sr=22050, backend=pitch_backend("resample"))
+        self.assertEqual(mock_pitch_shift.call_count, 2)
+        self.assertEqual(self.cache.stats()["entries"], 3)
+
+    @patch("librosa.effects.pitch_shift")
+    def test_frames_without_key_are_not_cached(self, mock_pitch_shift):
+        mock_pitch_shift.return_value = np.zeros(2048, dtype=np.float32)
+
+        self.cache.shift(self.frame, 3)
+        self.cache.shift(self.frame, 3)
+
+        self.assertEqual(mock_pitch_shift.call_count, 2)
+        self.assertEqual(self.cache.stats()["entries"], 0)
+
+    def test_shift_keeps_length(self):
+        shifted = self.cache.shift(self.frame, 2, ("digest", 0, 2048))
+        self.assertEqual(len(shifted), len(self.frame))
+        self.assertFalse(shifted.flags.writeable)
+
+    @patch("librosa.effects.pitch_shift")
+    def test_shift_many_shifts_each_distinct_frame_once(self, mock_pitch_shift):
+        mock_pitch_shift.side_effect = (
+            lambda audio, sr, n_steps, res_type: audio + n_steps
+        )
+        frame_a, frame_b = self.frame, self.frame[:1024]
+        keys = [("digest", 0, 2048), ("digest", 0, 1024), ("digest", 0, 2048)]
+
+        shifted = self.cache.shift_many([frame_a, frame_b, frame_a], [2, 2, 2], keys)
+
+        self.assertEqual(mock_pitch_shift.call_count, 2)
+        self.assertIs(shifted[0], shifted[2])
+        np.testing.assert_array_equal(shifted[1], frame_b + 2)
+
+        self.cache.shift_many([frame_a], [2], [keys[0]])
+        self.assertEqual(mock_pitch_shift.call_count, 2)
+
+    def test_shift_many_uses_process_pool(self):
+        mock_shifter = MagicMock()
+        mock_shifter.enabled = True
+        mock_shifter.shift_frames.side_effect = lambda frames, n_steps, sr, backend: [
+            frame + steps for frame, steps in zip(frames, n_steps)
+        ]
+        cache = PitchShiftCache(max_bytes=10 * 1024 * 1024, shifter=mock_shifter)
+
+        shifted = cache.shift_many(
+            [self.frame, self.frame], [1, 3], [("digest", 0, 2048)] * 2
+        )
+
+        mock_shifter.shift_frames.assert_called_once()
+        np.testing.assert_array_equal(shifted[1], self.frame + 3)
+
+
+class TestParallelPitchShifter(unittest.TestCase):
+    def test_disabled_below_two_workers(self):
+        self.assertFalse(ParallelPitchShifter(0).enabled)
+        self.assertFalse(ParallelPitchShifter(1).enabled)
+        self.assertTrue(ParallelPitchShifter(2).enabled)
+
+    def test_shift_frames_matches_serial_shift(self):
+        shifter = ParallelPitchShifter(2)
+        frames = [
+            np.random.rand(length).astype(np.float32) for length in (2048, 4096, 1024)
+        ]
+        n_steps = [-5, 3, 7]
+        try:
+            shifted = shifter.shift_frames(frames, n_steps)
+        finally:
+            shifter.shutdown()
+
+        for frame, steps, result in zip(frames, n_steps, shifted):
+            np.testing.assert_allclose(
+                result,
+                librosa.effects.pitch_shift(frame, sr=44100, n_steps=steps),
+                atol=1e-6,
+            )
+
+
+class TestPitchBackends(unittest.TestCase):
+    def setUp(self):
+        t = np.arange(22050) / 22050
+        self.tone = np.sin(2 * np.pi * 440 * t).astype(np.float32)
+
+    def dominant_frequency(self, audio, sr=22050):
+        spectrum = np.abs(np.fft.rfft(audio * np.hanning(len(audio))))
+        return np.fft.rfftfreq(len(audio), 1 / sr)[np.argmax(spectrum)]
+
+    def test_backends_shift_the_pitch_and_keep_the_length(self):
+        for name in ("librosa", "resample", "pedalboard"):
+            with self.subTest(backend=name):
+                shifted = pitch_backend(name).shift(self.tone, 22050, 12)
+                self.assertEqual(len(shifted), len(self.tone))
+                # the tail of a varispeed shift is padding
+                self.assertAlmostEqual(
+                    self.dominant_frequency(shifted[:8192]), 880, delta=10
+                )
+
+    def test_resample_without_steps(self):
+        shifted = pitch_backend("resample").shift(self.tone, 22050, 0)
+        np.testing.assert_array_equal(shifted, self.tone)
+
+    def test_default_and_unknown_backends(self):
+        self.assertEqual(pitch_backend(), pitch_backend("librosa"))
+        self.assertNotEqual(pitch_backend("librosa"), pitch_backend("librosa", "soxr_qq"))
+        self.assertNotEqual(pitch_backend("librosa").key, pitch_backend("resample").key)
+        with self.assertRaises(ValueError):
+            pitch_backend("rubberband")
+
+    def test_backends_implement_shift(self):
+        class Unfinished(PitchBackend):
+            name = "unfinished"
+
+        with self.assertRaises(TypeError):
+            Unfinished()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,162 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+import numpy as np
+import soundfile as sf
+from app.sequence_generator.analysis import analyze_audio, write_analysis
+from app.sequence_generator.generator import SequenceConfigRefactor
+from app.sequence_generator.tiles import fit_frames
+from app.sequence_generator.plan import (
+    SequencePlan,
+    SequencePlanCache,
+    frame_offsets,
+    grid_length,
+)
+
+
+class TestSequencePlan(unittest.TestCase):
+    def test_compile(self):
+        plan = SequencePlan.compile([3, 8], 120, 44100 * 3)
+
+        np.testing.assert_array_equal(plan.pattern, [1, 0, 0, 1, 0, 0, 1, 0])
+        np.testing.assert_array_equal(plan.onsets, [0, 3, 6])
+        self.assertEqual(
+            (plan.grid_value, plan.pulse_length), grid_length(132300, 120, 8)
+        )
+        np.testing.assert_array_equal(plan.frame_lengths, [33075, 33075, 22050])
+        np.testing.assert_array_equal(plan.unique_lengths, [22050, 33075])
+        np.testing.assert_array_equal(plan.reps, [5, 3])
+        np.testing.assert_array_equal(plan.offsets[0], np.arange(0, 88200, 22050))
+        np.testing.assert_array_equal(plan.offsets[1], [0, 33075])
+        # one count per frame length, in order of first onset
+        self.assertEqual(plan.draws, (2, 1))
+
+    def test_rotation_and_onsets(self):
+        plan = SequencePlan.compile([3, 8, 1], 120, 44100 * 3, onsets=[400, 22000])
+        np.testing.assert_array_equal(plan.onsets, [2, 5, 7])
+        self.assertEqual(int(plan.offsets[0][0]), 400)
+
+    def test_rotated_onsets_land_on_their_steps(self):
+        plan = SequencePlan.compile([3, 8, 1], 120, 44100 * 3)
+        pulse = plan.pulse_length
+        np.testing.assert_array_equal(plan.frame_lengths, np.array([3, 2, 3]) * pulse)
+        self.assertEqual(plan.lead, int(2 * pulse))
+
+        # one click at the start of each frame, laid out the way the engine does
+        frames = []
+        for length in plan.frame_lengths.astype(int):
+            frame = np.zeros(length, dtype=np.float32)
+            frame[0] = 1
+            frames.append(frame)
+        bar = fit_frames(frames, int(round(8 * pulse)), plan.lead)
+        np.testing.assert_array_equal(
+            np.flatnonzero(bar), np.round(plan.onsets * pulse).astype(int)
+        )
+        self.assertEqual(SequencePlan.compile([3, 8], 120, 44100 * 3).lead, 0)
+
+    def test_preview_rate(self):
+        master = SequencePlan.compile([5, 16], 90, 44100 * 4)
+        preview = SequencePlan.compile([5, 16], 90, 22050 * 4, sr=22050)
+        np.testing.assert_allclose(preview.frame_lengths * 2, master.frame_lengths)
+
+    def test_is_immutable(self):
+        plan = SequencePlan.compile([3, 8], 120, 44100 * 3)
+        with self.assertRaises(AttributeError):
+            plan.grid_value = 0
+        with self.assertRaises(AttributeError):
+            plan.cached = True
+        with self.assertRaises(ValueError):
+            plan.frame_lengths[0] = 0
+        with self.assertRaises(ValueError):
+            plan.offsets[0][0] = 1
+
+    def test_frame_offsets(self):
+        offsets = frame_offsets([100, 250], [4, 1])
+        np.testing.assert_array_equal(offsets[0], [0, 100, 200])
+        np.testing.assert_array_equal(offsets[1], [0])
+
+
+class TestSequencePlanCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.asset_path = os.path.join(self.tmp_dir, "loop.wav")
+        sf.write(self.asset_path, np.zeros(44100 * 2, dtype=np.float32), 44100)
+        self.cache = SequencePlanCache(16)
+        self.audio_length = MagicMock(return_value=44100 * 2)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def get(self, rhythm_config=(3, 8), bpm=120, sr=44100):
+        return self.cache.get(self.asset_path, rhythm_config, bpm, sr, self.audio_length)
+
+    def test_plans_are_compiled_once(self):
+        plan = self.get()
+        self.assertIs(self.get(), plan)
+        self.assertIsNot(self.get(rhythm_config=(5, 8)), plan)
+        self.assertIsNot(self.get(bpm=90), plan)
+        self.assertIsNot(self.get(sr=22050), plan)
+        self.assertEqual(self.audio_length.call_count, 4)
+
+    def test_asset_rewrite(self):
+        plan = self.get()
+        stat = os.stat(self.asset_path)
+        os.utime(self.asset_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        self.assertIsNot(self.get(), plan)
+
+    def test_new_sidecar(self):
+        plan = self.get()
+        analysis = analyze_audio(np.zeros(44100 * 2, dtype=np.float32), size=1)
+        analysis["size"] = os.path.getsize(self.asset_path)
+        write_analysis(self.asset_path, dict(analysis, onsets=[300]))
+        aligned = self.get()
+        self.assertIsNot(aligned, plan)
+        self.assertEqual(int(aligned.offsets[0][0]), 300)
+
+    def test_missing_asset_is_not_cached(self):
+        self.asset_path = os.path.join(self.tmp_dir, "missing.wav")
+        self.assertIsNot(self.get(), self.get())
+        self.assertEqual(len(self.cache.cache), 0)
+
+    def test_invalidate(self):
+        self.get()
+        self.get(bpm=90)
+        self.assertEqual(self.cache.invalidate(self.asset_path), 2)
+        self.assertEqual(len(self.cache.cache), 0)
+
+
+class TestSequenceConfigPlan(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.asset_path = os.path.join(self.tmp_dir, "loop.wav")
+        sf.write(self.asset_path, np.zeros(44100 * 3, dtype=np.float32), 44100)
+        self.job_params = MagicMock()
+        self.job_params.get_job_params.return_value = {
+            "local_paths": self.asset_path,
+            "bpm": 120,
+            "rythm_config_list": [3, 8],
+        }
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    @patch("app.sequence_generator.generator.sequence_plan_cache", SequencePlanCache(16))
+    def test_configs_of_a_channel_share_the_plan(self):
+        first = SequenceConfigRefactor(self.job_params)
+        with patch.object(
+            SequenceConfigRefactor, "audio_length", return_value=44100 * 3
+        ) as mock_audio_length:
+            plan = first.plan()
+            second = SequenceConfigRefactor(self.job_params)
+            self.assertIs(second.plan(), plan)
+            mock_audio_length.assert_called_once()
+
+        self.assertEqual(second.get_audio_frames_length(), plan.frame_lengths.tolist())
+        self.assertEqual(second.get_audio_frames_reps(), plan.reps.tolist())
+        self.assertEqual(second.grid_validate(), (plan.grid_value, plan.pulse_length))
+
+
+if __name__ == "__main__":
+    unittest.main()
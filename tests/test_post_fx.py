@@ -1,7 +1,9 @@
+import os
+import tempfile
 import unittest
 from pydantic import ValidationError
 import unittest
-from unittest.mock import MagicMock, patch, Mock, mock_open
+from unittest.mock import ANY, MagicMock, patch, Mock, mock_open
 import numpy as np
 from app.post_fx.post_fx import (
     FxParamsModel,
@@ -11,6 +13,7 @@ from app.post_fx.post_fx import (
     FxPedalBoardEngine,
     FxRunner,
 )
+from app.utils.symbolic import SymbolicSequence
 
 
 class TestFxParamsModel(unittest.TestCase):
@@ -65,35 +68,66 @@ class TestFxParamsModel(unittest.TestCase):
 
 
 class TestMuteEngine(unittest.TestCase):
-    @patch("pickle.load")
-    @patch("builtins.open", new_callable=mock_open)
-    def test_apply_selective_mutism(self, mock_open, mock_load):
-        # Mock the sequence loaded from pickle
-        mock_sequences = [
-            np.array([1, 2, 3, 4, 5]),
-            np.array([6, 7, 8, 9, 10]),
-            np.array([11, 12, 13, 14, 15]),
-            # Add as many mock sequences as needed
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.mix_params = MagicMock()
+        self.job_params = MagicMock()
+        self.job_params.path_resolver.return_value = {
+            "local_path_processed_sequence": os.path.join(
+                self.tmp_dir.name, "sequence.sequence.json"
+            )
+        }
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def save_sequence(self, n_steps, header=None):
+        SymbolicSequence(
+            {"path": "loop.wav", "cloud_path": "assets/loop.wav", "digest": "d"},
+            offsets=np.arange(n_steps) * 100,
+            lengths=[100] * n_steps,
+            header=header or {"sr": 44100},
+        ).save(self.job_params.path_resolver()["local_path_processed_sequence"])
+
+    def test_apply_selective_mutism(self):
+        self.save_sequence(10)
+        self.mix_params.selective_mutism_value = 0.3
+
+        result = MuteEngine(self.mix_params, self.job_params).apply_selective_mutism()
+
+        # 30% of the steps are muted
+        self.assertEqual(int(result.mute.sum()), 3)
+        np.testing.assert_array_equal(result.gain, 1)
+
+    def test_seeded_selective_mutism_is_reproducible(self):
+        self.save_sequence(8)
+        self.mix_params.selective_mutism_value = 0.5
+
+        muted = [
+            np.flatnonzero(
+                MuteEngine(
+                    self.mix_params, self.job_params, rng=np.random.default_rng(11)
+                )
+                .apply_selective_mutism()
+                .mute
+            ).tolist()
+            for __ in range(2)
         ]
-        mock_load.return_value = mock_sequences
 
-        # Mock mix_params and job_params
-        mock_mix_params = MagicMock()
-        mock_mix_params.selective_mutism_value = 0.3
-        mock_job_params = MagicMock()
-        mock_job_params.path_resolver.return_value = {
-            "local_path_processed_pkl": "some_path"
-        }
+        self.assertEqual(len(muted[0]), 4)
+        self.assertEqual(muted[0], muted[1])
 
-        mute_engine = MuteEngine(mock_mix_params, mock_job_params)
-        result_sequences = mute_engine.apply_selective_mutism()
+    def test_symbolic_sequence_is_muted_before_render(self):
+        header = {"sr": 22050, "bpm": 120, "quality": "preview"}
+        self.save_sequence(8, header)
+        self.mix_params.selective_mutism_value = 0.5
+        engine = MuteEngine(self.mix_params, self.job_params)
+        result = engine.apply_selective_mutism()
 
-        # Check that approximately 30% of the sequences have been zeroed out
-        zero_sequences = sum(1 for sequence in result_sequences if np.all(sequence == 0))
-        expected_zero_sequences = round(
-            mock_mix_params.selective_mutism_value * len(mock_sequences)
-        )
-        self.assertEqual(zero_sequences, expected_zero_sequences)
+        # rendered by VolEngine, once its gains are set
+        self.assertIsInstance(result, SymbolicSequence)
+        self.assertEqual(int(result.mute.sum()), 4)
+        self.assertEqual(engine.header, header)
 
 
 class TestVolEngine(unittest.TestCase):
@@ -136,6 +170,92 @@ class TestVolEngine(unittest.TestCase):
 
             np.testing.assert_almost_equal(result_sequence, expected_sequence, decimal=5)
 
+    def test_apply_volume_tiled(self):
+        mix_params = MagicMock()
+        mix_params.vol = [50]
+        job_params = MagicMock()
+        job_params.channel_index = "0"
+        job_params.get_job_params.return_value = {"bpm": 120}
+        bar = np.linspace(-1, 1, 88200, dtype=np.float32)
+        frames = [bar[:44100], bar[44100:], np.full(88200, 0.5)]
+        header = {"chain": [0, 1, 0], "masks": [None, None, [1, 0]], "tiles": [2, 1]}
+
+        result = VolEngine(mix_params, job_params, frames, header=header).apply_volume()
+
+        self.assertEqual(len(result), 3 * 88200)
+        np.testing.assert_almost_equal(result[:88200], bar, decimal=5)
+        # the second tile is normalized with the others, not on its own
+        np.testing.assert_almost_equal(result[88200:176400], 0.5, decimal=5)
+        np.testing.assert_almost_equal(result[176400:220500], bar[:44100], decimal=5)
+        np.testing.assert_array_equal(result[220500:], 0)
+
+    @patch("app.post_fx.post_fx.asset_cache")
+    @patch("app.post_fx.post_fx.StorageEngine")
+    @patch("app.post_fx.post_fx.render_symbolic")
+    def test_apply_volume_symbolic(
+        self, mock_render_symbolic, mock_storage_engine, mock_asset_cache
+    ):
+        mock_render_symbolic.side_effect = (
+            lambda sequence: [
+                np.linspace(0, 1, 44100, dtype=np.float32) * sequence.gain[0]
+            ]
+            * 2
+        )
+        mix_params = MagicMock()
+        mix_params.vol = [50]
+        job_params = MagicMock()
+        job_params.channel_index = "0"
+        job_params.get_job_params.return_value = {"bpm": 120}
+        sequence = SymbolicSequence(
+            {"path": "missing/loop.wav", "cloud_path": "assets/loop.wav", "digest": "d"},
+            offsets=[0, 0],
+            lengths=[44100, 44100],
+            header={"sr": 44100},
+        )
+
+        result = VolEngine(mix_params, job_params, sequence).apply_volume()
+
+        # the volume is rendered as the gain of every step
+        rendered = mock_render_symbolic.call_args.args[0]
+        np.testing.assert_array_equal(rendered.gain, 0.5)
+        self.assertEqual(len(result), 88200)
+        np.testing.assert_almost_equal(result[[0, 44099]], [-1, 1], decimal=5)
+        # the asset is fetched again when it left the asset cache, and kept out of
+        # eviction while it renders
+        mock_storage_engine.assert_called_once_with(job_params, "asset_path")
+        mock_storage_engine.return_value.get_cached_object.assert_called_once()
+        mock_asset_cache.in_use.assert_called_once_with("missing/loop.wav")
+
+    def test_apply_volume_silent(self):
+        mix_params = MagicMock()
+        mix_params.vol = [50]
+        job_params = MagicMock()
+        job_params.channel_index = "0"
+        job_params.get_job_params.return_value = {"bpm": 120}
+        frames = [np.zeros(44100, dtype=np.float32)] * 2
+
+        result = VolEngine(mix_params, job_params, frames).apply_volume()
+
+        # a fully muted sequence has no range to normalize
+        np.testing.assert_array_equal(result, 0)
+
+    def test_apply_volume_rotated(self):
+        mix_params = MagicMock()
+        mix_params.vol = [100]
+        job_params = MagicMock()
+        job_params.channel_index = "0"
+        job_params.get_job_params.return_value = {"bpm": 120}
+        frames = [np.ones(22050, dtype=np.float32), np.full(66150, 0.5)]
+
+        result = VolEngine(
+            mix_params, job_params, frames, header={"lead": 66150}
+        ).apply_volume()
+
+        # the first frame starts at the lead, the last one wraps to the bar's start
+        self.assertEqual(len(result), 88200)
+        np.testing.assert_almost_equal(result[66150:], 1, decimal=5)
+        np.testing.assert_almost_equal(result[:66150], -1, decimal=5)
+
 
 class TestFxPedalBoardConfig(unittest.TestCase):
     def test_audio_fx_validator(self):
@@ -225,6 +345,46 @@ class TestFxRunner(unittest.TestCase):
         mock_vol_engine.assert_called_once_with()
         mock_fx_pedalboard_engine.assert_called_once_with()
 
+    @patch("app.post_fx.post_fx.decoded_audio_cache")
+    def test_render_key_depends_on_the_channel_params(self, mock_audio_cache):
+        mock_audio_cache.asset_digest.return_value = "digest"
+        params = {
+            "job_id": "job_ids",
+            "fx_input": "0_1_2_3_4_F",
+            "channel_index": "0",
+            "selective_mutism_switch": "T",
+            "vol": "50_50_50_50_50_50",
+            "channel_mute_params": "T_T_T_T_T_T",
+            "selective_mutism_value": "0.5",
+            "preset": "warm",
+        }
+
+        def key(**changes):
+            runner = FxRunner(
+                FxParamsModel(**{**params, **changes}),
+                "folder/job_ids.json",
+                "0",
+                "456",
+                seed=3,
+            )
+            return runner.render_key()
+
+        base = key()
+        # another channel's volume and FX, and the preset of a standard FX, are ignored
+        self.assertEqual(key(vol="50_10_10_10_10_10"), base)
+        self.assertEqual(key(fx_input="0_6_6_6_6_6"), base)
+        self.assertEqual(key(preset="cold"), base)
+        for changes in (
+            {"vol": "40_50_50_50_50_50"},
+            {"fx_input": "1_1_2_3_4_F"},
+            {"selective_mutism_value": "0.25"},
+        ):
+            with self.subTest(changes=changes):
+                self.assertNotEqual(key(**changes), base)
+        self.assertNotEqual(
+            key(fx_input="6_1_2_3_4_F"), key(fx_input="6_1_2_3_4_F", preset="cold")
+        )
+
 
 class TestFxRunner2(unittest.TestCase):
     @patch("app.post_fx.post_fx.MuteEngine")
@@ -242,6 +402,7 @@ class TestFxRunner2(unittest.TestCase):
         mock_mute_engine.return_value.apply_selective_mutism.return_value = (
             "mute_sequence"
         )
+        mock_mute_engine.return_value.header = {"sr": 22050, "quality": "preview"}
         mock_vol_engine.return_value.apply_volume.return_value = "vol_sequence"
         mock_fx_pedal_board_engine.return_value.apply_pedalboard_fx.return_value = True
 
@@ -252,13 +413,18 @@ class TestFxRunner2(unittest.TestCase):
 
         # Assert
         self.assertTrue(result)
-        mock_mute_engine.assert_called_once_with(mix_params, runner.job_params)
+        mock_mute_engine.assert_called_once_with(mix_params, runner.job_params, rng=ANY)
         mock_vol_engine.assert_called_once_with(
-            mix_params, runner.job_params, "mute_sequence"
+            mix_params,
+            runner.job_params,
+            "mute_sequence",
+            header=mock_mute_engine.return_value.header,
         )
         mock_fx_pedal_board_engine.assert_called_once_with(
-            mix_params, runner.job_params, "vol_sequence"
+            mix_params, runner.job_params, "vol_sequence", quality=ANY
         )
+        quality = mock_fx_pedal_board_engine.call_args.kwargs["quality"]
+        self.assertEqual((quality.name, quality.sample_rate), ("preview", 22050))
 
     @patch("app.post_fx.post_fx.MuteEngine")
     def test_execute_failure_in_mute_engine(self, mock_mute_engine):
@@ -0,0 +1,47 @@
+import os
+import unittest
+from unittest.mock import patch
+from app.utils.quality import RenderQuality
+
+
+class TestRenderQuality(unittest.TestCase):
+    def test_master_is_the_default(self):
+        quality = RenderQuality.resolve()
+        self.assertTrue(quality.is_master)
+        self.assertEqual(
+            (quality.sample_rate, quality.pitch_backend, quality.pitch_res_type),
+            (44100, "librosa", "soxr_hq"),
+        )
+        self.assertEqual(RenderQuality.resolve("master"), quality)
+
+    def test_preview(self):
+        quality = RenderQuality.resolve("preview")
+        self.assertFalse(quality.is_master)
+        self.assertEqual(
+            (quality.sample_rate, quality.pitch_backend), (22050, "resample")
+        )
+        self.assertEqual(quality.tag(), {"quality": "preview"})
+        self.assertIs(RenderQuality.resolve(quality), quality)
+
+    def test_preview_settings(self):
+        with patch.dict(
+            os.environ, {"PREVIEW_SAMPLE_RATE": "16000", "PREVIEW_FX_BUFFER_SIZE": "4096"}
+        ):
+            quality = RenderQuality.resolve("preview")
+        self.assertEqual((quality.sample_rate, quality.fx_buffer_size), (16000, 4096))
+
+    def test_unknown_quality(self):
+        with self.assertRaises(ValueError):
+            RenderQuality.resolve("draft")
+
+    def test_from_header(self):
+        self.assertEqual(RenderQuality.from_header({}), RenderQuality())
+        self.assertEqual(RenderQuality.from_header({"sr": 44100}), RenderQuality())
+
+        # the rate is the container's own, whatever the current settings
+        quality = RenderQuality.from_header({"sr": 16000, "quality": "preview"})
+        self.assertEqual((quality.name, quality.sample_rate), ("preview", 16000))
+
+
+if __name__ == "__main__":
+    unittest.main()
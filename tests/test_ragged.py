@@ -0,0 +1,64 @@
+import os
+import unittest
+import numpy as np
+from app.utils.ragged import RaggedFrames, read_ragged, write_ragged
+
+
+class TestRaggedContainer(unittest.TestCase):
+    def setUp(self):
+        self.path = "temp/test_container.ragged"
+        self.frames = [
+            np.random.rand(n).astype(np.float32) for n in (5512, 11025, 3, 0, 2048)
+        ]
+
+    def tearDown(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def test_round_trip(self):
+        write_ragged(self.path, self.frames, bpm=120, channel=3)
+
+        for mmap in (True, False):
+            container = read_ragged(self.path, mmap=mmap)
+            self.assertIsInstance(container, RaggedFrames)
+            self.assertEqual(container.sr, 44100)
+            self.assertEqual(container.bpm, 120)
+            self.assertEqual(container.channel, 3)
+            self.assertEqual(len(container), len(self.frames))
+            for frame, expected in zip(container.frames(), self.frames):
+                np.testing.assert_array_equal(frame, expected)
+            np.testing.assert_array_equal(container.samples, np.concatenate(self.frames))
+
+    def test_frames_are_read_only_views(self):
+        write_ragged(self.path, self.frames)
+        container = read_ragged(self.path)
+
+        frame = container[1]
+        self.assertFalse(frame.flags.writeable)
+        self.assertTrue(np.shares_memory(frame, container.samples))
+        np.testing.assert_array_equal(container[-1], self.frames[-1])
+        with self.assertRaises(IndexError):
+            container[len(self.frames)]
+
+    def test_flat_array_is_one_frame(self):
+        write_ragged(self.path, np.ones(100))
+        container = read_ragged(self.path)
+        self.assertEqual(len(container), 1)
+        self.assertEqual(container.samples.dtype, np.float32)
+        np.testing.assert_array_equal(container[0], np.ones(100))
+
+    def test_empty_sequence(self):
+        write_ragged(self.path, [])
+        container = read_ragged(self.path)
+        self.assertEqual(len(container), 0)
+        self.assertEqual(len(container.samples), 0)
+
+    def test_rejects_other_files(self):
+        with open(self.path, "wb") as f:
+            f.write(b"\x80\x04not a container")
+        with self.assertRaises(ValueError):
+            read_ragged(self.path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import os
+import tempfile
+import time
+import unittest
+from app.utils.render_cache import RenderCache
+
+
+class TestRenderCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.tmp_dir.name, "renders")
+        self.cache = RenderCache(self.directory, max_bytes=1024)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write(self, name, body):
+        path = os.path.join(self.tmp_dir.name, name)
+        with open(path, "wb") as f:
+            f.write(body)
+        return path
+
+    def read(self, path):
+        with open(path, "rb") as f:
+            return f.read()
+
+    def test_key_is_order_independent(self):
+        self.assertEqual(
+            RenderCache.key(seed=1, channel=0), RenderCache.key(channel=0, seed=1)
+        )
+        self.assertNotEqual(
+            RenderCache.key(seed=1, channel=0), RenderCache.key(seed=2, channel=0)
+        )
+
+    def test_miss(self):
+        destination = os.path.join(self.tmp_dir.name, "out.ragged")
+        self.assertFalse(self.cache.get("missing", {".ragged": destination}))
+        self.assertFalse(os.path.exists(destination))
+
+    def test_put_then_get(self):
+        key = RenderCache.key(seed=1)
+        self.cache.put(
+            key,
+            {
+                ".ragged": self.write("a.ragged", b"r" * 10),
+                ".wav": self.write("a.wav", b"w" * 10),
+            },
+        )
+
+        destinations = {
+            ".ragged": os.path.join(self.tmp_dir.name, "b.ragged"),
+            ".wav": os.path.join(self.tmp_dir.name, "b.wav"),
+        }
+        self.assertTrue(self.cache.get(key, destinations))
+        self.assertEqual(self.read(destinations[".ragged"]), b"r" * 10)
+        self.assertEqual(self.read(destinations[".wav"]), b"w" * 10)
+
+    def test_partial_entry_is_a_miss(self):
+        key = RenderCache.key(seed=1)
+        self.cache.put(key, {".ragged": self.write("a.ragged", b"r" * 10)})
+
+        destinations = {
+            ".ragged": os.path.join(self.tmp_dir.name, "b.ragged"),
+            ".wav": os.path.join(self.tmp_dir.name, "b.wav"),
+        }
+        self.assertFalse(self.cache.get(key, destinations))
+
+    def test_put_evicts_least_recently_used(self):
+        old_key, new_key = RenderCache.key(seed=1), RenderCache.key(seed=2)
+        self.cache.put(old_key, {".ragged": self.write("a.ragged", b"a" * 600)})
+        past = time.time_ns() - 10**9
+        os.utime(self.cache.path(old_key, ".ragged"), ns=(past, past))
+
+        self.cache.put(new_key, {".ragged": self.write("b.ragged", b"b" * 600)})
+
+        self.assertFalse(os.path.exists(self.cache.path(old_key, ".ragged")))
+        self.assertTrue(os.path.exists(self.cache.path(new_key, ".ragged")))
+
+    def test_put_keeps_oversized_current_entry(self):
+        key = RenderCache.key(seed=1)
+        self.cache.put(key, {".ragged": self.write("a.ragged", b"a" * 2048)})
+        self.assertTrue(os.path.exists(self.cache.path(key, ".ragged")))
+
+
+if __name__ == "__main__":
+    unittest.main()
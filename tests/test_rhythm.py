@@ -0,0 +1,88 @@
+import unittest
+import numpy as np
+from app.sequence_generator.rhythm import (
+    MAX_STEPS,
+    bjorklund,
+    euclidean_pattern,
+    euclidean_onsets,
+    onset_frame_steps,
+    batch_patterns,
+    batch_frame_steps,
+)
+
+
+class TestEuclideanPattern(unittest.TestCase):
+    def test_table_matches_reference(self):
+        for steps in range(1, MAX_STEPS + 1):
+            for pulses in range(steps + 1):
+                np.testing.assert_array_equal(
+                    euclidean_pattern(pulses, steps), bjorklund(pulses, steps)
+                )
+
+    def test_known_pattern(self):
+        self.assertEqual(euclidean_pattern(3, 8).tolist(), [1, 0, 0, 1, 0, 0, 1, 0])
+
+    def test_rotation(self):
+        self.assertEqual(euclidean_pattern(3, 8, 1).tolist(), [0, 0, 1, 0, 0, 1, 0, 1])
+
+    def test_rejects_invalid_pulses(self):
+        with self.assertRaises(ValueError):
+            euclidean_pattern(5, 4)
+        with self.assertRaises(ValueError):
+            euclidean_pattern(-1, 8)
+        self.assertEqual(euclidean_pattern(4, 4).tolist(), [1, 1, 1, 1])
+        self.assertEqual(euclidean_pattern(0, 4).tolist(), [0, 0, 0, 0])
+
+    def test_longer_than_table(self):
+        self.assertEqual(int(euclidean_pattern(5, 80).sum()), 5)
+
+    def test_onsets(self):
+        np.testing.assert_array_equal(euclidean_onsets(3, 8), [0, 3, 6])
+
+    def test_onset_frame_steps(self):
+        np.testing.assert_array_equal(
+            onset_frame_steps(np.array([0, 3, 6]), 8), [3, 3, 2]
+        )
+        np.testing.assert_array_equal(onset_frame_steps(np.array([], dtype=int), 8), [])
+
+    def test_onset_frame_steps_wrap_around_the_bar(self):
+        # the last onset lasts until the first onset of the next bar
+        np.testing.assert_array_equal(
+            onset_frame_steps(euclidean_onsets(3, 8, 1), 8), [3, 2, 3]
+        )
+
+
+class TestBatchPatterns(unittest.TestCase):
+    def test_matches_single_patterns(self):
+        pulses, steps, rotations = [3, 5, 12, 0], [8, 16, 16, 4], [0, 2, 5, 1]
+        patterns = batch_patterns(pulses, steps, rotations)
+
+        self.assertEqual(patterns.shape, (4, MAX_STEPS))
+        for row, (p, s, r) in enumerate(zip(pulses, steps, rotations)):
+            np.testing.assert_array_equal(patterns[row, :s], euclidean_pattern(p, s, r))
+            self.assertFalse(patterns[row, s:].any())
+
+    def test_frame_steps_match_single_patterns(self):
+        pulses, steps, rotations = [3, 5, 12], [8, 16, 16], [0, 2, 5]
+        frame_steps = batch_frame_steps(batch_patterns(pulses, steps, rotations), steps)
+
+        for row, (p, s, r) in enumerate(zip(pulses, steps, rotations)):
+            onsets = euclidean_onsets(p, s, r)
+            np.testing.assert_array_equal(
+                frame_steps[row, onsets], onset_frame_steps(onsets, s)
+            )
+            self.assertEqual(np.count_nonzero(frame_steps[row]), len(onsets))
+
+    def test_rejects_too_many_steps(self):
+        with self.assertRaises(ValueError):
+            batch_patterns([3], [MAX_STEPS + 1])
+
+    def test_rejects_invalid_pulses(self):
+        with self.assertRaises(ValueError):
+            batch_patterns([9], [8])
+        with self.assertRaises(ValueError):
+            batch_patterns([-1], [8])
+
+
+if __name__ == "__main__":
+    unittest.main()
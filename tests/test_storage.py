@@ -544,6 +544,21 @@ class TestSnapshotManager(unittest.TestCase):
         # Assert the remaining labels in snapshot_files_df
         assert set(self.snapshot_manager.snapshot_files_df["label"]) == set(["other"])
 
+    def test_load_snapshot_files_from_s3(self):
+        self.snapshot_manager.snapshot_files_df = pd.DataFrame(
+            {"paths": ["other/file5.mp3"], "bucket": [self.bucket_name]}
+        )
+        self.snapshot_manager.save_snapshot_files_to_s3()
+        self.snapshot_manager.snapshot_files_df = None
+
+        files_df = self.snapshot_manager.load_snapshot_files_from_s3()
+
+        self.assertEqual(
+            files_df.to_dict("records"),
+            [{"paths": "other/file5.mp3", "bucket": self.bucket_name}],
+        )
+        self.assertIs(self.snapshot_manager.snapshot_files_df, files_df)
+
     def test_save_snapshot_files_to_s3(self):
         # Given
 
@@ -0,0 +1,307 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+import numpy as np
+import soundfile as sf
+from fastapi import BackgroundTasks
+from app.audio_processing import get_sequence
+from app.sequence_generator.audio_cache import decoded_audio_cache
+from app.sequence_generator.generator import (
+    JobRunner,
+    SequenceAudioFrameSlicer,
+    SequenceConfigRefactor,
+    SequenceEngine,
+    render_symbolic,
+)
+from app.utils.render_cache import RenderCache
+from app.utils.symbolic import SYMBOLIC_EXTENSION, SymbolicSequence
+
+HEADER = {
+    "sr": 44100,
+    "bpm": 120,
+    "channel": 2,
+    "quality": "master",
+    "pitch": {"backend": "resample", "res_type": "soxr_hq", "bank": False},
+    "rhythm": [5, 16],
+}
+
+
+def symbolic_sequence(n_steps=16, **fields):
+    values = {
+        "asset": {
+            "path": "temp/loop.wav",
+            "cloud_path": "assets/loop.wav",
+            "digest": "d",
+        },
+        "offsets": np.arange(n_steps) * 5512,
+        "lengths": [5512, 11025] * (n_steps // 2),
+        "pitch": [0, 7, -5, 12] * (n_steps // 4),
+        "header": HEADER,
+    }
+    values.update(fields)
+    return SymbolicSequence(**values)
+
+
+class TestSymbolicSequence(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_round_trip(self):
+        sequence = symbolic_sequence().with_mutes([1, 3]).with_gain(0.5)
+        path = os.path.join(self.tmp_dir, f"sequence{SYMBOLIC_EXTENSION}")
+        sequence.save(path)
+        loaded = SymbolicSequence.load(path)
+
+        self.assertEqual(loaded.to_dict(), sequence.to_dict())
+        self.assertEqual(loaded.header, HEADER)
+        self.assertEqual(loaded.sr, 44100)
+        np.testing.assert_array_equal(loaded.mute[:4], [0, 1, 0, 1])
+        np.testing.assert_array_equal(loaded.gain, 0.5)
+        self.assertEqual(os.listdir(self.tmp_dir), [f"sequence{SYMBOLIC_EXTENSION}"])
+        # a bar of steps takes a few hundred bytes rather than seconds of audio
+        self.assertLess(os.path.getsize(path), 1024)
+
+    def test_invalid_file(self):
+        path = os.path.join(self.tmp_dir, "sequence.json")
+        with open(path, "w") as f:
+            f.write("not json")
+        with self.assertRaises(ValueError):
+            SymbolicSequence.load(path)
+        with open(path, "w") as f:
+            json.dump({"version": 0}, f)
+        with self.assertRaises(ValueError):
+            SymbolicSequence.load(path)
+
+    def test_step_arrays_must_agree(self):
+        with self.assertRaises(ValueError):
+            symbolic_sequence(lengths=[100])
+        with self.assertRaises(ValueError):
+            symbolic_sequence(pitch=[0])
+
+    def test_edits_return_copies(self):
+        sequence = symbolic_sequence()
+        muted = sequence.with_mutes([0])
+        self.assertEqual(int(sequence.mute.sum()), 0)
+        self.assertEqual(int(muted.mute.sum()), 1)
+        self.assertEqual(muted.header, sequence.header)
+
+    def test_with_asset(self):
+        sequence = symbolic_sequence()
+        copy = {"path": "temp/copy.wav", "cloud_path": "assets/copy.wav", "digest": "d"}
+        self.assertEqual(sequence.with_asset(copy).asset, copy)
+        self.assertEqual(sequence.asset["path"], "temp/loop.wav")
+        with self.assertRaises(ValueError):
+            sequence.with_asset(dict(copy, digest="e"))
+
+    def test_gather(self):
+        audio = np.arange(1000, dtype=np.float32)
+        sequence = symbolic_sequence(
+            4, offsets=[0, 100, 950, 200], lengths=[100, 300, 100, 100]
+        )
+        frames = sequence.gather(audio)
+
+        np.testing.assert_array_equal(frames[0], audio[:100])
+        np.testing.assert_array_equal(frames[1], audio[100:400])
+        np.testing.assert_array_equal(frames[3], audio[200:300])
+        # frames running past the end are zero-padded
+        np.testing.assert_array_equal(frames[2][:50], audio[950:])
+        np.testing.assert_array_equal(frames[2][50:], 0)
+        self.assertTrue(all(frame.dtype == np.float32 for frame in frames))
+
+    def test_apply_levels(self):
+        frames = [np.ones(4, dtype=np.float32) for __ in range(4)]
+        sequence = symbolic_sequence(4, lengths=[4] * 4, gain=[1, 0.5, 1, 0.5])
+        leveled = sequence.with_mutes([3]).apply_levels(frames)
+
+        self.assertIs(leveled[0], frames[0])
+        np.testing.assert_array_equal(leveled[1], 0.5)
+        np.testing.assert_array_equal(leveled[3], 0)
+        np.testing.assert_array_equal(frames[1], 1)
+
+
+class TestRenderSymbolic(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.asset_path = os.path.join(self.tmp_dir, "loop.wav")
+        audio = np.random.default_rng(0).uniform(-0.5, 0.5, 44100 * 3)
+        sf.write(self.asset_path, audio.astype(np.float32), 44100)
+        self.job_params = MagicMock()
+        self.job_params.get_job_params.return_value = {
+            "local_paths": self.asset_path,
+            "cloud_paths": "assets/loop.wav",
+            "bpm": 120,
+            "rythm_config_list": [5, 16],
+            "pitch_temperature_knob_list": [1],
+            "pitch_backend": "resample",
+        }
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def generate(self):
+        config = SequenceConfigRefactor(self.job_params)
+        plan = config.plan()
+        engine = SequenceEngine(
+            config,
+            SequenceAudioFrameSlicer(config, plan),
+            rng=np.random.default_rng(4),
+            plan=plan,
+        )
+        with patch.object(config, "get_note_sequence", return_value=[-5, 0, 7]):
+            __, frames = engine.generate_audio_sequence()
+        steps = engine.recorded_steps()
+        sequence = SymbolicSequence(
+            {
+                "path": self.asset_path,
+                "cloud_path": "assets/loop.wav",
+                "digest": decoded_audio_cache.asset_digest(self.asset_path),
+            },
+            steps["offsets"],
+            steps["lengths"],
+            steps["pitch"],
+            header=dict(HEADER, pitch={**HEADER["pitch"], "bank": steps["bank"]}),
+        )
+        return sequence, frames
+
+    def test_render_matches_the_generated_frames(self):
+        sequence, frames = self.generate()
+        self.assertTrue(np.any(sequence.pitch != 0))
+
+        rendered = render_symbolic(sequence)
+        self.assertEqual(len(rendered), len(frames))
+        for rendered_frame, frame in zip(rendered, frames):
+            np.testing.assert_allclose(rendered_frame, frame, atol=1e-6)
+
+    def test_steps_are_drawn_without_audio(self):
+        sequence, __ = self.generate()
+        config = SequenceConfigRefactor(self.job_params)
+        engine = SequenceEngine(
+            config, None, rng=np.random.default_rng(4), plan=config.plan()
+        )
+        with patch.object(config, "get_note_sequence", return_value=[-5, 0, 7]), patch(
+            "app.sequence_generator.generator.transpose_frames"
+        ) as mock_transpose:
+            steps = engine.generate_steps()
+
+        mock_transpose.assert_not_called()
+        np.testing.assert_array_equal(steps["offsets"], sequence.offsets)
+        np.testing.assert_array_equal(steps["lengths"], sequence.lengths)
+        np.testing.assert_array_equal(steps["pitch"], sequence.pitch)
+        self.assertEqual(steps["bank"], sequence.header["pitch"]["bank"])
+
+    @patch.object(SequenceConfigRefactor, "get_note_sequence", return_value=[-5, 0, 7])
+    @patch.object(JobRunner, "asset_in_use")
+    @patch.object(JobRunner, "get_assets")
+    @patch("app.sequence_generator.generator.render_cache")
+    @patch("app.sequence_generator.generator.JobConfig")
+    def test_get_sequence_only_draws_the_steps(
+        self,
+        mock_job_config,
+        mock_render_cache,
+        mock_get_assets,
+        mock_asset_in_use,
+        mock_notes,
+    ):
+        mock_job_config.return_value = self.job_params
+        mock_render_cache.get.return_value = False
+        self.job_params.path_resolver.return_value = {
+            "local_path_processed_sequence": os.path.join(
+                self.tmp_dir, f"sequence{SYMBOLIC_EXTENSION}"
+            ),
+            "cloud_path_processed": "sequences/job_0.mp3",
+        }
+        with patch("app.sequence_generator.generator.transpose_frames") as mock_transpose:
+            response = get_sequence(
+                "folder/job.json", 0, "random_id", BackgroundTasks(), seed=4
+            )
+
+        # the frames are neither sliced nor shifted until the FX render them
+        mock_transpose.assert_not_called()
+        self.assertEqual(response["sequence"], "sequences/job_0.mp3")
+        self.assertTrue(np.any(np.asarray(response["symbolic"]["steps"]["pitch"])))
+
+        sequence, frames = self.generate()
+        rendered = render_symbolic(
+            SymbolicSequence.load(
+                self.job_params.path_resolver()["local_path_processed_sequence"]
+            )
+        )
+        for rendered_frame, frame in zip(rendered, frames):
+            np.testing.assert_allclose(rendered_frame, frame, atol=1e-6)
+
+    def test_muted_steps_are_not_shifted(self):
+        sequence, frames = self.generate()
+        with patch(
+            "app.sequence_generator.generator.transpose_frames",
+            side_effect=lambda asset_path, audio_frames, *args, **kwargs: (
+                audio_frames,
+                False,
+            ),
+        ) as mock_transpose:
+            rendered = render_symbolic(sequence.with_mutes([0, 1]))
+
+        self.assertEqual(
+            len(mock_transpose.call_args.args[1]), np.count_nonzero(sequence.pitch[2:])
+        )
+        np.testing.assert_array_equal(rendered[0], 0)
+        np.testing.assert_array_equal(rendered[1], 0)
+
+    @patch.object(SequenceConfigRefactor, "get_note_sequence", return_value=[-5, 0, 7])
+    @patch.object(JobRunner, "asset_in_use")
+    @patch.object(JobRunner, "get_assets")
+    @patch("app.sequence_generator.generator.JobConfig")
+    def test_cached_render_references_the_jobs_asset(
+        self, mock_job_config, mock_get_assets, mock_asset_in_use, mock_notes
+    ):
+        # a second job plays a copy of the same asset, under other paths
+        copy_path = os.path.join(self.tmp_dir, "copy.wav")
+        shutil.copyfile(self.asset_path, copy_path)
+        copy_params = MagicMock()
+        copy_params.get_job_params.return_value = dict(
+            self.job_params.get_job_params(),
+            local_paths=copy_path,
+            cloud_paths="assets/copy.wav",
+        )
+        for name, job_params in (("job", self.job_params), ("copy", copy_params)):
+            job_params.path_resolver.return_value = {
+                "local_path_processed_sequence": os.path.join(
+                    self.tmp_dir, f"{name}{SYMBOLIC_EXTENSION}"
+                )
+            }
+        mock_job_config.side_effect = lambda job_id, *args: (
+            copy_params if job_id == "folder/copy.json" else self.job_params
+        )
+
+        cache = RenderCache(os.path.join(self.tmp_dir, "renders"), max_bytes=2**20)
+        with patch("app.sequence_generator.generator.render_cache", cache):
+            job = JobRunner("folder/job.json", 0, "random_id", seed=4)
+            self.assertTrue(job.execute())
+            copy = JobRunner("folder/copy.json", 0, "random_id", seed=4)
+            with patch.object(copy, "validate") as mock_validate:
+                self.assertTrue(copy.execute())
+
+        # served from the render of the first job
+        mock_validate.assert_not_called()
+        self.assertEqual(job.render_key(), copy.render_key())
+        self.assertEqual(copy.symbolic_result()["asset"]["cloud_path"], "assets/copy.wav")
+        sequence = SymbolicSequence.load(
+            copy_params.path_resolver()["local_path_processed_sequence"]
+        )
+        self.assertEqual(sequence.asset["path"], copy_path)
+        self.assertEqual(sequence.to_dict()["steps"], job.symbolic_result()["steps"])
+
+    def test_changed_asset(self):
+        sequence, __ = self.generate()
+        sf.write(self.asset_path, np.zeros(44100, dtype=np.float32), 44100)
+        with self.assertRaises(ValueError):
+            render_symbolic(sequence)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+import librosa
+import numpy as np
+import soundfile as sf
+from app.sequence_generator.analysis import read_analysis
+from app.sequence_generator.tempo import conform_asset, conformed_path
+
+
+class TestConformAsset(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.asset_path = os.path.join(self.tmp_dir, "PITCH_C__BPM_120__loop.wav")
+        self.audio = (np.sin(np.linspace(0, 400, 44100)) * 0.5).astype(np.float32)
+        sf.write(self.asset_path, self.audio, 44100, subtype="FLOAT")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_conformed_path(self):
+        self.assertEqual(
+            conformed_path("assets/sounds/BPM_120__loop.mp3", 140),
+            "assets/sounds/BPM_120__loop.bpm140.44100.npy",
+        )
+        self.assertEqual(
+            conformed_path("BPM_120__loop.mp3", 92.5, sr=22050),
+            "BPM_120__loop.bpm92.5.22050.npy",
+        )
+
+    def test_stretches_once(self):
+        with patch(
+            "app.sequence_generator.tempo.librosa.effects.time_stretch",
+            wraps=librosa.effects.time_stretch,
+        ) as mock_stretch:
+            variant_path = conform_asset(self.asset_path, 150)
+            self.assertEqual(conform_asset(self.asset_path, 150), variant_path)
+
+        mock_stretch.assert_called_once()
+        self.assertEqual(mock_stretch.call_args.kwargs["rate"], 1.25)
+        self.assertEqual(variant_path, conformed_path(self.asset_path, 150))
+        variant = np.load(variant_path)
+        self.assertEqual(variant.dtype, np.float32)
+        self.assertAlmostEqual(len(variant) / len(self.audio), 0.8, delta=0.02)
+
+        analysis = read_analysis(variant_path)
+        self.assertEqual((analysis["n_samples"], analysis["bpm"]), (len(variant), 150))
+        self.assertEqual(analysis["key"], "C")
+
+    def test_stale_variant_is_rebuilt(self):
+        variant_path = conform_asset(self.asset_path, 100)
+        past = os.stat(self.asset_path).st_mtime_ns - 10**9
+        os.utime(variant_path, ns=(past, past))
+
+        with patch(
+            "app.sequence_generator.tempo.librosa.effects.time_stretch",
+            wraps=librosa.effects.time_stretch,
+        ) as mock_stretch:
+            conform_asset(self.asset_path, 100)
+        mock_stretch.assert_called_once()
+
+    @patch("app.sequence_generator.tempo.librosa.effects.time_stretch")
+    def test_asset_is_used_as_is(self, mock_stretch):
+        untagged_path = os.path.join(self.tmp_dir, "one_shot.wav")
+        shutil.copyfile(self.asset_path, untagged_path)
+
+        self.assertEqual(conform_asset(self.asset_path, 120), self.asset_path)
+        self.assertEqual(conform_asset(self.asset_path, 120.2), self.asset_path)
+        self.assertEqual(conform_asset(untagged_path, 140), untagged_path)
+        missing_path = os.path.join(self.tmp_dir, "BPM_90__missing.wav")
+        self.assertEqual(conform_asset(missing_path, 140), missing_path)
+        with patch.dict(os.environ, {"TEMPO_CONFORM": "false"}):
+            self.assertEqual(conform_asset(self.asset_path, 140), self.asset_path)
+        mock_stretch.assert_not_called()
+
+    @patch(
+        "app.sequence_generator.tempo.librosa.effects.time_stretch",
+        side_effect=ValueError("stretch failed"),
+    )
+    def test_failed_stretch_falls_back_to_asset(self, mock_stretch):
+        self.assertEqual(conform_asset(self.asset_path, 140), self.asset_path)
+        self.assertFalse(os.path.exists(conformed_path(self.asset_path, 140)))
+
+
+if __name__ == "__main__":
+    unittest.main()
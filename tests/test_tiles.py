@@ -0,0 +1,122 @@
+import unittest
+import numpy as np
+from app.sequence_generator.tiles import (
+    BarLayout,
+    TileRenderer,
+    bar_length,
+    fit_frames,
+)
+
+
+class TestFitFrames(unittest.TestCase):
+    def test_pads_and_truncates(self):
+        np.testing.assert_array_equal(
+            fit_frames([np.ones(2), np.full(2, 2.0)], 3), [1, 1, 2]
+        )
+        np.testing.assert_array_equal(fit_frames(np.ones(2), 4), [1, 1, 0, 0])
+        np.testing.assert_array_equal(fit_frames([], 2), [0, 0])
+
+    def test_start_wraps_around(self):
+        frames = [np.full(2, 1.0), np.full(3, 2.0)]
+        np.testing.assert_array_equal(fit_frames(frames, 6, 2), [2, 0, 1, 1, 2, 2])
+        # longer sequences are truncated, never written over their start
+        np.testing.assert_array_equal(
+            fit_frames(frames + [np.full(4, 3.0)], 6, 2), [2, 3, 1, 1, 2, 2]
+        )
+
+    def test_bar_length(self):
+        self.assertEqual(bar_length(120), 88200)
+        self.assertEqual(bar_length(120, sr=22050), 44100)
+
+
+class TestBarLayout(unittest.TestCase):
+    def test_default_is_a_single_bar(self):
+        layout = BarLayout.from_spec()
+        self.assertEqual((layout.chain, layout.masks), ([0], [None]))
+        self.assertTrue(layout.is_single)
+
+    def test_chain_repeats_over_the_bars(self):
+        layout = BarLayout.from_spec(bars=6, chain="bba")
+        self.assertEqual(layout.chain, [0, 0, 1, 0, 0, 1])
+        self.assertEqual((layout.bars, layout.n_tiles), (6, 2))
+        self.assertFalse(layout.is_single)
+
+    def test_variation_masks_repeated_bars(self):
+        layout = BarLayout.from_spec(
+            bars=4, chain="AB", variation=0.5, steps=16, rng=np.random.default_rng(0)
+        )
+        self.assertEqual(layout.masks[:2], [None, None])
+        for mask in layout.masks[2:]:
+            self.assertEqual(len(mask), 16)
+            self.assertTrue(set(mask) <= {0, 1})
+
+    def test_invalid_specs(self):
+        for spec in (
+            {"bars": 0},
+            {"bars": 65},
+            {"chain": "A-B"},
+            {"bars": 2, "variation": 0.5},
+        ):
+            with self.subTest(spec=spec):
+                with self.assertRaises(ValueError):
+                    BarLayout.from_spec(**spec)
+        with self.assertRaises(ValueError):
+            BarLayout([0, 2])
+
+    def test_header_round_trip(self):
+        layout = BarLayout.from_spec(
+            bars=3, chain="AAB", variation=0.5, steps=4, rng=np.random.default_rng(1)
+        )
+        layout.tile_frames = [3, 2]
+        restored = BarLayout.from_header(layout.to_header())
+        self.assertEqual(
+            (restored.chain, restored.masks, restored.tile_frames),
+            (layout.chain, layout.masks, layout.tile_frames),
+        )
+        self.assertTrue(BarLayout.from_header({"sr": 44100}).is_single)
+
+    def test_split(self):
+        frames = [np.full(2, i) for i in range(5)]
+        tiles = BarLayout([0, 1], tile_frames=[3, 2]).split(frames)
+        self.assertEqual([len(tile) for tile in tiles], [3, 2])
+        self.assertEqual(tiles[1][0][0], 3)
+        self.assertEqual(BarLayout().split(frames), [frames])
+
+
+class TestTileRenderer(unittest.TestCase):
+    def setUp(self):
+        # 4 samples per bar
+        self.renderer = TileRenderer(bpm=120, sr=2)
+
+    def test_tiles_are_copied_into_their_bars(self):
+        layout = BarLayout([0, 0, 1, 0])
+        tiles = [np.ones(4), [np.full(2, 2.0)]]
+        np.testing.assert_array_equal(
+            self.renderer.render(tiles, layout),
+            [1, 1, 1, 1] * 2 + [2, 2, 0, 0] + [1, 1, 1, 1],
+        )
+
+    def test_masks_drop_steps(self):
+        layout = BarLayout([0, 0], masks=[None, [1, 0]])
+        np.testing.assert_array_equal(
+            self.renderer.render([np.ones(4)], layout), [1, 1, 1, 1, 1, 1, 0, 0]
+        )
+
+    def test_renders_into_a_given_buffer(self):
+        out = np.full(8, 9.0, dtype=np.float32)
+        result = self.renderer.render([np.ones(4), np.zeros(4)], BarLayout([1, 0]), out)
+        self.assertIs(result, out)
+        np.testing.assert_array_equal(out, [0, 0, 0, 0, 1, 1, 1, 1])
+
+    def test_tile_count_must_match(self):
+        with self.assertRaises(ValueError):
+            self.renderer.render([np.ones(4)], BarLayout([0, 1]))
+
+    def test_step_gains(self):
+        np.testing.assert_array_equal(
+            TileRenderer(bpm=120, sr=3).step_gains([1, 0, 1, 1]), [1, 1, 0, 1, 1, 1]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
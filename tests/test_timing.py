@@ -0,0 +1,130 @@
+import asyncio
+import contextvars
+import json
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+import anyio
+from starlette.requests import Request
+from starlette.responses import StreamingResponse
+from app.utils.timing import (
+    StageTimer,
+    current_timer,
+    server_timing_middleware,
+    stage,
+    timed,
+    timing_scope,
+)
+
+
+class TestStageTimer(unittest.TestCase):
+    def test_stage_is_a_noop_outside_a_scope(self):
+        self.assertIsNone(current_timer())
+        with stage("decode"):
+            pass
+        self.assertIs(stage("decode"), stage("mix"))
+
+    def test_nested_stages_are_charged_their_own_time(self):
+        with timing_scope() as timer:
+            with stage("plan"):
+                time.sleep(0.02)
+                with stage("decode"):
+                    time.sleep(0.05)
+
+        self.assertEqual(list(timer.durations), ["decode", "plan"])
+        self.assertGreaterEqual(timer.durations["decode"], 0.05)
+        self.assertGreaterEqual(timer.durations["plan"], 0.02)
+        self.assertLess(timer.durations["plan"], 0.05)
+
+    def test_repeated_stages_are_summed(self):
+        @timed("mute")
+        def mute():
+            return "muted"
+
+        with timing_scope() as timer:
+            self.assertEqual(mute(), "muted")
+            mute()
+
+        self.assertEqual(timer.counts["mute"], 2)
+        self.assertIsNone(current_timer())
+
+    def test_copied_context_reports_to_the_same_timer(self):
+        def render():
+            with stage("slice"):
+                time.sleep(0.01)
+
+        with timing_scope() as timer:
+            with ThreadPoolExecutor(max_workers=3) as executor:
+                futures = [
+                    executor.submit(contextvars.copy_context().run, render)
+                    for __ in range(3)
+                ]
+                [future.result() for future in futures]
+
+        self.assertEqual(timer.counts["slice"], 3)
+
+    def test_header(self):
+        timer = StageTimer()
+        timer.add("download", 0.0125)
+        header = timer.header()
+        self.assertTrue(header.startswith("download;dur=12.5, total;dur="))
+
+
+class TestServerTimingMiddleware(unittest.TestCase):
+    def dispatch(self, endpoint, query_string=b""):
+        request = Request(
+            {
+                "type": "http",
+                "method": "POST",
+                "headers": [],
+                "query_string": query_string,
+            }
+        )
+
+        async def call_next(request):
+            # endpoints run on a worker thread, as with starlette's run_in_threadpool
+            content = await anyio.to_thread.run_sync(endpoint)
+            return StreamingResponse(
+                iter([json.dumps(content).encode()]), media_type="application/json"
+            )
+
+        async def run():
+            response = await server_timing_middleware(request, call_next)
+            if isinstance(response, StreamingResponse):
+                body = b"".join([chunk async for chunk in response.body_iterator])
+            else:
+                body = response.body
+            return response, json.loads(body)
+
+        return asyncio.run(run())
+
+    @staticmethod
+    def sequence():
+        with stage("decode"):
+            pass
+        return "sequences/job_0.mp3"
+
+    @staticmethod
+    def mix():
+        with stage("mix"):
+            pass
+        return {"mixed": True}
+
+    def test_header(self):
+        response, body = self.dispatch(self.sequence)
+        self.assertEqual(body, "sequences/job_0.mp3")
+        self.assertIn("decode;dur=", response.headers["server-timing"])
+        self.assertIn("total;dur=", response.headers["server-timing"])
+
+    def test_debug_field(self):
+        response, body = self.dispatch(self.mix, b"debug_timings=true")
+        self.assertTrue(body["mixed"])
+        self.assertIn("mix", body["debug"]["timings"])
+
+        response, body = self.dispatch(self.sequence, b"debug_timings=1")
+        self.assertEqual(body["result"], "sequences/job_0.mp3")
+        self.assertIn("decode", body["debug"]["timings"])
+
+
+if __name__ == "__main__":
+    unittest.main()
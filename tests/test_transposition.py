@@ -0,0 +1,143 @@
+import unittest
+import os
+import tempfile
+import shutil
+from unittest.mock import patch, MagicMock
+import numpy as np
+import soundfile as sf
+from app.sequence_generator.transposition import TranspositionBank, BANK_SEMITONES
+from app.sequence_generator.generator import SequenceEngine
+from app.utils.quality import RenderQuality
+
+
+def fake_pitch_shift(audio, sr, n_steps):
+    return audio + n_steps
+
+
+class TestTranspositionBank(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.asset_path = os.path.join(self.tmp_dir, "sample.wav")
+        sf.write(self.asset_path, np.zeros(4410, dtype=np.float32), 44100)
+        self.bank = TranspositionBank(self.asset_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_bank_path(self):
+        self.assertEqual(
+            self.bank.bank_path, os.path.join(self.tmp_dir, "sample.bank.npy")
+        )
+
+    def test_covers(self):
+        self.assertTrue(TranspositionBank.covers(-12))
+        self.assertTrue(TranspositionBank.covers(11))
+        self.assertFalse(TranspositionBank.covers(12))
+        self.assertFalse(TranspositionBank.covers(0.5))
+
+    @patch("librosa.effects.pitch_shift", side_effect=fake_pitch_shift)
+    def test_build(self, mock_pitch_shift):
+        self.assertFalse(self.bank.is_fresh())
+        self.assertTrue(self.bank.build())
+        self.assertTrue(self.bank.is_fresh())
+        self.assertEqual(mock_pitch_shift.call_count, len(BANK_SEMITONES))
+
+        bank = self.bank.load()
+        self.assertEqual(bank.shape, (len(BANK_SEMITONES), 4410))
+        self.assertEqual(bank.dtype, np.float32)
+        self.assertEqual([f for f in os.listdir(self.tmp_dir) if f.endswith(".tmp")], [])
+
+    @patch("librosa.effects.pitch_shift", side_effect=fake_pitch_shift)
+    def test_frame(self, mock_pitch_shift):
+        self.bank.build()
+        np.testing.assert_array_equal(self.bank.frame(-7, 100, 10), np.full(10, -7))
+        padded = self.bank.frame(3, 4400, 20)
+        self.assertEqual(len(padded), 20)
+        np.testing.assert_array_equal(padded[10:], 0)
+
+    @patch("librosa.effects.pitch_shift", side_effect=fake_pitch_shift)
+    def test_stale_after_asset_rewrite(self, mock_pitch_shift):
+        self.bank.build()
+        stat = os.stat(self.bank.bank_path)
+        os.utime(self.asset_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        self.assertFalse(self.bank.is_fresh())
+
+
+class TestSequenceEngineTranspositionBank(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.asset_path = os.path.join(self.tmp_dir, "sample.wav")
+        sf.write(self.asset_path, np.zeros(4096, dtype=np.float32), 44100)
+
+        self.frames = [np.zeros(2048, dtype=np.float32) for _ in range(2)]
+        self.mock_config = MagicMock()
+        self.mock_config.get_audio_frames_length.return_value = [2048.0] * 4
+        self.mock_config.get_note_sequence.return_value = [5]
+        self.mock_config.job_params.get_job_params.return_value = {
+            "local_paths": self.asset_path,
+            "bpm": 120,
+            "pitch_temperature_knob_list": [50],
+        }
+        self.mock_config.asset_path.return_value = self.asset_path
+        self.mock_config.quality = RenderQuality()
+        self.mock_config.sample_rate = 44100
+        self.mock_frames = MagicMock()
+        self.mock_frames.get_audio_frames.return_value = [self.frames]
+        self.mock_frames.get_audio_frame_sequence_list.return_value = [
+            np.array([0, 2048])
+        ]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_pitched_frames_come_from_bank(self):
+        with patch("librosa.effects.pitch_shift", side_effect=fake_pitch_shift):
+            TranspositionBank(self.asset_path).build()
+
+        rng = MagicMock(wraps=np.random.default_rng(0))
+        rng.random.return_value = 0.9
+        with patch("librosa.effects.pitch_shift") as mock_pitch_shift:
+            engine = SequenceEngine(self.mock_config, self.mock_frames, rng=rng)
+            __, audio_sequence = engine.generate_audio_sequence()
+            mock_pitch_shift.assert_not_called()
+
+        for frame in audio_sequence:
+            np.testing.assert_array_equal(frame, np.full(2048, 5))
+
+    def test_previews_do_not_use_the_master_bank(self):
+        with patch("librosa.effects.pitch_shift", side_effect=fake_pitch_shift):
+            TranspositionBank(self.asset_path).build()
+        self.mock_config.quality = RenderQuality("preview", 22050)
+        self.mock_config.sample_rate = 22050
+
+        rng = MagicMock(wraps=np.random.default_rng(0))
+        rng.random.return_value = 0.9
+        with patch(
+            "librosa.effects.pitch_shift", return_value=np.ones(2048, dtype=np.float32)
+        ) as mock_pitch_shift:
+            engine = SequenceEngine(self.mock_config, self.mock_frames, rng=rng)
+            engine.generate_audio_sequence()
+        self.assertEqual(mock_pitch_shift.call_args.kwargs["sr"], 22050)
+
+    def test_other_backends_do_not_use_the_bank(self):
+        with patch("librosa.effects.pitch_shift", side_effect=fake_pitch_shift):
+            TranspositionBank(self.asset_path).build()
+        self.mock_config.job_params.get_job_params.return_value["pitch_backend"] = (
+            "resample"
+        )
+
+        rng = MagicMock(wraps=np.random.default_rng(0))
+        rng.random.return_value = 0.9
+        with patch(
+            "app.sequence_generator.pitch.ResamplePitchBackend.shift",
+            return_value=np.ones(2048, dtype=np.float32),
+        ) as mock_shift:
+            engine = SequenceEngine(self.mock_config, self.mock_frames, rng=rng)
+            __, audio_sequence = engine.generate_audio_sequence()
+        mock_shift.assert_called()
+        for frame in audio_sequence:
+            np.testing.assert_array_equal(frame, np.ones(2048))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,15 @@
 import unittest
+from unittest.mock import patch
 from pydantic import ValidationError
-from app.utils.utils import JobTypeValidator, JobConfig, JobUtils, JobCleanUp, purge_all
+from app.utils.utils import (
+    JobTypeValidator,
+    JobConfig,
+    JobUtils,
+    JobCleanUp,
+    parse_sample_bpm,
+    parse_sample_key,
+    purge_all,
+)
 import os
 import json
 import itertools
@@ -51,12 +60,133 @@ class TestJobConfig(unittest.TestCase):
         paths = self.job_config.path_resolver()
         self.assertIn("cloud_path", paths)
         self.assertIn("local_path", paths)
+        self.assertEqual(
+            paths["local_path_processed_sequence"], "temp/sequences_test_1.sequence.json"
+        )
+
+    def test_variant_path_resolver(self):
+        paths = self.job_config.variant_path_resolver(2)
+        self.assertEqual(
+            paths["local_path_processed_sequence"],
+            "temp/sequences_test_1__v2.sequence.json",
+        )
+        self.assertEqual(paths["cloud_path_processed"], "sequences/test_1__v2.mp3")
 
     # def test_psuedo_json_to_dict(self):
     #     result = self.job_config.__psuedo_json_to_dict()
     #     self.assertIsInstance(result, list)
 
 
+class TestJobParamsCache(unittest.TestCase):
+    def setUp(self):
+        self.job_id = "job_ids/cache_test.json"
+        self.local_path = "temp/cache_test.json"
+        self.payload = {
+            "local_paths": [f"assets/sounds/sample_{i}.mp3" for i in range(6)],
+            "cloud_paths": [f"kicks/sample_{i}.mp3" for i in range(6)],
+            "bpm": [120],
+            "scale_value": ["major"],
+            "key_value": ["C Major"],
+            "rythm_config_list": [[4, 16]] * 6,
+            "pitch_temperature_knob_list": [[0]] * 6,
+        }
+        self.write_payload(self.payload)
+
+    def tearDown(self):
+        JobConfig(self.job_id, 0, "").invalidate_job_params()
+        os.remove(self.local_path)
+
+    def write_payload(self, payload):
+        with open(self.local_path, "w") as f:
+            json.dump(payload, f)
+
+    def test_repeated_calls_parse_once(self):
+        job_config = JobConfig(self.job_id, 2, "random1")
+        with patch("app.utils.utils.json.load", wraps=json.load) as mock_load:
+            first = job_config.get_job_params()
+            second = job_config.get_job_params()
+            JobConfig(self.job_id, 3, "random1").get_job_params()
+        self.assertEqual(mock_load.call_count, 1)
+        self.assertEqual(first, second)
+        self.assertEqual(first["local_paths"], "assets/sounds/sample_2.mp3")
+
+    def test_returned_params_are_copies(self):
+        job_config = JobConfig(self.job_id, 0, "random1")
+        job_config.get_job_params()["bpm"] = 90
+        self.assertEqual(job_config.get_job_params()["bpm"], 120)
+
+    def test_invalidate_after_rewrite(self):
+        job_config = JobConfig(self.job_id, 0, "random1")
+        self.assertEqual(job_config.get_job_params()["bpm"], 120)
+        self.write_payload(dict(self.payload, bpm=[90]))
+        self.assertGreater(job_config.invalidate_job_params(), 0)
+        self.assertEqual(job_config.get_job_params()["bpm"], 90)
+
+    def test_pseudo_json_payload(self):
+        pseudo = json.dumps(self.payload)[:-1] + ', "extra": undefined}'
+        self.write_payload([pseudo])
+        JobConfig(self.job_id, 0, "random1").invalidate_job_params()
+        params = JobConfig(self.job_id, 1, "random1").get_job_params()
+        self.assertEqual(params["cloud_paths"], "kicks/sample_1.mp3")
+
+    def test_bar_params(self):
+        params = JobConfig(self.job_id, 1, "random1").get_job_params()
+        self.assertEqual(
+            (params["bars"], params["bar_chain"], params["bar_variation"]), (1, None, 0.0)
+        )
+
+        self.write_payload(
+            dict(
+                self.payload,
+                bars=[8, 2],
+                bar_chain_list=["AABA", None],
+                bar_variation_list=[0.25],
+            )
+        )
+        JobConfig(self.job_id, 0, "random1").invalidate_job_params()
+        first = JobConfig(self.job_id, 0, "random1").get_job_params()
+        second = JobConfig(self.job_id, 1, "random1").get_job_params()
+        self.assertEqual(
+            (first["bars"], first["bar_chain"], first["bar_variation"]), (8, "AABA", 0.25)
+        )
+        self.assertEqual(
+            (second["bars"], second["bar_chain"], second["bar_variation"]), (2, None, 0.0)
+        )
+        # channels past the end of the list render one bar
+        self.assertEqual(JobConfig(self.job_id, 2, "random1").get_job_params()["bars"], 1)
+
+    def test_invalid_bars(self):
+        for bars in (["8"], [2.5], [0], [True]):
+            with self.subTest(bars=bars):
+                self.write_payload(dict(self.payload, bars=bars))
+                JobConfig(self.job_id, 0, "random1").invalidate_job_params()
+                with self.assertRaises(ValidationError):
+                    JobConfig(self.job_id, 0, "random1").get_job_params()
+
+    def test_pitch_backend_param(self):
+        params = JobConfig(self.job_id, 1, "random1").get_job_params()
+        self.assertIsNone(params["pitch_backend"])
+
+        # a single backend applies to every channel
+        self.write_payload(dict(self.payload, pitch_backend="resample"))
+        JobConfig(self.job_id, 0, "random1").invalidate_job_params()
+        for channel_index in range(6):
+            params = JobConfig(self.job_id, channel_index, "random1").get_job_params()
+            self.assertEqual(params["pitch_backend"], "resample")
+
+    def test_pitch_backend_per_channel(self):
+        self.write_payload(
+            dict(self.payload, pitch_backend=["resample", None, "pedalboard"])
+        )
+        backends = [
+            JobConfig(self.job_id, channel_index, "random1").get_job_params()[
+                "pitch_backend"
+            ]
+            for channel_index in range(4)
+        ]
+        self.assertEqual(backends, ["resample", None, "pedalboard", None])
+
+
 class TestJobUtils(unittest.TestCase):
     def test_sanitize_job_id(self):
         job_id = "job_ids/test.json"
@@ -151,5 +281,32 @@ class TestPurgeAll(unittest.TestCase):
         self.assertTrue(result)
 
 
+class TestParseSampleBpm(unittest.TestCase):
+    def test_parse_sample_bpm(self):
+        cases = {
+            "assets/sounds/PITCH_C__BPM_120__nn2_120_drum_loop_inland_full.mp3": 120,
+            "loop__drums_full/BPM_92.5__loop.wav": 92.5,
+            "BPM_140.mp3": 140,
+            "assets/sounds/one_shot.wav": None,
+            "NOBPM_120.mp3": None,
+            "BPM_0__loop.mp3": None,
+        }
+        for path, bpm in cases.items():
+            with self.subTest(path=path):
+                self.assertEqual(parse_sample_bpm(path), bpm)
+
+    def test_parse_sample_key(self):
+        cases = {
+            "assets/sounds/PITCH_C__BPM_120__nn2_120_drum_loop_inland_full.mp3": "C",
+            "loop__bass/PITCH_F#m__BPM_92__bass.wav": "F#m",
+            "PITCH_Bb.mp3": "Bb",
+            "assets/sounds/one_shot.wav": None,
+            "PITCH_H__loop.mp3": None,
+        }
+        for path, key in cases.items():
+            with self.subTest(path=path):
+                self.assertEqual(parse_sample_key(path), key)
+
+
 if __name__ == "__main__":
     unittest.main()